@@ -44,6 +44,18 @@ def get_available_slots(doctor_id: int, office_id: int, date_str: str, db: Sessi
     return gemini_helpers.get_available_slots(db, doctor_id, office_id, date_str)
 
 
+def get_available_days(
+    doctor_id: int,
+    office_id: int,
+    db: Session,
+    start_date_str: Optional[str] = None,
+    days: int = 14
+) -> List[Dict[str, Any]]:
+    """Get the next days with available time slots for a doctor."""
+    api_logger.debug(f"Executing get_available_days for doctor_id={doctor_id}, office_id={office_id}, start={start_date_str}, days={days}")
+    return gemini_helpers.get_available_days(db, doctor_id, office_id, start_date_str, days)
+
+
 def find_patient_by_phone(phone: str, db: Session) -> Optional[Dict[str, Any]]:
     """Find a patient by their phone number."""
     api_logger.debug(f"Executing find_patient_by_phone for phone={phone}")
@@ -151,6 +163,21 @@ def create_adk_tools(db: Session) -> List[Any]:
                         "required": ["doctor_id", "office_id", "date_str"]
                     }
                 ),
+                FunctionTool(
+                    func=lambda doctor_id, office_id, start_date_str=None, days=14: get_available_days(doctor_id, office_id, db, start_date_str, days),
+                    name="get_available_days",
+                    description="Get the next days that still have available times for a doctor (up to 14 days ahead by default). Use this when the user has no specific date in mind or the requested date has no availability.",
+                    parameters={
+                        "type": "object",
+                        "properties": {
+                            "doctor_id": {"type": "integer", "description": "The ID of the doctor"},
+                            "office_id": {"type": "integer", "description": "The ID of the office"},
+                            "start_date_str": {"type": "string", "description": "First day in format YYYY-MM-DD (defaults to today)"},
+                            "days": {"type": "integer", "description": "Number of days to look at (default 14)"}
+                        },
+                        "required": ["doctor_id", "office_id"]
+                    }
+                ),
                 FunctionTool(
                     func=lambda phone: find_patient_by_phone(phone, db),
                     name="find_patient_by_phone",
@@ -270,6 +297,20 @@ def create_adk_tools(db: Session) -> List[Any]:
                     "required": ["doctor_id", "office_id", "date_str"]
                 }
             ),
+            FunctionDeclaration(
+                name="get_available_days",
+                description="Get the next days that still have available times for a doctor (up to 14 days ahead by default). Use this when the user has no specific date in mind or the requested date has no availability.",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "doctor_id": {"type": "integer", "description": "The ID of the doctor"},
+                        "office_id": {"type": "integer", "description": "The ID of the office"},
+                        "start_date_str": {"type": "string", "description": "First day in format YYYY-MM-DD (defaults to today)"},
+                        "days": {"type": "integer", "description": "Number of days to look at (default 14)"}
+                    },
+                    "required": ["doctor_id", "office_id"]
+                }
+            ),
             FunctionDeclaration(
                 name="find_patient_by_phone",
                 description="Find a patient by their phone number. Use this to check if the user is already registered as a patient.",
@@ -394,6 +435,20 @@ def get_all_tools_dict() -> List[Dict[str, Any]]:
                 "required": ["doctor_id", "office_id", "date_str"]
             }
         },
+        {
+            "name": "get_available_days",
+            "description": "Get the next days that still have available times for a doctor (up to 14 days ahead by default). Use this when the user has no specific date in mind or the requested date has no availability.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "doctor_id": {"type": "integer", "description": "The ID of the doctor"},
+                    "office_id": {"type": "integer", "description": "The ID of the office"},
+                    "start_date_str": {"type": "string", "description": "First day in format YYYY-MM-DD (defaults to today)"},
+                    "days": {"type": "integer", "description": "Number of days to look at (default 14)"}
+                },
+                "required": ["doctor_id", "office_id"]
+            }
+        },
         {
             "name": "find_patient_by_phone",
             "description": "Find patient(s) by their phone number. Returns a list of matching patients (since multiple people can share a phone). Use this to check if user is registered.",
@@ -495,6 +550,15 @@ def execute_tool(db: Session, function_name: str, args: Dict[str, Any]) -> Any:
                 args.get("date_str")
             )
         
+        elif function_name == "get_available_days":
+            return gemini_helpers.get_available_days(
+                db,
+                args.get("doctor_id"),
+                args.get("office_id"),
+                args.get("start_date_str"),
+                args.get("days") or 14
+            )
+        
         elif function_name == "find_patient_by_phone":
             return gemini_helpers.find_patient_by_phone(db, args.get("phone"))
         
@@ -14,7 +14,8 @@ Phase A ships with six read-only tools:
   diagnosis match (e.g., "hipertensión")
 
 Every tool:
-1. scopes results through `doctor_can_read_patient` (ACL),
+1. scopes results through `services.patient_access` (ACL) — per patient
+   for detail tools, pushed into the query for searches,
 2. returns plain JSON-serialisable dicts (the model consumes these
    as function_response parts),
 3. logs an audit line via `audit_service.log_action` so every PHI
@@ -37,7 +38,7 @@ from database import (
     Person,
 )
 from logger import get_logger
-from services.patient_access import doctor_can_read_patient
+from services.patient_access import doctor_can_read_patient, readable_patients_filter
 
 api_logger = get_logger("medical_records.doctor_assistant")
 
@@ -72,12 +73,15 @@ def search_patients(
     limit = max(1, min(limit, MAX_SEARCH_LIMIT))
 
     like = f"%{q}%"
+    # ACL runs inside the search SQL, so `limit` counts visible patients only.
+    acl = readable_patients_filter(doctor)
     try:
         rows: List[Person] = (
             db.query(Person)
             .filter(
                 Person.person_type == "patient",
                 func.unaccent(Person.name).ilike(func.unaccent(like)),
+                acl,
             )
             .order_by(Person.name.asc())
             .limit(limit)
@@ -87,14 +91,13 @@ def search_patients(
         # unaccent extension not available — fall back to plain ilike
         rows = (
             db.query(Person)
-            .filter(Person.person_type == "patient", Person.name.ilike(like))
+            .filter(Person.person_type == "patient", Person.name.ilike(like), acl)
             .order_by(Person.name.asc())
             .limit(limit)
             .all()
         )
 
-    visible = [p for p in rows if doctor_can_read_patient(db, doctor, p)]
-    patients = [_serialize_patient_brief(p) for p in visible]
+    patients = [_serialize_patient_brief(p) for p in rows]
 
     _audit(
         db,
@@ -13,11 +13,14 @@ from utils.datetime_utils import utc_now
 from fastapi import Request
 from logger import get_logger
 from uuid import uuid4
-from copy import deepcopy
+from services.audit_writer import apply_identity_fallback, audit_writer, resolve_identities
 
 # Create logger for audit service
 audit_logger = get_logger("cortex.audit")
 
+# Acciones de seguridad que nunca pasan por el escritor por lotes
+SECURITY_ACTIONS = frozenset({"LOGIN", "LOGOUT", "ACCESS_DENIED"})
+
 # ============================================================================
 # AUDIT SERVICE
 # ============================================================================
@@ -47,6 +50,12 @@ class AuditService:
         """
         Registra una acción en el log de auditoría
         
+        Las entradas rutinarias (p. ej. lecturas de PHI) se encolan en el
+        escritor por lotes (services/audit_writer.py) y no tocan la sesión del
+        request. Los eventos de seguridad (ver _is_security_event) y cualquier
+        entrada cuando el escritor no está corriendo se escriben de forma
+        síncrona en `db`.
+        
         Args:
             db: Sesión de base de datos
             action: Acción realizada (CREATE, READ, UPDATE, DELETE, LOGIN, etc.)
@@ -65,141 +74,159 @@ class AuditService:
             metadata: Metadatos adicionales
         """
         try:
-            # CRITICAL FIX: If the session has a failed transaction, rollback completely
-            # This happens when login fails or any DB operation fails before audit logging
-            try:
-                current_tx = db.get_transaction()
-                if current_tx is not None and not current_tx.is_active:
-                    db.rollback()
-                    # After rollback, we need to ensure we're in a clean state
-                    # The next operation will start a new transaction automatically
-            except Exception:
-                # If checking transaction state fails, force a rollback
-                try:
-                    db.rollback()
-                except Exception:
-                    pass
-
-            # Extraer información del request
-            ip_address = request.client.host if request.client else None
-            user_agent = request.headers.get("user-agent", "")[:500]  # Limit length
-
-            sanitized_old = AuditService._sanitize_values(old_values)
-            sanitized_new = AuditService._sanitize_values(new_values)
-            
-            # Generar resumen de cambios
-            changes_summary = AuditService._generate_changes_summary(sanitized_old, sanitized_new)
-
-            metadata_payload = deepcopy(metadata) if metadata else {}
-            metadata_payload.setdefault("change_folio", AuditService._generate_change_folio())
-            if change_reason:
-                metadata_payload["change_reason"] = change_reason
-            
-            # Resolver identidad del actor
-            # Si no hay usuario, es una acción del sistema
-            is_system_action = (user is None) or getattr(user, "person_type", None) == "system"
-            
-            # Inicializar valores con None
-            resolved_user_email = None
-            resolved_user_name = None
-            resolved_user_type = None
-            
-            # Si hay usuario, intentar obtener datos del objeto o de la BD
-            if user and user.id:
-                # Intentar obtener email del objeto
-                user_email = getattr(user, "email", None)
-                user_name = getattr(user, "name", None)
-                user_type = getattr(user, "person_type", None)
-                
-                # Si faltan datos en el objeto, consultar la BD
-                if not user_email or not user_name:
-                    try:
-                        db_user = db.query(Person).filter(Person.id == user.id).first()
-                        if db_user:
-                            user_email = db_user.email if not user_email else user_email
-                            user_name = db_user.name if not user_name else user_name
-                            user_type = db_user.person_type if not user_type else user_type
-                    except Exception:
-                        # Si falla la consulta, continuar con los valores que tengamos
-                        pass
-                
-                # Asignar valores (pueden seguir siendo None si no se encontraron)
-                resolved_user_email = user_email
-                resolved_user_name = user_name
-                resolved_user_type = user_type
-            
-            # Fallback a SYSTEM si cualquier campo está vacío o es None
-            # Verificar None primero antes de usar métodos de string
-            if resolved_user_email is None or (isinstance(resolved_user_email, str) and resolved_user_email.strip() == ''):
-                resolved_user_email = "SYSTEM"
-            if resolved_user_name is None or (isinstance(resolved_user_name, str) and resolved_user_name.strip() == ''):
-                resolved_user_name = "SYSTEM"
-            if resolved_user_type is None or (isinstance(resolved_user_type, str) and resolved_user_type.strip() == ''):
-                resolved_user_type = "system"
-            
-            # Garantía final: nunca dejar None
-            if resolved_user_email is None:
-                resolved_user_email = "SYSTEM"
-            if resolved_user_name is None:
-                resolved_user_name = "SYSTEM"
-            if resolved_user_type is None:
-                resolved_user_type = "system"
-            
-            # Crear registro de auditoría
-            audit_entry = AuditLog(
-                user_id=user.id if user else None,
-                user_email=resolved_user_email,
-                user_name=resolved_user_name,
-                user_type=resolved_user_type,
-                
+            entry = AuditService._build_entry(
                 action=action,
+                user=user,
+                request=request,
                 table_name=table_name,
                 record_id=record_id,
-                
-                old_values=sanitized_old,
-                new_values=sanitized_new,
-                changes_summary=changes_summary,
-                
+                old_values=old_values,
+                new_values=new_values,
                 operation_type=operation_type,
                 affected_patient_id=affected_patient_id,
                 affected_patient_name=affected_patient_name,
-                
-                ip_address=ip_address,
-                user_agent=user_agent,
-                session_id=request.headers.get("session-id"),
-                request_path=str(request.url.path)[:500],  # Limit length
-                request_method=request.method,
-                
                 success=success,
-                error_message=error_message[:1000] if error_message else None,  # Limit length
+                error_message=error_message,
                 security_level=security_level,
-                
-                timestamp=utc_now(),
-                metadata_json=metadata_payload
+                metadata=metadata,
+                change_reason=change_reason
             )
             
-            db.add(audit_entry)
-            db.commit()
+            if audit_writer.running and not AuditService._is_security_event(action, security_level):
+                audit_writer.submit(entry)
+            else:
+                AuditService._write_sync(db, entry)
             
             # Log crítico también en consola
             if security_level in ['WARNING', 'CRITICAL']:
                 emoji = '⚠️' if security_level == 'WARNING' else '🚨'
                 audit_logger.warning(
-                    f"{emoji} [{security_level}] {action} by {user.email if user else 'SYSTEM'}: {changes_summary}",
+                    f"{emoji} [{security_level}] {action} by {user.email if user else 'SYSTEM'}: {entry['changes_summary']}",
                     user_id=user.id if user else None,
                     operation=operation_type,
-                    ip=ip_address
+                    ip=entry['ip_address']
                 )
             
         except Exception as e:
             # Si falla la auditoría, no queremos romper la operación principal
             # Pero sí lo logueamos
+            print(f"❌ Error al registrar auditoría: {str(e)}")
+            audit_logger.error(f"Failed to create audit log: {str(e)}")
+    
+    @staticmethod
+    def _is_security_event(action: str, security_level: str) -> bool:
+        """Eventos que se escriben síncronamente (no pueden esperar al lote)"""
+        return action in SECURITY_ACTIONS or security_level in ('WARNING', 'CRITICAL')
+    
+    @staticmethod
+    def _build_entry(
+        action: str,
+        user: Optional[Person],
+        request: Request,
+        table_name: Optional[str] = None,
+        record_id: Optional[int] = None,
+        old_values: Optional[Dict] = None,
+        new_values: Optional[Dict] = None,
+        operation_type: Optional[str] = None,
+        affected_patient_id: Optional[int] = None,
+        affected_patient_name: Optional[str] = None,
+        success: bool = True,
+        error_message: Optional[str] = None,
+        security_level: str = 'INFO',
+        metadata: Optional[Dict] = None,
+        change_reason: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Valores de columna de AuditLog, capturados en el momento de la acción.
+        La identidad del actor se toma del objeto user; lo que falte se resuelve
+        al escribir (resolve_identities).
+        """
+        # Extraer información del request
+        ip_address = request.client.host if request.client else None
+        user_agent = request.headers.get("user-agent", "")[:500]  # Limit length
+
+        sanitized_old = AuditService._sanitize_values(old_values)
+        sanitized_new = AuditService._sanitize_values(new_values)
+        
+        # Generar resumen de cambios
+        changes_summary = AuditService._generate_changes_summary(sanitized_old, sanitized_new)
+
+        # Copia superficial: el llamador construye el dict, solo evitamos mutarlo
+        metadata_payload = dict(metadata) if metadata else {}
+        metadata_payload.setdefault("change_folio", AuditService._generate_change_folio())
+        if change_reason:
+            metadata_payload["change_reason"] = change_reason
+        
+        # Identidad del actor (si no hay usuario, es una acción del sistema)
+        user_id = user.id if user else None
+        
+        return {
+            "user_id": user_id,
+            "user_email": getattr(user, "email", None) if user_id else None,
+            "user_name": getattr(user, "name", None) if user_id else None,
+            "user_type": getattr(user, "person_type", None) if user_id else None,
+            
+            "action": action,
+            "table_name": table_name,
+            "record_id": record_id,
+            
+            "old_values": sanitized_old,
+            "new_values": sanitized_new,
+            "changes_summary": changes_summary,
+            
+            "operation_type": operation_type,
+            "affected_patient_id": affected_patient_id,
+            "affected_patient_name": affected_patient_name,
+            
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "session_id": request.headers.get("session-id"),
+            "request_path": str(request.url.path)[:500],  # Limit length
+            "request_method": request.method,
+            
+            "success": success,
+            "error_message": error_message[:1000] if error_message else None,  # Limit length
+            "security_level": security_level,
+            
+            "timestamp": utc_now(),
+            "metadata_json": metadata_payload,
+        }
+    
+    @staticmethod
+    def _write_sync(db: Session, entry: Dict[str, Any]) -> None:
+        """
+        Ruta síncrona (eventos de seguridad): add + commit en la sesión del request.
+        Si la base de datos no responde, la entrada se guarda en el spool del escritor.
+        """
+        try:
+            # CRITICAL FIX: If the session has a failed transaction, rollback completely
+            # This happens when login fails or any DB operation fails before audit logging
+            try:
+                current_tx = db.get_transaction()
+                if current_tx is not None and not current_tx.is_active:
+                    db.rollback()
+            except Exception:
+                # If checking transaction state fails, force a rollback
+                try:
+                    db.rollback()
+                except Exception:
+                    pass
+            
+            try:
+                resolve_identities(db, [entry])
+            except Exception:
+                # Si falla la consulta, continuar con los valores que tengamos
+                apply_identity_fallback(entry)
+            
+            db.add(AuditLog(**entry))
+            db.commit()
+        except Exception as e:
             try:
                 db.rollback()
             except Exception:
                 pass
-            print(f"❌ Error al registrar auditoría: {str(e)}")
-            audit_logger.error(f"Failed to create audit log: {str(e)}")
+            audit_logger.error(f"Failed to write audit log synchronously, spooling: {str(e)}")
+            audit_writer.spool([entry])
     
     @staticmethod
     def _generate_changes_summary(old_values: Optional[Dict], new_values: Optional[Dict]) -> str:
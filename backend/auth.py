@@ -15,6 +15,7 @@ from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
 from database import Person, PersonDocument, Document, DocumentType
+from services.auth_user_cache import auth_user_cache
 import secrets
 import hashlib
 
@@ -88,10 +89,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    # Agregar claims estándar
+    # Agregar claims estándar (jti identifica el token en la caché de usuarios)
     to_encode.update({
         "exp": expire,
         "iat": datetime.now(timezone.utc),
+        "jti": secrets.token_urlsafe(16),
         "type": "access"
     })
     
@@ -141,11 +143,26 @@ def verify_token(token: str, token_type: str = "access") -> Optional[Dict[str, A
 def get_user_from_token(db: Session, token: str) -> Optional[Person]:
     """
     Obtener usuario desde token JWT
+    Usa la caché de usuarios autenticados (TTL corto) antes de consultar la BD
     """
     payload = verify_token(token)
     if payload is None:
         return None
     
+    cache_key = auth_user_cache.key_for(token, payload)
+    user = auth_user_cache.get_user(db, cache_key)
+    if user is not None:
+        return user
+    
+    user = _load_user_from_payload(db, payload)
+    if user is not None:
+        auth_user_cache.put_user(cache_key, user)
+    return user
+
+def _load_user_from_payload(db: Session, payload: Dict[str, Any]) -> Optional[Person]:
+    """
+    Resolver el usuario del payload (user_id, luego sub) contra la BD
+    """
     # Try to get user_id first (more reliable)
     user_id = payload.get("user_id")
     if user_id is not None:
@@ -5,6 +5,7 @@ Manages environment variables and application settings
 import os
 import json
 import secrets
+import tempfile
 from typing import List, Optional, Union
 from pydantic_settings import BaseSettings
 from pydantic import field_validator, model_validator, Field
@@ -89,7 +90,36 @@ class Settings(BaseSettings):
         "1000" if os.getenv("APP_ENV", "development").lower() == "development" else "120"
     ))
     RATE_LIMIT_WINDOW_SECONDS: int = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
-    
+    # Stricter per-route policies: login/register/password reset (per IP) and the WhatsApp webhook
+    RATE_LIMIT_AUTH_MAX_REQUESTS: int = int(os.getenv(
+        "RATE_LIMIT_AUTH_MAX_REQUESTS",
+        "100" if os.getenv("APP_ENV", "development").lower() == "development" else "10"
+    ))
+    RATE_LIMIT_AUTH_WINDOW_SECONDS: int = int(os.getenv("RATE_LIMIT_AUTH_WINDOW_SECONDS", "60"))
+    RATE_LIMIT_WEBHOOK_MAX_REQUESTS: int = int(os.getenv(
+        "RATE_LIMIT_WEBHOOK_MAX_REQUESTS",
+        "1000" if os.getenv("APP_ENV", "development").lower() == "development" else "60"
+    ))
+    RATE_LIMIT_WEBHOOK_WINDOW_SECONDS: int = int(os.getenv("RATE_LIMIT_WEBHOOK_WINDOW_SECONDS", "60"))
+    # "memory" (per instance) or "redis" (shared across instances, uses REDIS_URL)
+    RATE_LIMIT_BACKEND: str = os.getenv(
+        "RATE_LIMIT_BACKEND",
+        "redis" if _env_bool("REDIS_ENABLED", False) else "memory"
+    ).strip().lower()
+
+    # Audit log writer (NOM-004 traceability)
+    # Routine entries are queued and inserted in batches by a background thread;
+    # security events (LOGIN/LOGOUT/ACCESS_DENIED, WARNING/CRITICAL) are written synchronously.
+    AUDIT_ASYNC_ENABLED: bool = _env_bool("AUDIT_ASYNC_ENABLED", True)
+    AUDIT_QUEUE_MAX_SIZE: int = int(os.getenv("AUDIT_QUEUE_MAX_SIZE", "10000"))
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+    AUDIT_FLUSH_INTERVAL_MS: int = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "500"))
+    # Entries that cannot reach the database are spooled here as JSON lines and replayed later
+    AUDIT_SPOOL_DIR: str = os.getenv(
+        "AUDIT_SPOOL_DIR",
+        os.path.join(tempfile.gettempdir(), "cortex_audit_spool")
+    )
+
     # Email Configuration
     SMTP_HOST: Optional[str] = None
     SMTP_PORT: int = 587
@@ -7,6 +7,8 @@ import pytz
 
 from models import Appointment, Person, utc_now
 from crud.base import get_cdmx_now, to_utc_for_storage
+from utils.pagination import apply_keyset
+from services.calendar_sync_outbox import OPERATION_DELETE, OPERATION_UPSERT, enqueue_calendar_sync
 import schemas
 from logger import get_logger
 
@@ -94,23 +96,17 @@ def create_appointment(db: Session, appointment_data: Union[schemas.AppointmentC
     
     
     db.add(db_appointment)
+    db.flush()
+    
+    # Sincronizar con Google Calendar (outbox en la misma transacción; lo aplica el worker)
+    enqueue_calendar_sync(db, db_appointment.id, doctor_id, OPERATION_UPSERT)
+    
     try:
         db.commit()
     except Exception as e:
         raise
     db.refresh(db_appointment)
     
-    # Sincronizar con Google Calendar si está configurado
-    try:
-        from services.google_calendar_service import GoogleCalendarService
-        GoogleCalendarService.create_calendar_event(db, doctor_id, db_appointment)
-    except Exception as e:
-        # No fallar si Google Calendar no está configurado o hay error
-        api_logger.warning("Error al sincronizar creación con Google Calendar (no crítico)", exc_info=True, extra={
-            "doctor_id": doctor_id,
-            "appointment_id": db_appointment.id
-        })
-    
     return db_appointment
 
 def get_appointment(db: Session, appointment_id: int) -> Optional[Appointment]:
@@ -147,9 +143,14 @@ def get_appointments(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     status: Optional[str] = None,
-    available_for_consultation: bool = False
+    available_for_consultation: bool = False,
+    cursor: Optional[str] = None
 ) -> List[Appointment]:
-    """Get appointments with optional filters"""
+    """Get appointments with optional filters.
+
+    When `cursor` is given the page is keyset-paginated on
+    (appointment_date, id) and `skip` is ignored.
+    """
     query = db.query(Appointment).options(
         joinedload(Appointment.patient),
         joinedload(Appointment.doctor),
@@ -179,7 +180,10 @@ def get_appointments(
     if available_for_consultation:
         query = query.filter(Appointment.status.in_(['confirmed', 'por_confirmar']))
     
-    return query.order_by(desc(Appointment.appointment_date)).offset(skip).limit(limit).all()
+    query = apply_keyset(query, Appointment.appointment_date, Appointment.id, cursor)
+    if not cursor:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 def update_appointment(db: Session, appointment_id: int, appointment_data) -> Appointment:
     """Update appointment with CDMX timezone support
@@ -280,20 +284,15 @@ def update_appointment(db: Session, appointment_id: int, appointment_data) -> Ap
         }
     )
     
+    # Sincronizar con Google Calendar (outbox en la misma transacción; lo aplica el worker)
+    enqueue_calendar_sync(
+        db, appointment.id, appointment.doctor_id,
+        OPERATION_DELETE if appointment.status == 'cancelled' else OPERATION_UPSERT
+    )
+    
     db.commit()
     db.refresh(appointment)
     
-    # Sincronizar con Google Calendar si está configurado
-    try:
-        from services.google_calendar_service import GoogleCalendarService
-        GoogleCalendarService.update_calendar_event(db, appointment.doctor_id, appointment)
-    except Exception as e:
-        # No fallar si Google Calendar no está configurado o hay error
-        api_logger.warning("Error al sincronizar actualización con Google Calendar (no crítico)", exc_info=True, extra={
-            "doctor_id": appointment.doctor_id,
-            "appointment_id": appointment_id
-        })
-    
     api_logger.info(
         "✅ Appointment updated successfully",
         extra={
@@ -319,19 +318,10 @@ def cancel_appointment(db: Session, appointment_id: int, reason: str, cancelled_
     appointment.cancelled_by = cancelled_by
     appointment.updated_at = utc_now()
     
+    # Sincronizar con Google Calendar (outbox en la misma transacción; lo aplica el worker)
+    enqueue_calendar_sync(db, appointment_id, doctor_id, OPERATION_DELETE)
+    
     db.commit()
     db.refresh(appointment)
     
-    # Sincronizar con Google Calendar si está configurado
-    if doctor_id:
-        try:
-            from services.google_calendar_service import GoogleCalendarService
-            GoogleCalendarService.delete_calendar_event(db, doctor_id, appointment_id)
-        except Exception as e:
-            # No fallar si Google Calendar no está configurado o hay error
-            api_logger.warning("Error al sincronizar eliminación con Google Calendar (no crítico)", exc_info=True, extra={
-                "doctor_id": doctor_id,
-                "appointment_id": appointment_id
-            })
-    
     return appointment
@@ -17,12 +17,14 @@ from models import (
     MedicalRecord, VitalSign, ConsultationVitalSign, 
     Medication, ConsultationPrescription,
     AppointmentType, Appointment, AppointmentReminder, 
-    GoogleCalendarEventMapping,
+    GoogleCalendarEventMapping, CalendarSyncOutbox,
     ClinicalStudy, StudyCategory, StudyCatalog,
     WhatsAppSession,
     IntakeQuestionnaireResponse,
     AssistantConversation, AssistantMessage,
     CfdiIssuer, CfdiInvoice,
+    PracticeDailyRollup, AppointmentDailyRollup, AppointmentHourlyRollup,
+    ExportJob,
 )
 
 # Re-export logger for compatibility if it was used
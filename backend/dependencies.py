@@ -8,6 +8,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 
 from database import get_db, Person
+from services.auth_user_cache import auth_user_cache
 import auth
 
 # Security
@@ -52,8 +53,9 @@ def require_valid_license_for_doctor(
     if current_user.person_type == 'admin':
         return current_user
     
-    # Only validate for doctors
-    if current_user.person_type == 'doctor':
-        LicenseService.require_valid_license(db, current_user.id)
+    # Only validate for doctors; a recent successful check is cached per user
+    if current_user.person_type == 'doctor' and not auth_user_cache.is_license_valid(current_user.id):
+        if LicenseService.require_valid_license(db, current_user.id) is not None:
+            auth_user_cache.mark_license_valid(current_user.id)
     
     return current_user
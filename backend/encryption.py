@@ -10,9 +10,14 @@ from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
 import secrets
-from typing import Optional, Union, Dict, Any
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union, Dict, Any, Callable, Iterable, List, Sequence, Tuple
 import json
 import hashlib
 from datetime import datetime
@@ -21,6 +26,68 @@ import logging
 # Configurar logging para auditoría
 logger = logging.getLogger(__name__)
 
+# ============================================================================
+# FORMATO DE CIFRADO VERSIONADO
+# ============================================================================
+#
+# Formato legado (v1): base64(sal[16] + IV[12] + ciphertext + tag[16]).
+#   Cada campo lleva su propia sal, por lo que descifrar implica una corrida
+#   de PBKDF2 (100,000 iteraciones) por campo.
+#
+# Formato v2: "enc:v2:<key_id>:" + base64(nonce[12] + ciphertext + tag[16]).
+#   La clave AES se deriva una sola vez por (clave maestra, key_id) y se
+#   guarda en un caché LRU acotado. El key_id viaja como dato asociado (AAD)
+#   de GCM, así que no se puede reetiquetar un blob con otra clave.
+#
+# Los blobs v1 se siguen descifrando de forma transparente; el job de
+# re-cifrado (EncryptionMigration.reencrypt_legacy_values) los actualiza a v2.
+
+CIPHERTEXT_V2_PREFIX = "enc:v2:"
+DEFAULT_KEY_ID = "k1"
+PBKDF2_ITERATIONS = 100000
+_V2_NONCE_SIZE = 12
+_LEGACY_MIN_BYTES = 44  # sal + IV + tag = 16 + 12 + 16
+_BASE64_PATTERN = re.compile(r'^[A-Za-z0-9+/]*={0,2}$')
+# decrypt_many reparte el trabajo en hilos solo a partir de este tamaño
+DECRYPT_PARALLEL_MIN_ROWS = 500
+
+
+class _DerivedKeyCache:
+    """Caché LRU acotado y thread-safe de claves derivadas."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[bytes, str, bytes], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key: Tuple[bytes, str, bytes]) -> Optional[bytes]:
+        with self._lock:
+            key = self._data.get(cache_key)
+            if key is not None:
+                self._data.move_to_end(cache_key)
+            return key
+
+    def put(self, cache_key: Tuple[bytes, str, bytes], key: bytes) -> None:
+        with self._lock:
+            self._data[cache_key] = key
+            self._data.move_to_end(cache_key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Compartido entre instancias: varias rutas crean EncryptionService() por
+# request, y la entrada incluye la huella de la clave maestra.
+_derived_key_cache = _DerivedKeyCache(
+    maxsize=int(os.getenv("ENCRYPTION_KEY_CACHE_SIZE", "1024"))
+)
+
 # ============================================================================
 # ENCRYPTION SERVICE
 # ============================================================================
@@ -28,13 +95,17 @@ logger = logging.getLogger(__name__)
 class EncryptionService:
     """Servicio de cifrado para datos médicos sensibles"""
     
-    def __init__(self, master_key: Optional[str] = None):
+    def __init__(self, master_key: Optional[str] = None, key_id: Optional[str] = None):
         """
         Inicializa el servicio de cifrado
         
         Args:
             master_key: Clave maestra para cifrado. Si no se proporciona, se genera una nueva
+            key_id: Identificador de la clave para el formato v2 (MEDICAL_ENCRYPTION_KEY_ID)
         """
+        self.key_id = key_id or os.getenv('MEDICAL_ENCRYPTION_KEY_ID') or DEFAULT_KEY_ID
+        if ':' in self.key_id:
+            raise ValueError("El key_id de cifrado no puede contener ':'")
         if master_key:
             self.master_key = master_key.encode()
         else:
@@ -46,31 +117,91 @@ class EncryptionService:
                 # En producción, esta clave debe ser generada y almacenada de forma segura
                 self.master_key = self._generate_master_key()
                 logger.warning("🔐 Nueva clave de cifrado generada. Guarde en variable de entorno MEDICAL_ENCRYPTION_KEY")
+        self._master_fingerprint = hashlib.sha256(self.master_key).digest()
     
     def _generate_master_key(self) -> bytes:
         """Genera una clave maestra de 32 bytes (256 bits)"""
         return secrets.token_bytes(32)
     
-    def _derive_key(self, salt: bytes) -> bytes:
-        """Deriva una clave de cifrado a partir de la clave maestra y sal"""
+    def _pbkdf2(self, salt: bytes) -> bytes:
         kdf = PBKDF2HMAC(
             algorithm=hashes.SHA256(),
             length=32,
             salt=salt,
-            iterations=100000,
+            iterations=PBKDF2_ITERATIONS,
             backend=default_backend()
         )
         return kdf.derive(self.master_key)
     
+    def _derive_key(self, salt: bytes) -> bytes:
+        """Deriva una clave de cifrado a partir de la clave maestra y sal (formato v1)"""
+        cache_key = (self._master_fingerprint, "salt", salt)
+        key = _derived_key_cache.get(cache_key)
+        if key is None:
+            key = self._pbkdf2(salt)
+            _derived_key_cache.put(cache_key, key)
+        return key
+    
+    def _derive_versioned_key(self, key_id: str) -> bytes:
+        """Deriva (una sola vez por clave maestra + key_id) la clave del formato v2"""
+        cache_key = (self._master_fingerprint, "kid", key_id.encode('utf-8'))
+        key = _derived_key_cache.get(cache_key)
+        if key is None:
+            salt = hashlib.sha256(b"cortex-dek-v2:" + key_id.encode('utf-8')).digest()[:16]
+            key = self._pbkdf2(salt)
+            _derived_key_cache.put(cache_key, key)
+        return key
+    
+    @staticmethod
+    def is_versioned_ciphertext(value: Any) -> bool:
+        """Indica si el valor usa el formato versionado (v2)"""
+        return isinstance(value, str) and value.startswith(CIPHERTEXT_V2_PREFIX)
+    
+    @staticmethod
+    def _legacy_payload(value: Any) -> Optional[bytes]:
+        """Decodifica un blob v1 si tiene la forma esperada; None si no aplica"""
+        if not isinstance(value, str) or len(value) < 50:
+            return None
+        if not _BASE64_PATTERN.match(value):
+            return None
+        try:
+            data = base64.b64decode(value.encode('utf-8'), validate=True)
+        except (binascii.Error, ValueError):
+            return None
+        if len(data) < _LEGACY_MIN_BYTES:
+            return None
+        return data
+    
+    def needs_reencryption(self, value: Any) -> bool:
+        """True si el valor está en formato v1 o en v2 con un key_id distinto al actual"""
+        if self.is_versioned_ciphertext(value):
+            key_id = value[len(CIPHERTEXT_V2_PREFIX):].split(':', 1)[0]
+            return key_id != self.key_id
+        return self._legacy_payload(value) is not None
+    
     def encrypt_sensitive_data(self, data: str) -> str:
         """
-        Cifra datos sensibles usando AES-256-GCM
+        Cifra datos sensibles usando AES-256-GCM (formato v2)
         
         Args:
             data: Datos a cifrar (string)
             
         Returns:
-            String codificado en base64 que contiene sal + IV + datos cifrados + tag
+            "enc:v2:<key_id>:" + base64(nonce + datos cifrados + tag)
+        """
+        if not data:
+            return ""
+        
+        key = self._derive_versioned_key(self.key_id)
+        nonce = secrets.token_bytes(_V2_NONCE_SIZE)
+        ciphertext = AESGCM(key).encrypt(nonce, data.encode('utf-8'), self.key_id.encode('utf-8'))
+        encoded = base64.b64encode(nonce + ciphertext).decode('utf-8')
+        return f"{CIPHERTEXT_V2_PREFIX}{self.key_id}:{encoded}"
+    
+    def encrypt_legacy_data(self, data: str) -> str:
+        """
+        Cifra datos con el formato v1 (sal por campo). Solo para compatibilidad
+        y pruebas; el código nuevo debe usar encrypt_sensitive_data.
         """
         if not data:
             return ""
@@ -113,6 +244,9 @@ class EncryptionService:
         if not encrypted_data:
             return ""
         
+        if self.is_versioned_ciphertext(encrypted_data):
+            return self._decrypt_versioned(encrypted_data)
+        
         # Detectar si los datos están cifrados o no
         # Los datos cifrados en base64 tienen un tamaño mínimo y son múltiplos de 4
         # Si el string es muy corto (< 50 caracteres) o no parece base64, asumir que no está cifrado
@@ -124,8 +258,7 @@ class EncryptionService:
         try:
             # Base64 válido debe tener longitud múltiplo de 4 (después de remover padding)
             # y solo contener caracteres base64
-            base64_pattern = re.compile(r'^[A-Za-z0-9+/]*={0,2}$')
-            if not base64_pattern.match(encrypted_data):
+            if not _BASE64_PATTERN.match(encrypted_data):
                 # No es base64 válido, probablemente no está cifrado
                 return encrypted_data
             
@@ -164,6 +297,124 @@ class EncryptionService:
             logger.debug(f"Error al descifrar datos (probablemente no están cifrados): {e}")
             return encrypted_data
     
+    def _decrypt_versioned(self, encrypted_data: str) -> str:
+        """Descifra un blob v2; devuelve el valor tal cual si no se puede descifrar"""
+        try:
+            key_id, encoded = encrypted_data[len(CIPHERTEXT_V2_PREFIX):].split(':', 1)
+            data = base64.b64decode(encoded.encode('utf-8'), validate=True)
+            nonce, ciphertext = data[:_V2_NONCE_SIZE], data[_V2_NONCE_SIZE:]
+            key = self._derive_versioned_key(key_id)
+            plaintext = AESGCM(key).decrypt(nonce, ciphertext, key_id.encode('utf-8'))
+            return plaintext.decode('utf-8')
+        except Exception as e:
+            logger.warning(f"No se pudo descifrar dato en formato v2: {type(e).__name__}")
+            return encrypted_data
+    
+    def reencrypt(self, value: str) -> Optional[str]:
+        """
+        Re-cifra un valor legado al formato v2 con el key_id actual.
+        
+        Returns:
+            El nuevo ciphertext, o None si el valor no requiere (o no admite)
+            re-cifrado — p. ej. texto plano o un blob que no descifra.
+        """
+        if not self.needs_reencryption(value):
+            return None
+        plaintext = self.decrypt_sensitive_data(value)
+        if plaintext == value:
+            # No descifró: no es un blob nuestro, no tocarlo
+            return None
+        return self.encrypt_sensitive_data(plaintext)
+    
+    def decrypt_many(
+        self,
+        rows: Sequence[Any],
+        fields: Sequence[str],
+        max_workers: Optional[int] = None,
+        on_error: Optional[Callable[[str, str], Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Descifra en una sola pasada las columnas `fields` de un conjunto de filas.
+        
+        Acepta filas ORM, `Row` de SQLAlchemy, dicts o tuplas simples (en cuyo
+        caso `fields` describe las posiciones). Reutiliza un contexto AES-GCM
+        por clave y distingue texto plano por el marcador de formato, sin
+        pasar cada valor por una expresión regular.
+        
+        Args:
+            rows: Filas a descifrar
+            fields: Nombres de columna a descifrar
+            max_workers: Si se indica y hay muchas filas, reparte en un pool de hilos
+            on_error: Callback (campo, ciphertext) -> valor para blobs que no
+                descifran; por defecto se devuelve el ciphertext tal cual
+            
+        Returns:
+            Una lista (mismo orden que `rows`) de dicts {campo: valor descifrado}
+        """
+        fields = tuple(fields)
+        rows = list(rows)
+        ciphers: Dict[Tuple[str, Any], AESGCM] = {}
+        
+        def _chunk(chunk: List[Any]) -> List[Dict[str, Any]]:
+            out = []
+            for row in chunk:
+                decrypted = {}
+                for index, field_name in enumerate(fields):
+                    value = _row_value(row, index, field_name)
+                    decrypted[field_name] = self._decrypt_batch_value(field_name, value, ciphers, on_error)
+                out.append(decrypted)
+            return out
+        
+        if not max_workers or max_workers <= 1 or len(rows) < DECRYPT_PARALLEL_MIN_ROWS:
+            return _chunk(rows)
+        
+        size = -(-len(rows) // max_workers)
+        chunks = [rows[i:i + size] for i in range(0, len(rows), size)]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_chunk, chunks))
+        return [item for chunk in results for item in chunk]
+    
+    def _cipher_for(self, ciphers: Dict[Tuple[str, Any], AESGCM], kind: str, ident: Any) -> AESGCM:
+        cipher = ciphers.get((kind, ident))
+        if cipher is None:
+            key = self._derive_versioned_key(ident) if kind == "kid" else self._derive_key(ident)
+            cipher = AESGCM(key)
+            ciphers[(kind, ident)] = cipher
+        return cipher
+    
+    def _decrypt_batch_value(
+        self,
+        field_name: str,
+        value: Any,
+        ciphers: Dict[Tuple[str, Any], AESGCM],
+        on_error: Optional[Callable[[str, str], Any]],
+    ) -> Any:
+        if not isinstance(value, str) or not value:
+            return value
+        try:
+            if value.startswith(CIPHERTEXT_V2_PREFIX):
+                key_id, encoded = value[len(CIPHERTEXT_V2_PREFIX):].split(':', 1)
+                data = base64.b64decode(encoded, validate=True)
+                cipher = self._cipher_for(ciphers, "kid", key_id)
+                return cipher.decrypt(data[:_V2_NONCE_SIZE], data[_V2_NONCE_SIZE:], key_id.encode('utf-8')).decode('utf-8')
+            
+            if len(value) < 50:
+                return value
+            try:
+                data = base64.b64decode(value, validate=True)
+            except (binascii.Error, ValueError):
+                return value
+            if len(data) < _LEGACY_MIN_BYTES:
+                return value
+            # Formato v1: sal + IV + ciphertext + tag (AESGCM espera ct + tag juntos)
+            cipher = self._cipher_for(ciphers, "salt", data[:16])
+            return cipher.decrypt(data[16:28], data[28:], None).decode('utf-8')
+        except Exception as e:
+            logger.debug(f"No se pudo descifrar {field_name} en lote: {type(e).__name__}")
+            if on_error is not None:
+                return on_error(field_name, value)
+            return value
+    
     def hash_sensitive_field(self, data: str) -> str:
         """
         Crea hash SHA-256 de datos sensibles para búsquedas
@@ -179,6 +430,18 @@ class EncryptionService:
         
         return hashlib.sha256(data.encode('utf-8')).hexdigest()
 
+def _row_value(row: Any, index: int, field_name: str) -> Any:
+    """Lee un campo de una fila ORM, Row de SQLAlchemy, dict o tupla simple."""
+    if isinstance(row, Mapping):
+        return row.get(field_name)
+    mapping = getattr(row, "_mapping", None)
+    if mapping is not None and field_name in mapping:
+        return mapping[field_name]
+    if isinstance(row, tuple) and not hasattr(row, field_name):
+        return row[index] if index < len(row) else None
+    return getattr(row, field_name, None)
+
+
 # ============================================================================
 # CAMPO CIFRADO PARA BASE DE DATOS
 # ============================================================================
@@ -380,6 +643,104 @@ class EncryptionMigration:
                 db_session.rollback()
         
         logger.info(f"Migración de {model_class.__name__} completada")
+    
+    @staticmethod
+    def reencrypt_legacy_values(
+        db_session,
+        model_class,
+        field_names: Iterable[str],
+        encryption_service: EncryptionService,
+        batch_size: int = 200,
+        max_rows: Optional[int] = None,
+        start_after_id: int = 0,
+    ) -> Dict[str, int]:
+        """
+        Actualiza blobs v1 (sal por campo) al formato v2 por lotes.
+        
+        Recorre por id (keyset) solo las filas con algún campo en formato
+        legado: un blob v1 (base64 de al menos sal + IV + tag) o un blob v2
+        con otro key_id. El texto plano no se toca. Hace commit por lote y
+        devuelve el último id revisado, así que se puede interrumpir y
+        reanudar con `start_after_id` sin volver a revisar las mismas filas
+        (p. ej. blobs que no descifran). Es idempotente.
+        
+        Args:
+            db_session: Sesión de base de datos
+            model_class: Modelo con columna `id`
+            field_names: Columnas cifradas a revisar
+            encryption_service: Servicio de cifrado (define el key_id destino)
+            batch_size: Filas por lote / commit
+            max_rows: Límite opcional de filas revisadas en esta corrida
+            start_after_id: Reanudar a partir de este id
+            
+        Returns:
+            {"scanned": n, "updated_rows": n, "updated_fields": n,
+             "last_id": id, "done": bool} — `done` indica que no quedan filas
+            pendientes después de `last_id`
+        """
+        from sqlalchemy import and_, func, or_
+        
+        fields = [f for f in field_names if hasattr(model_class, f)]
+        stats = {"scanned": 0, "updated_rows": 0, "updated_fields": 0, "last_id": start_after_id, "done": False}
+        if not fields:
+            stats["done"] = True
+            return stats
+        
+        current_prefix = f"{CIPHERTEXT_V2_PREFIX}{encryption_service.key_id}:%"
+        
+        def _legacy(column):
+            # Misma forma que _legacy_payload: base64 de >= 44 bytes (60 caracteres)
+            return or_(
+                and_(column.like(f"{CIPHERTEXT_V2_PREFIX}%"), column.notlike(current_prefix)),
+                and_(func.length(column) >= 60, column.regexp_match(_BASE64_PATTERN.pattern)),
+            )
+        
+        pending = or_(*[_legacy(getattr(model_class, f)) for f in fields])
+        
+        last_id = start_after_id
+        while max_rows is None or stats["scanned"] < max_rows:
+            limit = batch_size if max_rows is None else min(batch_size, max_rows - stats["scanned"])
+            records = (
+                db_session.query(model_class)
+                .filter(model_class.id > last_id, pending)
+                .order_by(model_class.id)
+                .limit(limit)
+                .all()
+            )
+            if not records:
+                stats["done"] = True
+                break
+            
+            for record in records:
+                changed = 0
+                for field_name in fields:
+                    new_value = encryption_service.reencrypt(getattr(record, field_name))
+                    if new_value is not None:
+                        setattr(record, field_name, new_value)
+                        changed += 1
+                if changed:
+                    stats["updated_rows"] += 1
+                    stats["updated_fields"] += changed
+            
+            try:
+                db_session.commit()
+            except Exception as e:
+                logger.error(f"Error re-cifrando lote de {model_class.__name__} tras id {last_id}: {e}")
+                db_session.rollback()
+                raise
+            
+            last_id = records[-1].id
+            stats["scanned"] += len(records)
+            stats["last_id"] = last_id
+            if len(records) < limit:
+                stats["done"] = True
+                break
+        
+        logger.info(
+            f"Re-cifrado v2 de {model_class.__name__}: {stats['updated_rows']} filas actualizadas "
+            f"de {stats['scanned']} revisadas"
+        )
+        return stats
 
 # ============================================================================
 # INICIALIZACIÓN
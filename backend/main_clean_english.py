@@ -15,14 +15,13 @@ from datetime import datetime, timedelta
 import pytz
 import os
 import asyncio
-import time
-from collections import defaultdict, deque
 from pathlib import Path
 
 from database import get_db, Person
 from logger import get_logger, setup_logging
 from error_middleware import ErrorHandlingMiddleware
 from config import settings
+from services.rate_limiter import RateLimiter, build_rate_limiter
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -70,67 +69,58 @@ security_logger = get_logger("medical_records.security")
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple in-memory rate limiter per client IP."""
+    """Per-client-IP rate limiter with per-route policies (see services/rate_limiter.py)."""
 
-    def __init__(self, app, max_requests: int, window_seconds: int):
+    def __init__(self, app, limiter: RateLimiter):
         super().__init__(app)
-        self.max_requests = max_requests
-        self.window_seconds = window_seconds
-        self._hits = defaultdict(deque)
-        self._lock = asyncio.Lock()
+        self.limiter = limiter
 
     async def dispatch(self, request, call_next):
-        if self.max_requests <= 0 or self.window_seconds <= 0:
-            return await call_next(request)
-
         # Skip rate limiting for OPTIONS requests (CORS preflight)
         if request.method == "OPTIONS":
             return await call_next(request)
 
         client_ip = request.client.host if request.client else "anonymous"
-        now = time.monotonic()
-
-        async with self._lock:
-            bucket = self._hits[client_ip]
-            while bucket and now - bucket[0] > self.window_seconds:
-                bucket.popleft()
-
-            if len(bucket) >= self.max_requests:
-                retry_after = max(1, int(self.window_seconds - (now - bucket[0])))
-                # Get CORS origins for headers
-                allowed_origins = _get_cors_origins()
-                origin = request.headers.get("origin")
-                
-                # Build headers with CORS support
-                headers = {
-                    "Retry-After": str(retry_after),
-                    "X-RateLimit-Limit": str(self.max_requests),
-                    "X-RateLimit-Remaining": "0",
-                    "X-RateLimit-Window": str(self.window_seconds)
-                }
-                
-                # Add CORS headers if origin is allowed
-                if origin and (origin in allowed_origins or "*" in allowed_origins):
-                    headers["Access-Control-Allow-Origin"] = origin
-                    headers["Access-Control-Allow-Credentials"] = "true"
-                    headers["Access-Control-Allow-Methods"] = "*"
-                    headers["Access-Control-Allow-Headers"] = "*"
-                elif "*" in allowed_origins:
-                    headers["Access-Control-Allow-Origin"] = "*"
-                
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "Too many requests. Please try again later."},
-                    headers=headers
-                )
-
-            bucket.append(now)
-            remaining = max(self.max_requests - len(bucket), 0)
+        result = await self.limiter.hit(request.method, request.url.path, client_ip)
+        if result is None:
+            return await call_next(request)
+
+        if not result.allowed:
+            # Get CORS origins for headers
+            allowed_origins = _get_cors_origins()
+            origin = request.headers.get("origin")
+            
+            # Build headers with CORS support
+            headers = {
+                "Retry-After": str(result.retry_after),
+                "X-RateLimit-Limit": str(result.limit),
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Window": str(result.window_seconds)
+            }
+            
+            # Add CORS headers if origin is allowed
+            if origin and (origin in allowed_origins or "*" in allowed_origins):
+                headers["Access-Control-Allow-Origin"] = origin
+                headers["Access-Control-Allow-Credentials"] = "true"
+                headers["Access-Control-Allow-Methods"] = "*"
+                headers["Access-Control-Allow-Headers"] = "*"
+            elif "*" in allowed_origins:
+                headers["Access-Control-Allow-Origin"] = "*"
+            
+            security_logger.warning(
+                "Rate limit exceeded",
+                extra={"client_ip": client_ip, "policy": result.policy, "path": request.url.path}
+            )
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests. Please try again later."},
+                headers=headers
+            )
 
         response = await call_next(request)
-        response.headers["X-RateLimit-Limit"] = str(self.max_requests)
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Window"] = str(self.window_seconds)
+        response.headers["X-RateLimit-Limit"] = str(result.limit)
+        response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+        response.headers["X-RateLimit-Window"] = str(result.window_seconds)
         return response
 
 # ============================================================================
@@ -183,18 +173,57 @@ async def lifespan(app: FastAPI):
             # Wait 5 minutes before next check
             await asyncio.sleep(300)
 
-    # Create the background task
+    from services.calendar_sync_outbox import POLL_SECONDS, process_calendar_outbox
+
+    async def run_calendar_outbox_loop():
+        """Background task that drains the Google Calendar sync outbox"""
+        while True:
+            try:
+                await asyncio.to_thread(process_calendar_outbox)
+            except Exception as e:
+                logger.error(f"❌ Error in calendar outbox loop: {e}", exc_info=True)
+
+            await asyncio.sleep(POLL_SECONDS)
+
+    from services.export_jobs import POLL_SECONDS as EXPORT_POLL_SECONDS, process_export_jobs
+
+    async def run_export_jobs_loop():
+        """Background task that runs queued exports (ARCO, expediente, compliance)"""
+        while True:
+            try:
+                await asyncio.to_thread(process_export_jobs)
+            except Exception as e:
+                logger.error(f"❌ Error in export jobs loop: {e}", exc_info=True)
+
+            await asyncio.sleep(EXPORT_POLL_SECONDS)
+
+    # Batched audit log writer (security events stay synchronous)
+    from services.audit_writer import audit_writer
+    if settings.AUDIT_ASYNC_ENABLED:
+        audit_writer.start()
+
+    # Create the background tasks
     scheduler_task = asyncio.create_task(run_scheduler_loop())
-    
+    calendar_outbox_task = asyncio.create_task(run_calendar_outbox_loop())
+    export_jobs_task = asyncio.create_task(run_export_jobs_loop())
+
     yield
-    
+
     # Shutdown
-    # Cancel the scheduler task
-    scheduler_task.cancel()
-    try:
-        await scheduler_task
-    except asyncio.CancelledError:
-        logger.info("🛑 Scheduler task cancelled")
+    # Cancel the background tasks
+    for task, name in (
+        (scheduler_task, "Scheduler"),
+        (calendar_outbox_task, "Calendar outbox"),
+        (export_jobs_task, "Export jobs"),
+    ):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            logger.info(f"🛑 {name} task cancelled")
+
+    # Flush queued audit entries (the remainder is spooled to disk)
+    await asyncio.to_thread(audit_writer.stop)
 
 app = FastAPI(
     title="Medical Records API",
@@ -306,7 +335,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"]
+    # "*" is not honoured by browsers on credentialed requests; list the
+    # headers the frontend reads explicitly.
+    expose_headers=["*", "X-Next-Cursor"]
 )
 
 if settings.SECURITY_HEADERS_ENABLED and SECURITY_MIDDLEWARE_AVAILABLE:
@@ -328,8 +359,7 @@ app.add_middleware(ErrorHandlingMiddleware, debug=True)
 if settings.RATE_LIMIT_ENABLED and settings.RATE_LIMIT_MAX_REQUESTS > 0:
     app.add_middleware(
         RateLimitMiddleware,
-        max_requests=settings.RATE_LIMIT_MAX_REQUESTS,
-        window_seconds=settings.RATE_LIMIT_WINDOW_SECONDS
+        limiter=build_rate_limiter()
     )
 
 # Debugging middleware removed
@@ -502,6 +532,10 @@ app.include_router(assistant_router)
 from routes.fhir import router as fhir_router
 app.include_router(fhir_router)
 
+# Include background export jobs (status polling + resumable downloads)
+from routes.export_jobs import router as export_jobs_router
+app.include_router(export_jobs_router)
+
 # ============================================================================
 # TEMPORARY DEBUG ENDPOINT
 # ============================================================================
@@ -0,0 +1,64 @@
+"""calendar_sync_outbox: transactional outbox for Google Calendar sync
+
+Revision ID: a5b6c7d8e9f0
+Revises: f4a5b6c7d8e9
+Create Date: 2026-10-17 12:00:00.000000
+
+Creating, rescheduling or cancelling an appointment used to refresh the
+doctor's OAuth token and call the Google Calendar API inline, so every
+booking waited on Google. Appointment writes now enqueue a row here in the
+same transaction and a background worker applies them in batches.
+
+- ux_calendar_sync_outbox_pending_appointment: one pending entry per
+  appointment, the ON CONFLICT target that coalesces repeated changes
+- ix_calendar_sync_outbox_due: the worker's due-queue scan
+- appointment_id has no FK so 'delete' entries outlive the appointment
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a5b6c7d8e9f0"
+down_revision: Union[str, None] = "f4a5b6c7d8e9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS calendar_sync_outbox (
+            id SERIAL PRIMARY KEY,
+            appointment_id INTEGER NOT NULL,
+            doctor_id INTEGER NOT NULL REFERENCES persons(id) ON DELETE CASCADE,
+            operation VARCHAR(10) NOT NULL,
+            status VARCHAR(10) NOT NULL DEFAULT 'pending',
+            version INTEGER NOT NULL DEFAULT 1,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP NOT NULL DEFAULT now(),
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT now(),
+            updated_at TIMESTAMP DEFAULT now(),
+            CONSTRAINT check_calendar_sync_operation CHECK (operation IN ('upsert', 'delete'))
+        );
+        """
+    )
+    op.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_calendar_sync_outbox_pending_appointment
+        ON calendar_sync_outbox (appointment_id)
+        WHERE status = 'pending';
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_calendar_sync_outbox_due
+        ON calendar_sync_outbox (next_attempt_at)
+        WHERE status = 'pending';
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS calendar_sync_outbox;")
@@ -0,0 +1,51 @@
+"""appointment_reminders.send_at: due-time column for the reminder queue
+
+Revision ID: b6c7d8e9f0a1
+Revises: a5b6c7d8e9f0
+Create Date: 2026-10-17 13:00:00.000000
+
+Every scheduler tick loaded all enabled, unsent reminders for future
+appointments (with three joinedloads) and computed
+`appointment_date - offset_minutes` in Python to find the due ones. This
+migration materializes that send time and indexes it so the tick can claim
+due rows with a range scan (FOR UPDATE SKIP LOCKED, bounded batches).
+
+- send_at = appointment_date - offset_minutes (CDMX local, like
+  appointment_date); kept current by mapper events on AppointmentReminder
+  (insert / offset change) and Appointment (reschedule)
+- ix_appointment_reminders_due on (sent, enabled, send_at)
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b6c7d8e9f0a1"
+down_revision: Union[str, None] = "a5b6c7d8e9f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE appointment_reminders ADD COLUMN IF NOT EXISTS send_at TIMESTAMP;")
+
+    op.execute(
+        """
+        UPDATE appointment_reminders r
+        SET send_at = a.appointment_date - r.offset_minutes * interval '1 minute'
+        FROM appointments a
+        WHERE a.id = r.appointment_id;
+        """
+    )
+
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_appointment_reminders_due
+        ON appointment_reminders USING btree (sent, enabled, send_at);
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_appointment_reminders_due;")
+    op.execute("ALTER TABLE appointment_reminders DROP COLUMN IF EXISTS send_at;")
@@ -0,0 +1,153 @@
+"""analytics rollups: per-doctor daily aggregates for the dashboards
+
+Revision ID: c7d8e9f0a1b2
+Revises: b6c7d8e9f0a1
+Create Date: 2026-10-17 16:00:00.000000
+
+The practice summary and the analytics dashboard rescanned up to 12 months
+of medical_records / appointments on every page view. These tables hold
+the same counts per (doctor, day) so the dashboards read a few hundred
+rows:
+
+- practice_daily_rollups: consultations, new patients (persons.created_by),
+  studies ordered
+- appointment_daily_rollups: appointments by status and consultation type
+  bucket, with completed / cancelled-by / duration columns
+- appointment_hourly_rollups: non-cancelled appointments per hour (heatmap)
+
+The application recomputes the touched (doctor, day) rows on every flush
+(models/analytics.py) and a nightly job reconciles the last ~13 months.
+This migration backfills the full history once.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c7d8e9f0a1b2"
+down_revision: Union[str, None] = "b6c7d8e9f0a1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS practice_daily_rollups (
+            doctor_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            consultations INTEGER NOT NULL DEFAULT 0,
+            new_patients INTEGER NOT NULL DEFAULT 0,
+            studies_ordered INTEGER NOT NULL DEFAULT 0,
+            refreshed_at TIMESTAMP DEFAULT now(),
+            PRIMARY KEY (doctor_id, day)
+        );
+        """
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS appointment_daily_rollups (
+            doctor_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            type_bucket VARCHAR(10) NOT NULL,
+            appointments INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            cancelled_by_doctor INTEGER NOT NULL DEFAULT 0,
+            cancelled_by_patient INTEGER NOT NULL DEFAULT 0,
+            duration_minutes INTEGER NOT NULL DEFAULT 0,
+            duration_samples INTEGER NOT NULL DEFAULT 0,
+            refreshed_at TIMESTAMP DEFAULT now(),
+            PRIMARY KEY (doctor_id, day, status, type_bucket)
+        );
+        """
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS appointment_hourly_rollups (
+            doctor_id INTEGER NOT NULL,
+            day DATE NOT NULL,
+            hour INTEGER NOT NULL,
+            appointments INTEGER NOT NULL DEFAULT 0,
+            refreshed_at TIMESTAMP DEFAULT now(),
+            PRIMARY KEY (doctor_id, day, hour)
+        );
+        """
+    )
+
+    # Backfill (same rules as models/analytics.py)
+    op.execute(
+        """
+        INSERT INTO practice_daily_rollups (doctor_id, day, consultations, new_patients, studies_ordered)
+        SELECT doctor_id, day, sum(consultations), sum(new_patients), sum(studies_ordered)
+        FROM (
+            SELECT doctor_id, consultation_date::date AS day,
+                   count(*) AS consultations, 0 AS new_patients, 0 AS studies_ordered
+            FROM medical_records
+            GROUP BY 1, 2
+            UNION ALL
+            SELECT created_by, created_at::date, 0, count(*), 0
+            FROM persons
+            WHERE person_type = 'patient' AND created_by IS NOT NULL AND created_at IS NOT NULL
+            GROUP BY 1, 2
+            UNION ALL
+            SELECT doctor_id, ordered_date::date, 0, 0, count(*)
+            FROM clinical_studies
+            GROUP BY 1, 2
+        ) AS sources
+        GROUP BY doctor_id, day
+        ON CONFLICT DO NOTHING;
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO appointment_daily_rollups (
+            doctor_id, day, status, type_bucket, appointments, completed,
+            cancelled_by_doctor, cancelled_by_patient, duration_minutes, duration_samples
+        )
+        SELECT
+            a.doctor_id,
+            a.appointment_date::date,
+            coalesce(a.status, 'unknown'),
+            CASE
+                WHEN a.consultation_type ILIKE '%primera%' THEN 'new'
+                WHEN a.consultation_type ILIKE '%seguimiento%' THEN 'follow_up'
+                ELSE 'other'
+            END AS type_bucket,
+            count(*),
+            count(*) FILTER (WHERE EXISTS (
+                SELECT 1 FROM medical_records m
+                WHERE m.patient_id = a.patient_id
+                  AND m.doctor_id = a.doctor_id
+                  AND m.consultation_date > a.appointment_date - interval '1 hour'
+                  AND m.consultation_date < a.appointment_date + interval '1 hour'
+            )),
+            count(*) FILTER (WHERE a.cancelled_by = a.doctor_id),
+            count(*) FILTER (WHERE a.cancelled_by IS NOT NULL
+                             AND (a.cancelled_by != a.doctor_id OR a.cancelled_by = a.patient_id)),
+            coalesce(sum(d.minutes) FILTER (WHERE d.minutes BETWEEN 5 AND 240), 0),
+            count(*) FILTER (WHERE d.minutes BETWEEN 5 AND 240)
+        FROM appointments a
+        CROSS JOIN LATERAL (
+            SELECT trunc(extract(epoch FROM a.end_time - a.appointment_date) / 60) AS minutes
+        ) AS d
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT DO NOTHING;
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO appointment_hourly_rollups (doctor_id, day, hour, appointments)
+        SELECT doctor_id, appointment_date::date, extract(hour FROM appointment_date)::int, count(*)
+        FROM appointments
+        WHERE status != 'cancelled'
+        GROUP BY 1, 2, 3
+        ON CONFLICT DO NOTHING;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS appointment_hourly_rollups;")
+    op.execute("DROP TABLE IF EXISTS appointment_daily_rollups;")
+    op.execute("DROP TABLE IF EXISTS practice_daily_rollups;")
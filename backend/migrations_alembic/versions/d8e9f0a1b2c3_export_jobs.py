@@ -0,0 +1,69 @@
+"""export_jobs: background queue for heavy exports
+
+Revision ID: d8e9f0a1b2c3
+Revises: c7d8e9f0a1b2
+Create Date: 2026-10-17 18:00:00.000000
+
+ARCO exports, the full expediente and the compliance report ran inside the
+HTTP request and hit Cloud Run's timeout on large practices. They are now
+enqueued here and produced by a background worker; the artifact is stored
+through the storage service and downloaded with Range support.
+
+- ix_export_jobs_due: the worker's claim scan over queued jobs and running
+  jobs whose lease expired
+- ix_export_jobs_requested_by: a user's recent exports
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d8e9f0a1b2c3"
+down_revision: Union[str, None] = "c7d8e9f0a1b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS export_jobs (
+            id SERIAL PRIMARY KEY,
+            kind VARCHAR(30) NOT NULL,
+            status VARCHAR(10) NOT NULL DEFAULT 'queued',
+            requested_by INTEGER NOT NULL REFERENCES persons(id) ON DELETE CASCADE,
+            params JSONB NOT NULL DEFAULT '{}'::jsonb,
+            progress INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP NOT NULL DEFAULT now(),
+            last_error TEXT,
+            artifact_key VARCHAR(500),
+            artifact_name VARCHAR(255),
+            content_type VARCHAR(100),
+            artifact_size BIGINT,
+            created_at TIMESTAMP DEFAULT now(),
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            expires_at TIMESTAMP,
+            CONSTRAINT check_export_job_status
+                CHECK (status IN ('queued', 'running', 'succeeded', 'failed', 'expired'))
+        );
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_export_jobs_due
+        ON export_jobs (next_attempt_at)
+        WHERE status IN ('queued', 'running');
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_export_jobs_requested_by
+        ON export_jobs (requested_by, created_at DESC);
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS export_jobs;")
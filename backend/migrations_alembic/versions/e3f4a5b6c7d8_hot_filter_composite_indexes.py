@@ -0,0 +1,94 @@
+"""composite and partial indexes for medical_records / appointments hot filters
+
+Revision ID: e3f4a5b6c7d8
+Revises: d2e3f4a5b6c7
+Create Date: 2026-10-17 09:00:00.000000
+
+b8c9d0e1f2a3 added single-column FK indexes, but the hot queries filter
+on one column and order by another, so Postgres still has to fetch every
+row for the doctor/patient and sort it:
+
+- consultation list, analytics, practice metrics:
+    WHERE doctor_id = ? [AND consultation_date BETWEEN ...]
+    ORDER BY consultation_date DESC, id DESC
+- FHIR $everything, expediente export, ACL check:
+    WHERE patient_id = ? [AND doctor_id = ?] ORDER BY consultation_date DESC
+- agenda list / calendar / dashboard:
+    WHERE doctor_id = ? AND appointment_date BETWEEN ... [AND status ...]
+- reminders, slot availability, WhatsApp "my appointments":
+    WHERE appointment_date ... AND status IN ('por_confirmar', 'confirmada')
+- audit log (keyset pagination): WHERE user_id = ? ORDER BY timestamp DESC, id DESC
+
+Partial indexes only cover the rows those queries can return, which keeps
+them small: active appointments are a fraction of the agenda history.
+
+The retention index (`is_anonymized = false AND legal_hold = false`) is
+only created where those columns exist — d5be39ff35bc dropped them from
+environments built from the ORM models, while older databases still carry
+them and `data_retention_service` queries them.
+
+All statements use `IF NOT EXISTS` so the migration is idempotent.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e3f4a5b6c7d8"
+down_revision: Union[str, None] = "d2e3f4a5b6c7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ACTIVE_APPOINTMENT_STATUSES = "('por_confirmar', 'confirmada')"
+
+# (index name, table, column list, partial predicate or None)
+INDEXES: list[tuple[str, str, str, Union[str, None]]] = [
+    ("ix_medical_records_doctor_date", "medical_records",
+     "doctor_id, consultation_date DESC, id DESC", None),
+    ("ix_medical_records_patient_doctor_date", "medical_records",
+     "patient_id, doctor_id, consultation_date DESC", None),
+    ("ix_appointments_doctor_date_status", "appointments",
+     "doctor_id, appointment_date, status", None),
+    ("ix_appointments_active_doctor_date", "appointments",
+     "doctor_id, appointment_date", f"status IN {ACTIVE_APPOINTMENT_STATUSES}"),
+    ("ix_appointments_active_date", "appointments",
+     "appointment_date", f"status IN {ACTIVE_APPOINTMENT_STATUSES}"),
+    ("ix_audit_log_user_timestamp", "audit_log",
+     "user_id, timestamp DESC, id DESC", None),
+]
+
+RETENTION_INDEX = "ix_medical_records_retention_pending"
+
+
+def upgrade() -> None:
+    for name, table, columns, where in INDEXES:
+        predicate = f" WHERE {where}" if where else ""
+        op.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" '
+            f'ON public."{table}" USING btree ({columns}){predicate};'
+        )
+
+    op.execute(
+        f"""
+        DO $$
+        BEGIN
+            IF (
+                SELECT COUNT(*) FROM information_schema.columns
+                WHERE table_schema = 'public'
+                  AND table_name = 'medical_records'
+                  AND column_name IN ('retention_end_date', 'is_anonymized', 'legal_hold')
+            ) = 3 THEN
+                CREATE INDEX IF NOT EXISTS "{RETENTION_INDEX}"
+                ON public.medical_records USING btree (retention_end_date)
+                WHERE is_anonymized = false AND legal_hold = false;
+            END IF;
+        END $$;
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(f'DROP INDEX IF EXISTS public."{RETENTION_INDEX}";')
+    for name, _table, _columns, _where in reversed(INDEXES):
+        op.execute(f'DROP INDEX IF EXISTS public."{name}";')
@@ -0,0 +1,47 @@
+"""consultation_prescriptions.updated_at for incremental FHIR exports
+
+Revision ID: e9f0a1b2c3d4
+Revises: d8e9f0a1b2c3
+Create Date: 2026-10-17 19:00:00.000000
+
+FHIR Bulk Data `$export?_since=` selects resources changed after an
+instant using `updated_at`. Persons, medical_records and
+consultation_vital_signs already carry it; prescriptions only had
+created_at, so edited prescriptions were missed by incremental exports.
+Existing rows are backfilled with created_at.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e9f0a1b2c3d4"
+down_revision: Union[str, None] = "d8e9f0a1b2c3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        ALTER TABLE consultation_prescriptions
+        ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+        """
+    )
+    op.execute(
+        """
+        UPDATE consultation_prescriptions
+        SET updated_at = COALESCE(created_at, now())
+        WHERE updated_at IS NULL;
+        """
+    )
+    op.execute(
+        """
+        ALTER TABLE consultation_prescriptions
+        ALTER COLUMN updated_at SET DEFAULT now();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE consultation_prescriptions DROP COLUMN IF EXISTS updated_at;")
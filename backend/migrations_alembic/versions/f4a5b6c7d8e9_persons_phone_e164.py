@@ -0,0 +1,66 @@
+"""persons.phone_e164: normalized phone for indexed WhatsApp lookup
+
+Revision ID: f4a5b6c7d8e9
+Revises: e3f4a5b6c7d8
+Create Date: 2026-10-17 11:00:00.000000
+
+Every inbound WhatsApp message resolved its sender by loading all
+patients with a phone and normalizing each number in Python, so webhook
+latency grew with the patient count. This migration persists the
+canonical +E.164 form next to `primary_phone` and indexes it (partial on
+patients), turning the lookup into a single index probe.
+
+Backfill mirrors `utils.phone_utils.normalize_phone_e164`:
+- strip everything but digits
+- 10 digits          → +52 + digits
+- 521 + 10 digits    → +52 + 10 digits (legacy Mexican mobile prefix)
+- anything else      → + digits
+
+The index is not unique: family members legitimately share a number.
+New writes are kept in sync by the `Person.primary_phone` validator.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f4a5b6c7d8e9"
+down_revision: Union[str, None] = "e3f4a5b6c7d8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE persons ADD COLUMN IF NOT EXISTS phone_e164 VARCHAR(20);")
+
+    op.execute(
+        """
+        WITH digits AS (
+            SELECT id, regexp_replace(primary_phone, '[^0-9]', '', 'g') AS d
+            FROM persons
+            WHERE primary_phone IS NOT NULL
+        )
+        UPDATE persons p
+        SET phone_e164 = '+' || CASE
+            WHEN length(digits.d) = 10 THEN '52' || digits.d
+            WHEN length(digits.d) = 13 AND digits.d LIKE '521%' THEN '52' || substr(digits.d, 4)
+            ELSE digits.d
+        END
+        FROM digits
+        WHERE p.id = digits.id
+          AND digits.d <> '';
+        """
+    )
+
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS ix_persons_patient_phone_e164
+        ON persons USING btree (phone_e164)
+        WHERE person_type = 'patient';
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_persons_patient_phone_e164;")
+    op.execute("ALTER TABLE persons DROP COLUMN IF EXISTS phone_e164;")
@@ -17,10 +17,12 @@ from .medical import (
 )
 from .appointment import (
     AppointmentType, Appointment, AppointmentReminder, 
-    GoogleCalendarEventMapping
+    GoogleCalendarEventMapping, CalendarSyncOutbox
 )
 from .clinical import ClinicalStudy, StudyCategory, StudyCatalog
 from .whatsapp_session import WhatsAppSession
 from .intake import IntakeQuestionnaireResponse
 from .assistant import AssistantConversation, AssistantMessage
 from .cfdi import CfdiIssuer, CfdiInvoice
+from .analytics import PracticeDailyRollup, AppointmentDailyRollup, AppointmentHourlyRollup
+from .export_job import ExportJob
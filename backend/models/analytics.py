@@ -0,0 +1,316 @@
+"""
+Daily analytics rollups (per doctor, per day).
+
+The practice / dashboard analytics read these few hundred pre-aggregated
+rows instead of rescanning 12 months of appointments and medical_records.
+They are derived data:
+
+- every flush that touches an Appointment, MedicalRecord, ClinicalStudy or
+  patient Person recomputes the affected (doctor, day) rows in the same
+  transaction (see `refresh_rollups` and the after_flush hook below)
+- a nightly job (services/analytics_rollups.reconcile_rollups) rebuilds
+  the last ~13 months to repair anything written outside the ORM session
+  (raw SQL, query-level bulk updates)
+
+Recomputing whole (doctor, day) buckets instead of applying +1/-1 deltas
+keeps the rollups idempotent: status changes, reschedules and a
+consultation that turns an appointment into "completed" are all handled
+the same way. Writers take a per-doctor transaction advisory lock so two
+concurrent refreshes of the same doctor serialize instead of racing.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Collection, Dict, Iterable, Optional, Set
+
+from sqlalchemy import (
+    Column, Date, DateTime, Integer, String, and_, case, cast, delete, event,
+    exists, func, inspect, insert, literal, or_, select, union_all,
+)
+from sqlalchemy.orm import Session
+
+from .appointment import Appointment
+from .base import Base, utc_now
+from .clinical import ClinicalStudy
+from .medical import MedicalRecord
+from .person import Person
+
+# pg_advisory_xact_lock(namespace, doctor_id)
+ROLLUP_LOCK_NAMESPACE = 7311
+
+# "Completed" = a consultation by the same doctor for the same patient
+# within one hour of the appointment (same rule as AnalyticsService).
+COMPLETED_WINDOW = timedelta(hours=1)
+
+# Appointment durations outside this range are data-entry errors
+DURATION_MIN_MINUTES = 5
+DURATION_MAX_MINUTES = 240
+
+TYPE_NEW_PATIENT = "new"
+TYPE_FOLLOW_UP = "follow_up"
+TYPE_OTHER = "other"
+
+
+class PracticeDailyRollup(Base):
+    """Consultations, new patients and studies ordered per doctor per day."""
+    __tablename__ = "practice_daily_rollups"
+
+    # Sin FK: son datos derivados, se reconstruyen desde las tablas base
+    doctor_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    consultations = Column(Integer, nullable=False, default=0)
+    new_patients = Column(Integer, nullable=False, default=0)  # persons.created_by = doctor
+    studies_ordered = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime, default=utc_now)
+
+
+class AppointmentDailyRollup(Base):
+    """Appointments per doctor per day, by status and consultation type bucket."""
+    __tablename__ = "appointment_daily_rollups"
+
+    doctor_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    status = Column(String(20), primary_key=True)  # NULL status stored as 'unknown'
+    type_bucket = Column(String(10), primary_key=True)  # 'new' | 'follow_up' | 'other'
+    appointments = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    cancelled_by_doctor = Column(Integer, nullable=False, default=0)
+    cancelled_by_patient = Column(Integer, nullable=False, default=0)
+    # Whole minutes (end_time - appointment_date) of rows within the sane range
+    duration_minutes = Column(Integer, nullable=False, default=0)
+    duration_samples = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime, default=utc_now)
+
+
+class AppointmentHourlyRollup(Base):
+    """Non-cancelled appointments per doctor, day and hour (busy heatmap)."""
+    __tablename__ = "appointment_hourly_rollups"
+
+    doctor_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    hour = Column(Integer, primary_key=True)
+    appointments = Column(Integer, nullable=False, default=0)
+    refreshed_at = Column(DateTime, default=utc_now)
+
+
+ROLLUP_TABLES = (PracticeDailyRollup, AppointmentDailyRollup, AppointmentHourlyRollup)
+
+
+# ============================================================================
+# Recompute (shared by the flush hook and the nightly reconcile)
+# ============================================================================
+
+def _day_scope(ts_col, first_day: date, last_day: date, days: Optional[Collection[date]]):
+    """Range predicate on the timestamp (index friendly), narrowed to `days` if given."""
+    criteria = [ts_col >= first_day, ts_col < last_day + timedelta(days=1)]
+    if days is not None:
+        criteria.append(cast(ts_col, Date).in_(sorted(days)))
+    return criteria
+
+
+def appointment_type_bucket(consultation_type_col):
+    return case(
+        (consultation_type_col.ilike('%primera%'), TYPE_NEW_PATIENT),
+        (consultation_type_col.ilike('%seguimiento%'), TYPE_FOLLOW_UP),
+        else_=TYPE_OTHER,
+    )
+
+
+def _appointment_rollup_select(doctor_id: int, first_day: date, last_day: date, days=None):
+    day = cast(Appointment.appointment_date, Date)
+    status = func.coalesce(Appointment.status, 'unknown')
+    bucket = appointment_type_bucket(Appointment.consultation_type)
+    minutes = func.trunc(func.extract('epoch', Appointment.end_time - Appointment.appointment_date) / 60)
+    sane_duration = minutes.between(DURATION_MIN_MINUTES, DURATION_MAX_MINUTES)
+    completed = exists().where(
+        MedicalRecord.patient_id == Appointment.patient_id,
+        MedicalRecord.doctor_id == Appointment.doctor_id,
+        MedicalRecord.consultation_date > Appointment.appointment_date - COMPLETED_WINDOW,
+        MedicalRecord.consultation_date < Appointment.appointment_date + COMPLETED_WINDOW,
+    )
+    cancelled_by_patient = and_(
+        Appointment.cancelled_by.isnot(None),
+        or_(
+            Appointment.cancelled_by != Appointment.doctor_id,
+            Appointment.cancelled_by == Appointment.patient_id,
+        ),
+    )
+    return select(
+        Appointment.doctor_id,
+        day,
+        status,
+        bucket,
+        func.count(),
+        func.count().filter(completed),
+        func.count().filter(Appointment.cancelled_by == Appointment.doctor_id),
+        func.count().filter(cancelled_by_patient),
+        func.coalesce(func.sum(minutes).filter(sane_duration), 0),
+        func.count().filter(sane_duration),
+    ).where(
+        Appointment.doctor_id == doctor_id,
+        *_day_scope(Appointment.appointment_date, first_day, last_day, days),
+    ).group_by(Appointment.doctor_id, day, status, bucket)
+
+
+def _hourly_rollup_select(doctor_id: int, first_day: date, last_day: date, days=None):
+    day = cast(Appointment.appointment_date, Date)
+    hour = cast(func.extract('hour', Appointment.appointment_date), Integer)
+    return select(
+        Appointment.doctor_id, day, hour, func.count(),
+    ).where(
+        Appointment.doctor_id == doctor_id,
+        Appointment.status != 'cancelled',
+        *_day_scope(Appointment.appointment_date, first_day, last_day, days),
+    ).group_by(Appointment.doctor_id, day, hour)
+
+
+def _practice_rollup_select(doctor_id: int, first_day: date, last_day: date, days=None):
+    zero = literal(0)
+    consultations = select(
+        MedicalRecord.doctor_id.label('doctor_id'),
+        cast(MedicalRecord.consultation_date, Date).label('day'),
+        func.count().label('consultations'), zero.label('new_patients'), zero.label('studies_ordered'),
+    ).where(
+        MedicalRecord.doctor_id == doctor_id,
+        *_day_scope(MedicalRecord.consultation_date, first_day, last_day, days),
+    ).group_by(MedicalRecord.doctor_id, cast(MedicalRecord.consultation_date, Date))
+    new_patients = select(
+        Person.created_by, cast(Person.created_at, Date), zero, func.count(), zero,
+    ).where(
+        Person.person_type == 'patient',
+        Person.created_by == doctor_id,
+        *_day_scope(Person.created_at, first_day, last_day, days),
+    ).group_by(Person.created_by, cast(Person.created_at, Date))
+    studies = select(
+        ClinicalStudy.doctor_id, cast(ClinicalStudy.ordered_date, Date), zero, zero, func.count(),
+    ).where(
+        ClinicalStudy.doctor_id == doctor_id,
+        *_day_scope(ClinicalStudy.ordered_date, first_day, last_day, days),
+    ).group_by(ClinicalStudy.doctor_id, cast(ClinicalStudy.ordered_date, Date))
+
+    sources = union_all(consultations, new_patients, studies).subquery()
+    return select(
+        sources.c.doctor_id,
+        sources.c.day,
+        func.sum(sources.c.consultations),
+        func.sum(sources.c.new_patients),
+        func.sum(sources.c.studies_ordered),
+    ).group_by(sources.c.doctor_id, sources.c.day)
+
+
+def refresh_rollups(
+    connection,
+    doctor_id: int,
+    first_day: date,
+    last_day: date,
+    days: Optional[Collection[date]] = None,
+) -> None:
+    """
+    Rebuild the rollup rows of one doctor for [first_day, last_day]
+    (or only `days` within that range) from the base tables.
+    Runs inside the caller's transaction.
+    """
+    connection.execute(select(func.pg_advisory_xact_lock(ROLLUP_LOCK_NAMESPACE, doctor_id)))
+    for model in ROLLUP_TABLES:
+        scope = [model.doctor_id == doctor_id, model.day >= first_day, model.day <= last_day]
+        if days is not None:
+            scope.append(model.day.in_(sorted(days)))
+        connection.execute(delete(model).where(*scope))
+
+    connection.execute(
+        insert(PracticeDailyRollup).from_select(
+            ["doctor_id", "day", "consultations", "new_patients", "studies_ordered"],
+            _practice_rollup_select(doctor_id, first_day, last_day, days),
+        )
+    )
+    connection.execute(
+        insert(AppointmentDailyRollup).from_select(
+            ["doctor_id", "day", "status", "type_bucket", "appointments", "completed",
+             "cancelled_by_doctor", "cancelled_by_patient", "duration_minutes", "duration_samples"],
+            _appointment_rollup_select(doctor_id, first_day, last_day, days),
+        )
+    )
+    connection.execute(
+        insert(AppointmentHourlyRollup).from_select(
+            ["doctor_id", "day", "hour", "appointments"],
+            _hourly_rollup_select(doctor_id, first_day, last_day, days),
+        )
+    )
+
+
+# ============================================================================
+# Incremental maintenance from the ORM write paths
+# ============================================================================
+
+# Columns that change what a row contributes to the rollups
+_TRACKED_ATTRS = {
+    Appointment: ("doctor_id", "patient_id", "appointment_date", "end_time",
+                  "status", "consultation_type", "cancelled_by"),
+    MedicalRecord: ("doctor_id", "patient_id", "consultation_date"),
+    ClinicalStudy: ("doctor_id", "ordered_date"),
+    Person: ("person_type", "created_by", "created_at"),
+}
+
+
+def _values(state, attr: str) -> list:
+    """Current and previous (if loaded) values of an attribute."""
+    history = state.attrs[attr].history
+    return [
+        value
+        for value in (*history.added, *history.unchanged, *history.deleted)
+        if value is not None
+    ]
+
+
+def _days(timestamps: Iterable[datetime], spread: timedelta = timedelta(0)) -> Set[date]:
+    out = set()
+    for ts in timestamps:
+        out.add((ts - spread).date())
+        out.add((ts + spread).date())
+    return out
+
+
+def collect_rollup_keys(objects: Iterable[object], deleted: Collection[object] = ()) -> Dict[int, Set[date]]:
+    """(doctor_id -> days) whose rollups are affected by these flushed objects."""
+    keys: Dict[int, Set[date]] = defaultdict(set)
+    for obj in objects:
+        attrs = _TRACKED_ATTRS.get(type(obj))
+        if attrs is None:
+            continue
+        state = inspect(obj)
+        if not (state.pending or obj in deleted) and not any(
+            state.attrs[attr].history.has_changes() for attr in attrs
+        ):
+            continue
+
+        if isinstance(obj, Appointment):
+            doctors = _values(state, "doctor_id")
+            days = _days(_values(state, "appointment_date"))
+        elif isinstance(obj, MedicalRecord):
+            doctors = _values(state, "doctor_id")
+            # The consultation day, plus the days of appointments it may complete
+            days = _days(_values(state, "consultation_date"), COMPLETED_WINDOW)
+        elif isinstance(obj, ClinicalStudy):
+            doctors = _values(state, "doctor_id")
+            days = _days(_values(state, "ordered_date"))
+        else:
+            if 'patient' not in _values(state, "person_type"):
+                continue
+            doctors = _values(state, "created_by")
+            days = _days(_values(state, "created_at")) or {utc_now().date()}
+
+        for doctor_id in doctors:
+            keys[doctor_id] |= days
+    return keys
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_rollups_after_flush(session, flush_context) -> None:
+    deleted = set(session.deleted)
+    keys = collect_rollup_keys([*session.new, *session.dirty, *deleted], deleted)
+    if not keys:
+        return
+    connection = session.connection()
+    # Fixed doctor order so concurrent flushes take the advisory locks in the same order
+    for doctor_id in sorted(keys):
+        days = keys[doctor_id]
+        refresh_rollups(connection, doctor_id, min(days), max(days), days)
@@ -1,7 +1,16 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, CheckConstraint, UniqueConstraint
+from datetime import timedelta
+
+from sqlalchemy import (
+    Column, Integer, String, Boolean, DateTime, ForeignKey, Text, CheckConstraint, UniqueConstraint, Index,
+    bindparam, event, inspect, literal_column, select, update,
+)
 from sqlalchemy.orm import relationship
 from .base import Base, utc_now
 
+# Statuses that still occupy a slot / may receive reminders.
+ACTIVE_APPOINTMENT_STATUSES = ("por_confirmar", "confirmada")
+
+
 class AppointmentType(Base):
     __tablename__ = "appointment_types"
     
@@ -52,6 +61,20 @@ class Appointment(Base):
     reminders = relationship("AppointmentReminder", back_populates="appointment", cascade="all, delete-orphan")
     google_calendar_mapping = relationship("GoogleCalendarEventMapping", back_populates="appointment", uselist=False, cascade="all, delete-orphan")
 
+    # Agenda range scans plus partial indexes over active appointments only
+    # (reminders, availability, conflicts). Kept in sync with migration e3f4a5b6c7d8.
+    __table_args__ = (
+        Index("ix_appointments_doctor_date_status", doctor_id, appointment_date, status),
+        Index(
+            "ix_appointments_active_doctor_date", doctor_id, appointment_date,
+            postgresql_where=status.in_(ACTIVE_APPOINTMENT_STATUSES),
+        ),
+        Index(
+            "ix_appointments_active_date", appointment_date,
+            postgresql_where=status.in_(ACTIVE_APPOINTMENT_STATUSES),
+        ),
+    )
+
 class AppointmentReminder(Base):
     """
     Stores up to 3 automatic reminders per appointment.
@@ -66,6 +89,10 @@ class AppointmentReminder(Base):
     sent = Column(Boolean, default=False, nullable=False)
     sent_at = Column(DateTime, nullable=True)
     whatsapp_message_id = Column(String(255), nullable=True)
+    # appointment_date - offset_minutes (CDMX local, like appointment_date).
+    # Maintained by the mapper events below so the scheduler can claim due
+    # reminders with an index range scan.
+    send_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=utc_now)
     updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
     
@@ -77,6 +104,35 @@ class AppointmentReminder(Base):
         CheckConstraint('reminder_number >= 1 AND reminder_number <= 3', name='check_reminder_number_range'),
         CheckConstraint('offset_minutes > 0', name='check_offset_minutes_positive'),
         UniqueConstraint('appointment_id', 'reminder_number', name='unique_appointment_reminder_number'),
+        # Due-reminder queue. Kept in sync with migration b6c7d8e9f0a1.
+        Index("ix_appointment_reminders_due", sent, enabled, send_at),
+    )
+
+
+@event.listens_for(AppointmentReminder, "before_insert")
+@event.listens_for(AppointmentReminder, "before_update")
+def _set_reminder_send_at(mapper, connection, target) -> None:
+    state = inspect(target)
+    if target.send_at is not None and not state.attrs.offset_minutes.history.has_changes():
+        return
+    appointment = target.appointment if "appointment" in state.dict else None
+    appointment_date = appointment.appointment_date if appointment is not None else connection.scalar(
+        select(Appointment.appointment_date).where(Appointment.id == target.appointment_id)
+    )
+    if appointment_date is not None and target.offset_minutes is not None:
+        target.send_at = appointment_date - timedelta(minutes=target.offset_minutes)
+
+
+@event.listens_for(Appointment, "after_update")
+def _reschedule_reminders(mapper, connection, target) -> None:
+    if not inspect(target).attrs.appointment_date.history.has_changes():
+        return
+    reminders = AppointmentReminder.__table__
+    new_date = bindparam("new_date", target.appointment_date, type_=DateTime)
+    connection.execute(
+        update(reminders)
+        .where(reminders.c.appointment_id == target.id)
+        .values(send_at=new_date - reminders.c.offset_minutes * literal_column("interval '1 minute'"))
     )
 
 class GoogleCalendarEventMapping(Base):
@@ -95,3 +151,39 @@ class GoogleCalendarEventMapping(Base):
     # Relationships
     appointment = relationship("Appointment", back_populates="google_calendar_mapping")
     doctor = relationship("Person")
+
+class CalendarSyncOutbox(Base):
+    """
+    Cambios de citas pendientes de sincronizar con Google Calendar.
+    Se escriben en la misma transacción que la cita; un worker en segundo
+    plano los aplica (ver services/calendar_sync_outbox.py).
+    """
+    __tablename__ = "calendar_sync_outbox"
+    
+    id = Column(Integer, primary_key=True)
+    # Sin FK: una entrada 'delete' debe sobrevivir al borrado de la cita
+    appointment_id = Column(Integer, nullable=False)
+    doctor_id = Column(Integer, ForeignKey("persons.id", ondelete="CASCADE"), nullable=False)
+    operation = Column(String(10), nullable=False)  # 'upsert' | 'delete'
+    status = Column(String(10), nullable=False, default='pending')  # 'pending' | 'failed'
+    # Incrementa cada vez que un cambio nuevo se fusiona en la entrada pendiente
+    version = Column(Integer, nullable=False, default=1)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=utc_now)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=utc_now)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
+    
+    # One pending entry per appointment (repeated updates coalesce into it)
+    # and a due-queue index for the worker. Kept in sync with migration a5b6c7d8e9f0.
+    __table_args__ = (
+        CheckConstraint("operation IN ('upsert', 'delete')", name='check_calendar_sync_operation'),
+        Index(
+            "ux_calendar_sync_outbox_pending_appointment", appointment_id,
+            unique=True, postgresql_where=status == 'pending',
+        ),
+        Index(
+            "ix_calendar_sync_outbox_due", next_attempt_at,
+            postgresql_where=status == 'pending',
+        ),
+    )
@@ -0,0 +1,56 @@
+"""
+Background export jobs.
+
+Heavy exports (ARCO ZIP, full expediente, compliance report) used to run
+inside the HTTP request and could hit Cloud Run's request timeout on large
+practices. They are now rows in `export_jobs`: the request validates access,
+enqueues and returns 202; a worker (services/export_jobs.py) claims the job,
+writes the artifact through the storage service and records where it is.
+"""
+from sqlalchemy import BigInteger, CheckConstraint, Column, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
+
+from .base import Base, utc_now
+
+
+class ExportJob(Base):
+    """
+    Exportación en segundo plano y su artefacto descargable.
+    'queued' y 'running' son trabajo pendiente: un 'running' cuyo lease
+    (next_attempt_at) venció se vuelve a reclamar.
+    """
+    __tablename__ = "export_jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(30), nullable=False)  # 'arco_export' | 'expediente' | 'compliance_report' | 'fhir_bulk_export'
+    status = Column(String(10), nullable=False, default="queued")
+    requested_by = Column(Integer, ForeignKey("persons.id", ondelete="CASCADE"), nullable=False)
+    params = Column(JSONB, nullable=False, default=dict)
+    progress = Column(Integer, nullable=False, default=0)  # 0-100
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=utc_now)
+    last_error = Column(Text)
+    artifact_key = Column(String(500))
+    artifact_name = Column(String(255))
+    content_type = Column(String(100))
+    artifact_size = Column(BigInteger)
+    created_at = Column(DateTime, default=utc_now)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    expires_at = Column(DateTime)
+
+    requester = relationship("Person")
+
+    # Worker queue scan and the "my exports" listing. Kept in sync with migration d8e9f0a1b2c3.
+    __table_args__ = (
+        CheckConstraint(
+            "status IN ('queued', 'running', 'succeeded', 'failed', 'expired')",
+            name="check_export_job_status",
+        ),
+        Index(
+            "ix_export_jobs_due", next_attempt_at,
+            postgresql_where=status.in_(("queued", "running")),
+        ),
+        Index("ix_export_jobs_requested_by", requested_by, created_at.desc()),
+    )
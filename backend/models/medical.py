@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy import desc
@@ -51,6 +51,13 @@ class MedicalRecord(Base):
     patient_document = relationship("Document", foreign_keys=[patient_document_id])
     document_folios = relationship("DocumentFolio", back_populates="consultation", cascade="all, delete-orphan")
 
+    # Hot filters: per-doctor timeline (lists, analytics) and per-patient
+    # expediente / ACL checks. Kept in sync with migration e3f4a5b6c7d8.
+    __table_args__ = (
+        Index("ix_medical_records_doctor_date", doctor_id, consultation_date.desc(), id.desc()),
+        Index("ix_medical_records_patient_doctor_date", patient_id, doctor_id, consultation_date.desc()),
+    )
+
 # ============================================================================
 # VITAL SIGNS MODELS
 # ============================================================================
@@ -113,6 +120,7 @@ class ConsultationPrescription(Base):
     quantity = Column(String(100))
     via_administracion = Column(String(100))
     created_at = Column(DateTime, default=utc_now)
+    updated_at = Column(DateTime, default=utc_now, onupdate=utc_now)
 
     # DIGITAL SIGNATURE (Fase 1 — firma electrónica simple Prescrypto-style)
     digital_signature = Column(JSONB, nullable=True)
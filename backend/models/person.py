@@ -1,8 +1,9 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Date, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Date, Text, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 from .base import Base, utc_now
+from utils.phone_utils import normalize_phone_e164
 
 # ============================================================================
 # MAIN TABLE: PERSONS (UNIFIED)
@@ -31,6 +32,9 @@ class Person(Base):
     # CONTACT INFORMATION
     email = Column(String(100))
     primary_phone = Column(String(20))
+    # Canonical +E.164 form of primary_phone (521/52 folded), maintained by
+    # `_sync_phone_e164`. Indexed for WhatsApp sender lookup.
+    phone_e164 = Column(String(20))
     
     # AVATAR SETTINGS
     avatar_type = Column(String(20), default='initials')  # initials | preloaded | custom
@@ -125,6 +129,18 @@ class Person(Base):
     
     # Google Calendar relationship
     google_calendar_token = relationship("GoogleCalendarToken", back_populates="doctor", uselist=False, cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index(
+            "ix_persons_patient_phone_e164", phone_e164,
+            postgresql_where=text("person_type = 'patient'"),
+        ),
+    )
+
+    @validates("primary_phone")
+    def _sync_phone_e164(self, key, value):
+        self.phone_e164 = normalize_phone_e164(value)
+        return value
     
     
     # PROPERTIES
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, Date
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, Date, Index
 from sqlalchemy.orm import relationship
 from .base import Base, utc_now
 
@@ -84,6 +84,10 @@ class AuditLog(Base):
     user = relationship("Person", foreign_keys=[user_id])
     affected_patient = relationship("Person", foreign_keys=[affected_patient_id])
 
+    __table_args__ = (
+        Index("ix_audit_log_user_timestamp", user_id, timestamp.desc(), id.desc()),
+    )
+
 # ============================================================================
 # PRIVACY AND CONSENT SYSTEM
 # ============================================================================
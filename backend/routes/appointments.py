@@ -3,7 +3,7 @@ Appointment management endpoints
 Refactored to use AppointmentService for better code health
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import datetime
@@ -12,6 +12,7 @@ from database import get_db, Person
 from dependencies import get_current_user
 from logger import get_logger
 from services.appointment_service import AppointmentService
+from utils.pagination import NEXT_CURSOR_HEADER, next_cursor, validate_cursor
 import crud
 import schemas
 
@@ -26,6 +27,7 @@ router = APIRouter(prefix="/api", tags=["appointments"])
 
 @router.get("/appointments")
 async def get_appointments(
+    response: Response,
     current_user: Person = Depends(get_current_user),
     db: Session = Depends(get_db),
     skip: int = Query(0),
@@ -33,9 +35,11 @@ async def get_appointments(
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
-    available_for_consultation: bool = Query(False)
+    available_for_consultation: bool = Query(False),
+    cursor: Optional[str] = Query(None)
 ):
-    """Get list of appointments with optional filters"""
+    """Get list of appointments with optional filters (next cursor in X-Next-Cursor)"""
+    validate_cursor(cursor)
     try:
         # Use CRUD for basic listing (already implemented)
         appointments = crud.get_appointments(
@@ -46,8 +50,12 @@ async def get_appointments(
             start_date=start_date,
             end_date=end_date,
             status=status,
-            available_for_consultation=available_for_consultation
+            available_for_consultation=available_for_consultation,
+            cursor=cursor
         )
+        next_page = next_cursor(appointments, limit, lambda apt: (apt.appointment_date, apt.id))
+        if next_page:
+            response.headers[NEXT_CURSOR_HEADER] = next_page
         
         # Serialize appointments
         return [AppointmentService.serialize_appointment(apt) for apt in appointments]
@@ -115,10 +123,8 @@ async def get_available_times_for_booking(
     given office on the weekday of `date`. Conflicts are checked against
     active appointments for the same office on that day.
     """
-    from datetime import datetime, timedelta, time as dtime
-    import json
-    from sqlalchemy import text
-    from database import Appointment, Office
+    from database import Office
+    from services.appointments.availability import default_office_id, free_slots
 
     try:
         target_date = datetime.fromisoformat(date).date()
@@ -140,115 +146,22 @@ async def get_available_times_for_booking(
             raise HTTPException(status_code=404, detail="Office not found for this doctor")
         resolved_office_id = office.id
     else:
-        first_office = (
-            db.query(Office)
-            .filter(Office.doctor_id == current_user.id, Office.is_active == True)
-            .order_by(Office.created_at.asc(), Office.id.asc())
-            .first()
-        )
-        resolved_office_id = first_office.id if first_office else None
-
-    if not resolved_office_id:
-        return {"date": date, "available_times": [], "slot_duration_minutes": slot_duration}
-
-    day_of_week = target_date.weekday()
-
-    template_row = db.execute(
-        text(
-            """
-            SELECT start_time, end_time, time_blocks
-            FROM schedule_templates
-            WHERE doctor_id = :doctor_id
-              AND office_id = :office_id
-              AND day_of_week = :day_of_week
-              AND is_active = TRUE
-            LIMIT 1
-            """
-        ),
-        {
-            "doctor_id": current_user.id,
-            "office_id": resolved_office_id,
-            "day_of_week": day_of_week,
-        },
-    ).fetchone()
-
-    if not template_row:
-        return {"date": date, "available_times": [], "slot_duration_minutes": slot_duration}
-
-    time_blocks = []
-    raw_blocks = template_row[2]
-    if raw_blocks:
-        if isinstance(raw_blocks, list):
-            time_blocks = raw_blocks
-        elif isinstance(raw_blocks, str):
-            time_blocks = json.loads(raw_blocks)
-
-    if not time_blocks and template_row[0] and template_row[1]:
-        time_blocks = [{
-            "start_time": template_row[0].strftime("%H:%M"),
-            "end_time": template_row[1].strftime("%H:%M"),
-        }]
-
-    if not time_blocks:
-        return {"date": date, "available_times": [], "slot_duration_minutes": slot_duration}
-
-    # Existing appointments in the same office on this date. Conflicts
-    # between offices are not enforced here — a separate booking-layer
-    # check owns that.
-    existing = db.execute(
-        text(
-            """
-            SELECT appointment_date, end_time
-            FROM appointments
-            WHERE doctor_id = :doctor_id
-              AND office_id = :office_id
-              AND DATE(appointment_date) = :date
-              AND status IN ('confirmada', 'por_confirmar')
-            """
-        ),
-        {
-            "doctor_id": current_user.id,
-            "office_id": resolved_office_id,
-            "date": target_date,
-        },
-    ).fetchall()
-
-    booked = [
-        {"start": row[0].time(), "end": row[1].time() if row[1] else row[0].time()}
-        for row in existing
-    ]
-
-    available_slots: list[dict] = []
-    for block in time_blocks:
-        start_str = block.get("start_time")
-        end_str = block.get("end_time")
-        if not start_str or not end_str:
-            continue
-        block_start = datetime.strptime(start_str, "%H:%M").time()
-        block_end = datetime.strptime(end_str, "%H:%M").time()
-
-        cursor = datetime.combine(target_date, block_start)
-        block_end_dt = datetime.combine(target_date, block_end)
-
-        while cursor + timedelta(minutes=slot_duration) <= block_end_dt:
-            slot_start = cursor.time()
-            slot_end = (cursor + timedelta(minutes=slot_duration)).time()
-
-            overlaps = any(
-                slot_start < b["end"] and slot_end > b["start"]
-                for b in booked
-            )
-            if not overlaps:
-                time_str = slot_start.strftime("%H:%M")
-                available_slots.append({
-                    "time": time_str,
-                    "display": time_str,
-                    "datetime": cursor.isoformat(),
-                    "duration_minutes": slot_duration,
-                    "available": True,
-                })
-
-            cursor += timedelta(minutes=slot_duration)
+        resolved_office_id = default_office_id(db, current_user.id)
+
+    # Conflicts between offices are not enforced here — a separate
+    # booking-layer check owns that.
+    slots = free_slots(db, current_user.id, resolved_office_id, target_date, slot_duration)
+
+    available_slots = []
+    for slot in slots:
+        time_str = slot.start.strftime("%H:%M")
+        available_slots.append({
+            "time": time_str,
+            "display": time_str,
+            "datetime": slot.start.isoformat(),
+            "duration_minutes": slot_duration,
+            "available": True,
+        })
 
     return {
         "date": date,
@@ -8,6 +8,7 @@ from database import get_db, Person, AuditLog, MedicalRecord
 from dependencies import get_current_user
 from logger import get_logger
 from utils.datetime_utils import utc_now
+from utils.pagination import apply_keyset, next_cursor, validate_cursor
 
 router = APIRouter(prefix="/api/audit", tags=["audit"])
 api_logger = get_logger("medical_records.api")
@@ -21,13 +22,16 @@ async def get_audit_logs(
     security_level: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: Person = Depends(get_current_user)
 ):
     """
     Get audit logs with filters
     Only accessible by doctors (for their own actions) or admins
+    Pass the returned `next_cursor` back as `cursor` for keyset pagination
     """
+    validate_cursor(cursor)
     try:
         # Build query
         query = db.query(AuditLog)
@@ -48,12 +52,14 @@ async def get_audit_logs(
         if end_date:
             query = query.filter(AuditLog.timestamp <= end_date)
         
-        # Order by most recent first
-        query = query.order_by(AuditLog.timestamp.desc())
-        
-        # Pagination
+        # Pagination: total counts the whole filtered set, not what is left after the cursor
         total = query.count()
-        logs = query.offset(skip).limit(limit).all()
+        
+        # Order by most recent first
+        query = apply_keyset(query, AuditLog.timestamp, AuditLog.id, cursor)
+        if not cursor:
+            query = query.offset(skip)
+        logs = query.limit(limit).all()
         
         # Convert to dict
         result = []
@@ -78,6 +84,7 @@ async def get_audit_logs(
             "total": total,
             "skip": skip,
             "limit": limit,
+            "next_cursor": next_cursor(logs, limit, lambda log: (log.timestamp, log.id)),
             "logs": result
         }
     except Exception as e:
@@ -25,6 +25,7 @@ import auth
 import crud
 import schemas
 from audit_service import audit_service
+from services.auth_user_cache import auth_user_cache
 
 
 def _client_ip(request: Request) -> Optional[str]:
@@ -643,6 +644,7 @@ async def get_current_user_info(
 @router.post("/auth/logout")
 async def logout(current_user: Person = Depends(get_current_user)):
     """Logout user"""
+    auth_user_cache.invalidate_user(current_user.id)
     return {"message": "Logged out successfully"}
 
 
@@ -1,82 +1,118 @@
 """
 Catalog endpoints (specialties, countries, states, emergency relationships, timezones)
 Migrated from main_clean_english.py to improve code organization
+
+Catalogs are served from services.catalog_cache with ETag / If-None-Match.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from typing import Optional
 
 from database import get_db, Country, State, Specialty
 import crud
+from services.catalog_cache import catalog_cache, catalog_response
 from timezone_list import get_timezone_options
 
 router = APIRouter(prefix="/api/catalogs", tags=["catalogs"])
 
 
+def _specialty_rows(db: Session):
+    return [
+        {
+            "id": spec.id,
+            "name": spec.name,
+            "is_active": spec.is_active,
+            "created_at": spec.created_at.isoformat() if spec.created_at else None
+        }
+        for spec in crud.get_specialties(db, active=True)
+    ]
+
+
+def _country_rows(db: Session):
+    return [
+        {
+            "id": country.id,
+            "name": country.name,
+            "phone_code": country.phone_code,
+            "is_active": country.is_active,
+            "created_at": country.created_at.isoformat() if country.created_at else None
+        }
+        for country in crud.get_countries(db, active=True)
+    ]
+
+
+def _state_rows(db: Session):
+    return [
+        {
+            "id": state.id,
+            "name": state.name,
+            "country_id": state.country_id,
+            "is_active": state.is_active,
+            "created_at": state.created_at.isoformat() if state.created_at else None
+        }
+        for state in crud.get_states(db, active=True)
+    ]
+
+
+def _emergency_relationship_rows(db: Session):
+    return [
+        {
+            "code": relationship.code,
+            "name": relationship.name,
+            "is_active": relationship.is_active,
+            "created_at": relationship.created_at
+        }
+        for relationship in crud.get_emergency_relationships(db, active=True)
+    ]
+
+
 @router.get("/specialties")
-async def get_specialties(db: Session = Depends(get_db)):
+async def get_specialties(request: Request, db: Session = Depends(get_db)):
     """Get list of medical specialties from medical_specialties table"""
     try:
-        specialties = crud.get_specialties(db, active=True)
-        return [
-            {
-                "id": spec.id,
-                "name": spec.name,
-                "is_active": spec.is_active,
-                "created_at": spec.created_at.isoformat() if spec.created_at else None
-            }
-            for spec in specialties
-        ]
+        entry = catalog_cache.get("specialties", lambda: _specialty_rows(db))
+        return catalog_response(request, entry)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting specialties: {str(e)}")
 
 
 @router.get("/countries")
-async def get_countries(db: Session = Depends(get_db)):
+async def get_countries(request: Request, db: Session = Depends(get_db)):
     """Get list of countries"""
     try:
-        countries = crud.get_countries(db, active=True)
-        return [
-            {
-                "id": country.id,
-                "name": country.name,
-                "phone_code": country.phone_code,
-                "is_active": country.is_active,
-                "created_at": country.created_at.isoformat() if country.created_at else None
-            }
-            for country in countries
-        ]
+        entry = catalog_cache.get("countries", lambda: _country_rows(db))
+        return catalog_response(request, entry)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting countries: {str(e)}")
 
 
 @router.get("/states")
 async def get_states(
+    request: Request,
     country_id: Optional[int] = Query(None),
     db: Session = Depends(get_db)
 ):
     """Get list of states"""
     try:
-        states = crud.get_states(db, country_id=country_id, active=True)
-        return [
-            {
-                "id": state.id,
-                "name": state.name,
-                "country_id": state.country_id,
-                "is_active": state.is_active,
-                "created_at": state.created_at.isoformat() if state.created_at else None
-            }
-            for state in states
-        ]
+        entry = catalog_cache.get("states", lambda: _state_rows(db))
+        if not country_id:
+            return catalog_response(request, entry)
+        return catalog_response(
+            request,
+            entry,
+            select=lambda rows: [row for row in rows if row["country_id"] == country_id],
+            variant={"country_id": country_id},
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting states: {str(e)}")
 
 
 @router.get("/emergency-relationships")
-async def get_emergency_relationships(db: Session = Depends(get_db)):
+async def get_emergency_relationships(request: Request, db: Session = Depends(get_db)):
     """Get list of emergency relationships"""
-    return crud.get_emergency_relationships(db, active=True)
+    entry = catalog_cache.get("emergency_relationships", lambda: _emergency_relationship_rows(db))
+    return catalog_response(request, entry)
 
 
 @router.get("/timezones")
@@ -18,6 +18,8 @@ from utils.datetime_utils import utc_now
 from dependencies import get_current_user
 from logger import get_logger
 from audit_service import audit_service
+from services.catalog_cache import catalog_cache, catalog_response, contains, page
+from services.catalog_search import search_index
 from services.storage_service import get_storage_service, generate_storage_key, LocalStorageService
 import crud
 import schemas
@@ -773,16 +775,38 @@ async def get_clinical_study_file(
         raise HTTPException(status_code=500, detail="Error retrieving file")
 
 
+def _study_category_rows(db: Session):
+    categories = crud.get_study_categories(db, skip=0, limit=None)
+    return [
+        schemas.StudyCategory.model_validate(category).model_dump(mode="json")
+        for category in sorted(categories, key=lambda category: category.id)
+    ]
+
+
+def _study_catalog_rows(db: Session):
+    studies = crud.get_study_catalog(db, skip=0, limit=None)
+    return [
+        schemas.StudyCatalog.model_validate(study).model_dump(mode="json")
+        for study in sorted(studies, key=lambda study: study.id)
+    ]
+
+
 @router.get("/study-categories")
 async def get_study_categories(
+    request: Request,
     skip: int = Query(0),
     limit: int = Query(100),
     db: Session = Depends(get_db)
 ):
     """Get all study categories"""
     try:
-        categories = crud.get_study_categories(db, skip=skip, limit=limit)
-        return [schemas.StudyCategory.model_validate(category) for category in categories]
+        entry = catalog_cache.get("study_categories", lambda: _study_category_rows(db))
+        return catalog_response(
+            request,
+            entry,
+            select=lambda rows: page(rows, skip, limit),
+            variant={"skip": skip, "limit": limit},
+        )
     except Exception as e:
         api_logger.error("Error in get_study_categories", error=str(e), exc_info=True)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -790,6 +814,7 @@ async def get_study_categories(
 
 @router.get("/study-catalog")
 async def get_study_catalog(
+    request: Request,
     skip: int = Query(0),
     limit: int = Query(100),
     category_id: Optional[int] = Query(None),
@@ -798,14 +823,19 @@ async def get_study_catalog(
 ):
     """Get studies from catalog with filters"""
     try:
-        studies = crud.get_study_catalog(
-            db, 
-            skip=skip, 
-            limit=limit,
-            category_id=category_id,
-            search=search
+        entry = catalog_cache.get("study_catalog", lambda: _study_catalog_rows(db))
+
+        def select(rows):
+            if category_id:
+                rows = [row for row in rows if row["category_id"] == category_id]
+            return page(contains(rows, "name", search), skip, limit)
+
+        return catalog_response(
+            request,
+            entry,
+            select=select,
+            variant={"skip": skip, "limit": limit, "category_id": category_id, "search": search},
         )
-        return [schemas.StudyCatalog.model_validate(study) for study in studies]
     except Exception as e:
         api_logger.error("Error in get_study_catalog", error=str(e), exc_info=True)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -836,16 +866,12 @@ async def search_studies(
     db: Session = Depends(get_db),
     current_user: Person = Depends(get_current_user)
 ):
-    """Search studies with advanced filters"""
+    """Search studies (ranked typeahead over the cached study catalog)"""
     try:
-        studies = crud.search_studies(
-            db,
-            search_term=q,
-            category_id=category_id,
-            specialty=specialty,
-            limit=limit
-        )
-        return [schemas.StudyCatalog.model_validate(study) for study in studies]
+        entry = catalog_cache.get("study_catalog", lambda: _study_catalog_rows(db))
+        predicate = (lambda row: row["category_id"] == category_id) if category_id else None
+        matches = search_index(entry).search(q, limit=limit, predicate=predicate)
+        return [row for row, _ in matches]
     except Exception as e:
         api_logger.error("❌ Error in search_studies", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -5,10 +5,12 @@ Compliance: NOM-004-SSA3-2012, NOM-024-SSA3-2012, NOM-035-SSA3-2012, LFPDPPP
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
+import json
 import logging
 
 from database import get_db, Person, MedicalRecord, PrivacyConsent, PrivacyNotice, AuditLog
@@ -16,6 +18,13 @@ from models.diagnosis import DiagnosisCatalog
 from dependencies import get_current_user
 from logger import get_logger
 from data_retention_service import get_retention_stats
+from services.export_jobs import (
+    KIND_COMPLIANCE_REPORT,
+    ExportArtifact,
+    enqueue_export,
+    export_handler,
+    serialize_export_job,
+)
 
 api_logger = get_logger("api")
 
@@ -27,6 +36,49 @@ import pytz
 SYSTEM_TIMEZONE = pytz.timezone('America/Mexico_City')
 
 
+def build_compliance_report(db: Session, current_user: Person, doctor_id: Optional[int] = None) -> Dict[str, Any]:
+    """Reporte de cumplimiento (también lo genera el worker de exportaciones)"""
+    # Filtrar por doctor si se especifica
+    filter_doctor_id = doctor_id if doctor_id else (current_user.id if current_user.person_type == 'doctor' else None)
+    
+    # ============================================================================
+    # 1. NOM-004-SSA3-2012 COMPLIANCE
+    # ============================================================================
+    nom004_status = _check_nom004_compliance(db, filter_doctor_id)
+    
+    # ============================================================================
+    # 2. NOM-024-SSA3-2012 COMPLIANCE
+    # ============================================================================
+    nom024_status = _check_nom024_compliance(db, filter_doctor_id)
+    
+    # ============================================================================
+    # 3. NOM-035-SSA3-2012 / LFPDPPP COMPLIANCE
+    # ============================================================================
+    nom035_status = _check_nom035_compliance(db, filter_doctor_id)
+    
+    # ============================================================================
+    # 4. ESTADÍSTICAS GENERALES
+    # ============================================================================
+    general_stats = _get_general_stats(db, filter_doctor_id)
+    
+    # ============================================================================
+    # 5. CALCULAR CUMPLIMIENTO GLOBAL
+    # ============================================================================
+    overall_compliance = _calculate_overall_compliance(nom004_status, nom024_status, nom035_status)
+    
+    return {
+        "report_date": datetime.now(SYSTEM_TIMEZONE).isoformat(),
+        "doctor_id": filter_doctor_id,
+        "doctor_name": current_user.name if filter_doctor_id == current_user.id else None,
+        "overall_compliance": overall_compliance,
+        "nom004_compliance": nom004_status,
+        "nom024_compliance": nom024_status,
+        "nom035_compliance": nom035_status,
+        "general_statistics": general_stats,
+        "recommendations": _generate_recommendations(nom004_status, nom024_status, nom035_status)
+    }
+
+
 @router.get("/report")
 async def get_compliance_report(
     doctor_id: Optional[int] = Query(None, description="ID del doctor (opcional, para filtrar por doctor)"),
@@ -49,45 +101,7 @@ async def get_compliance_report(
             extra={"doctor_id": doctor_id, "user_id": current_user.id}
         )
         
-        # Filtrar por doctor si se especifica
-        filter_doctor_id = doctor_id if doctor_id else (current_user.id if current_user.person_type == 'doctor' else None)
-        
-        # ============================================================================
-        # 1. NOM-004-SSA3-2012 COMPLIANCE
-        # ============================================================================
-        nom004_status = await _check_nom004_compliance(db, filter_doctor_id)
-        
-        # ============================================================================
-        # 2. NOM-024-SSA3-2012 COMPLIANCE
-        # ============================================================================
-        nom024_status = await _check_nom024_compliance(db, filter_doctor_id)
-        
-        # ============================================================================
-        # 3. NOM-035-SSA3-2012 / LFPDPPP COMPLIANCE
-        # ============================================================================
-        nom035_status = await _check_nom035_compliance(db, filter_doctor_id)
-        
-        # ============================================================================
-        # 4. ESTADÍSTICAS GENERALES
-        # ============================================================================
-        general_stats = await _get_general_stats(db, filter_doctor_id)
-        
-        # ============================================================================
-        # 5. CALCULAR CUMPLIMIENTO GLOBAL
-        # ============================================================================
-        overall_compliance = _calculate_overall_compliance(nom004_status, nom024_status, nom035_status)
-        
-        return {
-            "report_date": datetime.now(SYSTEM_TIMEZONE).isoformat(),
-            "doctor_id": filter_doctor_id,
-            "doctor_name": current_user.name if filter_doctor_id == current_user.id else None,
-            "overall_compliance": overall_compliance,
-            "nom004_compliance": nom004_status,
-            "nom024_compliance": nom024_status,
-            "nom035_compliance": nom035_status,
-            "general_statistics": general_stats,
-            "recommendations": _generate_recommendations(nom004_status, nom024_status, nom035_status)
-        }
+        return build_compliance_report(db, current_user, doctor_id)
         
     except Exception as e:
         api_logger.error(
@@ -98,7 +112,38 @@ async def get_compliance_report(
         raise HTTPException(status_code=500, detail=f"Error al generar reporte de cumplimiento: {str(e)}")
 
 
-async def _check_nom004_compliance(db: Session, doctor_id: Optional[int]) -> Dict[str, Any]:
+@router.post("/report/jobs", status_code=202)
+async def enqueue_compliance_report(
+    doctor_id: Optional[int] = Query(None, description="ID del doctor (opcional, para filtrar por doctor)"),
+    db: Session = Depends(get_db),
+    current_user: Person = Depends(get_current_user)
+):
+    """
+    Encola el reporte de cumplimiento (prácticas grandes); consultar avance en
+    GET /api/exports/{id} y descargar el JSON al terminar
+    """
+    job = enqueue_export(db, KIND_COMPLIANCE_REPORT, current_user.id, {"doctor_id": doctor_id})
+    db.commit()
+    api_logger.info(
+        "📊 Compliance report queued",
+        extra={"doctor_id": doctor_id, "user_id": current_user.id, "job_id": job.id}
+    )
+    return serialize_export_job(job)
+
+
+@export_handler(KIND_COMPLIANCE_REPORT)
+def _build_compliance_export(db: Session, job, progress) -> ExportArtifact:
+    requester = db.query(Person).filter(Person.id == job.requested_by).first()
+    report = build_compliance_report(db, requester, job.params.get("doctor_id"))
+    progress(90)
+    return ExportArtifact(
+        filename=f"compliance-report-{datetime.now(SYSTEM_TIMEZONE).strftime('%Y%m%d-%H%M')}.json",
+        content_type="application/json",
+        chunks=[json.dumps(jsonable_encoder(report), ensure_ascii=False).encode("utf-8")],
+    )
+
+
+def _check_nom004_compliance(db: Session, doctor_id: Optional[int]) -> Dict[str, Any]:
     """Verifica cumplimiento NOM-004-SSA3-2012"""
     
     query = db.query(MedicalRecord)
@@ -189,7 +234,7 @@ async def _check_nom004_compliance(db: Session, doctor_id: Optional[int]) -> Dic
     }
 
 
-async def _check_nom024_compliance(db: Session, doctor_id: Optional[int]) -> Dict[str, Any]:
+def _check_nom024_compliance(db: Session, doctor_id: Optional[int]) -> Dict[str, Any]:
     """Verifica cumplimiento NOM-024-SSA3-2012 (Interoperabilidad)"""
     
     # Verificar catálogo CIE-10
@@ -245,7 +290,7 @@ async def _check_nom024_compliance(db: Session, doctor_id: Optional[int]) -> Dic
     }
 
 
-async def _check_nom035_compliance(db: Session, doctor_id: Optional[int]) -> Dict[str, Any]:
+def _check_nom035_compliance(db: Session, doctor_id: Optional[int]) -> Dict[str, Any]:
     """Verifica cumplimiento NOM-035-SSA3-2012 / LFPDPPP"""
     
     # Verificar avisos de privacidad
@@ -314,7 +359,7 @@ async def _check_nom035_compliance(db: Session, doctor_id: Optional[int]) -> Dic
     }
 
 
-async def _get_general_stats(db: Session, doctor_id: Optional[int]) -> Dict[str, Any]:
+def _get_general_stats(db: Session, doctor_id: Optional[int]) -> Dict[str, Any]:
     """Obtiene estadísticas generales del sistema"""
     
     query_patients = db.query(Person).filter(Person.person_type == 'patient')
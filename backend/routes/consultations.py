@@ -3,7 +3,7 @@ Consultations management endpoints
 Refactored to use ConsultationService
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
 
@@ -20,6 +20,7 @@ from services.consultation_service import (
 )
 from services.consultations.security import verify_medical_document_signature
 from audit_service import audit_service
+from utils.pagination import NEXT_CURSOR_HEADER, validate_cursor
 
 api_logger = get_logger("medical_records.api")
 
@@ -29,29 +30,35 @@ router = APIRouter(prefix="/api", tags=["consultations"])
 @router.get("/consultations")
 async def get_consultations(
     request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Person = Depends(get_current_user),
     skip: int = Query(0),
-    limit: int = Query(100)
+    limit: int = Query(100),
+    cursor: Optional[str] = Query(None)
 ):
-    """Get list of consultations"""
+    """Get list of consultations (offset or keyset pagination; next cursor in X-Next-Cursor)"""
     api_logger.info(
         "📋 GET /consultations called",
         extra={
             "doctor_id": current_user.id,
             "skip": skip,
             "limit": limit,
+            "cursor": bool(cursor),
             "user_type": current_user.person_type
         }
     )
+    validate_cursor(cursor)
     try:
-        result = ConsultationService.get_consultations_for_doctor(
+        result, next_page = ConsultationService.get_consultations_page(
             db=db,
             doctor_id=current_user.id,
             skip=skip,
             limit=limit,
-            decrypt_sensitive_data_fn=decrypt_sensitive_data
+            cursor=cursor
         )
+        if next_page:
+            response.headers[NEXT_CURSOR_HEADER] = next_page
         api_logger.info(
             "✅ GET /consultations returning result",
             extra={
@@ -67,7 +74,7 @@ async def get_consultations(
                 user=current_user,
                 request=request,
                 result_count=len(result) if result else 0,
-                filters={"skip": skip, "limit": limit},
+                filters={"skip": skip, "limit": limit, "cursor": bool(cursor)},
             )
         except Exception as audit_err:
             api_logger.warning("Failed to audit consultation list access: %s", audit_err)
@@ -2,7 +2,7 @@
 Diagnosis catalog API routes based on CIE-10 (ICD-10)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, text
 from typing import List, Optional, Dict, Any
@@ -21,6 +21,8 @@ from schemas_diagnosis import (
     DiagnosisStats
 )
 from dependencies import get_current_user
+from services.catalog_cache import PRIVATE_CACHE_CONTROL, catalog_cache, catalog_response, page
+from services.catalog_search import search_index
 
 router = APIRouter(prefix="/api/diagnosis", tags=["diagnosis"])
 logger = logging.getLogger(__name__)
@@ -45,8 +47,20 @@ def filter_diagnoses_by_creator(query, current_user: Optional[Person] = None):
     return query
 
 
+def _diagnosis_rows(db: Session, current_user: Optional[Person]):
+    query = db.query(DiagnosisCatalog).filter(
+        DiagnosisCatalog.is_active == True
+    )
+    query = filter_diagnoses_by_creator(query, current_user)
+    return [
+        DiagnosisCatalogSchema.model_validate(diagnosis).model_dump(mode="json")
+        for diagnosis in query.order_by(DiagnosisCatalog.code).all()
+    ]
+
+
 @router.get("/catalog", response_model=List[DiagnosisCatalogSchema])
 async def get_diagnosis_catalog(
+    request: Request,
     limit: int = Query(100, ge=1, le=500, description="Maximum number of results"),
     offset: int = Query(0, ge=0, description="Number of results to skip"),
     db: Session = Depends(get_db),
@@ -58,17 +72,20 @@ async def get_diagnosis_catalog(
     Only code and name are required by law
     """
     try:
-        query = db.query(DiagnosisCatalog).filter(
-            DiagnosisCatalog.is_active == True
+        # Doctors see system diagnoses plus their own; everyone else sees all
+        is_doctor = current_user and current_user.person_type == 'doctor'
+        entry = catalog_cache.get(
+            "diagnoses",
+            lambda: _diagnosis_rows(db, current_user),
+            scope=current_user.id if is_doctor else "all",
+        )
+        return catalog_response(
+            request,
+            entry,
+            select=lambda rows: page(rows, offset, limit),
+            variant={"offset": offset, "limit": limit},
+            cache_control=PRIVATE_CACHE_CONTROL,
         )
-        
-        # Filter by creator: system (created_by=0) OR doctor's own (created_by=doctor_id)
-        query = filter_diagnoses_by_creator(query, current_user)
-        
-        diagnoses = query.order_by(DiagnosisCatalog.code).offset(offset).limit(limit).all()
-        
-        # Return diagnoses directly - schema will handle serialization
-        return diagnoses
     
     except Exception as e:
         logger.error(f"Error getting diagnosis catalog: {str(e)}")
@@ -121,50 +138,40 @@ async def search_diagnoses(
     db: Session = Depends(get_db),
     current_user: Person = Depends(get_current_user)
 ):
-    """Search diagnoses using full-text search
+    """Search diagnoses (ranked typeahead: code, word prefix, substring, fuzzy)
     Compliance: NOM-004-SSA3-2012, NOM-024-SSA3-2012 - CIE-10 catalog
     Shows system diagnoses (created_by=0) and doctor's own diagnoses (created_by=doctor_id)
     """
     try:
         logger.info(f"🔍 Searching diagnoses with query: {search_request.query}")
-        
-        # Build base query
-        query = db.query(DiagnosisCatalog).filter(
-            DiagnosisCatalog.is_active == True
+
+        # One index over every active diagnosis; the creator scope is applied per match
+        entry = catalog_cache.get("diagnoses", lambda: _diagnosis_rows(db, None), scope="all")
+        index = search_index(entry, code_field="code")
+
+        predicate = None
+        if current_user and current_user.person_type == 'doctor':
+            # System diagnoses (created_by=0) OR doctor's own diagnoses (created_by=doctor_id)
+            predicate = lambda row: row["created_by"] in (0, current_user.id)
+
+        matches = index.search(
+            search_request.query,
+            limit=search_request.limit,
+            offset=search_request.offset,
+            predicate=predicate,
         )
-        
-        # Filter by creator: system (created_by=0) OR doctor's own (created_by=doctor_id)
-        query = filter_diagnoses_by_creator(query, current_user)
-        
-        # Add text search (only search name and code)
-        if search_request.query:
-            search_term = f"%{search_request.query}%"
-            logger.info(f"🔍 Using search term: {search_term}")
-            query = query.filter(
-                or_(
-                    DiagnosisCatalog.name.ilike(search_term),
-                    DiagnosisCatalog.code.ilike(search_term)
-                )
+
+        search_results = [
+            DiagnosisSearchResult(
+                id=row["id"],
+                code=row["code"],
+                name=row["name"],
+                created_by=row["created_by"],
+                rank=rank
             )
-        
-        # Execute query
-        logger.info(f"🔍 Executing search query with limit: {search_request.limit}, offset: {search_request.offset}")
-        results = query.order_by(DiagnosisCatalog.name).offset(
-            search_request.offset
-        ).limit(search_request.limit).all()
-        
-        logger.info(f"🔍 Found {len(results)} diagnoses matching search criteria")
-        
-        # Convert to search results
-        search_results = []
-        for diagnosis in results:
-            search_results.append(DiagnosisSearchResult(
-                id=diagnosis.id,
-                code=diagnosis.code,
-                name=diagnosis.name,
-                created_by=diagnosis.created_by
-            ))
-        
+            for row, rank in matches
+        ]
+
         logger.info(f"🔍 Returning {len(search_results)} search results")
         return search_results
     
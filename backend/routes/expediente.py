@@ -5,11 +5,18 @@ GET /api/patients/{patient_id}/expediente/full — doctor-only JSON
 aggregation of the patient's whole expediente. The frontend consumes
 this payload and renders the PDF client-side (jsPDF) to avoid adding
 a new PDF dependency on the backend.
+
+POST /api/patients/{patient_id}/expediente/jobs — same payload built by
+the export worker, for patients whose history is too large to aggregate
+within the request timeout (poll and download via /api/exports).
 """
 
 from __future__ import annotations
 
+import json
+
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
 from audit_service import audit_service
@@ -17,6 +24,13 @@ from database import Person, get_db
 from dependencies import get_current_user
 from logger import get_logger
 from services.expediente_export import ExpedienteAggregator
+from services.export_jobs import (
+    KIND_EXPEDIENTE,
+    ExportArtifact,
+    enqueue_export,
+    export_handler,
+    serialize_export_job,
+)
 
 api_logger = get_logger("medical_records.expediente_route")
 
@@ -69,3 +83,63 @@ async def get_expediente_full(
         api_logger.warning("Expediente export audit failed: %s", audit_err)
 
     return payload
+
+
+@router.post("/{patient_id}/expediente/jobs", status_code=202)
+async def enqueue_expediente_export(
+    patient_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Person = Depends(get_current_user),
+):
+    """Queue the expediente aggregation; poll GET /api/exports/{id}."""
+    if current_user.person_type not in ("doctor", "admin"):
+        raise HTTPException(
+            status_code=403,
+            detail="Solo personal médico puede exportar expedientes.",
+        )
+    try:
+        patient = ExpedienteAggregator(db=db).authorize(patient_id, current_user)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Paciente no encontrado.")
+    except PermissionError:
+        raise HTTPException(
+            status_code=403,
+            detail="No tienes autorización sobre este paciente.",
+        )
+
+    job = enqueue_export(db, KIND_EXPEDIENTE, current_user.id, {"patient_id": patient_id})
+
+    try:
+        audit_service.log_action(
+            db=db,
+            user=current_user,
+            request=request,
+            action="READ",
+            table_name="persons",
+            record_id=patient_id,
+            affected_patient_id=patient_id,
+            affected_patient_name=patient.name,
+            operation_type="expediente_export",
+            metadata={"export_job_id": job.id},
+            security_level="INFO",
+        )
+    except Exception as audit_err:
+        api_logger.warning("Expediente export audit failed: %s", audit_err)
+
+    db.commit()
+    return serialize_export_job(job)
+
+
+@export_handler(KIND_EXPEDIENTE)
+def _build_expediente_export(db: Session, job, progress) -> ExportArtifact:
+    patient_id = job.params["patient_id"]
+    doctor = db.query(Person).filter(Person.id == job.requested_by).first()
+    payload = ExpedienteAggregator(db=db).build(patient_id=patient_id, doctor=doctor)
+    progress(90)
+    body = json.dumps(jsonable_encoder(payload), ensure_ascii=False).encode("utf-8")
+    return ExportArtifact(
+        filename=f"expediente-patient-{patient_id}.json",
+        content_type="application/json",
+        chunks=[body],
+    )
@@ -0,0 +1,102 @@
+"""
+Background export endpoints.
+
+Jobs are enqueued by the endpoints that own each export
+(POST /api/privacy/arco/export/{id}/jobs, /api/patients/{id}/expediente/jobs,
+/api/compliance/report/jobs). Here the requester polls them and downloads
+the artifact. Downloads honour HTTP Range requests so a large archive can
+resume: local storage is served with FileResponse (Range / If-Range aware)
+and cloud storage through a short-lived signed URL, which GCS serves with
+Range support.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from sqlalchemy.orm import Session
+
+from database import ExportJob, Person, get_db
+from dependencies import get_current_user
+from logger import get_logger
+from services.export_jobs import serialize_export_job
+from services.storage_service import LocalStorageService, get_storage_service
+
+api_logger = get_logger("medical_records.exports")
+
+router = APIRouter(prefix="/api/exports", tags=["exports"])
+
+DOWNLOAD_URL_TTL_SECONDS = 300
+
+
+def _own_job(db: Session, job_id: int, current_user: Person) -> ExportJob:
+    job = db.query(ExportJob).filter(
+        ExportJob.id == job_id,
+        ExportJob.requested_by == current_user.id,
+    ).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Exportación no encontrada")
+    return job
+
+
+@router.get("")
+async def list_export_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: Person = Depends(get_current_user),
+):
+    """Most recent exports requested by the current user."""
+    jobs = db.query(ExportJob).filter(
+        ExportJob.requested_by == current_user.id,
+    ).order_by(ExportJob.created_at.desc()).limit(limit).all()
+    return [serialize_export_job(job) for job in jobs]
+
+
+@router.get("/{job_id}")
+async def get_export_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: Person = Depends(get_current_user),
+):
+    """Status and progress of an export (poll until 'succeeded' or 'failed')."""
+    return serialize_export_job(_own_job(db, job_id, current_user))
+
+
+@router.get("/{job_id}/download")
+async def download_export(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: Person = Depends(get_current_user),
+):
+    """Download the artifact of a finished export (supports Range requests)."""
+    job = _own_job(db, job_id, current_user)
+    if job.status == "expired":
+        raise HTTPException(status_code=410, detail="La exportación expiró; genera una nueva")
+    if job.status != "succeeded" or not job.artifact_key:
+        raise HTTPException(status_code=409, detail="La exportación aún no está lista")
+
+    storage = get_storage_service()
+    api_logger.info("Descarga de exportación", extra={
+        "job_id": job.id, "kind": job.kind, "user_id": current_user.id
+    })
+
+    presigned_url = storage.get_url(job.artifact_key, expires_in=DOWNLOAD_URL_TTL_SECONDS, download_name=job.artifact_name)
+    if presigned_url:
+        return RedirectResponse(url=presigned_url, status_code=302)
+
+    if isinstance(storage, LocalStorageService):
+        if not storage.exists(job.artifact_key):
+            raise HTTPException(status_code=404, detail="Archivo de exportación no encontrado")
+        return FileResponse(
+            path=storage.get_full_path(job.artifact_key),
+            filename=job.artifact_name,
+            media_type=job.content_type or "application/octet-stream",
+        )
+
+    # Fallback: whole file (storage without URLs or local paths)
+    content = storage.download(job.artifact_key)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Archivo de exportación no encontrado")
+    return Response(
+        content=content,
+        media_type=job.content_type or "application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{job.artifact_name}"'},
+    )
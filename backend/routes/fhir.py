@@ -8,6 +8,17 @@ Resources exposed:
 - MedicationRequest  read + search (patient)
 - Observation        read + search (patient)
 - Patient/$everything operation — full clinical Bundle
+- $export / Patient/$export — FHIR Bulk Data export (async, NDJSON per
+  resource type, `_type` / `_since` / `patient`), produced by the export
+  job worker; poll $export-status/{id} for the manifest
+
+Searchsets and $everything are paged with `_count` / `_offset`; the Bundle
+carries self/next/previous links. $everything pages over Encounters and
+includes each page's MedicationRequests, Observations and Practitioners,
+so a patient with hundreds of visits never produces an unbounded Bundle.
+Related rows (practitioners, their offices, specialties and identifier
+documents, medications, vital sign names) are bulk-loaded, so a Bundle
+costs a fixed number of queries however many resources it holds.
 
 Auth model: doctor-only. A doctor can read their own Practitioner record,
 any Patient they own (`persons.created_by`) or have consulted, and any
@@ -21,35 +32,54 @@ Bundle transaction writes, resource _history.
 
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.orm import Session, joinedload
 
 from audit_service import audit_service
 from database import (
     ConsultationPrescription,
     ConsultationVitalSign,
     Document,
+    ExportJob,
     MedicalRecord,
     Person,
     PersonDocument,
     get_db,
 )
 from dependencies import get_current_user
-from interoperability import InteroperabilityService
 from logger import get_logger
+from services import export_jobs
+from services.export_jobs import KIND_FHIR_BULK_EXPORT, ExportArtifact, enqueue_export, export_handler
+from services.fhir_bulk_export import (
+    BULK_RESOURCE_TYPES,
+    NDJSON_CONTENT_TYPE,
+    PATIENT_COMPARTMENT_TYPES,
+    BulkExportScope,
+    count_resources,
+    iter_resources,
+    ndjson_chunks,
+)
 from services.fhir_service import (
     build_doctor_view,
-    build_encounter_view,
+    build_doctor_views,
     build_everything_bundle,
     build_patient_view,
     build_searchset_bundle,
-    fix_encounter_keys,
+    load_documents_by_person,
+    paging_links,
+    serialize_encounter,
     serialize_medication_request,
     serialize_observation,
+    serialize_patient,
+    serialize_practitioner,
 )
+from services.patient_access import doctor_can_read_patient, readable_patient_ids, readable_patients_filter
+from utils.datetime_utils import utc_now
 
 api_logger = get_logger("medical_records.api")
 
@@ -57,6 +87,11 @@ router = APIRouter(prefix="/api/fhir", tags=["fhir"])
 
 FHIR_CONTENT_TYPE = "application/fhir+json"
 
+# Page sizes (`_count`). $everything pages over Encounters.
+SEARCH_DEFAULT_COUNT = 100
+EVERYTHING_DEFAULT_COUNT = 50
+MAX_COUNT = 500
+
 
 def _fhir_response(payload: Dict[str, Any]) -> JSONResponse:
     return JSONResponse(content=payload, media_type=FHIR_CONTENT_TYPE)
@@ -76,6 +111,25 @@ def _operation_outcome(status_code: int, diagnostics: str) -> Dict[str, Any]:
     }
 
 
+def _encounter_scope(patient_id: int, current_user: Person) -> list:
+    """Encounters of a patient the caller may read: their own unless admin."""
+    criteria = [MedicalRecord.patient_id == patient_id]
+    if current_user.person_type != "admin":
+        criteria.append(MedicalRecord.doctor_id == current_user.id)
+    return criteria
+
+
+def _page(q, count: int, offset: int, options=()) -> tuple[int, list]:
+    """(total matches, rows of the requested page). `_count=0` only counts.
+
+    Eager-load `options` are applied to the page query only, not the count.
+    """
+    total = q.order_by(None).count()
+    if not count or offset >= total:
+        return total, []
+    return total, q.options(*options).offset(offset).limit(count).all()
+
+
 # ---------------------------------------------------------------------------
 # Practitioner
 # ---------------------------------------------------------------------------
@@ -90,7 +144,7 @@ async def get_my_practitioner(
     if current_user.person_type != "doctor":
         raise HTTPException(status_code=403, detail="Only doctors have a Practitioner record")
     view = build_doctor_view(db, current_user)
-    practitioner = InteroperabilityService.doctor_to_fhir_practitioner(view)
+    practitioner = serialize_practitioner(view)
     # Best-effort audit — Practitioner/me is not PHI about another person,
     # but logging keeps the NOM-004 traceability consistent.
     try:
@@ -106,7 +160,7 @@ async def get_my_practitioner(
         )
     except Exception as audit_err:
         api_logger.warning("Failed to audit Practitioner/me access: %s", audit_err)
-    return _fhir_response(practitioner.model_dump(exclude_none=True))
+    return _fhir_response(practitioner)
 
 
 @router.get("/Practitioner/{practitioner_id}")
@@ -135,7 +189,7 @@ async def get_practitioner(
             media_type=FHIR_CONTENT_TYPE,
         )
     view = build_doctor_view(db, person)
-    practitioner = InteroperabilityService.doctor_to_fhir_practitioner(view)
+    practitioner = serialize_practitioner(view)
     try:
         audit_service.log_action(
             db=db,
@@ -149,7 +203,7 @@ async def get_practitioner(
         )
     except Exception as audit_err:
         api_logger.warning("Failed to audit Practitioner access: %s", audit_err)
-    return _fhir_response(practitioner.model_dump(exclude_none=True))
+    return _fhir_response(practitioner)
 
 
 # ---------------------------------------------------------------------------
@@ -158,26 +212,11 @@ async def get_practitioner(
 
 def _doctor_can_read_patient(db: Session, doctor: Person, patient: Person) -> bool:
     """Same rule as the ARCO export: creator or has-consultation or admin."""
-    if doctor.person_type == "admin":
-        return True
-    if doctor.person_type != "doctor":
-        return False
-    if patient.created_by == doctor.id:
-        return True
-    has_consultation = (
-        db.query(MedicalRecord)
-        .filter(
-            MedicalRecord.patient_id == patient.id,
-            MedicalRecord.doctor_id == doctor.id,
-        )
-        .first()
-        is not None
-    )
-    return has_consultation
+    return doctor_can_read_patient(db, doctor, patient)
 
 
 # Patient.identifier system for Mexican CURP (matches the system URI
-# that `InteroperabilityService.patient_to_fhir_patient` emits).
+# that `serialize_patient` emits).
 CURP_IDENTIFIER_SYSTEM = "urn:oid:2.16.840.1.113883.4.629"
 
 
@@ -223,16 +262,15 @@ async def search_patients(
             Document.name == "CURP",
             PersonDocument.is_active.is_(True),
             PersonDocument.document_value == value,
+            readable_patients_filter(current_user),
         )
         .all()
     )
-    visible = [p for p in rows if _doctor_can_read_patient(db, current_user, p)]
+    documents = load_documents_by_person(db, (pat.id for pat in rows))
     resources: List[Dict[str, Any]] = []
-    for pat in visible:
-        view = build_patient_view(db, pat)
-        resources.append(
-            InteroperabilityService.patient_to_fhir_patient(view).model_dump(exclude_none=True)
-        )
+    for pat in rows:
+        view = build_patient_view(db, pat, documents=documents.get(pat.id, {}))
+        resources.append(serialize_patient(view))
     try:
         audit_service.log_action(
             db=db, action="READ", user=current_user, request=request,
@@ -246,6 +284,253 @@ async def search_patients(
     return _fhir_response(build_searchset_bundle(resources))
 
 
+# ---------------------------------------------------------------------------
+# Bulk Data export — $export (system) and Patient/$export.
+# Registered before /Patient/{patient_id} so "$export" is not read as an id.
+# ---------------------------------------------------------------------------
+
+NDJSON_OUTPUT_FORMATS = ("application/fhir+ndjson", "application/ndjson", "ndjson")
+
+
+def _parse_instant(value: str) -> datetime:
+    """FHIR instant (`2026-01-01T00:00:00Z`, offset optional) as aware UTC."""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _kick_off_bulk_export(
+    request: Request,
+    db: Session,
+    current_user: Person,
+    level: str,
+    allowed_types: tuple,
+    type_param: Optional[str],
+    since_param: Optional[str],
+    output_format: Optional[str],
+    patient_param: Optional[str] = None,
+):
+    if current_user.person_type not in ("doctor", "admin"):
+        return JSONResponse(
+            status_code=403,
+            content=_operation_outcome(403, "Not authorized"),
+            media_type=FHIR_CONTENT_TYPE,
+        )
+    if output_format and output_format not in NDJSON_OUTPUT_FORMATS:
+        return JSONResponse(
+            status_code=400,
+            content=_operation_outcome(400, f"Unsupported _outputFormat: {output_format}"),
+            media_type=FHIR_CONTENT_TYPE,
+        )
+
+    types = [t.strip() for t in type_param.split(",") if t.strip()] if type_param else list(allowed_types)
+    unsupported = [t for t in types if t not in allowed_types]
+    if unsupported:
+        return JSONResponse(
+            status_code=400,
+            content=_operation_outcome(400, f"Unsupported _type: {', '.join(unsupported)}"),
+            media_type=FHIR_CONTENT_TYPE,
+        )
+
+    since = None
+    if since_param:
+        try:
+            since = _parse_instant(since_param)
+        except ValueError:
+            return JSONResponse(
+                status_code=400,
+                content=_operation_outcome(400, "_since must be a FHIR instant"),
+                media_type=FHIR_CONTENT_TYPE,
+            )
+
+    patient_ids = None
+    if patient_param:
+        try:
+            patient_ids = sorted({
+                int(ref.strip().rsplit("/", 1)[-1]) for ref in patient_param.split(",") if ref.strip()
+            })
+        except ValueError:
+            return JSONResponse(
+                status_code=400,
+                content=_operation_outcome(400, "patient must be a list of Patient ids or references"),
+                media_type=FHIR_CONTENT_TYPE,
+            )
+        if set(patient_ids) - readable_patient_ids(db, current_user, patient_ids):
+            return JSONResponse(
+                status_code=403,
+                content=_operation_outcome(403, "Not authorized to export some of these patients"),
+                media_type=FHIR_CONTENT_TYPE,
+            )
+
+    export_id = uuid.uuid4().hex
+    transaction_time = utc_now()
+    for resource_type in dict.fromkeys(types):
+        enqueue_export(db, KIND_FHIR_BULK_EXPORT, current_user.id, {
+            "export_id": export_id,
+            "level": level,
+            "type": resource_type,
+            "since": since.isoformat() if since else None,
+            "patient_ids": patient_ids,
+            "transaction_time": transaction_time.isoformat(),
+            "request": str(request.url),
+        })
+    try:
+        audit_service.log_action(
+            db=db, action="EXPORT", user=current_user, request=request,
+            table_name="persons", record_id=None,
+            operation_type="fhir_bulk_export",
+            metadata={
+                "export_id": export_id,
+                "level": level,
+                "types": types,
+                "since": since_param,
+                "patients": len(patient_ids) if patient_ids is not None else None,
+            },
+            security_level="WARNING",
+        )
+    except Exception as audit_err:
+        api_logger.warning("Failed to audit bulk export: %s", audit_err)
+    db.commit()
+
+    return Response(
+        status_code=202,
+        headers={"Content-Location": str(request.url_for("bulk_export_status", export_id=export_id))},
+    )
+
+
+@router.get("/$export")
+async def system_export(
+    request: Request,
+    type_: Optional[str] = Query(None, alias="_type"),
+    since: Optional[str] = Query(None, alias="_since"),
+    output_format: Optional[str] = Query(None, alias="_outputFormat"),
+    db: Session = Depends(get_db),
+    current_user: Person = Depends(get_current_user),
+):
+    """Start a system-level Bulk Data export of every readable resource.
+
+    Async per the Bulk Data spec: 202 + Content-Location of the status
+    endpoint. Doctors get their patients and the records they authored.
+    """
+    return _kick_off_bulk_export(
+        request, db, current_user, "system", BULK_RESOURCE_TYPES, type_, since, output_format,
+    )
+
+
+@router.get("/Patient/$export")
+async def patient_export(
+    request: Request,
+    type_: Optional[str] = Query(None, alias="_type"),
+    since: Optional[str] = Query(None, alias="_since"),
+    output_format: Optional[str] = Query(None, alias="_outputFormat"),
+    patient: Optional[str] = Query(None, description="Comma-separated Patient ids or references"),
+    db: Session = Depends(get_db),
+    current_user: Person = Depends(get_current_user),
+):
+    """Start a Patient-level Bulk Data export (patient compartment types).
+
+    `patient` narrows the export to a list of patients — the nearest thing
+    to a Group export, as there is no Group resource here.
+    """
+    return _kick_off_bulk_export(
+        request, db, current_user, "patient", PATIENT_COMPARTMENT_TYPES, type_, since, output_format,
+        patient_param=patient,
+    )
+
+
+@router.get("/$export-status/{export_id}", name="bulk_export_status")
+async def bulk_export_status(
+    export_id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Person = Depends(get_current_user),
+):
+    """Poll a Bulk Data export: 202 while running, 200 with the manifest when done."""
+    jobs = (
+        db.query(ExportJob)
+        .filter(
+            ExportJob.requested_by == current_user.id,
+            ExportJob.kind == KIND_FHIR_BULK_EXPORT,
+            ExportJob.params["export_id"].astext == export_id,
+        )
+        .order_by(ExportJob.id.asc())
+        .all()
+    )
+    if not jobs:
+        return JSONResponse(
+            status_code=404,
+            content=_operation_outcome(404, "Export not found"),
+            media_type=FHIR_CONTENT_TYPE,
+        )
+    if any(job.status == "expired" for job in jobs):
+        return JSONResponse(
+            status_code=410,
+            content=_operation_outcome(410, "Export files expired; start a new export"),
+            media_type=FHIR_CONTENT_TYPE,
+        )
+    failed = [job for job in jobs if job.status == "failed"]
+    if failed:
+        return JSONResponse(
+            status_code=500,
+            content=_operation_outcome(500, "; ".join(
+                f"{job.params.get('type')}: {job.last_error}" for job in failed
+            )),
+            media_type=FHIR_CONTENT_TYPE,
+        )
+
+    done = [job for job in jobs if job.status == "succeeded"]
+    if len(done) < len(jobs):
+        return Response(
+            status_code=202,
+            headers={
+                "X-Progress": f"{len(done)}/{len(jobs)} resource types complete",
+                "Retry-After": str(export_jobs.POLL_SECONDS),
+            },
+        )
+
+    params = jobs[0].params
+    return JSONResponse(content={
+        "transactionTime": params.get("transaction_time"),
+        "request": params.get("request"),
+        "requiresAccessToken": True,
+        # Types with no matching resources are left out, as the spec allows
+        "output": [
+            {
+                "type": job.params.get("type"),
+                "url": str(request.url_for("download_export", job_id=job.id)),
+            }
+            for job in done
+            if job.artifact_size
+        ],
+        "error": [],
+    })
+
+
+@export_handler(KIND_FHIR_BULK_EXPORT)
+def _build_fhir_bulk_export(db: Session, job, progress) -> ExportArtifact:
+    params = job.params
+    requester = db.query(Person).filter(Person.id == job.requested_by).first()
+    scope = BulkExportScope(
+        requester=requester,
+        patient_ids=params.get("patient_ids"),
+        since=_parse_instant(params["since"]) if params.get("since") else None,
+    )
+    resource_type = params["type"]
+    total = count_resources(db, resource_type, scope)
+
+    def tracked():
+        for done, resource in enumerate(iter_resources(db, resource_type, scope), start=1):
+            progress(done * 100 // max(total, 1))
+            yield resource
+
+    return ExportArtifact(
+        filename=f"{resource_type}.ndjson",
+        content_type=NDJSON_CONTENT_TYPE,
+        chunks=ndjson_chunks(tracked()),
+    )
+
+
 @router.get("/Patient/{patient_id}")
 async def get_fhir_patient(
     patient_id: int,
@@ -272,7 +557,7 @@ async def get_fhir_patient(
             media_type=FHIR_CONTENT_TYPE,
         )
     view = build_patient_view(db, patient)
-    fhir_patient = InteroperabilityService.patient_to_fhir_patient(view)
+    fhir_patient = serialize_patient(view)
     # PHI read — audit at INFO severity.
     try:
         audit_service.log_action(
@@ -289,26 +574,13 @@ async def get_fhir_patient(
         )
     except Exception as audit_err:
         api_logger.warning("Failed to audit Patient access: %s", audit_err)
-    return _fhir_response(fhir_patient.model_dump(exclude_none=True))
+    return _fhir_response(fhir_patient)
 
 
 # ---------------------------------------------------------------------------
 # Encounter
 # ---------------------------------------------------------------------------
 
-def _fhir_encounter_for(
-    consultation: MedicalRecord,
-) -> Dict[str, Any]:
-    """Convert a MedicalRecord row into a FHIR Encounter dict (with `class` key)."""
-    view = build_encounter_view(consultation)
-    fhir_model = InteroperabilityService.consultation_to_fhir_encounter(
-        view,
-        patient_id=str(consultation.patient_id),
-        doctor_id=str(consultation.doctor_id),
-    )
-    return fix_encounter_keys(fhir_model.model_dump(exclude_none=True))
-
-
 @router.get("/Encounter/{encounter_id}")
 async def get_fhir_encounter(
     encounter_id: int,
@@ -334,7 +606,7 @@ async def get_fhir_encounter(
             content=_operation_outcome(403, "Not authorized to read this Encounter"),
             media_type=FHIR_CONTENT_TYPE,
         )
-    encounter = _fhir_encounter_for(consultation)
+    encounter = serialize_encounter(consultation)
     try:
         audit_service.log_action(
             db=db,
@@ -360,6 +632,8 @@ async def get_fhir_encounter(
 async def patient_everything(
     patient_id: int,
     request: Request,
+    count: int = Query(EVERYTHING_DEFAULT_COUNT, alias="_count", ge=0, le=MAX_COUNT),
+    offset: int = Query(0, alias="_offset", ge=0),
     db: Session = Depends(get_db),
     current_user: Person = Depends(get_current_user),
 ):
@@ -369,6 +643,9 @@ async def patient_everything(
     Encounters + MedicationRequests + Observations + involved
     Practitioners. Non-admin callers only see Encounters (and their
     child resources) they authored.
+
+    Paged over Encounters (`_count` per page, oldest first); every page
+    repeats the Patient and carries the resources linked to its Encounters.
     """
     patient = (
         db.query(Person)
@@ -388,18 +665,15 @@ async def patient_everything(
             media_type=FHIR_CONTENT_TYPE,
         )
 
-    # Patient
-    patient_view = build_patient_view(db, patient)
-    patient_fhir = InteroperabilityService.patient_to_fhir_patient(patient_view).model_dump(
-        exclude_none=True
-    )
-
     # Encounters: only those the calling doctor authored (unless admin).
-    q = db.query(MedicalRecord).filter(MedicalRecord.patient_id == patient_id)
-    if current_user.person_type != "admin":
-        q = q.filter(MedicalRecord.doctor_id == current_user.id)
-    consultations = q.order_by(MedicalRecord.consultation_date.asc()).all()
-    encounters: List[Dict[str, Any]] = [_fhir_encounter_for(c) for c in consultations]
+    total_encounters, consultations = _page(
+        db.query(MedicalRecord)
+        .filter(*_encounter_scope(patient_id, current_user))
+        .order_by(MedicalRecord.consultation_date.asc(), MedicalRecord.id.asc()),
+        count,
+        offset,
+    )
+    encounters: List[Dict[str, Any]] = [serialize_encounter(c) for c in consultations]
     encounter_ids = [c.id for c in consultations]
 
     # MedicationRequests + Observations anchored to those encounters.
@@ -408,7 +682,9 @@ async def patient_everything(
     if encounter_ids:
         rx_rows = (
             db.query(ConsultationPrescription)
+            .options(joinedload(ConsultationPrescription.medication))
             .filter(ConsultationPrescription.consultation_id.in_(encounter_ids))
+            .order_by(ConsultationPrescription.id.asc())
             .all()
         )
         # doctor_id is carried by the encounter, not the prescription row.
@@ -419,22 +695,29 @@ async def patient_everything(
         ]
         vs_rows = (
             db.query(ConsultationVitalSign)
+            .options(joinedload(ConsultationVitalSign.vital_sign))
             .filter(ConsultationVitalSign.consultation_id.in_(encounter_ids))
+            .order_by(ConsultationVitalSign.id.asc())
             .all()
         )
         observations = [serialize_observation(vs, patient_id) for vs in vs_rows]
 
-    # Involved Practitioners (unique doctor ids in the encounter list).
+    # Involved Practitioners (unique doctor ids in this page's encounters).
     doctor_ids = sorted({c.doctor_id for c in consultations})
-    practitioners: List[Dict[str, Any]] = []
-    for did in doctor_ids:
-        doc = db.query(Person).filter(Person.id == did, Person.person_type == "doctor").first()
-        if not doc:
-            continue
-        view = build_doctor_view(db, doc)
-        practitioners.append(
-            InteroperabilityService.doctor_to_fhir_practitioner(view).model_dump(exclude_none=True)
-        )
+    doctors = (
+        db.query(Person)
+        .filter(Person.id.in_(doctor_ids), Person.person_type == "doctor")
+        .order_by(Person.id.asc())
+        .all()
+    ) if doctor_ids else []
+
+    # Identifier documents for the patient and every practitioner at once.
+    documents = load_documents_by_person(db, [patient_id, *doctor_ids])
+    patient_view = build_patient_view(db, patient, documents=documents.get(patient_id, {}))
+    patient_fhir = serialize_patient(patient_view)
+    practitioners: List[Dict[str, Any]] = [
+        serialize_practitioner(view) for view in build_doctor_views(db, doctors, documents=documents)
+    ]
 
     bundle = build_everything_bundle(
         patient_fhir,
@@ -442,6 +725,7 @@ async def patient_everything(
         practitioners,
         medication_request_fhirs=medication_requests,
         observation_fhirs=observations,
+        links=paging_links(request.url, count, offset, total_encounters),
     )
 
     try:
@@ -457,6 +741,8 @@ async def patient_everything(
             operation_type="fhir_patient_everything",
             metadata={
                 "encounters": len(encounters),
+                "encounters_total": total_encounters,
+                "offset": offset,
                 "medication_requests": len(medication_requests),
                 "observations": len(observations),
                 "practitioners": len(practitioners),
@@ -476,6 +762,8 @@ async def patient_everything(
 @router.get("/Encounter")
 async def search_encounters(
     patient: int = Query(..., description="Patient resource id"),
+    count: int = Query(SEARCH_DEFAULT_COUNT, alias="_count", ge=0, le=MAX_COUNT),
+    offset: int = Query(0, alias="_offset", ge=0),
     request: Request = None,
     db: Session = Depends(get_db),
     current_user: Person = Depends(get_current_user),
@@ -494,40 +782,39 @@ async def search_encounters(
             content=_operation_outcome(403, "Not authorized to read this patient's Encounters"),
             media_type=FHIR_CONTENT_TYPE,
         )
-    q = db.query(MedicalRecord).filter(MedicalRecord.patient_id == patient)
-    if current_user.person_type != "admin":
-        q = q.filter(MedicalRecord.doctor_id == current_user.id)
-    consultations = q.order_by(MedicalRecord.consultation_date.asc()).all()
-    encounters = [_fhir_encounter_for(c) for c in consultations]
+    total, consultations = _page(
+        db.query(MedicalRecord)
+        .filter(*_encounter_scope(patient, current_user))
+        .order_by(MedicalRecord.consultation_date.asc(), MedicalRecord.id.asc()),
+        count,
+        offset,
+    )
+    encounters = [serialize_encounter(c) for c in consultations]
     try:
         audit_service.log_action(
             db=db, action="READ", user=current_user, request=request,
             table_name="medical_records", record_id=None,
             affected_patient_id=patient,
             operation_type="fhir_encounter_search",
-            metadata={"count": len(encounters)},
+            metadata={"count": len(encounters), "total": total, "offset": offset},
             security_level="INFO",
         )
     except Exception as audit_err:
         api_logger.warning("Failed to audit Encounter search: %s", audit_err)
-    return _fhir_response(build_searchset_bundle(encounters))
+    return _fhir_response(build_searchset_bundle(
+        encounters, total=total, links=paging_links(request.url, count, offset, total),
+    ))
 
 
 # ---------------------------------------------------------------------------
 # MedicationRequest — search + read
 # ---------------------------------------------------------------------------
 
-def _rx_patient_id(db: Session, rx: ConsultationPrescription) -> int | None:
-    """Resolve the patient_id for a prescription via its parent encounter."""
-    consultation = db.query(MedicalRecord).filter(
-        MedicalRecord.id == rx.consultation_id
-    ).first()
-    return consultation.patient_id if consultation else None
-
-
 @router.get("/MedicationRequest")
 async def search_medication_requests(
     patient: int = Query(..., description="Patient resource id"),
+    count: int = Query(SEARCH_DEFAULT_COUNT, alias="_count", ge=0, le=MAX_COUNT),
+    offset: int = Query(0, alias="_offset", ge=0),
     request: Request = None,
     db: Session = Depends(get_db),
     current_user: Person = Depends(get_current_user),
@@ -546,20 +833,19 @@ async def search_medication_requests(
             content=_operation_outcome(403, "Not authorized"),
             media_type=FHIR_CONTENT_TYPE,
         )
-    q = db.query(MedicalRecord).filter(MedicalRecord.patient_id == patient)
-    if current_user.person_type != "admin":
-        q = q.filter(MedicalRecord.doctor_id == current_user.id)
-    consultations = q.all()
-    enc_ids = [c.id for c in consultations]
-    consultation_doctor = {c.id: c.doctor_id for c in consultations}
-    rx_rows = (
-        db.query(ConsultationPrescription)
-        .filter(ConsultationPrescription.consultation_id.in_(enc_ids))
-        .all()
-    ) if enc_ids else []
+    # doctor_id is carried by the encounter, not the prescription row.
+    total, rows = _page(
+        db.query(ConsultationPrescription, MedicalRecord.doctor_id)
+        .join(MedicalRecord, MedicalRecord.id == ConsultationPrescription.consultation_id)
+        .filter(*_encounter_scope(patient, current_user))
+        .order_by(ConsultationPrescription.id.asc()),
+        count,
+        offset,
+        options=(joinedload(ConsultationPrescription.medication),),
+    )
     resources = [
-        serialize_medication_request(rx, patient, consultation_doctor.get(rx.consultation_id))
-        for rx in rx_rows
+        serialize_medication_request(rx, patient, doctor_id)
+        for rx, doctor_id in rows
     ]
     try:
         audit_service.log_action(
@@ -567,12 +853,14 @@ async def search_medication_requests(
             table_name="consultation_prescriptions", record_id=None,
             affected_patient_id=patient,
             operation_type="fhir_medication_request_search",
-            metadata={"count": len(resources)},
+            metadata={"count": len(resources), "total": total, "offset": offset},
             security_level="INFO",
         )
     except Exception as audit_err:
         api_logger.warning("Failed to audit MedicationRequest search: %s", audit_err)
-    return _fhir_response(build_searchset_bundle(resources))
+    return _fhir_response(build_searchset_bundle(
+        resources, total=total, links=paging_links(request.url, count, offset, total),
+    ))
 
 
 @router.get("/MedicationRequest/{rx_id}")
@@ -583,14 +871,21 @@ async def get_medication_request(
     current_user: Person = Depends(get_current_user),
 ):
     """Return a single MedicationRequest resource."""
-    rx = db.query(ConsultationPrescription).filter(ConsultationPrescription.id == rx_id).first()
-    if not rx:
+    # Prescription, its encounter and its medication in one round-trip.
+    row = (
+        db.query(ConsultationPrescription, MedicalRecord)
+        .outerjoin(MedicalRecord, MedicalRecord.id == ConsultationPrescription.consultation_id)
+        .options(joinedload(ConsultationPrescription.medication))
+        .filter(ConsultationPrescription.id == rx_id)
+        .first()
+    )
+    if not row:
         return JSONResponse(
             status_code=404,
             content=_operation_outcome(404, "MedicationRequest not found"),
             media_type=FHIR_CONTENT_TYPE,
         )
-    consultation = db.query(MedicalRecord).filter(MedicalRecord.id == rx.consultation_id).first()
+    rx, consultation = row
     if not consultation:
         return JSONResponse(
             status_code=404,
@@ -624,6 +919,8 @@ async def get_medication_request(
 @router.get("/Observation")
 async def search_observations(
     patient: int = Query(..., description="Patient resource id"),
+    count: int = Query(SEARCH_DEFAULT_COUNT, alias="_count", ge=0, le=MAX_COUNT),
+    offset: int = Query(0, alias="_offset", ge=0),
     request: Request = None,
     db: Session = Depends(get_db),
     current_user: Person = Depends(get_current_user),
@@ -642,16 +939,15 @@ async def search_observations(
             content=_operation_outcome(403, "Not authorized"),
             media_type=FHIR_CONTENT_TYPE,
         )
-    q = db.query(MedicalRecord).filter(MedicalRecord.patient_id == patient)
-    if current_user.person_type != "admin":
-        q = q.filter(MedicalRecord.doctor_id == current_user.id)
-    consultations = q.all()
-    enc_ids = [c.id for c in consultations]
-    vs_rows = (
+    total, vs_rows = _page(
         db.query(ConsultationVitalSign)
-        .filter(ConsultationVitalSign.consultation_id.in_(enc_ids))
-        .all()
-    ) if enc_ids else []
+        .join(MedicalRecord, MedicalRecord.id == ConsultationVitalSign.consultation_id)
+        .filter(*_encounter_scope(patient, current_user))
+        .order_by(ConsultationVitalSign.id.asc()),
+        count,
+        offset,
+        options=(joinedload(ConsultationVitalSign.vital_sign),),
+    )
     resources = [serialize_observation(vs, patient) for vs in vs_rows]
     try:
         audit_service.log_action(
@@ -659,12 +955,14 @@ async def search_observations(
             table_name="consultation_vital_signs", record_id=None,
             affected_patient_id=patient,
             operation_type="fhir_observation_search",
-            metadata={"count": len(resources)},
+            metadata={"count": len(resources), "total": total, "offset": offset},
             security_level="INFO",
         )
     except Exception as audit_err:
         api_logger.warning("Failed to audit Observation search: %s", audit_err)
-    return _fhir_response(build_searchset_bundle(resources))
+    return _fhir_response(build_searchset_bundle(
+        resources, total=total, links=paging_links(request.url, count, offset, total),
+    ))
 
 
 @router.get("/Observation/{vs_id}")
@@ -675,14 +973,20 @@ async def get_observation(
     current_user: Person = Depends(get_current_user),
 ):
     """Return a single Observation resource."""
-    vs = db.query(ConsultationVitalSign).filter(ConsultationVitalSign.id == vs_id).first()
-    if not vs:
+    row = (
+        db.query(ConsultationVitalSign, MedicalRecord)
+        .outerjoin(MedicalRecord, MedicalRecord.id == ConsultationVitalSign.consultation_id)
+        .options(joinedload(ConsultationVitalSign.vital_sign))
+        .filter(ConsultationVitalSign.id == vs_id)
+        .first()
+    )
+    if not row:
         return JSONResponse(
             status_code=404,
             content=_operation_outcome(404, "Observation not found"),
             media_type=FHIR_CONTENT_TYPE,
         )
-    consultation = db.query(MedicalRecord).filter(MedicalRecord.id == vs.consultation_id).first()
+    vs, consultation = row
     if not consultation:
         return JSONResponse(
             status_code=404,
@@ -726,6 +1030,12 @@ async def capability_statement():
             {
                 "mode": "server",
                 "security": {"description": "Bearer JWT; doctor-scoped"},
+                "operation": [
+                    {
+                        "name": "export",
+                        "definition": "http://hl7.org/fhir/uv/bulkdata/OperationDefinition/export",
+                    }
+                ],
                 "resource": [
                     {
                         "type": "Patient",
@@ -734,7 +1044,13 @@ async def capability_statement():
                             {"code": "search-type"},
                         ],
                         "searchParam": [{"name": "identifier", "type": "token"}],
-                        "operation": [{"name": "everything", "definition": "Patient/$everything"}],
+                        "operation": [
+                            {"name": "everything", "definition": "Patient/$everything"},
+                            {
+                                "name": "export",
+                                "definition": "http://hl7.org/fhir/uv/bulkdata/OperationDefinition/patient-export",
+                            },
+                        ],
                     },
                     {
                         "type": "Practitioner",
@@ -746,7 +1062,10 @@ async def capability_statement():
                             {"code": "read"},
                             {"code": "search-type"},
                         ],
-                        "searchParam": [{"name": "patient", "type": "reference"}],
+                        "searchParam": [
+                            {"name": "patient", "type": "reference"},
+                            {"name": "_count", "type": "number"},
+                        ],
                     },
                     {
                         "type": "MedicationRequest",
@@ -754,7 +1073,10 @@ async def capability_statement():
                             {"code": "read"},
                             {"code": "search-type"},
                         ],
-                        "searchParam": [{"name": "patient", "type": "reference"}],
+                        "searchParam": [
+                            {"name": "patient", "type": "reference"},
+                            {"name": "_count", "type": "number"},
+                        ],
                     },
                     {
                         "type": "Observation",
@@ -762,7 +1084,10 @@ async def capability_statement():
                             {"code": "read"},
                             {"code": "search-type"},
                         ],
-                        "searchParam": [{"name": "patient", "type": "reference"}],
+                        "searchParam": [
+                            {"name": "patient", "type": "reference"},
+                            {"name": "_count", "type": "number"},
+                        ],
                     },
                 ],
             }
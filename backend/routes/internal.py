@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Header, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, status
 from sqlalchemy.orm import Session
 from typing import Optional
+import asyncio
 import os
 
-from database import get_db
+from database import get_db, MedicalRecord, CfdiIssuer
+from encryption import EncryptionMigration, MedicalDataEncryption, get_encryption_service
+from services.analytics_rollups import RECONCILE_DAYS, reconcile_rollups
 from services.scheduler import check_and_send_reminders
 from logger import get_logger
 
@@ -15,6 +18,21 @@ logger = get_logger(__name__)
 # simpler for basic setup.
 INTERNAL_API_KEY = os.getenv("INTERNAL_API_KEY", "cortex-medical-internal-secret-2025")
 
+# Tables/columns holding ciphertext produced by EncryptionService.
+REENCRYPTION_TARGETS = [
+    (MedicalRecord, MedicalDataEncryption.CONSULTATION_ENCRYPTED_FIELDS),
+    (CfdiIssuer, ["csd_cer_encrypted", "csd_key_encrypted", "csd_password_encrypted"]),
+]
+
+
+def _verify_internal_key(x_internal_key: Optional[str]) -> None:
+    if x_internal_key != INTERNAL_API_KEY:
+        logger.warning("⚠️ Invalid internal key access attempt")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid internal key"
+        )
+
 @router.post("/trigger-reminders")
 async def trigger_reminders(
     x_internal_key: Optional[str] = Header(None, alias="X-Internal-Key"),
@@ -23,17 +41,11 @@ async def trigger_reminders(
     """
     Endpoint triggered by Cloud Scheduler to check and send WhatsApp reminders.
     """
-    # Verify the secret key
-    if x_internal_key != INTERNAL_API_KEY:
-        logger.warning("⚠️ Invalid internal key access attempt")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid internal key"
-        )
+    _verify_internal_key(x_internal_key)
     
     try:
-        # Run the logic synchronously
-        result = check_and_send_reminders(db)
+        # Off the event loop: the bulk WhatsApp send runs its own asyncio loop
+        result = await asyncio.to_thread(check_and_send_reminders, db)
         return result
     except Exception as e:
         logger.error(f"Error executing reminder triggers: {str(e)}", exc_info=True)
@@ -41,3 +53,90 @@ async def trigger_reminders(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
+
+
+@router.post("/reconcile-analytics-rollups")
+async def reconcile_analytics_rollups(
+    days: int = Query(RECONCILE_DAYS, ge=1, le=3660),
+    x_internal_key: Optional[str] = Header(None, alias="X-Internal-Key"),
+    db: Session = Depends(get_db)
+):
+    """
+    Nightly job (Cloud Scheduler) that rebuilds the daily analytics rollups
+    of the last `days` days from the base tables. Idempotent.
+    """
+    _verify_internal_key(x_internal_key)
+
+    try:
+        return await asyncio.to_thread(reconcile_rollups, db, days)
+    except Exception as e:
+        logger.error(f"Error reconciling analytics rollups: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@router.post("/reencrypt-legacy-ciphertext")
+async def reencrypt_legacy_ciphertext(
+    max_rows: int = Query(2000, ge=1, le=50000),
+    batch_size: int = Query(200, ge=1, le=2000),
+    table: Optional[str] = Query(None),
+    start_after_id: int = Query(0, ge=0),
+    x_internal_key: Optional[str] = Header(None, alias="X-Internal-Key"),
+    db: Session = Depends(get_db)
+):
+    """
+    Background job (Cloud Scheduler) that upgrades per-field-salt ciphertext
+    to the v2 key-id format. Each call scans at most `max_rows` rows so it
+    fits inside a request timeout, walking the tables in order by id.
+
+    Only legacy ciphertext is selected (v1 blobs and v2 blobs with another
+    key id); plaintext values are left alone. The response carries a
+    `next` cursor ({"table", "start_after_id"}); pass it back on the next
+    call to resume where this one stopped. `next` is null once every table
+    has been scanned to the end.
+    """
+    _verify_internal_key(x_internal_key)
+
+    tables = [model_class.__tablename__ for model_class, _ in REENCRYPTION_TARGETS]
+    if table is not None and table not in tables:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown table '{table}'. Expected one of: {', '.join(tables)}"
+        )
+    first = tables.index(table) if table is not None else 0
+
+    service = get_encryption_service()
+    results = {}
+    next_cursor = None
+    budget = max_rows
+    try:
+        for model_class, fields in REENCRYPTION_TARGETS[first:]:
+            name = model_class.__tablename__
+            stats = EncryptionMigration.reencrypt_legacy_values(
+                db,
+                model_class,
+                fields,
+                service,
+                batch_size=batch_size,
+                max_rows=budget,
+                start_after_id=start_after_id if name == tables[first] else 0,
+            )
+            results[name] = stats
+            budget -= stats["scanned"]
+            if not stats["done"]:
+                next_cursor = {"table": name, "start_after_id": stats["last_id"]}
+                break
+            if budget <= 0:
+                following = tables.index(name) + 1
+                if following < len(tables):
+                    next_cursor = {"table": tables[following], "start_after_id": 0}
+                break
+        return {"key_id": service.key_id, "tables": results, "next": next_cursor}
+    except Exception as e:
+        logger.error(f"Error re-encrypting legacy ciphertext: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
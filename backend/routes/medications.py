@@ -3,7 +3,7 @@ Medication management endpoints
 Migrated from main_clean_english.py to improve code organization
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import List, Optional
@@ -11,6 +11,8 @@ from typing import List, Optional
 from database import get_db, Person, Medication
 from dependencies import get_current_user
 from logger import get_logger
+from services.catalog_cache import PRIVATE_CACHE_CONTROL, catalog_cache, catalog_response
+from services.catalog_search import search_index
 import schemas
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
@@ -18,8 +20,22 @@ router = APIRouter(prefix="/api", tags=["medications"])
 api_logger = get_logger("medical_records.api")
 
 
+def _medication_rows(db: Session, doctor_id: int):
+    medications = (
+        db.query(Medication)
+        .filter(or_(Medication.created_by == 0, Medication.created_by == doctor_id))
+        .order_by(Medication.created_by.desc(), Medication.name.asc())
+        .all()
+    )
+    return [
+        schemas.MedicationResponse.model_validate(medication).model_dump(mode="json")
+        for medication in medications
+    ]
+
+
 @router.get("/medications", response_model=List[schemas.MedicationResponse])
 async def get_medications(
+    request: Request,
     search: Optional[str] = Query(default=None, description="Filtro por nombre"),
     db: Session = Depends(get_db),
     current_user: Person = Depends(get_current_user)
@@ -31,25 +47,29 @@ async def get_medications(
     )
 
     try:
-        # Show system medications (created_by=0) OR doctor's own medications (created_by=doctor_id)
-        query = db.query(Medication).filter(
-            or_(
-                Medication.created_by == 0,
-                Medication.created_by == current_user.id
-            )
+        # System medications (created_by=0) and the doctor's own, cached per doctor
+        entry = catalog_cache.get(
+            "medications",
+            lambda: _medication_rows(db, current_user.id),
+            scope=current_user.id,
         )
-
         if search:
-            search_pattern = f"%{search.strip()}%"
-            query = query.filter(Medication.name.ilike(search_pattern))
-
-        medications = query.order_by(Medication.created_by.desc(), Medication.name.asc()).all()
+            response = catalog_response(
+                request,
+                entry,
+                # Ranked typeahead: name prefix first, then word prefix, substring, fuzzy
+                select=lambda rows: [row for row, _ in search_index(entry).search(search, limit=len(rows))],
+                variant={"search": search.strip()},
+                cache_control=PRIVATE_CACHE_CONTROL,
+            )
+        else:
+            response = catalog_response(request, entry, cache_control=PRIVATE_CACHE_CONTROL)
 
         api_logger.info(
             "✅ Medicamentos obtenidos",
-            extra={"doctor_id": current_user.id, "count": len(medications)}
+            extra={"doctor_id": current_user.id, "status": response.status_code}
         )
-        return medications
+        return response
 
     except Exception as exc:
         api_logger.error(
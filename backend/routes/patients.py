@@ -3,15 +3,16 @@ Patient management endpoints
 Refactored to use PatientService for better code health
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 from database import get_db, Person
 from dependencies import get_current_user
 from logger import get_logger
 from services.patient_service import PatientService
 from audit_service import audit_service
+from utils.pagination import NEXT_CURSOR_HEADER, next_cursor, validate_cursor
 import schemas
 
 api_logger = get_logger("medical_records.api")
@@ -21,13 +22,19 @@ router = APIRouter(prefix="/api", tags=["patients"])
 @router.get("/patients")
 async def get_patients(
     request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: Person = Depends(get_current_user),
     skip: int = Query(0),
-    limit: int = Query(100)
+    limit: int = Query(100),
+    cursor: Optional[str] = Query(None)
 ) -> List[Dict[str, Any]]:
     """Get list of patients created by the current doctor with decrypted sensitive data"""
-    result = PatientService.get_patients(db, current_user.id, skip, limit)
+    validate_cursor(cursor)
+    result = PatientService.get_patients(db, current_user.id, skip, limit, cursor)
+    next_page = next_cursor(result, limit, lambda p: (None, p["id"]))
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
     # NOM-004 / LFPDPPP: bulk PHI read must be audited.
     try:
         audit_service.log_patient_list_access(
@@ -35,7 +42,7 @@ async def get_patients(
             user=current_user,
             request=request,
             result_count=len(result) if result else 0,
-            filters={"skip": skip, "limit": limit},
+            filters={"skip": skip, "limit": limit, "cursor": bool(cursor)},
         )
     except Exception as audit_err:
         api_logger.warning("Failed to audit patient list access: %s", audit_err)
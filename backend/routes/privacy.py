@@ -4,6 +4,7 @@ Migrated from main_clean_english.py to improve code organization
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from pydantic import BaseModel
@@ -13,9 +14,8 @@ import uuid
 import os
 
 from database import (
-    get_db, Person, PrivacyNotice, PrivacyConsent, ARCORequest,
-    MedicalRecord, ClinicalStudy, ConsultationPrescription,
-    ConsultationVitalSign, PersonDocument,
+    get_db, SessionLocal, Person, PrivacyNotice, PrivacyConsent, ARCORequest,
+    MedicalRecord, PersonDocument,
     LegalDocument,
 )
 from utils.datetime_utils import utc_now
@@ -23,14 +23,17 @@ from dependencies import get_current_user
 from logger import get_logger
 from audit_service import audit_service
 from services.arco_export_service import (
-    ARCOExportBundle,
-    build_zip as arco_build_zip,
-    serialize_clinical_study,
-    serialize_consultation,
+    count_patient_records,
+    iter_patient_sections,
     serialize_patient,
-    serialize_prescription,
-    serialize_privacy_consent,
-    serialize_vital_sign,
+    stream_zip as arco_stream_zip,
+)
+from services.export_jobs import (
+    KIND_ARCO_EXPORT,
+    ExportArtifact,
+    enqueue_export,
+    export_handler,
+    serialize_export_job,
 )
 from services.privacy_template import (
     MissingDoctorLegalDataError,
@@ -1013,29 +1016,8 @@ async def update_arco_request(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def _decrypt_safe(ciphertext: str) -> str:
-    """Lazy import so the export endpoint doesn't pull the whole consultation
-    service on module load (which in turn pulls encryption keys)."""
-    from services.consultation_service import decrypt_sensitive_data
-    return decrypt_sensitive_data(ciphertext)
-
-
-@router.post("/privacy/arco/export/{patient_id}")
-async def export_patient_arco(
-    patient_id: int,
-    request: Request,
-    db: Session = Depends(get_db),
-    current_user: Person = Depends(get_current_user),
-):
-    """Export all PHI for a patient as a ZIP (LFPDPPP Art. 15 — derecho de acceso).
-
-    Authorization: the calling doctor must own the patient (`created_by`) or
-    have at least one consultation with them. Admins bypass ownership. Every
-    export is logged at CRITICAL severity in the audit trail.
-    """
-    from fastapi.responses import Response
-
-    # Fetch patient
+def _arco_export_patient(db: Session, patient_id: int, current_user: Person) -> Person:
+    """Patient to export, or HTTPException if the caller may not export it."""
     patient = db.query(Person).filter(
         Person.id == patient_id,
         Person.person_type == 'patient',
@@ -1054,74 +1036,145 @@ async def export_patient_arco(
             raise HTTPException(status_code=403, detail="No tiene acceso a este paciente")
     elif current_user.person_type not in ('doctor', 'admin'):
         raise HTTPException(status_code=403, detail="Solo doctores o administradores pueden ejecutar exportaciones ARCO")
+    return patient
 
-    # Gather PHI
+
+def _arco_profile(db: Session, patient: Person) -> dict:
     documents = db.query(PersonDocument).filter(
-        PersonDocument.person_id == patient_id,
+        PersonDocument.person_id == patient.id,
         PersonDocument.is_active.is_(True),
     ).all()
-    consultations = db.query(MedicalRecord).filter(
-        MedicalRecord.patient_id == patient_id,
-    ).order_by(MedicalRecord.consultation_date.asc()).all()
-    consultation_ids = [c.id for c in consultations]
-    prescriptions = []
-    clinical_studies = []
-    vital_signs = []
-    if consultation_ids:
-        prescriptions = db.query(ConsultationPrescription).filter(
-            ConsultationPrescription.consultation_id.in_(consultation_ids),
-        ).all()
-        clinical_studies = db.query(ClinicalStudy).filter(
-            ClinicalStudy.consultation_id.in_(consultation_ids),
-        ).all()
-        vital_signs = db.query(ConsultationVitalSign).filter(
-            ConsultationVitalSign.consultation_id.in_(consultation_ids),
-        ).all()
-    # Studies can exist without a consultation (patient-level) — include those too.
-    orphan_studies = db.query(ClinicalStudy).filter(
-        ClinicalStudy.patient_id == patient_id,
-        ClinicalStudy.consultation_id.is_(None),
-    ).all()
-    consents = db.query(PrivacyConsent).filter(
-        PrivacyConsent.patient_id == patient_id,
-    ).order_by(PrivacyConsent.consent_date.asc()).all()
-
-    bundle = ARCOExportBundle(
-        patient=serialize_patient(patient, documents),
-        consultations=[serialize_consultation(c, decrypt_fn=_decrypt_safe) for c in consultations],
-        prescriptions=[serialize_prescription(rx) for rx in prescriptions],
-        clinical_studies=[serialize_clinical_study(s) for s in (clinical_studies + orphan_studies)],
-        vital_signs=[serialize_vital_sign(vs) for vs in vital_signs],
-        privacy_consents=[serialize_privacy_consent(c) for c in consents],
-        generated_by_doctor_id=current_user.id,
-    )
-    payload = arco_build_zip(bundle)
+    return serialize_patient(patient, documents)
+
 
-    # CRITICAL audit — bulk PHI export is the highest-sensitivity operation.
+def _audit_arco_export(db: Session, current_user: Person, patient: Person, request: Request) -> None:
+    """CRITICAL audit — bulk PHI export is the highest-sensitivity operation.
+
+    Written before any PHI is produced, with counts from one COUNT query;
+    if it fails the export does not happen.
+    """
     try:
         audit_service.log_arco_export(
             db=db,
             user=current_user,
-            patient_id=patient_id,
+            patient_id=patient.id,
             patient_name=patient.name,
             request=request,
-            counts=bundle.counts(),
+            counts=count_patient_records(db, patient.id),
         )
     except Exception as audit_err:
         api_logger.error(
             "CRITICAL: failed to audit ARCO export — aborting to preserve traceability",
-            extra={"patient_id": patient_id, "doctor_id": current_user.id, "error": str(audit_err)},
+            extra={"patient_id": patient.id, "doctor_id": current_user.id, "error": str(audit_err)},
         )
         raise HTTPException(
             status_code=500,
             detail="No fue posible registrar la exportación en la bitácora de auditoría. Intenta nuevamente.",
         )
 
-    filename = f"arco-export-patient-{patient_id}-{datetime.utcnow().strftime('%Y%m%d-%H%M%SZ')}.zip"
-    return Response(
-        content=payload,
+
+def _arco_filename(patient_id: int) -> str:
+    return f"arco-export-patient-{patient_id}-{datetime.utcnow().strftime('%Y%m%d-%H%M%SZ')}.zip"
+
+
+@router.post("/privacy/arco/export/{patient_id}")
+async def export_patient_arco(
+    patient_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Person = Depends(get_current_user),
+):
+    """Export all PHI for a patient as a ZIP (LFPDPPP Art. 15 — derecho de acceso).
+
+    Authorization: the calling doctor must own the patient (`created_by`) or
+    have at least one consultation with them. Admins bypass ownership. Every
+    export is logged at CRITICAL severity in the audit trail.
+
+    The archive is streamed: memory use does not grow with the patient's
+    history (see services.arco_export_service.stream_zip). For very large
+    histories use the background variant (POST .../jobs).
+    """
+    # Lazy import so the module doesn't pull encryption keys on load.
+    from encryption import get_encryption_service
+
+    patient = _arco_export_patient(db, patient_id, current_user)
+    profile = _arco_profile(db, patient)
+    _audit_arco_export(db, current_user, patient, request)
+
+    encryption_service = get_encryption_service()
+    doctor_id = current_user.id
+
+    def archive_chunks():
+        # The body is sent after this handler returns, so the PHI is read
+        # through a dedicated session that lives as long as the stream.
+        export_db = SessionLocal()
+        try:
+            yield from arco_stream_zip(
+                profile,
+                iter_patient_sections(export_db, patient_id, encryption_service),
+                generated_by_doctor_id=doctor_id,
+            )
+        finally:
+            export_db.close()
+
+    return StreamingResponse(
+        archive_chunks(),
         media_type="application/zip",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        headers={"Content-Disposition": f'attachment; filename="{_arco_filename(patient_id)}"'},
+    )
+
+
+@router.post("/privacy/arco/export/{patient_id}/jobs", status_code=202)
+async def enqueue_patient_arco_export(
+    patient_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: Person = Depends(get_current_user),
+):
+    """Queue the ARCO export ZIP as a background job; poll GET /api/exports/{id}.
+
+    Same authorization and CRITICAL audit as the synchronous export.
+    """
+    patient = _arco_export_patient(db, patient_id, current_user)
+    _audit_arco_export(db, current_user, patient, request)
+
+    job = enqueue_export(db, KIND_ARCO_EXPORT, current_user.id, {"patient_id": patient_id})
+    db.commit()
+    return serialize_export_job(job)
+
+
+@export_handler(KIND_ARCO_EXPORT)
+def _build_arco_export(db: Session, job, progress) -> ExportArtifact:
+    from encryption import get_encryption_service
+
+    patient_id = job.params["patient_id"]
+    patient = db.query(Person).filter(Person.id == patient_id).first()
+    if patient is None:
+        raise LookupError(f"Paciente {patient_id} no encontrado")
+
+    total = max(sum(count_patient_records(db, patient_id).values()), 1)
+    written = 0
+
+    def tracked(sections):
+        for name, records in sections:
+            yield name, counted(records)
+
+    def counted(records):
+        nonlocal written
+        for record in records:
+            yield record
+            written += 1
+            progress(written * 100 // total)
+
+    sections = iter_patient_sections(db, patient_id, get_encryption_service())
+    return ExportArtifact(
+        filename=_arco_filename(patient_id),
+        content_type="application/zip",
+        chunks=arco_stream_zip(
+            _arco_profile(db, patient),
+            tracked(sections),
+            generated_by_doctor_id=job.requested_by,
+        ),
     )
 
 
@@ -13,6 +13,15 @@ import json
 from database import get_db, Person, Appointment, Office
 from dependencies import get_current_user
 from logger import get_logger
+from services.appointments.availability import (
+    MAX_RANGE_DAYS,
+    day_slots,
+    default_office_id,
+    free_slots,
+    free_slots_by_day,
+    load_bookings,
+    load_week_template,
+)
 import pytz
 
 api_logger = get_logger("medical_records.api")
@@ -488,133 +497,21 @@ async def get_available_times(
         if not resolved_office_id:
             return {"available_times": []}
 
-        # Parse the date and get day of week (0=Monday, 6=Sunday)
         target_date = datetime.strptime(date, "%Y-%m-%d").date()
-        day_of_week = target_date.weekday()  # 0=Monday, 6=Sunday
-
-        # Get schedule template for this day scoped to the target office
-        schedule_result = db.execute(
-            text("""
-                SELECT start_time, end_time, time_blocks
-                FROM schedule_templates
-                WHERE doctor_id = :doctor_id
-                  AND office_id = :office_id
-                  AND day_of_week = :day_of_week
-                  AND is_active = true
-            """),
-            {"doctor_id": doctor_id, "office_id": resolved_office_id, "day_of_week": day_of_week}
-        ).fetchone()
-        if not schedule_result:
-            api_logger.info("No schedule found for this day", doctor_id=doctor_id, day_of_week=day_of_week)
-            return {"available_times": []}
-        
-        # Parse time_blocks from JSONB or fallback to start_time/end_time
-        time_blocks = []
-        api_logger.debug("Schedule result", doctor_id=current_user.id, date=date)
-        
-        if schedule_result[2]:  # time_blocks column
-            if isinstance(schedule_result[2], list):
-                time_blocks = schedule_result[2]
-                api_logger.debug(
-                    "Using time blocks from list",
-                    doctor_id=current_user.id,
-                    blocks=len(time_blocks)
-                )
-            elif isinstance(schedule_result[2], str):
-                time_blocks = json.loads(schedule_result[2])
-                api_logger.debug("Using time_blocks from JSON string", doctor_id=current_user.id)
-        
-        # Fallback: if no time_blocks, create from start_time/end_time
-        if not time_blocks and schedule_result[0] and schedule_result[1]:
-            time_blocks = [{
-                "start_time": schedule_result[0].strftime("%H:%M"),
-                "end_time": schedule_result[1].strftime("%H:%M")
-            }]
-            api_logger.debug("Using fallback time_blocks", doctor_id=current_user.id)
-        
-        api_logger.debug("Final time_blocks", doctor_id=current_user.id, count=len(time_blocks) if time_blocks else 0)
-        
-        # Get doctor's appointment duration (from persons table)
-        doctor_result = db.execute(
-            text("SELECT appointment_duration FROM persons WHERE id = :id"),
-            {"id": doctor_id}
-        ).fetchone()
-        consultation_duration = doctor_result[0] if doctor_result and doctor_result[0] else 30
-        
-        if not time_blocks:
-            api_logger.info("No time blocks configured for this day", doctor_id=doctor_id, day_of_week=day_of_week)
-            return {"available_times": []}
-        
-        # Get doctor's timezone from the target office
-        timezone_result = db.execute(
-            text("""
-                SELECT timezone FROM offices
-                WHERE id = :office_id
-            """),
-            {"office_id": resolved_office_id}
-        ).fetchone()
-        doctor_timezone = timezone_result[0] if timezone_result and timezone_result[0] else 'America/Mexico_City'
+        consultation_duration = current_user.appointment_duration or 30
+
+        # Template blocks of the target office minus its active appointments
+        slots = free_slots(db, doctor_id, resolved_office_id, target_date, consultation_duration)
+        available_times = [
+            {
+                "time": slot.start.strftime('%H:%M'),
+                "display": slot.start.strftime('%H:%M'),
+                "duration_minutes": consultation_duration,
+                "available": True
+            }
+            for slot in slots
+        ]
 
-        # Get existing appointments in the same office for this date
-        existing_appointments = db.execute(
-            text("""
-                SELECT appointment_date, end_time
-                FROM appointments
-                WHERE doctor_id = :doctor_id
-                  AND office_id = :office_id
-                  AND DATE(appointment_date) = :date
-                  AND status IN ('confirmada', 'por_confirmar')
-            """),
-            {"doctor_id": doctor_id, "office_id": resolved_office_id, "date": date}
-        ).fetchall()
-        
-        # Convert existing appointments to time ranges
-        # Since appointments are stored in CDMX timezone (without tzinfo),
-        # we can use them directly
-        booked_slots = []
-        for apt_date, apt_end in existing_appointments:
-            booked_slots.append({
-                'start': apt_date.time(),
-                'end': apt_end.time()
-            })
-        
-        # Generate available time slots based on schedule
-        available_times = []
-        
-        for block in time_blocks:
-            if not block.get('start_time') or not block.get('end_time'):
-                continue
-                
-            start_time = datetime.strptime(block['start_time'], '%H:%M').time()
-            end_time = datetime.strptime(block['end_time'], '%H:%M').time()
-            
-            # Generate 30-minute slots within this time block
-            current_time = start_time
-            while current_time < end_time:
-                # Calculate end of this slot using timedelta
-                current_datetime = datetime.combine(target_date, current_time)
-                slot_end_datetime = current_datetime + timedelta(minutes=consultation_duration)
-                slot_end = slot_end_datetime.time()
-                
-                # Check if this slot conflicts with existing appointments
-                is_available = True
-                for booked in booked_slots:
-                    # Check for overlap
-                    if (current_time < booked['end'] and slot_end > booked['start']):
-                        is_available = False
-                        break
-                
-                if is_available:
-                    available_times.append({
-                        "time": current_time.strftime('%H:%M'),
-                        "display": current_time.strftime('%H:%M'),
-                        "duration_minutes": consultation_duration,
-                        "available": True
-                    })
-                
-                # Move to next slot (30 minutes)
-                current_time = (datetime.combine(target_date, current_time) + timedelta(minutes=consultation_duration)).time()
-        
         preview_slots = [
             {"time": slot["time"], "duration": slot["duration_minutes"]}
             for slot in available_times[:5]
@@ -640,6 +537,68 @@ async def get_available_times(
         raise HTTPException(status_code=500, detail=f"Error getting available times: {str(e)}")
 
 
+@router.get("/schedule/availability")
+async def get_availability_range(
+    start_date: Optional[str] = Query(None, description="First day in YYYY-MM-DD format (default: today)"),
+    days: int = Query(14, ge=1, le=MAX_RANGE_DAYS, description="Number of days to return"),
+    office_id: Optional[int] = Query(None, description="Office whose schedule defines availability"),
+    db: Session = Depends(get_db),
+    current_user: Person = Depends(get_current_user)
+):
+    """Available times for every working day of a range (one appointment query for the whole range)"""
+    try:
+        first_day = datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else now_cdmx().date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    last_day = first_day + timedelta(days=days - 1)
+
+    try:
+        doctor_id = current_user.id
+        resolved_office_id = _resolve_target_office_id(db, doctor_id, office_id)
+        consultation_duration = current_user.appointment_duration or 30
+
+        by_day = free_slots_by_day(
+            db, doctor_id, resolved_office_id, first_day, last_day, consultation_duration
+        )
+        days_payload = [
+            {
+                "date": day.isoformat(),
+                "available_times": [
+                    {
+                        "time": slot.start.strftime('%H:%M'),
+                        "display": slot.start.strftime('%H:%M'),
+                        "datetime": slot.start.isoformat(),
+                        "duration_minutes": consultation_duration,
+                        "available": True
+                    }
+                    for slot in slots
+                ]
+            }
+            for day, slots in by_day.items()
+        ]
+
+        api_logger.info(
+            "Generated availability range",
+            doctor_id=doctor_id,
+            start_date=first_day.isoformat(),
+            days=days,
+            working_days=len(days_payload)
+        )
+        return {
+            "start_date": first_day.isoformat(),
+            "end_date": last_day.isoformat(),
+            "office_id": resolved_office_id,
+            "slot_duration_minutes": consultation_duration,
+            "days": days_payload
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        api_logger.error("Error getting availability range", doctor_id=current_user.id, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Error getting availability: {str(e)}")
+
+
 @router.get("/doctor/schedule")
 async def get_doctor_schedule(
     db: Session = Depends(get_db),
@@ -717,37 +676,26 @@ async def get_doctor_availability(
         # Parse the date
         target_date = datetime.strptime(date, "%Y-%m-%d").date()
         day_of_week = target_date.weekday()  # 0=Monday, 6=Sunday
-        
-        # Get existing appointments for this date
-        existing_appointments = db.query(Appointment).filter(
-            Appointment.doctor_id == current_user.id,
-            func.date(Appointment.appointment_date) == target_date,
-            Appointment.status.in_(['confirmada', 'por_confirmar'])
-        ).all()
-        
-        # Generate time slots based on doctor's schedule
-        # For now, assume 9 AM to 5 PM with 30-minute slots
-        time_slots = []
-        start_time = datetime.combine(target_date, time(9, 0))
-        end_time = datetime.combine(target_date, time(17, 0))
-        
-        current_time = start_time
-        while current_time < end_time:
-            # Check if this slot is available
-            slot_occupied = any(
-                apt.appointment_date <= current_time < apt.end_time
-                for apt in existing_appointments
-            )
-            
-            time_slots.append({
-                "time": current_time.strftime("%H:%M"),
-                "datetime": current_time.isoformat(),
-                "available": not slot_occupied,
-                "duration": 30
-            })
-            
-            current_time += timedelta(minutes=30)
-        
+        duration = current_user.appointment_duration or 30
+
+        # Slots follow the template of the doctor's default office; any
+        # appointment of the doctor (whatever the office) occupies its range
+        office_id = default_office_id(db, current_user.id)
+        week = load_week_template(db, current_user.id, office_id) if office_id else {}
+        bookings = load_bookings(db, current_user.id, target_date, target_date)
+        existing_appointments = bookings.get(target_date, [])
+        blocks = week.get(day_of_week, [])
+
+        time_slots = [
+            {
+                "time": slot.start.strftime("%H:%M"),
+                "datetime": slot.start.isoformat(),
+                "available": slot.available,
+                "duration": duration
+            }
+            for slot in day_slots(target_date, blocks, existing_appointments, duration)
+        ]
+
         availability_data = {
             "doctor_id": current_user.id,
             "doctor_name": current_user.name or "Doctor",
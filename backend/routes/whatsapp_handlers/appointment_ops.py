@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session, joinedload
 from datetime import timedelta
 from database import Appointment, Person, AppointmentReminder
 from utils.datetime_utils import utc_now
+from services.calendar_sync_outbox import OPERATION_DELETE, enqueue_calendar_sync
 from logger import get_logger
 from whatsapp_service import get_whatsapp_service
 from .phone_utils import find_patient_by_phone
@@ -153,21 +154,13 @@ async def cancel_appointment_via_whatsapp(appointment_id: Optional[int], patient
         appointment.cancelled_reason = 'Cancelada por el paciente vía WhatsApp'
         appointment.updated_at = utc_now()
         
+        # Sincronizar con Google Calendar (outbox en la misma transacción; lo aplica el worker)
+        if doctor_id:
+            enqueue_calendar_sync(db, appointment_id, doctor_id, OPERATION_DELETE)
+        
         db.commit()
         db.refresh(appointment)
         
-        # Sincronizar con Google Calendar si está configurado
-        if doctor_id:
-            try:
-                from services.google_calendar_service import GoogleCalendarService
-                GoogleCalendarService.delete_calendar_event(db, doctor_id, appointment_id)
-            except Exception as e:
-                # No fallar si Google Calendar no está configurado o hay error
-                api_logger.warning("Error al sincronizar eliminación con Google Calendar (no crítico)", exc_info=True, extra={
-                    "doctor_id": doctor_id,
-                    "appointment_id": appointment_id
-                })
-        
         # Track WhatsApp cancellation in Amplitude
         try:
             from services.amplitude_service import AmplitudeService
@@ -428,6 +421,10 @@ async def process_text_cancellation_request(text: str, patient_phone: str, db: S
         next_appointment.cancelled_by = matching_patient.id
         next_appointment.updated_at = utc_now()
         
+        # Google Calendar sync goes through the outbox, committed with the cancellation
+        if doctor_id:
+            enqueue_calendar_sync(db, next_appointment.id, doctor_id, OPERATION_DELETE)
+        
         try:
             db.commit()
             db.refresh(next_appointment)
@@ -436,13 +433,6 @@ async def process_text_cancellation_request(text: str, patient_phone: str, db: S
             db.rollback()
             raise commit_error
         
-        if doctor_id:
-            try:
-                from services.google_calendar_service import GoogleCalendarService
-                GoogleCalendarService.delete_calendar_event(db, doctor_id, next_appointment.id)
-            except Exception as google_error:
-                api_logger.warning("⚠️ Error syncing cancellation with Google Calendar", exc_info=True)
-        
         api_logger.info("✅ Cancellation successful via text", extra={"appointment_id": next_appointment.id})
         
     except Exception as e:
@@ -4,41 +4,34 @@ Phone number matching utilities for WhatsApp integration
 from typing import Optional, List
 from sqlalchemy.orm import Session
 from database import Person
-from whatsapp_service import get_whatsapp_service
 from logger import get_logger
+from utils.phone_utils import normalize_phone_e164
 
 api_logger = get_logger("medical_records.api")
 
 def find_patient_by_phone(phone: str, db: Session, patients: Optional[List[Person]] = None) -> Optional[Person]:
     """
-    Find a patient by phone number with normalization and alternative formats
+    Find a patient by phone number.
+
+    Both sides are compared in canonical E.164 form (521/52 Mexican mobile
+    variants fold together), so the lookup is one probe on the indexed
+    `Person.phone_e164` column. When `patients` is given, matching happens
+    in memory over that list instead.
     """
-    whatsapp = get_whatsapp_service()
-    normalized_from_phone = whatsapp._format_phone_number(phone)
-    
-    # If patients list not provided, query all patients
-    if patients is None:
-        patients = db.query(Person).filter(
-            Person.person_type == 'patient',
-            Person.primary_phone.isnot(None)
-        ).all()
-    
-    for candidate in patients:
-        normalized_candidate_phone = whatsapp._format_phone_number(candidate.primary_phone)
-        
-        # Direct match
-        if normalized_candidate_phone == normalized_from_phone:
-            return candidate
-        
-        # Alternative format with 521 vs 52
-        alternate_candidate_phone = normalized_candidate_phone.replace("521", "52") if normalized_candidate_phone.startswith("521") else normalized_candidate_phone
-        alternate_from_phone = normalized_from_phone.replace("521", "52") if normalized_from_phone.startswith("521") else normalized_from_phone
-        
-        if (normalized_candidate_phone == alternate_from_phone or
-            alternate_candidate_phone == normalized_from_phone):
-            return candidate
-    
-    return None
+    phone_key = normalize_phone_e164(phone)
+    if not phone_key:
+        return None
+
+    if patients is not None:
+        return next(
+            (candidate for candidate in patients if normalize_phone_e164(candidate.primary_phone) == phone_key),
+            None,
+        )
+
+    return db.query(Person).filter(
+        Person.person_type == 'patient',
+        Person.phone_e164 == phone_key
+    ).order_by(Person.id).first()
 
 def mask_phone(phone: Optional[str]) -> str:
     """Return a masked version of the phone number for logging."""
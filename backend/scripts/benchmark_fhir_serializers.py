@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark for FHIR resource serialization (services/fhir_service.py).
+
+Builds an in-memory $everything-style Bundle — one patient, N encounters
+(10k by default) and their practitioners — twice: through the pydantic
+models in interoperability.py (`model_dump(exclude_none=True)`, the strict
+path) and through the plain-dict serializers, then reports resources per
+second for each and checks that both produce the same JSON.
+
+No database is needed: rows are plain objects with the ORM attributes the
+serializers read, so only serialization is measured.
+
+Usage:
+    python scripts/benchmark_fhir_serializers.py --encounters 10000 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+# Add backend to path
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+
+from services import fhir_service  # noqa: E402
+from services.fhir_service import (  # noqa: E402
+    build_everything_bundle,
+    serialize_encounter,
+    serialize_patient,
+    serialize_practitioner,
+)
+
+PRACTITIONERS = 25
+
+
+def make_rows(encounters: int):
+    patient = SimpleNamespace(
+        id="1", name="María López García", curp="LOGM900101MDFPRR01", email="maria@example.com",
+        phone="5512345678", address="Av. Reforma 1", city="CDMX", state="", postal_code="06600",
+        gender="femenino", birth_date=date(1990, 1, 1),
+    )
+    doctors = [
+        SimpleNamespace(
+            id=str(d), is_active=True, curp=f"GARC850315HDFXYZ{d:02d}", rfc=None,
+            professional_license=f"{1000000 + d}", name=f"Carlos García {d}", full_name=f"Dr. Carlos García {d}",
+            title="Dr.", birth_date=None, email=f"doc{d}@example.com", phone=None,
+            office_address="Insurgentes 100", office_city="CDMX", office_state="CDMX",
+            office_postal_code="03100", specialty="Cardiología" if d % 2 else None,
+        )
+        for d in range(2, 2 + PRACTITIONERS)
+    ]
+    start = datetime(2020, 1, 1, 9, 0)
+    consultations = [
+        SimpleNamespace(
+            id=i, patient_id=1, doctor_id=2 + i % PRACTITIONERS,
+            consultation_date=start + timedelta(hours=6 * i), chief_complaint="Control de hipertensión",
+        )
+        for i in range(1, encounters + 1)
+    ]
+    return patient, doctors, consultations
+
+
+def build_bundle(patient, doctors, consultations):
+    return build_everything_bundle(
+        serialize_patient(patient),
+        [serialize_encounter(c) for c in consultations],
+        [serialize_practitioner(d) for d in doctors],
+    )
+
+
+def measure(strict: bool, rows, repeat: int):
+    fhir_service.STRICT_VALIDATION = strict
+    timings = []
+    bundle = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        bundle = build_bundle(*rows)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--encounters", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.encounters)
+    resources = 1 + args.encounters + PRACTITIONERS
+
+    strict_seconds, strict_bundle = measure(True, rows, args.repeat)
+    fast_seconds, fast_bundle = measure(False, rows, args.repeat)
+
+    identical = json.dumps(strict_bundle, ensure_ascii=False) == json.dumps(fast_bundle, ensure_ascii=False)
+
+    print(f"Bundle: {resources:,} resources ({args.encounters:,} encounters), median of {args.repeat} runs")
+    print(f"  pydantic models : {strict_seconds * 1000:9.1f} ms  {resources / strict_seconds:12,.0f} resources/s")
+    print(f"  plain dicts     : {fast_seconds * 1000:9.1f} ms  {resources / fast_seconds:12,.0f} resources/s")
+    print(f"  speedup         : {strict_seconds / fast_seconds:9.1f}x")
+    print(f"  identical JSON  : {'yes' if identical else 'NO'}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Nightly reconciliation of the daily analytics rollups.
+
+The rollups (models/analytics.py) are kept current by the after_flush hook,
+which only sees writes that go through an ORM Session. This job rebuilds a
+window of days for every doctor with activity in it, one doctor per
+transaction, so anything written with raw SQL or query-level bulk updates
+converges by the next morning. Triggered by Cloud Scheduler through
+POST /api/internal/reconcile-analytics-rollups.
+"""
+import os
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, union
+from sqlalchemy.orm import Session
+
+from database import Appointment, ClinicalStudy, MedicalRecord, Person
+from logger import get_logger
+from models.analytics import ROLLUP_TABLES, refresh_rollups
+from services.consultation_service import now_cdmx
+
+api_logger = get_logger("medical_records.api")
+
+# 12-month dashboards plus a margin; future appointments count in
+# "this week" / "this month", so the window also looks ahead.
+RECONCILE_DAYS = int(os.getenv("ANALYTICS_ROLLUP_RECONCILE_DAYS", "400"))
+RECONCILE_AHEAD_DAYS = int(os.getenv("ANALYTICS_ROLLUP_RECONCILE_AHEAD_DAYS", "366"))
+
+
+def _active_doctor_ids(db: Session, first_day: date, last_day: date) -> List[int]:
+    """Doctors with base rows or rollup rows in the window (stale rows must be cleared too)."""
+    end = last_day + timedelta(days=1)
+    sources = [
+        select(Appointment.doctor_id).where(
+            Appointment.appointment_date >= first_day, Appointment.appointment_date < end
+        ),
+        select(MedicalRecord.doctor_id).where(
+            MedicalRecord.consultation_date >= first_day, MedicalRecord.consultation_date < end
+        ),
+        select(ClinicalStudy.doctor_id).where(
+            ClinicalStudy.ordered_date >= first_day, ClinicalStudy.ordered_date < end
+        ),
+        select(Person.created_by).where(
+            Person.person_type == 'patient',
+            Person.created_by.isnot(None),
+            Person.created_at >= first_day,
+            Person.created_at < end,
+        ),
+    ]
+    sources += [
+        select(model.doctor_id).where(model.day >= first_day, model.day <= last_day)
+        for model in ROLLUP_TABLES
+    ]
+    return sorted(row[0] for row in db.execute(union(*sources)))
+
+
+def reconcile_rollups(
+    db: Session,
+    days: int = RECONCILE_DAYS,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """Rebuild the rollups of the last `days` days (plus the look-ahead) for all doctors."""
+    today = today or now_cdmx().date()
+    first_day = today - timedelta(days=days)
+    last_day = today + timedelta(days=RECONCILE_AHEAD_DAYS)
+
+    doctor_ids = _active_doctor_ids(db, first_day, last_day)
+    failed = []
+    for doctor_id in doctor_ids:
+        try:
+            refresh_rollups(db.connection(), doctor_id, first_day, last_day)
+            db.commit()
+        except Exception:
+            db.rollback()
+            failed.append(doctor_id)
+            api_logger.error(
+                "❌ Analytics rollup reconcile failed",
+                exc_info=True,
+                extra={"doctor_id": doctor_id},
+            )
+
+    api_logger.info("📊 Analytics rollups reconciled", extra={
+        "doctors": len(doctor_ids),
+        "failed": len(failed),
+        "first_day": first_day.isoformat(),
+        "last_day": last_day.isoformat(),
+    })
+    return {
+        "doctors": len(doctor_ids),
+        "failed": failed,
+        "first_day": first_day.isoformat(),
+        "last_day": last_day.isoformat(),
+    }
@@ -3,14 +3,15 @@ Analytics Service - Métricas y estadísticas para dashboard ejecutivo
 Proporciona agregaciones de datos relevantes para médicos
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, case, extract
+from sqlalchemy import func, and_, select, union
 from datetime import datetime, date, timedelta
 from typing import Dict, Any, Optional, List
 import pytz
 
 from database import (
-    Person, MedicalRecord, Appointment
+    Person, MedicalRecord, Appointment, AppointmentDailyRollup, PracticeDailyRollup
 )
+from models.analytics import TYPE_FOLLOW_UP, TYPE_NEW_PATIENT
 
 # Timezone CDMX
 CDMX_TZ = pytz.timezone('America/Mexico_City')
@@ -47,105 +48,199 @@ class AnalyticsService:
         if not date_from:
             date_from = date_to - timedelta(days=180)  # 6 months
         
+        # Three round trips in total: patients (distinct counts, live) and
+        # one grouped read each of the consultation and appointment rollups
+        consultation_rows = AnalyticsService._consultation_pass(db, doctor_id, date_from, date_to)
+        appointment_rows = AnalyticsService._appointment_pass(db, doctor_id, date_from, date_to)
+        
         return {
             "patients": AnalyticsService.get_patient_metrics(db, doctor_id),
             "consultations": AnalyticsService.get_consultation_metrics(
-                db, doctor_id, date_from, date_to
+                db, doctor_id, date_from, date_to, consultation_rows=consultation_rows
             ),
             "appointments": AnalyticsService.get_appointment_metrics(
-                db, doctor_id, date_from, date_to
+                db, doctor_id, date_from, date_to, appointment_rows=appointment_rows
             ),
             "occupation": AnalyticsService.get_occupation_metrics(
-                db, doctor_id, date_from, date_to
+                db, doctor_id, date_from, date_to, appointment_rows=appointment_rows
             ),
             "appointmentFlow": AnalyticsService.get_appointment_flow_sankey(
-                db, doctor_id, date_from, date_to
+                db, doctor_id, date_from, date_to, appointment_rows=appointment_rows
             ),
             "appointmentTrends": AnalyticsService.get_appointment_trends(
-                db, doctor_id, date_from, date_to
+                db, doctor_id, date_from, date_to,
+                appointment_rows=appointment_rows, consultation_rows=consultation_rows
             ),
             "appointmentTypeTrends": AnalyticsService.get_appointment_type_trends(
-                db, doctor_id, date_from, date_to
+                db, doctor_id, date_from, date_to, appointment_rows=appointment_rows
             )
         }
-    
+
     @staticmethod
     def get_patient_metrics(db: Session, doctor_id: int) -> Dict[str, int]:
-        """Get patient metrics: total, new this month, active"""
+        """Get patient metrics: total, new this month, active (one round trip)"""
         now = now_cdmx()
         first_day_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         six_months_ago = now - timedelta(days=180)
-        
+
         # Total patients (patients with appointments OR consultations with this doctor)
-        # Get distinct patient IDs from both sources and combine
-        appointment_patients = set(
-            row[0] for row in db.query(Appointment.patient_id).filter(
-                Appointment.doctor_id == doctor_id
-            ).distinct().all()
-        )
-        
-        consultation_patients = set(
-            row[0] for row in db.query(MedicalRecord.patient_id).filter(
-                MedicalRecord.doctor_id == doctor_id
-            ).distinct().all()
-        )
-        
-        total = len(appointment_patients.union(consultation_patients))
-        
+        patient_ids = union(
+            select(Appointment.patient_id).where(Appointment.doctor_id == doctor_id),
+            select(MedicalRecord.patient_id).where(MedicalRecord.doctor_id == doctor_id)
+        ).subquery()
+        total = select(func.count()).select_from(patient_ids).scalar_subquery()
+
         # New patients this month (patients with first appointment/consultation this month)
-        new_this_month = db.query(func.count(func.distinct(Person.id))).join(
+        new_this_month = select(func.count(func.distinct(Person.id))).join(
             Appointment,
             Appointment.patient_id == Person.id
-        ).filter(
+        ).where(
             Person.person_type == 'patient',
             Appointment.doctor_id == doctor_id,
             Appointment.appointment_date >= first_day_month
-        ).scalar() or 0
-        
+        ).scalar_subquery()
+
         # Active patients (with consultation in last 6 months)
-        active = db.query(func.count(func.distinct(MedicalRecord.patient_id))).filter(
+        active = select(func.count(func.distinct(MedicalRecord.patient_id))).where(
             MedicalRecord.doctor_id == doctor_id,
             MedicalRecord.consultation_date >= six_months_ago
-        ).scalar() or 0
-        
+        ).scalar_subquery()
+
+        row = db.query(total.label('total'), new_this_month.label('new'), active.label('active')).one()
+
         return {
-            "total": total,
-            "newThisMonth": new_this_month,
-            "active": active
+            "total": row.total or 0,
+            "newThisMonth": row.new or 0,
+            "active": row.active or 0
         }
+
+    # ------------------------------------------------------------------
+    # Grouped reads of the daily rollups, shared by the dashboard sections
+    # ------------------------------------------------------------------
+    
+    @staticmethod
+    def _consultation_pass(
+        db: Session,
+        doctor_id: int,
+        date_from: date,
+        date_to: date
+    ) -> List[Any]:
+        """
+        Per month, the doctor's consultations inside the period, this month and
+        last month, summed from the daily rollup (models/analytics.py).
+        """
+        today = now_cdmx().date()
+        first_day_month = today.replace(day=1)
+        first_day_last_month = (first_day_month - timedelta(days=1)).replace(day=1)
+        
+        day = PracticeDailyRollup.day
+        in_period = and_(day >= date_from, day <= date_to)
+        month_expr = func.date_trunc('month', day)
+        
+        return db.query(
+            month_expr.label('month'),
+            func.sum(PracticeDailyRollup.consultations).filter(in_period).label('in_period'),
+            func.sum(PracticeDailyRollup.consultations).filter(day >= first_day_month).label('this_month'),
+            func.sum(PracticeDailyRollup.consultations).filter(and_(
+                day >= first_day_last_month,
+                day < first_day_month
+            )).label('last_month')
+        ).filter(
+            PracticeDailyRollup.doctor_id == doctor_id,
+            day >= min(date_from, first_day_last_month)
+        ).group_by(month_expr).order_by(month_expr).all()
+    
+    @staticmethod
+    def _appointment_pass(
+        db: Session,
+        doctor_id: int,
+        date_from: date,
+        date_to: date
+    ) -> List[Any]:
+        """
+        The doctor's appointment rollup rows summed per (month, status).
+        Every appointment count on the dashboard (today, week, period, completed,
+        cancellations, new vs follow-up) is a SUM(...) FILTER column here; the
+        rollup already knows which appointments were completed (a consultation
+        within one hour) and who cancelled them.
+        """
+        today = now_cdmx().date()
+        week_start = today - timedelta(days=today.weekday())
+        first_day_month = today.replace(day=1)
+        
+        rollup = AppointmentDailyRollup
+        day = rollup.day
+        in_period = and_(day >= date_from, day <= date_to)
+        from_this_month = day >= first_day_month
+        month_expr = func.date_trunc('month', day)
+        
+        return db.query(
+            month_expr.label('month'),
+            rollup.status.label('status'),
+            func.sum(rollup.appointments).filter(in_period).label('in_period'),
+            func.sum(rollup.completed).filter(in_period).label('completed'),
+            func.sum(rollup.appointments).filter(day == today).label('today'),
+            func.sum(rollup.appointments).filter(day >= week_start).label('this_week'),
+            func.sum(rollup.appointments).filter(from_this_month).label('this_month'),
+            func.sum(rollup.completed).filter(from_this_month).label('completed_this_month'),
+            func.sum(rollup.cancelled_by_doctor).filter(in_period).label('cancelled_by_doctor'),
+            func.sum(rollup.cancelled_by_patient).filter(in_period).label('cancelled_by_patient'),
+            func.sum(rollup.appointments).filter(and_(in_period, rollup.type_bucket == TYPE_NEW_PATIENT)).label('new_patient'),
+            func.sum(rollup.appointments).filter(and_(in_period, rollup.type_bucket == TYPE_FOLLOW_UP)).label('follow_up')
+        ).filter(
+            rollup.doctor_id == doctor_id,
+            day >= min(date_from, week_start, first_day_month)
+        ).group_by(month_expr, rollup.status).all()
+    
+    @staticmethod
+    def _total(rows: List[Any], column: str, status: Optional[str] = None) -> int:
+        return sum(
+            getattr(row, column) or 0
+            for row in rows
+            if status is None or row.status == status
+        )
+    
+    @staticmethod
+    def _by_month(rows: List[Any], column: str, status: Optional[str] = None) -> Dict[str, int]:
+        result: Dict[str, int] = {}
+        for row in rows:
+            if row.month and (status is None or row.status == status):
+                month_key = row.month.strftime('%Y-%m')
+                result[month_key] = result.get(month_key, 0) + (getattr(row, column) or 0)
+        return result
+    
+    @staticmethod
+    def _month_keys(date_from: date, date_to: date) -> List[str]:
+        """Each YYYY-MM in the range (inclusive)"""
+        current = date(date_from.year, date_from.month, 1)
+        end = date(date_to.year, date_to.month, 1)
+        
+        keys = []
+        while current <= end:
+            keys.append(current.strftime('%Y-%m'))
+            # increment month
+            if current.month == 12:
+                current = date(current.year + 1, 1, 1)
+            else:
+                current = date(current.year, current.month + 1, 1)
+        return keys
     
     @staticmethod
     def get_consultation_metrics(
         db: Session, 
         doctor_id: int, 
         date_from: date, 
-        date_to: date
+        date_to: date,
+        consultation_rows: Optional[List[Any]] = None
     ) -> Dict[str, Any]:
         """Get consultation metrics: total, this month, average per day, trend"""
+        if consultation_rows is None:
+            consultation_rows = AnalyticsService._consultation_pass(db, doctor_id, date_from, date_to)
         now = now_cdmx()
-        first_day_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        first_day_last_month = (first_day_month - timedelta(days=1)).replace(day=1)
-        last_day_last_month = first_day_month - timedelta(days=1)
         
-        # Total consultations
-        total = db.query(func.count(MedicalRecord.id)).filter(
-            MedicalRecord.doctor_id == doctor_id,
-            func.date(MedicalRecord.consultation_date) >= date_from,
-            func.date(MedicalRecord.consultation_date) <= date_to
-        ).scalar() or 0
-        
-        # This month
-        this_month = db.query(func.count(MedicalRecord.id)).filter(
-            MedicalRecord.doctor_id == doctor_id,
-            MedicalRecord.consultation_date >= first_day_month
-        ).scalar() or 0
-        
-        # Last month for trend
-        last_month = db.query(func.count(MedicalRecord.id)).filter(
-            MedicalRecord.doctor_id == doctor_id,
-            func.date(MedicalRecord.consultation_date) >= first_day_last_month.date(),
-            func.date(MedicalRecord.consultation_date) <= last_day_last_month.date()
-        ).scalar() or 0
+        total = AnalyticsService._total(consultation_rows, 'in_period')
+        this_month = AnalyticsService._total(consultation_rows, 'this_month')
+        last_month = AnalyticsService._total(consultation_rows, 'last_month')
         
         # Calculate trend
         trend = 0
@@ -159,28 +254,13 @@ class AnalyticsService:
         average_per_day = this_month / days_in_month if days_in_month > 0 else 0
         
         # By month for chart
-        by_month = db.query(
-            extract('year', MedicalRecord.consultation_date).label('year'),
-            extract('month', MedicalRecord.consultation_date).label('month'),
-            func.count(MedicalRecord.id).label('count')
-        ).filter(
-            MedicalRecord.doctor_id == doctor_id,
-            func.date(MedicalRecord.consultation_date) >= date_from,
-            func.date(MedicalRecord.consultation_date) <= date_to
-        ).group_by(
-            extract('year', MedicalRecord.consultation_date),
-            extract('month', MedicalRecord.consultation_date)
-        ).order_by(
-            extract('year', MedicalRecord.consultation_date),
-            extract('month', MedicalRecord.consultation_date)
-        ).all()
-        
         by_month_list = [
             {
-                "month": f"{int(row.year)}-{int(row.month):02d}",
-                "count": row.count
+                "month": row.month.strftime('%Y-%m'),
+                "count": row.in_period
             }
-            for row in by_month
+            for row in consultation_rows
+            if row.month and row.in_period
         ]
         
         return {
@@ -196,90 +276,33 @@ class AnalyticsService:
         db: Session, 
         doctor_id: int, 
         date_from: date, 
-        date_to: date
+        date_to: date,
+        appointment_rows: Optional[List[Any]] = None
     ) -> Dict[str, Any]:
         """Get appointment metrics: today, this week, completed, cancelled, no-show, attendance rate"""
-        now = now_cdmx()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + timedelta(days=1)
-        week_start = today_start - timedelta(days=now.weekday())
-        
-        # Today
-        today = db.query(func.count(Appointment.id)).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.appointment_date >= today_start,
-            Appointment.appointment_date < today_end
-        ).scalar() or 0
-        
-        # This week
-        this_week = db.query(func.count(Appointment.id)).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.appointment_date >= week_start
-        ).scalar() or 0
-        
-        # Completed (has medical_record)
-        completed = db.query(func.count(func.distinct(Appointment.id))).join(
-            MedicalRecord,
-            and_(
-                MedicalRecord.patient_id == Appointment.patient_id,
-                MedicalRecord.doctor_id == Appointment.doctor_id,
-                func.abs(
-                    extract('epoch', MedicalRecord.consultation_date - Appointment.appointment_date)
-                ) < 3600  # Within 1 hour
-            )
-        ).filter(
-            Appointment.doctor_id == doctor_id,
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).scalar() or 0
-        
-        # Cancelled
-        cancelled = db.query(func.count(Appointment.id)).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.status == 'cancelled',
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).scalar() or 0
-        
-        pending = db.query(func.count(Appointment.id)).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.status == 'por_confirmar',
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).scalar() or 0
-        
-        # Total in period for attendance rate
-        total_in_period = db.query(func.count(Appointment.id)).filter(
-            Appointment.doctor_id == doctor_id,
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).scalar() or 0
+        if appointment_rows is None:
+            appointment_rows = AnalyticsService._appointment_pass(db, doctor_id, date_from, date_to)
+        total = AnalyticsService._total
         
+        completed = total(appointment_rows, 'completed')
+        total_in_period = total(appointment_rows, 'in_period')
         attendance_rate = (completed / total_in_period * 100) if total_in_period > 0 else 0
         
         # By status
-        by_status = db.query(
-            Appointment.status,
-            func.count(Appointment.id).label('count')
-        ).filter(
-            Appointment.doctor_id == doctor_id,
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).group_by(Appointment.status).all()
-        
-        by_status_list = [
-            {"status": row.status or "unknown", "count": row.count}
-            for row in by_status
-        ]
+        by_status: Dict[str, int] = {}
+        for row in appointment_rows:
+            if row.in_period:
+                key = row.status or "unknown"
+                by_status[key] = by_status.get(key, 0) + row.in_period
         
         return {
-            "today": today,
-            "thisWeek": this_week,
+            "today": total(appointment_rows, 'today'),
+            "thisWeek": total(appointment_rows, 'this_week'),
             "completed": completed,
-            "cancelled": cancelled,
-            "pending": pending,
+            "cancelled": total(appointment_rows, 'in_period', status='cancelled'),
+            "pending": total(appointment_rows, 'in_period', status='por_confirmar'),
             "attendanceRate": round(attendance_rate, 2),
-            "byStatus": by_status_list
+            "byStatus": [{"status": status, "count": count} for status, count in by_status.items()]
         }
     
     @staticmethod
@@ -287,36 +310,22 @@ class AnalyticsService:
         db: Session, 
         doctor_id: int, 
         date_from: date, 
-        date_to: date
+        date_to: date,
+        appointment_rows: Optional[List[Any]] = None
     ) -> Dict[str, Any]:
         """Get occupation metrics: hours worked, appointments completed, occupancy rate"""
-        now = now_cdmx()
-        first_day_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if appointment_rows is None:
+            appointment_rows = AnalyticsService._appointment_pass(db, doctor_id, date_from, date_to)
         
         # Appointments completed this month (with medical_record)
-        appointments_completed = db.query(func.count(func.distinct(Appointment.id))).join(
-            MedicalRecord,
-            and_(
-                MedicalRecord.patient_id == Appointment.patient_id,
-                MedicalRecord.doctor_id == Appointment.doctor_id,
-                func.abs(
-                    extract('epoch', MedicalRecord.consultation_date - Appointment.appointment_date)
-                ) < 3600
-            )
-        ).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.appointment_date >= first_day_month
-        ).scalar() or 0
+        appointments_completed = AnalyticsService._total(appointment_rows, 'completed_this_month')
         
         # Calculate hours worked (sum of appointment durations)
         # Assuming average 30 minutes per appointment
         hours_worked = (appointments_completed * 0.5)
         
         # Occupancy rate (completed / total scheduled this month)
-        total_scheduled_month = db.query(func.count(Appointment.id)).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.appointment_date >= first_day_month
-        ).scalar() or 0
+        total_scheduled_month = AnalyticsService._total(appointment_rows, 'this_month')
         
         occupancy_rate = (appointments_completed / total_scheduled_month * 100) if total_scheduled_month > 0 else 0
         
@@ -331,20 +340,19 @@ class AnalyticsService:
         db: Session, 
         doctor_id: int, 
         date_from: date, 
-        date_to: date
+        date_to: date,
+        appointment_rows: Optional[List[Any]] = None
     ) -> Dict[str, Any]:
         """
         Get appointment flow data for Sankey diagram
         Shows flow from scheduled appointments to final outcomes
         """
-        now = now_cdmx()
+        if appointment_rows is None:
+            appointment_rows = AnalyticsService._appointment_pass(db, doctor_id, date_from, date_to)
+        total = AnalyticsService._total
         
         # Total scheduled in period
-        total_scheduled = db.query(func.count(Appointment.id)).filter(
-            Appointment.doctor_id == doctor_id,
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).scalar() or 0
+        total_scheduled = total(appointment_rows, 'in_period')
         
         if total_scheduled == 0:
             return {
@@ -366,50 +374,16 @@ class AnalyticsService:
             }
         
         # Confirmed appointments (status='confirmada')
-        confirmed_appointments = db.query(func.count(Appointment.id)).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.status == 'confirmada',
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).scalar() or 0
+        confirmed_appointments = total(appointment_rows, 'in_period', status='confirmada')
         
         # Completed consultations (has medical_record within 1 hour of appointment)
-        completed_consultations = db.query(func.count(func.distinct(Appointment.id))).join(
-            MedicalRecord,
-            and_(
-                MedicalRecord.patient_id == Appointment.patient_id,
-                MedicalRecord.doctor_id == Appointment.doctor_id,
-                func.abs(
-                    extract('epoch', MedicalRecord.consultation_date - Appointment.appointment_date)
-                ) < 3600
-            )
-        ).filter(
-            Appointment.doctor_id == doctor_id,
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).scalar() or 0
+        completed_consultations = total(appointment_rows, 'completed')
         
         # Cancelled by doctor (status='cancelled' and cancelled_by = doctor_id)
-        cancelled_by_doctor = db.query(func.count(Appointment.id)).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.status == 'cancelled',
-            Appointment.cancelled_by == doctor_id,
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).scalar() or 0
+        cancelled_by_doctor = total(appointment_rows, 'cancelled_by_doctor', status='cancelled')
         
         # Cancelled by patient (status='cancelled' and cancelled_by != doctor_id or is patient_id)
-        cancelled_by_patient = db.query(func.count(Appointment.id)).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.status == 'cancelled',
-            or_(
-                Appointment.cancelled_by != doctor_id,
-                Appointment.cancelled_by == Appointment.patient_id
-            ),
-            Appointment.cancelled_by.isnot(None),
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).scalar() or 0
+        cancelled_by_patient = total(appointment_rows, 'cancelled_by_patient', status='cancelled')
         
         # Calculate percentages based on total scheduled
         percentages = {
@@ -505,78 +479,33 @@ class AnalyticsService:
         db: Session,
         doctor_id: int,
         date_from: date,
-        date_to: date
+        date_to: date,
+        appointment_rows: Optional[List[Any]] = None,
+        consultation_rows: Optional[List[Any]] = None
     ) -> Dict[str, Any]:
         """Get monthly trends for scheduled, cancelled by patient, and consultations"""
+        if appointment_rows is None:
+            appointment_rows = AnalyticsService._appointment_pass(db, doctor_id, date_from, date_to)
+        if consultation_rows is None:
+            consultation_rows = AnalyticsService._consultation_pass(db, doctor_id, date_from, date_to)
 
-        month_expr = func.date_trunc('month', Appointment.appointment_date)
-
-        scheduled_rows = db.query(
-            month_expr.label('month'),
-            func.count(Appointment.id).label('count')
-        ).filter(
-            Appointment.doctor_id == doctor_id,
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).group_by(month_expr).all()
-
-        cancelled_rows = db.query(
-            month_expr.label('month'),
-            func.count(Appointment.id).label('count')
-        ).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.status == 'cancelled',
-            Appointment.cancelled_by.isnot(None),
-            or_(
-                Appointment.cancelled_by == Appointment.patient_id,
-                Appointment.cancelled_by != doctor_id
-            ),
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).group_by(month_expr).all()
-
-        consultation_month_expr = func.date_trunc('month', MedicalRecord.consultation_date)
-
-        consultation_rows = db.query(
-            consultation_month_expr.label('month'),
-            func.count(MedicalRecord.id).label('count')
-        ).filter(
-            MedicalRecord.doctor_id == doctor_id,
-            func.date(MedicalRecord.consultation_date) >= date_from,
-            func.date(MedicalRecord.consultation_date) <= date_to
-        ).group_by(consultation_month_expr).all()
-
-        def rows_to_map(rows):
-            result = {}
-            for row in rows:
-                month_key = row.month.strftime('%Y-%m') if row.month else None
-                if month_key:
-                    result[month_key] = row.count
-            return result
-
-        scheduled_map = rows_to_map(scheduled_rows)
-        cancelled_map = rows_to_map(cancelled_rows)
-        consultations_map = rows_to_map(consultation_rows)
-
-        # Iterate through each month in the range
-        current = date(date_from.year, date_from.month, 1)
-        end = date(date_to.year, date_to.month, 1)
+        scheduled_map = AnalyticsService._by_month(appointment_rows, 'in_period')
+        cancelled_map = AnalyticsService._by_month(appointment_rows, 'cancelled_by_patient', status='cancelled')
+        consultations_map = {
+            row.month.strftime('%Y-%m'): row.in_period
+            for row in consultation_rows
+            if row.month
+        }
 
-        data = []
-        while current <= end:
-            month_key = current.strftime('%Y-%m')
-            data.append({
+        data = [
+            {
                 "month": month_key,
                 "scheduled": scheduled_map.get(month_key, 0),
                 "cancelledByPatient": cancelled_map.get(month_key, 0),
                 "consultations": consultations_map.get(month_key, 0)
-            })
-
-            # increment month
-            if current.month == 12:
-                current = date(current.year + 1, 1, 1)
-            else:
-                current = date(current.year, current.month + 1, 1)
+            }
+            for month_key in AnalyticsService._month_keys(date_from, date_to)
+        ]
 
         return {
             "data": data
@@ -587,59 +516,19 @@ class AnalyticsService:
         db: Session,
         doctor_id: int,
         date_from: date,
-        date_to: date
+        date_to: date,
+        appointment_rows: Optional[List[Any]] = None
     ) -> Dict[str, Any]:
         """Get monthly trends of appointment types (new patient vs follow-up)"""
+        if appointment_rows is None:
+            appointment_rows = AnalyticsService._appointment_pass(db, doctor_id, date_from, date_to)
 
-        month_expr = func.date_trunc('month', Appointment.appointment_date)
-
-        total_rows = db.query(
-            month_expr.label('month'),
-            func.count(Appointment.id).label('count')
-        ).filter(
-            Appointment.doctor_id == doctor_id,
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).group_by(month_expr).all()
-
-        new_rows = db.query(
-            month_expr.label('month'),
-            func.count(Appointment.id).label('count')
-        ).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.consultation_type.ilike('%primera%'),
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).group_by(month_expr).all()
-
-        follow_rows = db.query(
-            month_expr.label('month'),
-            func.count(Appointment.id).label('count')
-        ).filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.consultation_type.ilike('%seguimiento%'),
-            func.date(Appointment.appointment_date) >= date_from,
-            func.date(Appointment.appointment_date) <= date_to
-        ).group_by(month_expr).all()
-
-        def rows_to_map(rows):
-            result = {}
-            for row in rows:
-                if row.month:
-                    month_key = row.month.strftime('%Y-%m')
-                    result[month_key] = row.count
-            return result
-
-        total_map = rows_to_map(total_rows)
-        new_map = rows_to_map(new_rows)
-        follow_map = rows_to_map(follow_rows)
-
-        current = date(date_from.year, date_from.month, 1)
-        end = date(date_to.year, date_to.month, 1)
+        total_map = AnalyticsService._by_month(appointment_rows, 'in_period')
+        new_map = AnalyticsService._by_month(appointment_rows, 'new_patient')
+        follow_map = AnalyticsService._by_month(appointment_rows, 'follow_up')
 
         data = []
-        while current <= end:
-            month_key = current.strftime('%Y-%m')
+        for month_key in AnalyticsService._month_keys(date_from, date_to):
             total = total_map.get(month_key, 0)
             new_patients = new_map.get(month_key, 0)
             follow_up = follow_map.get(month_key, 0)
@@ -652,12 +541,6 @@ class AnalyticsService:
                 "other": other
             })
 
-            if current.month == 12:
-                current = date(current.year + 1, 1, 1)
-            else:
-                current = date(current.year, current.month + 1, 1)
-
         return {
             "data": data
         }
-
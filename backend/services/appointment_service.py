@@ -434,21 +434,11 @@ class AppointmentService:
         appointment.cancelled_at = utc_now()
         appointment.cancelled_reason = 'Cancelled by doctor'
         
-        db.commit()
+        # Remove from Google Calendar if exists (applied by the outbox worker)
+        from services.calendar_sync_outbox import OPERATION_DELETE, enqueue_calendar_sync
+        enqueue_calendar_sync(db, appointment_id, doctor_id, OPERATION_DELETE)
         
-        # Remove from Google Calendar if exists
-        try:
-            from services.google_calendar_service import GoogleCalendarService
-            GoogleCalendarService.delete_calendar_event(db, doctor_id, appointment_id)
-            api_logger.info(
-                "📅 Removed from Google Calendar",
-                extra={"appointment_id": appointment_id, "doctor_id": doctor_id}
-            )
-        except Exception as e:
-            api_logger.error(
-                "❌ Failed to remove event from Google Calendar", 
-                extra={"appointment_id": appointment_id, "error": str(e)}
-            )
+        db.commit()
         
         api_logger.info(
             "🗑️ Appointment cancelled",
@@ -530,8 +520,6 @@ class AppointmentService:
                 )
                 return False
             
-            appointment = reminder.appointment
-            
             # Mark as sent before sending (atomic operation to prevent duplicates)
             if reminder.sent:
                 api_logger.info(
@@ -546,48 +534,77 @@ class AppointmentService:
             reminder.sent_at = utc_now()
             db.commit()
             
-            # Build WhatsApp message
-            import pytz
-            from services.office_helpers import build_office_address, resolve_maps_url, resolve_country_code
+            return AppointmentService.deliver_reminder(db, reminder)
+                
+        except Exception as e:
+            db.rollback()
+            api_logger.error(
+                "❌ Exception sending reminder",
+                extra={"reminder_id": reminder_id, "error": str(e)},
+                exc_info=True
+            )
+            return False
+
+    @staticmethod
+    def reminder_message_kwargs(reminder: AppointmentReminder) -> Dict[str, Any]:
+        """
+        Arguments for WhatsAppService.send_appointment_reminder / build_appointment_reminder_payload.
+        Expects reminder.appointment with patient, doctor, office and type loaded.
+        """
+        appointment = reminder.appointment
+        
+        from services.office_helpers import build_office_address, resolve_maps_url, resolve_country_code
+        
+        mexico_tz = pytz.timezone('America/Mexico_City')
+        local_dt = mexico_tz.localize(appointment.appointment_date)
+        appointment_date = local_dt.strftime('%d de %B de %Y')
+        appointment_time = local_dt.strftime('%I:%M %p')
+        
+        # Determine appointment type
+        appointment_type = "presencial"
+        if appointment.appointment_type_rel:
+            appointment_type = "online" if appointment.appointment_type_rel.name == "En línea" else "presencial"
+        
+        if appointment.office and appointment.office.is_virtual and appointment.office.virtual_url:
+            appointment_type = "online"
+        
+        # Prepare office details
+        office_address_val = build_office_address(appointment.office) if appointment.office else "mi consultorio - No especificado"
+        maps_url_val = resolve_maps_url(appointment.office, office_address_val) if appointment.office else None
+        country_code_val = resolve_country_code(appointment.office) if appointment.office else '52'
+        
+        return dict(
+            patient_phone=appointment.patient.primary_phone if appointment.patient else None,
+            patient_full_name=appointment.patient.full_name if appointment.patient else "Paciente",
+            appointment_date=appointment_date,
+            appointment_time=appointment_time,
+            doctor_title=(appointment.doctor.title if appointment.doctor else "Dr."),
+            doctor_full_name=(appointment.doctor.full_name if appointment.doctor else "Médico"),
+            office_address=office_address_val,
+            country_code=country_code_val,
+            appointment_type=appointment_type,
+            maps_url=maps_url_val
+        )
+
+    @staticmethod
+    def deliver_reminder(db: Session, reminder: AppointmentReminder) -> bool:
+        """
+        Send an already-claimed reminder (sent=True committed by the caller).
+        Expects reminder.appointment with patient, doctor, office and type loaded.
+        On failure the sent flag is rolled back so a later tick retries it.
+        """
+        reminder_id = reminder.id
+        try:
             from whatsapp_service import get_whatsapp_service
             
-            mexico_tz = pytz.timezone('America/Mexico_City')
-            local_dt = mexico_tz.localize(appointment.appointment_date)
-            appointment_date = local_dt.strftime('%d de %B de %Y')
-            appointment_time = local_dt.strftime('%I:%M %p')
-            
-            # Determine appointment type
-            appointment_type = "presencial"
-            if appointment.appointment_type_rel:
-                appointment_type = "online" if appointment.appointment_type_rel.name == "En línea" else "presencial"
-            
-            if appointment.office and appointment.office.is_virtual and appointment.office.virtual_url:
-                appointment_type = "online"
-            
-            # Prepare office details
-            office_address_val = build_office_address(appointment.office) if appointment.office else "mi consultorio - No especificado"
-            maps_url_val = resolve_maps_url(appointment.office, office_address_val) if appointment.office else None
-            country_code_val = resolve_country_code(appointment.office) if appointment.office else '52'
-            
             service = get_whatsapp_service()
-            resp = service.send_appointment_reminder(
-                patient_phone=appointment.patient.primary_phone if appointment.patient else None,
-                patient_full_name=appointment.patient.full_name if appointment.patient else "Paciente",
-                appointment_date=appointment_date,
-                appointment_time=appointment_time,
-                doctor_title=(appointment.doctor.title if appointment.doctor else "Dr."),
-                doctor_full_name=(appointment.doctor.full_name if appointment.doctor else "Médico"),
-                office_address=office_address_val,
-                country_code=country_code_val,
-                appointment_type=appointment_type,
-                maps_url=maps_url_val
-            )
+            resp = service.send_appointment_reminder(**AppointmentService.reminder_message_kwargs(reminder))
             
             
             if resp and resp.get('success'):
                 api_logger.info(
                     "✅ Reminder sent successfully",
-                    extra={"reminder_id": reminder_id, "appointment_id": appointment.id}
+                    extra={"reminder_id": reminder_id, "appointment_id": reminder.appointment_id}
                 )
                 return True
             else:
@@ -609,3 +626,55 @@ class AppointmentService:
                 exc_info=True
             )
             return False
+
+    @staticmethod
+    def deliver_reminders(db: Session, reminders: List[AppointmentReminder]) -> Dict[int, bool]:
+        """
+        Bulk version of deliver_reminder for a batch of claimed reminders.
+        With the Meta provider all messages go out concurrently through
+        WhatsAppService.send_many (pooled connections, bounded parallelism,
+        retries); other providers fall back to one deliver_reminder per row.
+        Failed reminders get sent=False back in a single UPDATE.
+        Returns {reminder_id: delivered}.
+        """
+        if not reminders:
+            return {}
+        from whatsapp_service import get_whatsapp_service
+        
+        service = get_whatsapp_service()
+        if not hasattr(service, "send_many"):
+            return {r.id: AppointmentService.deliver_reminder(db, r) for r in reminders}
+        
+        outcome: Dict[int, bool] = {}
+        pending = []
+        for reminder in reminders:
+            try:
+                kwargs = AppointmentService.reminder_message_kwargs(reminder)
+                pending.append((reminder, kwargs, service.build_appointment_reminder_payload(**kwargs)))
+            except Exception as e:
+                api_logger.error(
+                    "❌ Exception building reminder",
+                    extra={"reminder_id": reminder.id, "error": str(e)},
+                    exc_info=True
+                )
+                outcome[reminder.id] = False
+        
+        results = service.send_many([payload for _, _, payload in pending]) if pending else []
+        for (reminder, kwargs, _), resp in zip(pending, results):
+            if not resp.get('success') and service._is_template_language_error(resp):
+                # Template/language misconfiguration: the single-send path tries the other variants
+                resp = service.send_appointment_reminder(**kwargs)
+            outcome[reminder.id] = bool(resp and resp.get('success'))
+            if not outcome[reminder.id]:
+                api_logger.warning(
+                    "⚠️ Reminder sending failed, rolled back",
+                    extra={"reminder_id": reminder.id, "response": resp}
+                )
+        
+        failed_ids = [reminder_id for reminder_id, ok in outcome.items() if not ok]
+        if failed_ids:
+            db.query(AppointmentReminder).filter(
+                AppointmentReminder.id.in_(failed_ids)
+            ).update({"sent": False, "sent_at": None}, synchronize_session=False)
+            db.commit()
+        return outcome
@@ -0,0 +1,225 @@
+"""
+Availability engine shared by every slot generator.
+
+Free slots are the doctor's schedule-template time blocks minus the booked
+intervals of the day. Bookings are loaded once for the whole date range,
+sorted by start, and swept with a single pointer per day while the slots
+are generated in order, so a day costs O(slots + bookings) instead of
+checking every slot against every appointment.
+"""
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import Appointment, Office
+
+# Appointments that occupy their time range
+BLOCKING_STATUSES = ('confirmada', 'por_confirmar')
+DEFAULT_SLOT_MINUTES = 30
+# Longest range a single availability request may cover
+MAX_RANGE_DAYS = 31
+
+
+class Booking(NamedTuple):
+    start: datetime
+    end: datetime
+    appointment_id: int
+
+
+class Slot(NamedTuple):
+    start: datetime
+    end: datetime
+    available: bool
+    appointment_id: Optional[int] = None
+
+
+def parse_time_blocks(raw_blocks, start_time: Optional[time], end_time: Optional[time]) -> List[Tuple[time, time]]:
+    """Template blocks as sorted, merged (start, end) pairs.
+
+    `time_blocks` is JSONB (list, or str for legacy rows); templates without
+    blocks fall back to their start_time / end_time.
+    """
+    if isinstance(raw_blocks, str):
+        raw_blocks = json.loads(raw_blocks)
+    blocks = []
+    for block in raw_blocks if isinstance(raw_blocks, list) else []:
+        start_str = block.get("start_time")
+        end_str = block.get("end_time")
+        if not start_str or not end_str:
+            continue
+        start = datetime.strptime(start_str, "%H:%M").time()
+        end = datetime.strptime(end_str, "%H:%M").time()
+        if start < end:
+            blocks.append((start, end))
+    if not blocks and start_time and end_time and start_time < end_time:
+        blocks = [(start_time, end_time)]
+
+    # Overlapping blocks would emit slots out of order and break the sweep
+    merged: List[Tuple[time, time]] = []
+    for start, end in sorted(blocks):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def default_office_id(db: Session, doctor_id: int) -> Optional[int]:
+    """Doctor's oldest active office, for callers that do not pass office_id."""
+    office = (
+        db.query(Office)
+        .filter(Office.doctor_id == doctor_id, Office.is_active == True)
+        .order_by(Office.created_at.asc(), Office.id.asc())
+        .first()
+    )
+    return office.id if office else None
+
+
+def load_week_template(db: Session, doctor_id: int, office_id: int) -> Dict[int, List[Tuple[time, time]]]:
+    """Active time blocks per weekday (0=Monday) for one office, in one query."""
+    rows = db.execute(
+        text(
+            """
+            SELECT day_of_week, start_time, end_time, time_blocks
+            FROM schedule_templates
+            WHERE doctor_id = :doctor_id
+              AND office_id = :office_id
+              AND is_active = TRUE
+            """
+        ),
+        {"doctor_id": doctor_id, "office_id": office_id},
+    ).fetchall()
+    week = {}
+    for day_of_week, start_time, end_time, raw_blocks in rows:
+        blocks = parse_time_blocks(raw_blocks, start_time, end_time)
+        if blocks:
+            week[day_of_week] = blocks
+    return week
+
+
+def load_bookings(
+    db: Session,
+    doctor_id: int,
+    first_day: date,
+    last_day: date,
+    office_id: Optional[int] = None,
+) -> Dict[date, List[Booking]]:
+    """Blocking appointments of the range grouped by day, each day sorted by start."""
+    query = db.query(Appointment.id, Appointment.appointment_date, Appointment.end_time).filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.appointment_date >= datetime.combine(first_day, time.min),
+        Appointment.appointment_date < datetime.combine(last_day + timedelta(days=1), time.min),
+        Appointment.status.in_(BLOCKING_STATUSES),
+    )
+    if office_id is not None:
+        query = query.filter(Appointment.office_id == office_id)
+
+    bookings: Dict[date, List[Booking]] = {}
+    for appointment_id, start, end in query.order_by(Appointment.appointment_date).all():
+        bookings.setdefault(start.date(), []).append(Booking(start, max(start, end), appointment_id))
+    return bookings
+
+
+def day_slots(
+    day: date,
+    blocks: List[Tuple[time, time]],
+    bookings: List[Booking],
+    slot_minutes: int,
+) -> List[Slot]:
+    """Slots of one day, each marked available unless it overlaps a booking.
+
+    `blocks` and `bookings` must be sorted by start (see parse_time_blocks /
+    load_bookings). Slots only move forward, so a booking that ended before
+    the current slot can never block a later one and the pointer skips it.
+    """
+    step = timedelta(minutes=slot_minutes)
+    slots = []
+    i = 0
+    for block_start, block_end in blocks:
+        cursor = datetime.combine(day, block_start)
+        block_end_dt = datetime.combine(day, block_end)
+        while cursor + step <= block_end_dt:
+            slot_end = cursor + step
+            while i < len(bookings) and bookings[i].end <= cursor:
+                i += 1
+            # Bookings are sorted by start: if the first one still running
+            # starts after this slot, no later one can overlap it either
+            if i < len(bookings) and bookings[i].start < slot_end:
+                slots.append(Slot(cursor, slot_end, False, bookings[i].appointment_id))
+            else:
+                slots.append(Slot(cursor, slot_end, True))
+            cursor = slot_end
+    return slots
+
+
+def get_availability(
+    db: Session,
+    doctor_id: int,
+    office_id: Optional[int],
+    first_day: date,
+    last_day: date,
+    slot_minutes: Optional[int] = None,
+    bookings_office_only: bool = True,
+) -> Dict[date, List[Slot]]:
+    """Slots per day from `first_day` to `last_day` (inclusive) for a doctor.
+
+    The office's weekly template defines the working blocks; days without
+    an active template are omitted. Two queries cover the whole range. With
+    `bookings_office_only` only appointments in the same office block a
+    slot, otherwise any appointment of the doctor does.
+    """
+    if office_id is None:
+        return {}
+    week = load_week_template(db, doctor_id, office_id)
+    if not week:
+        return {}
+
+    slot_minutes = slot_minutes or DEFAULT_SLOT_MINUTES
+    bookings = load_bookings(
+        db, doctor_id, first_day, last_day, office_id if bookings_office_only else None
+    )
+
+    availability = {}
+    day = first_day
+    while day <= last_day:
+        blocks = week.get(day.weekday())
+        if blocks:
+            availability[day] = day_slots(day, blocks, bookings.get(day, []), slot_minutes)
+        day += timedelta(days=1)
+    return availability
+
+
+def free_slots_by_day(
+    db: Session,
+    doctor_id: int,
+    office_id: Optional[int],
+    first_day: date,
+    last_day: date,
+    slot_minutes: Optional[int] = None,
+    bookings_office_only: bool = True,
+) -> Dict[date, List[Slot]]:
+    """Available slots per working day of the range (a fully booked day maps to [])."""
+    availability = get_availability(
+        db, doctor_id, office_id, first_day, last_day, slot_minutes, bookings_office_only
+    )
+    return {
+        day: [slot for slot in slots if slot.available]
+        for day, slots in availability.items()
+    }
+
+
+def free_slots(
+    db: Session,
+    doctor_id: int,
+    office_id: Optional[int],
+    target_date: date,
+    slot_minutes: Optional[int] = None,
+    bookings_office_only: bool = True,
+) -> List[Slot]:
+    """Available slots of a single day."""
+    return free_slots_by_day(
+        db, doctor_id, office_id, target_date, target_date, slot_minutes, bookings_office_only
+    ).get(target_date, [])
@@ -3,6 +3,8 @@ from sqlalchemy import asc, func
 from datetime import date, datetime, time, timedelta
 from typing import List, Optional, Dict
 from database import Appointment, Person
+from services.appointments import availability
+from utils.datetime_utils import now_cdmx
 
 def get_appointments(
     db: Session, 
@@ -62,78 +64,76 @@ def get_appointments_by_date(db: Session, target_date: date) -> List[Appointment
         func.date(Appointment.appointment_date) == target_date
     ).order_by(asc(Appointment.appointment_date)).all()
 
+def _patient_names(db: Session, slots) -> Dict[int, str]:
+    """Patient name per appointment blocking any of the slots (one query)."""
+    appointment_ids = {slot.appointment_id for slot in slots if slot.appointment_id}
+    if not appointment_ids:
+        return {}
+    appointments = db.query(Appointment).options(
+        joinedload(Appointment.patient)
+    ).filter(Appointment.id.in_(appointment_ids)).all()
+    return {
+        appointment.id: appointment.patient.full_name if appointment.patient else "Unknown"
+        for appointment in appointments
+    }
+
+def _slot_rows(slots, patient_names: Dict[int, str]) -> List[Dict]:
+    """Slot dicts in the shape callers of get_available_time_slots expect"""
+    return [
+        {
+            "time": slot.start.strftime("%H:%M"),
+            "datetime": slot.start,
+            "available": slot.available,
+            "appointment_id": slot.appointment_id,
+            "patient_name": patient_names.get(slot.appointment_id),
+        }
+        for slot in slots
+    ]
+
 def get_available_time_slots(
     db: Session, 
     target_date: date, 
     doctor_id: Optional[str] = None,
-    slot_duration: int = 30
+    slot_duration: int = 30,
+    office_id: Optional[int] = None,
 ) -> List[Dict]:
-    """Get available time slots for a specific date"""
-    # Default working hours: 8:00 AM to 6:00 PM
-    start_hour = 8
-    end_hour = 18
-    
-    # Generate all possible time slots
-    slots = []
-    current_time = datetime.combine(target_date, time(start_hour, 0))
-    end_time = datetime.combine(target_date, time(end_hour, 0))
-    
-    while current_time < end_time:
-        slots.append({
-            "time": current_time.strftime("%H:%M"),
-            "datetime": current_time,
-            "available": True,
-            "appointment_id": None,
-            "patient_name": None
-        })
-        current_time += timedelta(minutes=slot_duration)
-    
-    # Get existing appointments for the date
-    existing_appointments = get_appointments_by_date(db, target_date)
-    
-    # Mark occupied slots
-    for appointment in existing_appointments:
-        if appointment.status in ['cancelled']:
-            continue
-            
-        apt_start = appointment.appointment_date.time()
-        apt_end = appointment.end_time.time() if appointment.end_time else None
-        
-        for slot in slots:
-            slot_time = datetime.strptime(slot["time"], "%H:%M").time()
-            
-            # Check if slot overlaps with appointment
-            if apt_end:
-                if apt_start <= slot_time < apt_end:
-                    slot["available"] = False
-                    slot["appointment_id"] = appointment.id
-                    slot["patient_name"] = appointment.patient.full_name if appointment.patient else "Unknown"
-            else:
-                # If no end time, assume default duration
-                apt_end_calculated = (datetime.combine(target_date, apt_start) + 
-                                    timedelta(minutes=appointment.duration_minutes)).time()
-                if apt_start <= slot_time < apt_end_calculated:
-                    slot["available"] = False
-                    slot["appointment_id"] = appointment.id
-                    slot["patient_name"] = appointment.patient.full_name if appointment.patient else "Unknown"
-    
-    return slots
+    """Get the doctor's time slots for a specific date.
+
+    Slots come from the office's schedule template (the doctor's oldest
+    active office by default); any active appointment of the doctor marks
+    the slots it overlaps as unavailable.
+    """
+    if not doctor_id:
+        return []
+    doctor_id = int(doctor_id)
+    office_id = office_id or availability.default_office_id(db, doctor_id)
+    slots = availability.get_availability(
+        db, doctor_id, office_id, target_date, target_date, slot_duration,
+        bookings_office_only=False,
+    ).get(target_date, [])
+    return _slot_rows(slots, _patient_names(db, slots))
 
 def get_doctor_schedule(
     db: Session, 
     doctor_id: str, 
     start_date: date, 
-    end_date: date
+    end_date: date,
+    slot_duration: int = 30,
 ) -> Dict[str, List[Dict]]:
-    """Get doctor's schedule for a date range"""
+    """Get doctor's schedule for a date range (one query for the whole range)"""
+    doctor_id = int(doctor_id)
+    office_id = availability.default_office_id(db, doctor_id)
+    by_day = availability.get_availability(
+        db, doctor_id, office_id, start_date, end_date, slot_duration,
+        bookings_office_only=False,
+    )
+
+    patient_names = _patient_names(db, [slot for slots in by_day.values() for slot in slots])
+
     schedule = {}
     current_date = start_date
-    
     while current_date <= end_date:
-        date_str = current_date.isoformat()
-        schedule[date_str] = get_available_time_slots(
-            db, current_date, doctor_id
-        )
+        schedule[current_date.isoformat()] = _slot_rows(by_day.get(current_date, []), patient_names)
         current_date += timedelta(days=1)
     
     return schedule
@@ -153,8 +153,8 @@ def get_appointment_stats(db: Session, doctor_id: Optional[str] = None) -> Dict:
     cancelled = query.filter(Appointment.status == "cancelled").count()
     pending = query.filter(Appointment.status == "por_confirmar").count()
     
-    # Today's appointments
-    today = date.today()
+    # Today's appointments (CDMX calendar day, not the server's)
+    today = now_cdmx().date()
     today_appointments = query.filter(
         func.date(Appointment.appointment_date) == today
     ).count()
@@ -14,20 +14,42 @@ Design notes:
 - Format: ZIP with structured JSON files per entity plus `summary.md`. A FHIR
   Bundle variant is tracked as a follow-up; the JSON here is a superset so
   conversion later is mechanical.
-- Encryption: encrypted fields on MedicalRecord are decrypted via the same
-  helper the consultation service uses, so the export matches what the doctor
+- Streaming: the archive is produced by `stream_zip` as a sequence of byte
+  chunks. Rows are read in batches through server-side cursors
+  (`yield_per`), each JSON array is written one record per line, and the
+  ZIP uses data descriptors, so nothing needs to seek back. Peak memory is
+  one batch plus one compression buffer, whatever the patient's history.
+- Encryption: encrypted fields on MedicalRecord are decrypted in one batch
+  via `EncryptionService.decrypt_many`, so the export matches what the doctor
   would see in the UI. If decryption fails we include the ciphertext with a
   `_decrypt_failed: true` marker rather than silently dropping the field.
 """
 
 from __future__ import annotations
 
-import io
 import json
 import zipfile
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Optional
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Session, joinedload
+
+from database import ClinicalStudy, ConsultationPrescription, ConsultationVitalSign, MedicalRecord, PrivacyConsent
+
+# Exports above DECRYPT_PARALLEL_MIN_ROWS consultations fan out across threads.
+EXPORT_DECRYPT_WORKERS = 4
+
+# Rows fetched (and decrypted) per round trip while streaming an export.
+EXPORT_BATCH_SIZE = 500
+
+# Compressed bytes buffered before a chunk is handed to the response.
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# JSON files in the archive, in order, after profile.json.
+EXPORT_SECTIONS = ("consultations", "prescriptions", "clinical_studies", "vital_signs", "privacy_consents")
 
 
 # ---------------------------------------------------------------------------
@@ -120,20 +142,51 @@ def serialize_patient(
 def serialize_consultation(
     consultation: Any,
     decrypt_fn: Optional[Callable[[str], str]] = None,
+    decrypted: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
-    """Serialize a MedicalRecord row, decrypting PHI fields when possible."""
+    """Serialize a MedicalRecord row, decrypting PHI fields when possible.
+
+    `decrypted` holds values already produced by a batch decrypt
+    (see `serialize_consultations`) and takes precedence over `decrypt_fn`.
+    """
     out: Dict[str, Any] = {}
     for field_name in CONSULTATION_FIELDS:
         if not hasattr(consultation, field_name):
             continue
         value = getattr(consultation, field_name)
         if field_name in CONSULTATION_ENCRYPTED_FIELDS and isinstance(value, str):
-            out[field_name] = _maybe_decrypt(value, decrypt_fn)
+            if decrypted is not None and field_name in decrypted:
+                out[field_name] = decrypted[field_name]
+            else:
+                out[field_name] = _maybe_decrypt(value, decrypt_fn)
         else:
             out[field_name] = _json_safe(value)
     return out
 
 
+def _decrypt_failed_marker(field_name: str, ciphertext: str) -> Dict[str, Any]:
+    return {"_decrypt_failed": True, "ciphertext": ciphertext}
+
+
+def serialize_consultations(
+    consultations: Sequence[Any],
+    encryption_service: Any = None,
+) -> List[Dict[str, Any]]:
+    """Serialize a result set, decrypting every PHI column in one pass."""
+    if encryption_service is None:
+        return [serialize_consultation(c) for c in consultations]
+    decrypted_rows = encryption_service.decrypt_many(
+        consultations,
+        CONSULTATION_ENCRYPTED_FIELDS,
+        max_workers=EXPORT_DECRYPT_WORKERS,
+        on_error=_decrypt_failed_marker,
+    )
+    return [
+        serialize_consultation(c, decrypted=decrypted)
+        for c, decrypted in zip(consultations, decrypted_rows)
+    ]
+
+
 def serialize_prescription(rx: Any) -> Dict[str, Any]:
     return {
         "id": getattr(rx, "id", None),
@@ -221,9 +274,12 @@ class ARCOExportBundle:
         }
 
 
-def _summary_markdown(bundle: ARCOExportBundle) -> str:
-    patient = bundle.patient
-    counts = bundle.counts()
+def _summary_markdown(
+    patient: Dict[str, Any],
+    counts: Dict[str, int],
+    generated_at: datetime,
+    generated_by_doctor_id: Optional[int],
+) -> str:
     return (
         "# Exportación de datos personales (derecho ARCO)\n\n"
         "Este archivo se generó en respuesta a una solicitud de **acceso** "
@@ -232,8 +288,8 @@ def _summary_markdown(bundle: ARCOExportBundle) -> str:
         f"- **Titular:** {patient.get('name') or 'N/D'}\n"
         f"- **ID interno:** {patient.get('id')}\n"
         f"- **Código de persona:** {patient.get('person_code') or 'N/D'}\n"
-        f"- **Generado el:** {bundle.generated_at.isoformat()}Z\n"
-        f"- **Solicitud procesada por doctor ID:** {bundle.generated_by_doctor_id}\n\n"
+        f"- **Generado el:** {generated_at.isoformat()}Z\n"
+        f"- **Solicitud procesada por doctor ID:** {generated_by_doctor_id}\n\n"
         "## Contenido del paquete\n\n"
         "| Archivo | Registros |\n"
         "|---|---|\n"
@@ -251,15 +307,156 @@ def _summary_markdown(bundle: ARCOExportBundle) -> str:
     )
 
 
+class _ZipSink:
+    """Write-only file object collecting what ZipFile emits until it is drained.
+
+    It has no `tell`/`seek`, so ZipFile writes data descriptors after each
+    member instead of seeking back to patch the local headers.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.pending = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.pending += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.pending = 0
+        return data
+
+
+def stream_zip(
+    patient: Dict[str, Any],
+    sections: Iterable[Tuple[str, Iterable[Dict[str, Any]]]],
+    generated_by_doctor_id: Optional[int] = None,
+    generated_at: Optional[datetime] = None,
+) -> Iterator[bytes]:
+    """Yield the export ZIP in chunks of about STREAM_CHUNK_BYTES.
+
+    `sections` pairs each name in EXPORT_SECTIONS with an iterable of
+    serialized records; they are consumed lazily, one at a time. The counts
+    in `summary.md` are the records actually written.
+    """
+    generated_at = generated_at or datetime.utcnow()
+    sink = _ZipSink()
+    counts = {name: 0 for name in EXPORT_SECTIONS}
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("profile.json", json.dumps(patient, ensure_ascii=False, indent=2))
+        for name, records in sections:
+            # force_zip64: the size is unknown up front and may pass 2 GiB
+            with zf.open(f"{name}.json", mode="w", force_zip64=True) as member:
+                member.write(b"[")
+                for record in records:
+                    separator = b",\n" if counts[name] else b"\n"
+                    member.write(separator + json.dumps(record, ensure_ascii=False).encode("utf-8"))
+                    counts[name] += 1
+                    if sink.pending >= STREAM_CHUNK_BYTES:
+                        yield sink.drain()
+                member.write(b"\n]\n" if counts[name] else b"]\n")
+        zf.writestr("summary.md", _summary_markdown(patient, counts, generated_at, generated_by_doctor_id))
+    yield sink.drain()
+
+
 def build_zip(bundle: ARCOExportBundle) -> bytes:
-    """Serialize the bundle to an in-memory ZIP and return its bytes."""
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr("profile.json", json.dumps(bundle.patient, ensure_ascii=False, indent=2))
-        zf.writestr("consultations.json", json.dumps(bundle.consultations, ensure_ascii=False, indent=2))
-        zf.writestr("prescriptions.json", json.dumps(bundle.prescriptions, ensure_ascii=False, indent=2))
-        zf.writestr("clinical_studies.json", json.dumps(bundle.clinical_studies, ensure_ascii=False, indent=2))
-        zf.writestr("vital_signs.json", json.dumps(bundle.vital_signs, ensure_ascii=False, indent=2))
-        zf.writestr("privacy_consents.json", json.dumps(bundle.privacy_consents, ensure_ascii=False, indent=2))
-        zf.writestr("summary.md", _summary_markdown(bundle))
-    return buf.getvalue()
+    """Serialize an in-memory bundle to a ZIP and return its bytes."""
+    sections = [(name, getattr(bundle, name)) for name in EXPORT_SECTIONS]
+    return b"".join(stream_zip(bundle.patient, sections, bundle.generated_by_doctor_id, bundle.generated_at))
+
+
+# ---------------------------------------------------------------------------
+# Streaming queries.
+# ---------------------------------------------------------------------------
+
+def _consultation_ids(patient_id: int):
+    return select(MedicalRecord.id).where(MedicalRecord.patient_id == patient_id)
+
+
+def _clinical_study_filter(patient_id: int):
+    # Studies ordered in the patient's consultations, plus patient-level ones
+    return or_(
+        ClinicalStudy.consultation_id.in_(_consultation_ids(patient_id)),
+        and_(ClinicalStudy.patient_id == patient_id, ClinicalStudy.consultation_id.is_(None)),
+    )
+
+
+def count_patient_records(db: Session, patient_id: int) -> Dict[str, int]:
+    """Records per section for the audit trail, in one round trip."""
+
+    def count(model, criterion):
+        return select(func.count()).select_from(model).where(criterion).scalar_subquery()
+
+    consultation_ids = _consultation_ids(patient_id)
+    row = db.execute(select(
+        count(MedicalRecord, MedicalRecord.patient_id == patient_id).label("consultations"),
+        count(ConsultationPrescription, ConsultationPrescription.consultation_id.in_(consultation_ids)).label("prescriptions"),
+        count(ClinicalStudy, _clinical_study_filter(patient_id)).label("clinical_studies"),
+        count(ConsultationVitalSign, ConsultationVitalSign.consultation_id.in_(consultation_ids)).label("vital_signs"),
+        count(PrivacyConsent, PrivacyConsent.patient_id == patient_id).label("privacy_consents"),
+    )).one()
+    return {name: row._mapping[name] for name in EXPORT_SECTIONS}
+
+
+def _batches(rows: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def _stream_consultations(db: Session, patient_id: int, encryption_service: Any, batch_size: int):
+    query = db.query(MedicalRecord).filter(
+        MedicalRecord.patient_id == patient_id,
+    ).order_by(MedicalRecord.consultation_date.asc(), MedicalRecord.id.asc()).yield_per(batch_size)
+    for batch in _batches(query, batch_size):
+        yield from serialize_consultations(batch, encryption_service)
+
+
+def _stream(query, serializer: Callable[[Any], Dict[str, Any]], batch_size: int):
+    for row in query.yield_per(batch_size):
+        yield serializer(row)
+
+
+def iter_patient_sections(
+    db: Session,
+    patient_id: int,
+    encryption_service: Any = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[Tuple[str, Iterator[Dict[str, Any]]]]:
+    """(section, records) pairs for `stream_zip`; each query runs when its section is reached."""
+    consultation_ids = _consultation_ids(patient_id)
+    yield "consultations", _stream_consultations(db, patient_id, encryption_service, batch_size)
+    yield "prescriptions", _stream(
+        db.query(ConsultationPrescription)
+        .options(joinedload(ConsultationPrescription.medication))
+        .filter(ConsultationPrescription.consultation_id.in_(consultation_ids))
+        .order_by(ConsultationPrescription.id),
+        serialize_prescription,
+        batch_size,
+    )
+    yield "clinical_studies", _stream(
+        db.query(ClinicalStudy).filter(_clinical_study_filter(patient_id)).order_by(ClinicalStudy.id),
+        serialize_clinical_study,
+        batch_size,
+    )
+    yield "vital_signs", _stream(
+        db.query(ConsultationVitalSign)
+        .options(joinedload(ConsultationVitalSign.vital_sign))
+        .filter(ConsultationVitalSign.consultation_id.in_(consultation_ids))
+        .order_by(ConsultationVitalSign.id),
+        serialize_vital_sign,
+        batch_size,
+    )
+    yield "privacy_consents", _stream(
+        db.query(PrivacyConsent)
+        .filter(PrivacyConsent.patient_id == patient_id)
+        .order_by(PrivacyConsent.consent_date.asc(), PrivacyConsent.id.asc()),
+        serialize_privacy_consent,
+        batch_size,
+    )
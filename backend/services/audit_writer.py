@@ -0,0 +1,327 @@
+"""
+Batched background writer for audit_log (NOM-004 traceability).
+
+AuditService.log_action used to add + commit every entry on the request's
+session, so each PHI read paid an extra commit (and a failed caller
+transaction was rolled back before auditing). Routine entries now go through
+`AuditWriter`:
+
+- bounded in-memory queue; `submit` blocks for at most ENQUEUE_TIMEOUT_SECONDS
+  when it is full (back-pressure) and spools the entry to disk after that
+- a daemon thread drains the queue every AUDIT_FLUSH_INTERVAL_MS or
+  AUDIT_BATCH_SIZE entries, whichever comes first, and writes the batch with
+  one multi-row INSERT on its own session
+- batches that cannot reach the database are appended to a JSON-lines spool
+  file (AUDIT_SPOOL_DIR) and replayed once the database answers again, so no
+  entry is dropped; a spool line that cannot be decoded (e.g. cut short by a
+  crash mid-append) is moved to a `.bad` file instead of blocking the replay
+
+Security events keep the synchronous path in AuditService.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import AuditLog, Person, SessionLocal
+from logger import get_logger
+
+audit_logger = get_logger("cortex.audit")
+
+ENQUEUE_TIMEOUT_SECONDS = 0.05
+DB_RETRY_SECONDS = 5.0
+SPOOL_REPLAY_SECONDS = 30.0
+SPOOL_SUFFIX = ".jsonl"
+REPLAY_SUFFIX = ".replay"
+BAD_SUFFIX = ".bad"
+# A claimed spool file untouched for this long was left by a dead process
+ORPHAN_REPLAY_SECONDS = 300.0
+
+AuditRow = Dict[str, Any]
+
+
+def apply_identity_fallback(row: AuditRow) -> AuditRow:
+    """Entries without a resolvable actor are recorded as SYSTEM (never NULL)."""
+    for key, fallback in (("user_email", "SYSTEM"), ("user_name", "SYSTEM"), ("user_type", "system")):
+        value = row.get(key)
+        if value is None or (isinstance(value, str) and value.strip() == ""):
+            row[key] = fallback
+    return row
+
+
+def resolve_identities(db: Session, rows: List[AuditRow]) -> None:
+    """Fill missing actor email/name/type with one persons query for the whole batch."""
+    missing = {
+        row["user_id"] for row in rows
+        if row.get("user_id") and (not row.get("user_email") or not row.get("user_name"))
+    }
+    if missing:
+        people = {
+            person_id: (email, name, person_type)
+            for person_id, email, name, person_type in db.query(
+                Person.id, Person.email, Person.name, Person.person_type
+            ).filter(Person.id.in_(missing)).all()
+        }
+        for row in rows:
+            found = people.get(row.get("user_id"))
+            if found:
+                row["user_email"] = row.get("user_email") or found[0]
+                row["user_name"] = row.get("user_name") or found[1]
+                row["user_type"] = row.get("user_type") or found[2]
+    for row in rows:
+        apply_identity_fallback(row)
+
+
+def _encode_row(row: AuditRow) -> str:
+    encoded = dict(row)
+    if isinstance(encoded.get("timestamp"), datetime):
+        encoded["timestamp"] = encoded["timestamp"].isoformat()
+    return json.dumps(encoded, default=str, ensure_ascii=False)
+
+
+def _decode_row(line: str) -> AuditRow:
+    row = json.loads(line)
+    if row.get("timestamp"):
+        row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+    return row
+
+
+class AuditWriter:
+    """Bounded queue + flusher thread that batches audit_log inserts."""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        max_queue_size: int = settings.AUDIT_QUEUE_MAX_SIZE,
+        batch_size: int = settings.AUDIT_BATCH_SIZE,
+        flush_interval_ms: int = settings.AUDIT_FLUSH_INTERVAL_MS,
+        spool_dir: str = settings.AUDIT_SPOOL_DIR,
+    ):
+        self._session_factory = session_factory or SessionLocal
+        self._queue: "queue.Queue[AuditRow]" = queue.Queue(maxsize=max(1, max_queue_size))
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(1, flush_interval_ms) / 1000.0
+        self.spool_dir = spool_dir
+        self._spool_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._db_down_until = 0.0
+        self._next_replay = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        audit_logger.info("🧾 Audit writer started")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush what is queued and stop; anything still pending is spooled."""
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        leftover = self._drain_nowait(self._queue.qsize())
+        if leftover:
+            self.spool(leftover)
+        audit_logger.info("🛑 Audit writer stopped")
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+
+    def submit(self, row: AuditRow) -> None:
+        """Queue one entry; never raises and never drops it."""
+        try:
+            self._queue.put(row, timeout=ENQUEUE_TIMEOUT_SECONDS)
+        except queue.Full:
+            audit_logger.warning("⚠️ Audit queue full, spooling entry to disk")
+            self.spool([row])
+
+    # ------------------------------------------------------------------
+    # Flusher
+    # ------------------------------------------------------------------
+
+    def _run(self) -> None:
+        while not self._stop.is_set() or not self._queue.empty():
+            batch: List[AuditRow] = []
+            try:
+                batch = self._next_batch()
+                if batch:
+                    self.flush(batch)
+                    batch = []
+                self._maybe_replay_spool()
+            except Exception:
+                # Keep the thread alive: a dead flusher would silently push
+                # every later entry onto the synchronous path
+                audit_logger.exception("Audit writer loop failed, continuing")
+                if batch:
+                    self.spool(batch)
+
+    def _drain_nowait(self, limit: int) -> List[AuditRow]:
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _next_batch(self) -> List[AuditRow]:
+        """Wait for the first entry, then collect until batch_size or flush_interval."""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size and not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        batch.extend(self._drain_nowait(self.batch_size - len(batch)))
+        return batch
+
+    def flush(self, rows: List[AuditRow]) -> bool:
+        """Insert rows in one statement; spool them if the database is unavailable."""
+        if time.monotonic() < self._db_down_until:
+            self.spool(rows)
+            return False
+        db = self._session_factory()
+        try:
+            resolve_identities(db, rows)
+            db.execute(insert(AuditLog), rows)
+            db.commit()
+            return True
+        except Exception as e:
+            try:
+                db.rollback()
+            except Exception:
+                pass
+            self._db_down_until = time.monotonic() + DB_RETRY_SECONDS
+            audit_logger.error(f"Failed to write audit batch ({len(rows)} entries), spooling: {str(e)}")
+            self.spool(rows)
+            return False
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------------
+    # Disk spool
+    # ------------------------------------------------------------------
+
+    def _spool_path(self) -> str:
+        return os.path.join(self.spool_dir, f"audit-{os.getpid()}{SPOOL_SUFFIX}")
+
+    def spool(self, rows: List[AuditRow]) -> None:
+        with self._spool_lock:
+            try:
+                os.makedirs(self.spool_dir, exist_ok=True)
+                with open(self._spool_path(), "a", encoding="utf-8") as fh:
+                    for row in rows:
+                        fh.write(_encode_row(row) + "\n")
+                    fh.flush()
+                    os.fsync(fh.fileno())
+            except OSError as e:
+                # Last resort: keep the entries in the application log
+                audit_logger.error(f"Audit spool unavailable ({str(e)}); entries: {[_encode_row(r) for r in rows]}")
+
+    def _claim_spool_files(self) -> List[str]:
+        """
+        Rename spool files before replaying so concurrent writers never replay
+        twice. Claimed files left behind by a process that died mid-replay are
+        claimed again once they are ORPHAN_REPLAY_SECONDS old.
+        """
+        claimed = []
+        with self._spool_lock:
+            try:
+                names = sorted(os.listdir(self.spool_dir))
+            except OSError:
+                return []
+            orphaned_before = time.time() - ORPHAN_REPLAY_SECONDS
+            for name in names:
+                source = os.path.join(self.spool_dir, name)
+                if name.endswith(SPOOL_SUFFIX):
+                    base = source
+                elif name.endswith(REPLAY_SUFFIX):
+                    base = source.rsplit(".", 2)[0]
+                else:
+                    continue
+                try:
+                    if name.endswith(REPLAY_SUFFIX) and os.path.getmtime(source) > orphaned_before:
+                        continue
+                    # Touch first: the claim's age is what marks it orphaned
+                    os.utime(source)
+                    target = f"{base}.{uuid4().hex[:8]}{REPLAY_SUFFIX}"
+                    os.rename(source, target)
+                    claimed.append(target)
+                except OSError:
+                    continue
+        return claimed
+
+    def _read_spool_file(self, path: str) -> List[AuditRow]:
+        """Decode a claimed spool file; undecodable lines go to a `.bad` file."""
+        rows, bad = [], []
+        with open(path, "rb") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(_decode_row(line.decode("utf-8")))
+                except (UnicodeDecodeError, ValueError, TypeError, AttributeError):
+                    bad.append(line if line.endswith(b"\n") else line + b"\n")
+        if bad:
+            bad_path = path[:-len(REPLAY_SUFFIX)] + BAD_SUFFIX
+            audit_logger.error(f"Skipping {len(bad)} undecodable audit spool lines, kept in {bad_path}")
+            with open(bad_path, "ab") as fh:
+                fh.writelines(bad)
+        return rows
+
+    def _maybe_replay_spool(self) -> None:
+        now = time.monotonic()
+        if now < self._next_replay or now < self._db_down_until:
+            return
+        self._next_replay = now + SPOOL_REPLAY_SECONDS
+        self.replay_spool()
+
+    def replay_spool(self) -> int:
+        """Insert spooled entries back into audit_log; returns how many were written."""
+        written = 0
+        for path in self._claim_spool_files():
+            rows = self._read_spool_file(path)
+            for start in range(0, len(rows), self.batch_size):
+                # A failed chunk is spooled again by flush()
+                if self.flush(rows[start:start + self.batch_size]):
+                    written += len(rows[start:start + self.batch_size])
+            os.remove(path)
+        if written:
+            audit_logger.info(f"🧾 Replayed {written} spooled audit entries")
+        return written
+
+
+# ============================================================================
+# INSTANCIA GLOBAL
+# ============================================================================
+
+audit_writer = AuditWriter()
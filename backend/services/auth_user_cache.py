@@ -0,0 +1,203 @@
+"""
+Auth user cache
+Short-TTL, in-process memoization of authenticated users and their license status
+
+Every API request used to decode the JWT and then run up to three `Person`
+queries (plus a `License` query for doctor-only routes). This cache holds a
+column snapshot of the user keyed by the token's `sub`/`jti`, and a
+"license valid" mark keyed by user id, so steady-state requests authenticate
+without touching the database.
+
+On a hit the snapshot is rebuilt as a detached `Person` and merged into the
+request session with `load=False`: no SELECT is issued, but relationships
+still lazy-load through the session and edits to `current_user` flush
+normally.
+
+Invalidation:
+- any flushed UPDATE/DELETE of a `Person` (password change or reset,
+  profile edits, deactivation) drops that user's entries
+- any flushed write to a `License` (create, update, auto-expiry) drops
+  the doctor's entries
+- logout drops the user's entries explicitly
+
+The cache is per process; other instances converge within the TTL.
+"""
+
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Set
+
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database import License, Person
+
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "30"))
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "10000"))
+
+
+@dataclass
+class _CachedUser:
+    user_id: int
+    values: Dict[str, Any]
+    expires_at: float
+
+
+class AuthUserCache:
+    """Thread-safe LRU of user snapshots with TTL and per-user invalidation."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = AUTH_USER_CACHE_TTL_SECONDS,
+        max_entries: int = AUTH_USER_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[str, _CachedUser]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[str]] = {}
+        self._license_valid_until: Dict[int, float] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @staticmethod
+    def key_for(token: str, payload: Dict[str, Any]) -> str:
+        """Cache key for a verified access token: `sub:jti`, or a token digest for legacy tokens without jti."""
+        jti = payload.get("jti")
+        if jti:
+            return f"{payload.get('sub')}:{jti}"
+        return "sha256:" + hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Users
+    # ------------------------------------------------------------------
+
+    def get_user(self, db: Session, key: str) -> Optional[Person]:
+        """Return the cached user attached to `db`, or None on miss/expiry."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._users.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= self._clock():
+                self._drop_key(key)
+                return None
+            self._users.move_to_end(key)
+            values = copy.deepcopy(entry.values)
+        return db.merge(_rebuild_person(values), load=False)
+
+    def put_user(self, key: str, user: Person) -> None:
+        if not self.enabled or not isinstance(user, Person) or user.id is None:
+            return
+        entry = _CachedUser(
+            user_id=user.id,
+            values=_snapshot_person(user),
+            expires_at=self._clock() + self.ttl_seconds,
+        )
+        with self._lock:
+            self._drop_key(key)
+            self._users[key] = entry
+            self._keys_by_user.setdefault(entry.user_id, set()).add(key)
+            while len(self._users) > self.max_entries:
+                oldest = next(iter(self._users))
+                self._drop_key(oldest)
+
+    # ------------------------------------------------------------------
+    # License status
+    # ------------------------------------------------------------------
+
+    def is_license_valid(self, user_id: int) -> bool:
+        if not self.enabled:
+            return False
+        with self._lock:
+            until = self._license_valid_until.get(user_id)
+            if until is None:
+                return False
+            if until <= self._clock():
+                del self._license_valid_until[user_id]
+                return False
+            return True
+
+    def mark_license_valid(self, user_id: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._license_valid_until[user_id] = self._clock() + self.ttl_seconds
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def invalidate_user(self, user_id: Optional[int]) -> None:
+        """Drop every cached token and the license mark for `user_id`."""
+        if user_id is None:
+            return
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._drop_key(key)
+            self._license_valid_until.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+            self._keys_by_user.clear()
+            self._license_valid_until.clear()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def _drop_key(self, key: str) -> None:
+        entry = self._users.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user.get(entry.user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry.user_id]
+
+
+def _snapshot_person(user: Person) -> Dict[str, Any]:
+    """Copy the loaded column values of `user` (no relationships)."""
+    state = sa_inspect(user)
+    return {
+        attr.key: copy.deepcopy(state.dict[attr.key])
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict
+    }
+
+
+def _rebuild_person(values: Dict[str, Any]) -> Person:
+    """Detached `Person` with `values` as its committed state (no validators, no dirty flags)."""
+    person = sa_inspect(Person).class_manager.new_instance()
+    for key, value in values.items():
+        set_committed_value(person, key, value)
+    make_transient_to_detached(person)
+    return person
+
+
+auth_user_cache = AuthUserCache()
+
+
+@event.listens_for(Person, "after_update")
+@event.listens_for(Person, "after_delete")
+def _invalidate_person(mapper, connection, target) -> None:
+    auth_user_cache.invalidate_user(target.id)
+
+
+@event.listens_for(License, "after_insert")
+@event.listens_for(License, "after_update")
+@event.listens_for(License, "after_delete")
+def _invalidate_license(mapper, connection, target) -> None:
+    auth_user_cache.invalidate_user(target.doctor_id)
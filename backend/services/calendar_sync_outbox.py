@@ -0,0 +1,214 @@
+"""
+Calendar sync outbox
+Transactional outbox for Google Calendar synchronization
+
+Appointment writes no longer call the Google API inline (OAuth refresh +
+HTTP round-trip on every booking). Instead they enqueue a row in
+`calendar_sync_outbox` within the same transaction as the appointment, and a
+background worker drains it:
+
+- coalescing: at most one pending entry per appointment; later changes merge
+  into it (latest operation wins, `version` is bumped)
+- batching: due entries are grouped per doctor and applied with one
+  credentials refresh and batched Calendar requests
+- leasing: claimed rows are pushed `LEASE_SECONDS` into the future (FOR
+  UPDATE SKIP LOCKED) so several instances can drain concurrently without
+  holding a transaction open across Google API calls
+- retries: failures back off exponentially; after `MAX_ATTEMPTS` the entry
+  is parked with status 'failed' and its last error
+
+The calendar client is anything with
+`sync_events_batch(db, doctor_id, {appointment_id: operation}) -> {appointment_id: error | None}`;
+`GoogleCalendarService` in production, a fake in tests.
+"""
+
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from database import CalendarSyncOutbox, SessionLocal
+from logger import get_logger
+from utils.datetime_utils import utc_now
+
+api_logger = get_logger("medical_records.google_calendar")
+
+OPERATION_UPSERT = "upsert"
+OPERATION_DELETE = "delete"
+
+BATCH_SIZE = int(os.getenv("CALENDAR_OUTBOX_BATCH_SIZE", "100"))
+MAX_ATTEMPTS = int(os.getenv("CALENDAR_OUTBOX_MAX_ATTEMPTS", "8"))
+POLL_SECONDS = int(os.getenv("CALENDAR_OUTBOX_POLL_SECONDS", "10"))
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+LEASE_SECONDS = 300
+
+
+@dataclass
+class _ClaimedEntry:
+    id: int
+    version: int
+    appointment_id: int
+    doctor_id: int
+    operation: str
+    attempts: int
+
+
+def enqueue_calendar_sync(db: Session, appointment_id: int, doctor_id: int, operation: str) -> None:
+    """Record a calendar change in the caller's transaction (does not commit).
+
+    A pending entry for the same appointment absorbs the change instead of
+    adding a new row. If a worker currently holds that entry, its lease is
+    kept and the bumped version makes the worker leave it pending.
+    `next_attempt_at` is never moved earlier: a lease and a retry backoff
+    look the same in the row, and lowering a lease would let another
+    instance claim the entry while the first is still calling Google.
+    """
+    if operation not in (OPERATION_UPSERT, OPERATION_DELETE):
+        raise ValueError(f"Unknown calendar sync operation: {operation}")
+    if not appointment_id or not doctor_id:
+        return
+
+    now = utc_now()
+    stmt = pg_insert(CalendarSyncOutbox).values(
+        appointment_id=appointment_id,
+        doctor_id=doctor_id,
+        operation=operation,
+        status="pending",
+        version=1,
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+        updated_at=now,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CalendarSyncOutbox.appointment_id],
+        index_where=CalendarSyncOutbox.status == "pending",
+        set_={
+            "operation": stmt.excluded.operation,
+            "doctor_id": stmt.excluded.doctor_id,
+            "version": CalendarSyncOutbox.version + 1,
+            "attempts": 0,
+            "next_attempt_at": func.greatest(CalendarSyncOutbox.next_attempt_at, stmt.excluded.next_attempt_at),
+            "last_error": None,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt)
+
+
+def backoff_seconds(attempts: int) -> int:
+    """Delay before retry number `attempts` (1-based): 30s, 60s, 120s ... capped at 1h."""
+    return min(BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), BACKOFF_MAX_SECONDS)
+
+
+def claim_due_entries(db: Session, batch_size: int = BATCH_SIZE, now: Optional[datetime] = None) -> List[_ClaimedEntry]:
+    """Lease up to `batch_size` due entries and commit, so the API calls run outside the lock."""
+    now = now or utc_now()
+    entries = db.query(CalendarSyncOutbox).filter(
+        CalendarSyncOutbox.status == "pending",
+        CalendarSyncOutbox.next_attempt_at <= now,
+    ).order_by(
+        CalendarSyncOutbox.next_attempt_at
+    ).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    claimed = []
+    for entry in entries:
+        entry.attempts = (entry.attempts or 0) + 1
+        entry.next_attempt_at = now + timedelta(seconds=LEASE_SECONDS)
+        claimed.append(_ClaimedEntry(
+            id=entry.id,
+            version=entry.version,
+            appointment_id=entry.appointment_id,
+            doctor_id=entry.doctor_id,
+            operation=entry.operation,
+            attempts=entry.attempts,
+        ))
+    db.commit()
+    return claimed
+
+
+def _settle(db: Session, entry: _ClaimedEntry, error: Optional[str]) -> None:
+    # Filtering on the claimed version leaves entries that received a newer
+    # change while in flight pending (they are due again immediately).
+    current = db.query(CalendarSyncOutbox).filter(
+        CalendarSyncOutbox.id == entry.id,
+        CalendarSyncOutbox.version == entry.version,
+    )
+    if error is None:
+        current.delete(synchronize_session=False)
+        return
+
+    values = {"last_error": error[:2000], "updated_at": utc_now()}
+    if entry.attempts >= MAX_ATTEMPTS:
+        values["status"] = "failed"
+        api_logger.error("Sincronización con Google Calendar descartada tras reintentos", extra={
+            "doctor_id": entry.doctor_id,
+            "appointment_id": entry.appointment_id,
+            "attempts": entry.attempts,
+            "error": error
+        })
+    else:
+        values["next_attempt_at"] = utc_now() + timedelta(seconds=backoff_seconds(entry.attempts))
+    current.update(values, synchronize_session=False)
+
+
+def drain_calendar_outbox(
+    db: Session,
+    calendar=None,
+    batch_size: int = BATCH_SIZE,
+    now: Optional[datetime] = None,
+) -> int:
+    """Apply one batch of due outbox entries; returns how many were claimed."""
+    if calendar is None:
+        from services.google_calendar_service import GoogleCalendarService
+        calendar = GoogleCalendarService
+
+    claimed = claim_due_entries(db, batch_size=batch_size, now=now)
+    if not claimed:
+        return 0
+
+    by_doctor: Dict[int, List[_ClaimedEntry]] = defaultdict(list)
+    for entry in claimed:
+        by_doctor[entry.doctor_id].append(entry)
+
+    for doctor_id, entries in by_doctor.items():
+        changes = {entry.appointment_id: entry.operation for entry in entries}
+        try:
+            results = calendar.sync_events_batch(db, doctor_id, changes)
+        except Exception as e:
+            db.rollback()
+            api_logger.warning("Error al sincronizar lote con Google Calendar", exc_info=True, extra={
+                "doctor_id": doctor_id,
+                "entries": len(entries)
+            })
+            results = {appointment_id: str(e) or e.__class__.__name__ for appointment_id in changes}
+
+        for entry in entries:
+            _settle(db, entry, results.get(entry.appointment_id))
+        db.commit()
+
+    return len(claimed)
+
+
+def process_calendar_outbox(calendar=None, max_batches: int = 10) -> int:
+    """Drain due entries with a fresh session (entry point for the background loop)."""
+    db = SessionLocal()
+    processed = 0
+    try:
+        for _ in range(max_batches):
+            claimed = drain_calendar_outbox(db, calendar=calendar)
+            processed += claimed
+            if claimed < BATCH_SIZE:
+                break
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return processed
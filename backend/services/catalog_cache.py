@@ -0,0 +1,253 @@
+"""
+Catalog cache
+In-process cache of the rarely changing catalogs, served with strong ETags
+
+Specialties, countries, states, emergency relationships, study categories,
+the study catalog, medications and the CIE-10 diagnosis catalog used to be
+read from PostgreSQL on every request. Each catalog is now loaded once,
+serialized to JSON-ready rows and kept in memory; endpoints filter / page
+the rows in Python and answer `If-None-Match` with 304 before building a
+body.
+
+ETags are strong: the catalog version from `catalog_metadata` (when it has
+one) plus a digest of the serialized rows, extended with the request's
+filter / page parameters for partial responses.
+
+Invalidation: any flushed insert, update or delete of a catalog model
+marks the catalog on the session, and the whole catalog (every scope) is
+dropped when that session commits, so doctor-created diagnoses and
+medications show up on the next request. The cache is per process; other
+instances converge within the TTL.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from catalog_metadata import CATALOG_METADATA
+from database import Country, EmergencyRelationship, Medication, Specialty, State, StudyCatalog, StudyCategory
+from models.diagnosis import DiagnosisCatalog
+
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "600"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "2000"))
+
+# Shared catalogs may be reused by the browser for a while; per-doctor ones
+# (which change when the doctor adds an entry) are always revalidated.
+PUBLIC_CACHE_CONTROL = "public, max-age=3600"
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+# Cache name -> CATALOG_METADATA key (catalogs with an official version)
+_METADATA_KEYS = {
+    "diagnoses": "diagnosis_catalog",
+    "study_catalog": "study_catalog",
+    "medications": "medications",
+}
+
+_CATALOG_BY_MODEL = {
+    Specialty: "specialties",
+    Country: "countries",
+    State: "states",
+    EmergencyRelationship: "emergency_relationships",
+    StudyCategory: "study_categories",
+    StudyCatalog: "study_catalog",
+    Medication: "medications",
+    DiagnosisCatalog: "diagnoses",
+}
+
+_PENDING_KEY = "catalog_cache_pending"
+
+
+@dataclass
+class CatalogEntry:
+    name: str
+    rows: List[Dict[str, Any]]
+    etag: str
+    body: bytes
+    expires_at: float
+    # Derived structures (search indexes) that share the entry's lifetime
+    indexes: Dict[Hashable, Any] = field(default_factory=dict)
+
+
+def _dumps(rows: Any) -> bytes:
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def catalog_version(name: str) -> str:
+    metadata_key = _METADATA_KEYS.get(name)
+    if metadata_key and metadata_key in CATALOG_METADATA:
+        return CATALOG_METADATA[metadata_key]["version"]
+    return "v1"
+
+
+class CatalogCache:
+    """Thread-safe LRU of serialized catalogs keyed by (catalog, scope), with TTL."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = CATALOG_CACHE_TTL_SECONDS,
+        max_entries: int = CATALOG_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Hashable], CatalogEntry]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, name: str, loader: Callable[[], Iterable[Dict[str, Any]]], scope: Hashable = None) -> CatalogEntry:
+        """Cached catalog `name` for `scope`, loading it with `loader` on miss/expiry."""
+        key = (name, scope)
+        if self.enabled:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    return entry
+                generation = self._generations.get(name, 0)
+
+        rows = jsonable_encoder(list(loader()))
+        body = _dumps(rows)
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        entry = CatalogEntry(
+            name=name,
+            rows=rows,
+            etag=f'"{name}-{catalog_version(name)}-{digest}"',
+            body=body,
+            expires_at=self._clock() + self.ttl_seconds,
+        )
+        if self.enabled:
+            with self._lock:
+                # A write committed while loading: serve these rows once, do not keep them
+                if self._generations.get(name, 0) == generation:
+                    self._entries[key] = entry
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, name: str) -> None:
+        """Drop every scope of catalog `name`."""
+        with self._lock:
+            self._generations[name] = self._generations.get(name, 0) + 1
+            for key in [key for key in self._entries if key[0] == name]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as RFC 9110 requires for If-None-Match."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def catalog_response(
+    request: Request,
+    entry: CatalogEntry,
+    select: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None,
+    variant: Optional[Dict[str, Any]] = None,
+    cache_control: str = PUBLIC_CACHE_CONTROL,
+) -> Response:
+    """JSON response for `entry` (or `select(entry.rows)`), or 304 when the client's copy is current.
+
+    `variant` holds the request parameters that `select` depends on; they
+    are folded into the ETag so every filtered / paged view has its own.
+    """
+    etag = entry.etag
+    if variant:
+        suffix = hashlib.sha256(_dumps(sorted(variant.items()))).hexdigest()[:12]
+        etag = f'{etag[:-1]}-{suffix}"'
+
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    body = entry.body if select is None else _dumps(select(entry.rows))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def page(rows: List[Dict[str, Any]], offset: int, limit: int) -> List[Dict[str, Any]]:
+    return rows[offset:offset + limit]
+
+
+def contains(rows: List[Dict[str, Any]], field: str, search: Optional[str]) -> List[Dict[str, Any]]:
+    """Case-insensitive substring filter (the in-memory ILIKE '%search%')."""
+    if not search:
+        return rows
+    needle = search.lower()
+    return [row for row in rows if needle in (row.get(field) or "").lower()]
+
+
+catalog_cache = CatalogCache()
+
+
+@event.listens_for(Specialty, "after_insert")
+@event.listens_for(Specialty, "after_update")
+@event.listens_for(Specialty, "after_delete")
+@event.listens_for(Country, "after_insert")
+@event.listens_for(Country, "after_update")
+@event.listens_for(Country, "after_delete")
+@event.listens_for(State, "after_insert")
+@event.listens_for(State, "after_update")
+@event.listens_for(State, "after_delete")
+@event.listens_for(EmergencyRelationship, "after_insert")
+@event.listens_for(EmergencyRelationship, "after_update")
+@event.listens_for(EmergencyRelationship, "after_delete")
+@event.listens_for(StudyCategory, "after_insert")
+@event.listens_for(StudyCategory, "after_update")
+@event.listens_for(StudyCategory, "after_delete")
+@event.listens_for(StudyCatalog, "after_insert")
+@event.listens_for(StudyCatalog, "after_update")
+@event.listens_for(StudyCatalog, "after_delete")
+@event.listens_for(Medication, "after_insert")
+@event.listens_for(Medication, "after_update")
+@event.listens_for(Medication, "after_delete")
+@event.listens_for(DiagnosisCatalog, "after_insert")
+@event.listens_for(DiagnosisCatalog, "after_update")
+@event.listens_for(DiagnosisCatalog, "after_delete")
+def _mark_catalog_written(mapper, connection, target) -> None:
+    session = object_session(target)
+    name = _CATALOG_BY_MODEL[mapper.class_]
+    if session is None:
+        catalog_cache.invalidate(name)
+        return
+    session.info.setdefault(_PENDING_KEY, set()).add(name)
+    # Studies embed their category
+    if name == "study_categories":
+        session.info[_PENDING_KEY].add("study_catalog")
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_catalogs(session) -> None:
+    for name in session.info.pop(_PENDING_KEY, ()):
+        catalog_cache.invalidate(name)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_catalogs(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
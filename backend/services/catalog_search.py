@@ -0,0 +1,220 @@
+"""
+Catalog search
+Ranked typeahead over the cached catalogs (CIE-10, studies, medications)
+
+The consultation form autocompletes diagnoses, studies and medications on
+every keystroke. `ILIKE '%term%'` forced a sequential scan per request and
+missed accented / unaccented variants ("cefalea" vs "céfalea"). Instead,
+each cached catalog entry (services/catalog_cache.py) gets an in-memory
+index, built on first use and dropped together with the entry when the
+catalog changes.
+
+Matching works on accent-free, lowercase text and ranks in tiers:
+
+1. exact code, then code prefix ("j06" -> J06, J06.9, ...)
+2. name prefix, then every query word prefixes a word of the name
+3. substring of the name (what ILIKE used to return)
+4. fuzzy: most of the query's trigrams appear in the name (typos)
+
+Lookups use sorted keys (bisect) for prefixes and a trigram inverted index
+for substrings / fuzzy matches, so a search over the full CIE-10 catalog
+takes a few milliseconds. Scoping (system entries plus the doctor's own)
+is a predicate applied while collecting results.
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from services.catalog_cache import CatalogEntry
+
+# Rank reported for each tier (fuzzy matches scale below FUZZY_RANK by similarity)
+CODE_EXACT_RANK = 1.0
+CODE_PREFIX_RANK = 0.9
+NAME_PREFIX_RANK = 0.8
+WORD_PREFIX_RANK = 0.7
+SUBSTRING_RANK = 0.5
+FUZZY_RANK = 0.4
+
+# Share of the query's trigrams a name must contain to count as a fuzzy match
+FUZZY_THRESHOLD = 0.6
+FUZZY_MIN_LENGTH = 4
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+Row = Dict[str, Any]
+Match = Tuple[Row, Optional[float]]
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase ASCII without accents, every non-alphanumeric run collapsed to one space."""
+    if not text:
+        return ""
+    ascii_text = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM.sub(" ", ascii_text).strip()
+
+
+def _word_trigrams(word: str) -> Set[str]:
+    """pg_trgm style trigrams: the word padded with two leading and one trailing space."""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _inner_trigrams(word: str) -> Set[str]:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def _prefix_range(keys: List[Tuple[str, int]], prefix: str) -> Iterable[Tuple[str, int]]:
+    """Entries of the sorted `keys` whose text starts with `prefix`, in order."""
+    for position in range(bisect_left(keys, (prefix, -1)), len(keys)):
+        text, index = keys[position]
+        if not text.startswith(prefix):
+            break
+        yield text, index
+
+
+class TypeaheadIndex:
+    """Ranked prefix / trigram index over catalog rows."""
+
+    def __init__(self, rows: List[Row], name_field: str = "name", code_field: Optional[str] = None):
+        self.rows = rows
+        self._names = [normalize(row.get(name_field)) for row in rows]
+        self._codes = [
+            normalize(row.get(code_field)).replace(" ", "") if code_field else ""
+            for row in rows
+        ]
+        self._by_name = sorted(range(len(rows)), key=lambda i: (self._names[i], i))
+        self._code_keys = sorted((code, i) for i, code in enumerate(self._codes) if code)
+
+        word_keys = []
+        postings: Dict[str, List[int]] = defaultdict(list)
+        word_trigrams: Dict[str, Set[str]] = {}  # catalog names reuse a small vocabulary
+        for i, name in enumerate(self._names):
+            words = set(name.split())
+            word_keys.extend((word, i) for word in words)
+            trigrams = set()
+            for word in words:
+                if word not in word_trigrams:
+                    word_trigrams[word] = _word_trigrams(word)
+                trigrams |= word_trigrams[word]
+            for trigram in trigrams:
+                postings[trigram].append(i)
+        word_keys.sort()
+        self._word_keys = word_keys
+        self._postings = dict(postings)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def search(
+        self,
+        query: Optional[str],
+        limit: int = 20,
+        offset: int = 0,
+        predicate: Optional[Callable[[Row], bool]] = None,
+    ) -> List[Match]:
+        """Best `limit` matches after `offset`, as (row, rank) pairs in rank order.
+
+        An empty query lists the rows alphabetically with rank None.
+        """
+        wanted = offset + limit
+        matches: List[Match] = []
+        seen: Set[int] = set()
+
+        def emit(indexes: Iterable[int], rank) -> bool:
+            """Add rows in order; True once enough matches were collected."""
+            for i in indexes:
+                if len(matches) >= wanted:
+                    return True
+                if i in seen:
+                    continue
+                seen.add(i)
+                row = self.rows[i]
+                if predicate is not None and not predicate(row):
+                    continue
+                matches.append((row, rank(i) if callable(rank) else rank))
+            return len(matches) >= wanted
+
+        text = normalize(query)
+        if not text:
+            emit(self._by_name, None)
+            return matches[offset:]
+
+        # Each tier only runs while the page is not full yet
+        for match in (self._match_codes, self._match_words, self._match_substring, self._match_fuzzy):
+            if match(text, emit):
+                break
+        return matches[offset:]
+
+    def _match_codes(self, text: str, emit) -> bool:
+        if not self._code_keys:
+            return False
+        code = text.replace(" ", "")
+        in_range = [i for _, i in _prefix_range(self._code_keys, code)]
+        exact = [i for i in in_range if self._codes[i] == code]
+        return emit(exact, CODE_EXACT_RANK) or emit(in_range, CODE_PREFIX_RANK)
+
+    def _match_words(self, text: str, emit) -> bool:
+        candidates: Optional[Set[int]] = None
+        for token in sorted(set(text.split()), key=len, reverse=True):
+            rows = {i for _, i in _prefix_range(self._word_keys, token)}
+            candidates = rows if candidates is None else candidates & rows
+            if not candidates:
+                return False
+        names = self._names
+        ordered = sorted(candidates, key=lambda i: (names[i], i))
+        prefixed = [i for i in ordered if names[i].startswith(text)]
+        return emit(prefixed, NAME_PREFIX_RANK) or emit(ordered, WORD_PREFIX_RANK)
+
+    def _match_substring(self, text: str, emit) -> bool:
+        trigrams = set()
+        for token in text.split():
+            trigrams |= _inner_trigrams(token)
+        if trigrams:
+            candidates = self._rows_with_all(trigrams)
+        else:
+            # Only one- and two-letter words: scan the names
+            candidates = range(len(self.rows))
+        names = self._names
+        found = sorted((i for i in candidates if text in names[i]), key=lambda i: (names[i], i))
+        return emit(found, SUBSTRING_RANK)
+
+    def _match_fuzzy(self, text: str, emit) -> bool:
+        if len(text) < FUZZY_MIN_LENGTH:
+            return False
+        trigrams = set()
+        for token in text.split():
+            trigrams |= _word_trigrams(token)
+        hits = Counter()
+        for trigram in trigrams:
+            hits.update(self._postings.get(trigram, ()))
+        similarity = {i: count / len(trigrams) for i, count in hits.items()}
+        found = sorted(
+            (i for i, value in similarity.items() if value >= FUZZY_THRESHOLD),
+            key=lambda i: (-similarity[i], self._names[i], i),
+        )
+        return emit(found, lambda i: round(FUZZY_RANK * similarity[i], 4))
+
+    def _rows_with_all(self, trigrams: Set[str]) -> Set[int]:
+        lists = sorted((self._postings.get(trigram, ()) for trigram in trigrams), key=len)
+        rows = set(lists[0])
+        for postings in lists[1:]:
+            if not rows:
+                break
+            rows.intersection_update(postings)
+        return rows
+
+
+def search_index(entry: CatalogEntry, code_field: Optional[str] = None) -> TypeaheadIndex:
+    """Typeahead index of a cached catalog entry, built on first use.
+
+    The index lives on the entry, so it is rebuilt exactly when the catalog
+    cache reloads the rows.
+    """
+    index = entry.indexes.get(code_field)
+    if index is None:
+        index = TypeaheadIndex(entry.rows, code_field=code_field)
+        entry.indexes[code_field] = index
+    return index
@@ -2,14 +2,15 @@
 Consultation Service - Refactored to use modular utilities
 Provides comprehensive consultation management functionality
 """
-from typing import Dict, List, Any
-from sqlalchemy.orm import Session, joinedload, load_only
+from typing import Dict, List, Any, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
 from datetime import timedelta
 from fastapi import HTTPException
 
 from database import MedicalRecord, Person
 from logger import get_logger
 from utils.audit_utils import serialize_instance
+from utils.pagination import apply_keyset, next_cursor
 from audit_service import audit_service
 
 # Import all utilities from the consultations package
@@ -19,12 +20,13 @@ from services.consultations import (
     # Security
     encrypt_sensitive_data, decrypt_sensitive_data, sign_medical_document,
     # Decryption
-    decrypt_patient_data, decrypt_consultation_data,
+    decrypt_consultation_data, decrypt_consultations_batch, decrypt_patients_batch,
     # Formatting
     format_patient_name, format_doctor_name,
     # Data retrieval
-    get_consultation_vital_signs, get_consultation_prescriptions,
-    get_consultation_clinical_studies, get_patient_info,
+    get_patient_info,
+    get_vital_signs_by_consultation, get_prescriptions_by_consultation,
+    get_clinical_studies_by_consultation,
     # Response builders
     build_consultation_response, build_create_consultation_response,
     # Diagnosis
@@ -50,19 +52,38 @@ class ConsultationService:
         doctor_id: int,
         skip: int = 0,
         limit: int = 100,
-        decrypt_sensitive_data_fn: callable = None
+        cursor: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
-        Get list of consultations for a specific doctor
+        Get list of consultations for a specific doctor.
+        Sensitive fields are decrypted for the whole page in one batch.
+        """
+        result, _ = ConsultationService.get_consultations_page(db, doctor_id, skip, limit, cursor)
+        return result
+
+    @staticmethod
+    def get_consultations_page(
+        db: Session,
+        doctor_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get a page of consultations plus the cursor for the next page.
+        When `cursor` is given the page is keyset-paginated on
+        (consultation_date, id) and `skip` is ignored. The next cursor is
+        taken from the queried rows, so consultations dropped while
+        processing do not end the scroll early.
         """
         try:
-            api_logger.info("🔍 Fetching consultations from database", doctor_id=doctor_id, skip=skip, limit=limit)
+            api_logger.info("🔍 Fetching consultations from database", doctor_id=doctor_id, skip=skip, limit=limit, cursor=bool(cursor))
             
             # Query medical records (consultations) from database
             # Optimize: Only load necessary fields from persons to avoid loading large TEXT fields unnecessarily
             # Use load_only to reduce data transfer and improve query performance
             try:
-                consultations = db.query(MedicalRecord).options(
+                query = db.query(MedicalRecord).options(
                     joinedload(MedicalRecord.patient).load_only(
                         Person.id, Person.name, Person.email, Person.primary_phone,
                         Person.person_code, Person.person_type, Person.birth_date,
@@ -80,10 +101,15 @@ class ConsultationService:
                         Person.person_code, Person.person_type, Person.title,
                         Person.specialty_id, Person.university, Person.graduation_year
                     ).joinedload(Person.offices),
-                    joinedload(MedicalRecord.patient_document)
+                    joinedload(MedicalRecord.patient_document),
+                    selectinload(MedicalRecord.document_folios)
                 ).filter(
                     MedicalRecord.doctor_id == doctor_id
-                ).order_by(MedicalRecord.consultation_date.desc()).offset(skip).limit(limit).all()
+                )
+                query = apply_keyset(query, MedicalRecord.consultation_date, MedicalRecord.id, cursor)
+                if not cursor:
+                    query = query.offset(skip)
+                consultations = query.limit(limit).all()
                 
                 api_logger.info("✅ Query executed successfully", doctor_id=doctor_id, count=len(consultations))
             except Exception as query_error:
@@ -97,48 +123,42 @@ class ConsultationService:
             
             api_logger.info("📊 Found consultations in database", doctor_id=doctor_id, count=len(consultations))
             
+            # Decrypt the whole page in one pass (shared cipher contexts)
+            decrypted_consultations = decrypt_consultations_batch(consultations)
+            decrypted_patients = decrypt_patients_batch([c.patient for c in consultations])
+            
+            # Bulk-load related data: one IN (...) query per relation, not per consultation
+            consultation_ids = [c.id for c in consultations]
+            vital_signs_by_id = ConsultationService._load_related(
+                "vital signs", get_vital_signs_by_consultation, db, consultation_ids
+            )
+            prescriptions_by_id = ConsultationService._load_related(
+                "prescriptions", get_prescriptions_by_consultation, db, consultation_ids
+            )
+            clinical_studies_by_id = ConsultationService._load_related(
+                "clinical studies", get_clinical_studies_by_consultation, db, consultation_ids
+            )
+            
             # Transform to API format using helper functions
             result = []
-            for consultation in consultations:
+            for consultation, decrypted_consultation, decrypted_patient in zip(
+                consultations, decrypted_consultations, decrypted_patients
+            ):
                 try:
-                    # Decrypt patient data
-                    decrypted_patient = decrypt_patient_data(consultation.patient, decrypt_sensitive_data_fn) if consultation.patient else {}
                     patient_name = format_patient_name(decrypted_patient) if consultation.patient else "Paciente No Identificado"
                     
-                    # Decrypt consultation data
-                    decrypted_consultation = decrypt_consultation_data(consultation, decrypt_sensitive_data_fn)
-                    
                     # Get doctor name
                     doctor_name = format_doctor_name(consultation.doctor)
                     
-                    # Get related data (vital signs, prescriptions, clinical studies)
-                    try:
-                        vital_signs = get_consultation_vital_signs(db, consultation.id)
-                    except Exception as e:
-                        api_logger.warning("Error getting vital signs for consultation", consultation_id=consultation.id, error=str(e))
-                        vital_signs = []
-                    
-                    try:
-                        prescriptions = get_consultation_prescriptions(db, consultation.id)
-                    except Exception as e:
-                        api_logger.warning("Error getting prescriptions for consultation", consultation_id=consultation.id, error=str(e))
-                        prescriptions = []
-                    
-                    try:
-                        clinical_studies = get_consultation_clinical_studies(db, consultation.id)
-                    except Exception as e:
-                        api_logger.warning("Error getting clinical studies for consultation", consultation_id=consultation.id, error=str(e))
-                        clinical_studies = []
-                    
                     # Build response using helper
                     consultation_response = build_consultation_response(
                         consultation,
                         decrypted_consultation,
                         patient_name,
                         doctor_name,
-                        vital_signs,
-                        prescriptions,
-                        clinical_studies
+                        vital_signs_by_id.get(consultation.id, []),
+                        prescriptions_by_id.get(consultation.id, []),
+                        clinical_studies_by_id.get(consultation.id, [])
                     )
                     
                     # Add compatibility fields
@@ -183,7 +203,7 @@ class ConsultationService:
                         "limit": limit
                     }
                 )
-            return result
+            return result, next_cursor(consultations, limit, lambda c: (c.consultation_date, c.id))
         except Exception as e:
             api_logger.error(
                 "❌ Error in get_consultations",
@@ -195,7 +215,19 @@ class ConsultationService:
                 exc_info=True
             )
             # Return empty list to prevent frontend crash, but log the error
-            return []
+            return [], None
+
+    @staticmethod
+    def _load_related(label: str, loader: callable, db: Session, consultation_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Run a bulk relation loader; a failure degrades to empty lists instead
+        of failing the whole page
+        """
+        try:
+            return loader(db, consultation_ids)
+        except Exception as e:
+            api_logger.warning(f"Error getting {label} for consultations", count=len(consultation_ids), error=str(e))
+            return {}
 
     @staticmethod
     def get_consultation_by_id(
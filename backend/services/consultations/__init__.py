@@ -17,7 +17,10 @@ from .security import (
 # Decryption helpers
 from .decryption import (
     decrypt_patient_data,
-    decrypt_consultation_data
+    decrypt_consultation_data,
+    decrypt_consultations_batch,
+    decrypt_patients_batch,
+    CONSULTATION_DECRYPT_FIELDS,
 )
 
 # Formatting utilities
@@ -31,6 +34,9 @@ from .data_retrieval import (
     get_consultation_vital_signs,
     get_consultation_prescriptions,
     get_consultation_clinical_studies,
+    get_vital_signs_by_consultation,
+    get_prescriptions_by_consultation,
+    get_clinical_studies_by_consultation,
     get_patient_info
 )
 
@@ -68,6 +74,9 @@ __all__ = [
     # Decryption
     'decrypt_patient_data',
     'decrypt_consultation_data',
+    'decrypt_consultations_batch',
+    'decrypt_patients_batch',
+    'CONSULTATION_DECRYPT_FIELDS',
     # Formatting
     'format_patient_name',
     'format_doctor_name',
@@ -75,6 +84,9 @@ __all__ = [
     'get_consultation_vital_signs',
     'get_consultation_prescriptions',
     'get_consultation_clinical_studies',
+    'get_vital_signs_by_consultation',
+    'get_prescriptions_by_consultation',
+    'get_clinical_studies_by_consultation',
     'get_patient_info',
     # Response builders
     'build_consultation_response',
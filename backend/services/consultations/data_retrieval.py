@@ -1,80 +1,125 @@
 """
 Data retrieval helpers for consultation service
 """
-from typing import List, Dict, Any, Optional
-from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional, Sequence
+from sqlalchemy.orm import Session, contains_eager
 from database import (
     ConsultationVitalSign, ConsultationPrescription, 
     Medication, ClinicalStudy, Person
 )
 
-def get_consultation_vital_signs(db: Session, consultation_id: int) -> List[Dict[str, Any]]:
+
+def _group_by_consultation(rows, serialize) -> Dict[int, List[Dict[str, Any]]]:
+    grouped: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        grouped.setdefault(row.consultation_id, []).append(serialize(row))
+    return grouped
+
+
+def _serialize_vital_sign(vs: ConsultationVitalSign) -> Dict[str, Any]:
+    return {
+        "id": vs.id,
+        "vital_sign_id": vs.vital_sign_id,
+        "value": vs.value,
+        "unit": vs.unit or "",
+        "created_at": vs.created_at.isoformat() if vs.created_at else None
+    }
+
+
+def _serialize_prescription(rx: ConsultationPrescription) -> Dict[str, Any]:
+    return {
+        "id": rx.id,
+        "consultation_id": rx.consultation_id,
+        "medication_id": rx.medication_id,
+        "medication_name": rx.medication.name if rx.medication else "",
+        "dosage": rx.dosage,
+        "frequency": rx.frequency,
+        "duration": rx.duration,
+        "instructions": rx.instructions,
+        "quantity": rx.quantity,
+        "via_administracion": rx.via_administracion,
+        "created_at": rx.created_at.isoformat() if rx.created_at else None
+    }
+
+
+def _serialize_clinical_study(study: ClinicalStudy) -> Dict[str, Any]:
+    return {
+        "id": study.id,
+        "study_name": study.study_name,
+        "study_type": study.study_type,
+        "description": study.clinical_indication or "",
+        "pdf_url": study.file_path,
+        "created_at": study.created_at.isoformat() if study.created_at else None
+    }
+
+
+def get_vital_signs_by_consultation(
+    db: Session, consultation_ids: Sequence[int]
+) -> Dict[int, List[Dict[str, Any]]]:
     """
-    Get vital signs for a consultation
+    Get vital signs for many consultations in one query, grouped by consultation id
     """
+    if not consultation_ids:
+        return {}
     vital_signs = db.query(ConsultationVitalSign).filter(
-        ConsultationVitalSign.consultation_id == consultation_id
-    ).all()
-    
-    return [
-        {
-            "id": vs.id,
-            "vital_sign_id": vs.vital_sign_id,
-            "value": vs.value,
-            "unit": vs.unit or "",
-            "created_at": vs.created_at.isoformat() if vs.created_at else None
-        }
-        for vs in vital_signs
-    ]
+        ConsultationVitalSign.consultation_id.in_(list(consultation_ids))
+    ).order_by(ConsultationVitalSign.id).all()
+    return _group_by_consultation(vital_signs, _serialize_vital_sign)
 
 
-def get_consultation_prescriptions(db: Session, consultation_id: int) -> List[Dict[str, Any]]:
+def get_prescriptions_by_consultation(
+    db: Session, consultation_ids: Sequence[int]
+) -> Dict[int, List[Dict[str, Any]]]:
     """
-    Get prescriptions for a consultation
+    Get prescriptions (with medication name) for many consultations in one
+    query, grouped by consultation id
     """
+    if not consultation_ids:
+        return {}
     prescriptions = db.query(ConsultationPrescription).join(
         Medication, ConsultationPrescription.medication_id == Medication.id
+    ).options(
+        contains_eager(ConsultationPrescription.medication)
     ).filter(
-        ConsultationPrescription.consultation_id == consultation_id
-    ).all()
-    
-    return [
-        {
-            "id": rx.id,
-            "consultation_id": rx.consultation_id,
-            "medication_id": rx.medication_id,
-            "medication_name": rx.medication.name if rx.medication else "",
-            "dosage": rx.dosage,
-            "frequency": rx.frequency,
-            "duration": rx.duration,
-            "instructions": rx.instructions,
-            "quantity": rx.quantity,
-            "via_administracion": rx.via_administracion,
-            "created_at": rx.created_at.isoformat() if rx.created_at else None
-        }
-        for rx in prescriptions
-    ]
+        ConsultationPrescription.consultation_id.in_(list(consultation_ids))
+    ).order_by(ConsultationPrescription.id).all()
+    return _group_by_consultation(prescriptions, _serialize_prescription)
 
 
-def get_consultation_clinical_studies(db: Session, consultation_id: int) -> List[Dict[str, Any]]:
+def get_clinical_studies_by_consultation(
+    db: Session, consultation_ids: Sequence[int]
+) -> Dict[int, List[Dict[str, Any]]]:
     """
-    Get clinical studies for a consultation
+    Get clinical studies for many consultations in one query, grouped by
+    consultation id (newest first within each consultation)
     """
+    if not consultation_ids:
+        return {}
     studies = db.query(ClinicalStudy).filter(
-        ClinicalStudy.consultation_id == consultation_id
+        ClinicalStudy.consultation_id.in_(list(consultation_ids))
     ).order_by(ClinicalStudy.created_at.desc()).all()
-    
-    return [
-        {
-            "id": study.id,
-            "study_name": study.study_name,
-            "study_type": study.study_type,
-            "description": study.clinical_indication or "",
-            "pdf_url": study.file_path,
-            "created_at": study.created_at.isoformat() if study.created_at else None
-        }
-        for study in studies
-    ]
+    return _group_by_consultation(studies, _serialize_clinical_study)
+
+
+def get_consultation_vital_signs(db: Session, consultation_id: int) -> List[Dict[str, Any]]:
+    """
+    Get vital signs for a consultation
+    """
+    return get_vital_signs_by_consultation(db, [consultation_id]).get(consultation_id, [])
+
+
+def get_consultation_prescriptions(db: Session, consultation_id: int) -> List[Dict[str, Any]]:
+    """
+    Get prescriptions for a consultation
+    """
+    return get_prescriptions_by_consultation(db, [consultation_id]).get(consultation_id, [])
+
+
+def get_consultation_clinical_studies(db: Session, consultation_id: int) -> List[Dict[str, Any]]:
+    """
+    Get clinical studies for a consultation
+    """
+    return get_clinical_studies_by_consultation(db, [consultation_id]).get(consultation_id, [])
 
 
 def get_patient_info(db: Session, patient_id: Optional[int]) -> tuple[str, Optional[Person]]:
@@ -1,12 +1,31 @@
 """
 Data decryption helpers for consultation service
 """
-from typing import Dict
+from typing import Dict, List, Sequence
 from database import Person, MedicalRecord
+from encryption import encryption_service
 from logger import get_logger
 
 api_logger = get_logger("medical_records.api")
 
+# MedicalRecord columns returned (decrypted) by the consultation endpoints.
+CONSULTATION_DECRYPT_FIELDS = (
+    "chief_complaint",
+    "history_present_illness",
+    "family_history",
+    "perinatal_history",
+    "personal_pathological_history",
+    "gynecological_and_obstetric_history",
+    "personal_non_pathological_history",
+    "physical_examination",
+    "primary_diagnosis",
+    "secondary_diagnoses",
+    "treatment_plan",
+    "follow_up_instructions",
+    "laboratory_results",
+    "notes",
+)
+
 def decrypt_patient_data(patient: Person, decrypt_fn: callable) -> Dict[str, str]:
     """
     Decrypt patient sensitive data
@@ -28,20 +47,7 @@ def decrypt_consultation_data(consultation: MedicalRecord, decrypt_fn: callable)
     Decrypt consultation sensitive data
     """
     fields_to_decrypt = {
-        "chief_complaint": consultation.chief_complaint,
-        "history_present_illness": consultation.history_present_illness,
-        "family_history": consultation.family_history,
-        "perinatal_history": consultation.perinatal_history,
-        "personal_pathological_history": consultation.personal_pathological_history,
-        "gynecological_and_obstetric_history": consultation.gynecological_and_obstetric_history,
-        "personal_non_pathological_history": consultation.personal_non_pathological_history,
-        "physical_examination": consultation.physical_examination,
-        "primary_diagnosis": consultation.primary_diagnosis,
-        "secondary_diagnoses": consultation.secondary_diagnoses,
-        "treatment_plan": consultation.treatment_plan,
-        "follow_up_instructions": consultation.follow_up_instructions,
-        "laboratory_results": consultation.laboratory_results,
-        "notes": consultation.notes
+        field: getattr(consultation, field) for field in CONSULTATION_DECRYPT_FIELDS
     }
     
     try:
@@ -50,3 +56,18 @@ def decrypt_consultation_data(consultation: MedicalRecord, decrypt_fn: callable)
         api_logger.warning("Could not decrypt consultation data", error=str(e))
         # Return original encrypted data if decryption fails
         return fields_to_decrypt
+
+
+def decrypt_consultations_batch(consultations: Sequence[MedicalRecord]) -> List[Dict[str, str]]:
+    """
+    Decrypt the sensitive fields of a whole result set in one pass
+    (same shape as decrypt_consultation_data, one dict per row)
+    """
+    return encryption_service.decrypt_many(consultations, CONSULTATION_DECRYPT_FIELDS)
+
+
+def decrypt_patients_batch(patients: Sequence[Person]) -> List[Dict[str, str]]:
+    """
+    Decrypt patient fields for a result set (same shape as decrypt_patient_data)
+    """
+    return encryption_service.decrypt_many(patients, ("name",))
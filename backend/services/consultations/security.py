@@ -72,10 +72,13 @@ def encrypt_sensitive_data(data: Dict[str, Any], type_str: str) -> Dict[str, Any
 
 
 def decrypt_sensitive_data(data: Dict[str, Any], type_str: str) -> Dict[str, Any]:
-    """Decrypt sensitive fields in a dictionary (heuristic, length-based)."""
+    """Decrypt sensitive fields in a dictionary (v2 marker or length-based heuristic)."""
     decrypted = data.copy()
     for key, value in decrypted.items():
-        if isinstance(value, str) and len(value) > 50:  # Simple heuristic
+        if not isinstance(value, str):
+            continue
+        # v2 blobs carry an explicit prefix; legacy blobs are only recognizable by size.
+        if encryption_service.is_versioned_ciphertext(value) or len(value) > 50:
             try:
                 decrypted_val = encryption_service.decrypt_sensitive_data(value)
                 if decrypted_val != value:
@@ -13,6 +13,9 @@ Scope includes:
 - vital signs per consultation
 - clinical studies ordered for the patient
 
+Encrypted consultation fields are decrypted for the whole result set in
+one `EncryptionService.decrypt_many` pass before serialisation.
+
 Admin callers see the full expediente; non-admin doctors see only the
 consultations THEY authored (same rule the FHIR Patient/$everything
 operation already applies). Patient demographics are always shown in
@@ -35,8 +38,24 @@ from database import (
     Person,
     PersonDocument,
 )
+from encryption import get_encryption_service
 from services.patient_access import doctor_can_read_patient
 
+# MedicalRecord columns emitted by the aggregator that are encrypted at rest.
+ENCRYPTED_CONSULTATION_FIELDS = (
+    "chief_complaint",
+    "history_present_illness",
+    "family_history",
+    "personal_pathological_history",
+    "personal_non_pathological_history",
+    "physical_examination",
+    "primary_diagnosis",
+    "secondary_diagnoses",
+    "treatment_plan",
+    "follow_up_instructions",
+    "notes",
+)
+
 
 class ExpedienteAggregator:
     """Stateless aggregator — inject a `Session` per call."""
@@ -48,15 +67,23 @@ class ExpedienteAggregator:
     # Public API
     # ------------------------------------------------------------------
 
-    def build(self, patient_id: int, doctor: Person) -> Dict[str, Any]:
-        """Return the complete expediente payload or raise an access error."""
+    def authorize(self, patient_id: int, doctor: Person) -> Person:
+        """Return the patient, or raise LookupError / PermissionError."""
         patient = self._load_patient(patient_id)
         if patient is None:
             raise LookupError("patient_not_found")
         if not doctor_can_read_patient(self.db, doctor, patient):
             raise PermissionError("not_authorized")
+        return patient
+
+    def build(self, patient_id: int, doctor: Person) -> Dict[str, Any]:
+        """Return the complete expediente payload or raise an access error."""
+        patient = self.authorize(patient_id, doctor)
 
         consultations = self._load_consultations(patient_id, doctor)
+        decrypted = get_encryption_service().decrypt_many(
+            consultations, ENCRYPTED_CONSULTATION_FIELDS
+        )
         consultation_ids = [c.id for c in consultations]
         prescriptions_by_consult = self._prescriptions_by_consultation(consultation_ids)
         vitals_by_consult = self._vitals_by_consultation(consultation_ids)
@@ -69,8 +96,9 @@ class ExpedienteAggregator:
                     c,
                     prescriptions=prescriptions_by_consult.get(c.id, []),
                     vitals=vitals_by_consult.get(c.id, []),
+                    decrypted=fields,
                 )
-                for c in consultations
+                for c, fields in zip(consultations, decrypted)
             ],
             "clinical_studies": [self._serialize_study(s) for s in studies],
             "summary": {
@@ -179,22 +207,28 @@ class ExpedienteAggregator:
         c: MedicalRecord,
         prescriptions: List[ConsultationPrescription],
         vitals: List[ConsultationVitalSign],
+        decrypted: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
+        plain = decrypted or {}
+
+        def field(name: str) -> Any:
+            return plain[name] if name in plain else getattr(c, name, None)
+
         return {
             "id": c.id,
             "consultation_date": _iso_or_none(c.consultation_date),
             "consultation_type": getattr(c, "consultation_type", None),
-            "chief_complaint": getattr(c, "chief_complaint", None),
-            "history_present_illness": getattr(c, "history_present_illness", None),
-            "family_history": getattr(c, "family_history", None),
-            "personal_pathological_history": getattr(c, "personal_pathological_history", None),
-            "personal_non_pathological_history": getattr(c, "personal_non_pathological_history", None),
-            "physical_examination": getattr(c, "physical_examination", None),
-            "primary_diagnosis": getattr(c, "primary_diagnosis", None),
-            "secondary_diagnoses": getattr(c, "secondary_diagnoses", None),
-            "treatment_plan": getattr(c, "treatment_plan", None),
-            "follow_up_instructions": getattr(c, "follow_up_instructions", None),
-            "notes": getattr(c, "notes", None),
+            "chief_complaint": field("chief_complaint"),
+            "history_present_illness": field("history_present_illness"),
+            "family_history": field("family_history"),
+            "personal_pathological_history": field("personal_pathological_history"),
+            "personal_non_pathological_history": field("personal_non_pathological_history"),
+            "physical_examination": field("physical_examination"),
+            "primary_diagnosis": field("primary_diagnosis"),
+            "secondary_diagnoses": field("secondary_diagnoses"),
+            "treatment_plan": field("treatment_plan"),
+            "follow_up_instructions": field("follow_up_instructions"),
+            "notes": field("notes"),
             "prescriptions": [self._serialize_prescription(rx) for rx in prescriptions],
             "vital_signs": [self._serialize_vital(vs) for vs in vitals],
         }
@@ -0,0 +1,299 @@
+"""
+Export jobs
+Background queue for heavy exports (ARCO ZIP, expediente, compliance report)
+
+Requests validate access, write the audit entry and enqueue a row in
+`export_jobs`; they return 202 with the job and the client polls it. A
+worker loop drains the queue:
+
+- claiming: one due job at a time with FOR UPDATE SKIP LOCKED, so several
+  instances can work concurrently; the claim pushes `next_attempt_at`
+  `LEASE_SECONDS` ahead and a running job whose lease expired (instance
+  restarted mid-export) is claimed again
+- progress: handlers report a percentage; it is written on a separate
+  session (throttled) so the export's own transaction and server-side
+  cursors are untouched, and every write extends the lease
+- artifacts: the handler yields the file in chunks, which go straight to
+  the storage service (`upload_stream`); downloads are served with Range
+  support (see routes/export_jobs.py) and artifacts are deleted after
+  `ARTIFACT_TTL_HOURS`
+- retries: a failed attempt is re-queued with a linear backoff; after
+  `MAX_ATTEMPTS` the job is parked as 'failed' with its last error
+
+Handlers are registered per kind with `@export_handler(kind)` next to the
+endpoint that enqueues them, and receive `(db, job, progress)`.
+"""
+
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from sqlalchemy.orm import Session
+
+from database import ExportJob, SessionLocal
+from logger import get_logger
+from utils.datetime_utils import utc_now
+
+api_logger = get_logger("medical_records.exports")
+
+KIND_ARCO_EXPORT = "arco_export"
+KIND_EXPEDIENTE = "expediente"
+KIND_COMPLIANCE_REPORT = "compliance_report"
+KIND_FHIR_BULK_EXPORT = "fhir_bulk_export"
+
+POLL_SECONDS = int(os.getenv("EXPORT_JOBS_POLL_SECONDS", "5"))
+MAX_ATTEMPTS = int(os.getenv("EXPORT_JOBS_MAX_ATTEMPTS", "3"))
+ARTIFACT_TTL_HOURS = int(os.getenv("EXPORT_ARTIFACT_TTL_HOURS", "24"))
+LEASE_SECONDS = 600
+RETRY_BACKOFF_SECONDS = 60
+PROGRESS_MIN_INTERVAL_SECONDS = 2.0
+
+
+@dataclass
+class ExportArtifact:
+    filename: str
+    content_type: str
+    chunks: Iterable[bytes]
+
+
+ProgressFn = Callable[[int], None]
+ExportHandler = Callable[[Session, ExportJob, ProgressFn], ExportArtifact]
+
+_HANDLERS: Dict[str, ExportHandler] = {}
+
+
+def export_handler(kind: str):
+    """Register the function that produces artifacts for jobs of `kind`."""
+    def register(handler: ExportHandler) -> ExportHandler:
+        _HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+def enqueue_export(db: Session, kind: str, requested_by: int, params: Optional[Dict[str, Any]] = None) -> ExportJob:
+    """Add a queued job in the caller's transaction (flushes, does not commit)."""
+    if kind not in _HANDLERS:
+        raise ValueError(f"Unknown export kind: {kind}")
+    now = utc_now()
+    job = ExportJob(
+        kind=kind,
+        status="queued",
+        requested_by=requested_by,
+        params=params or {},
+        progress=0,
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    )
+    db.add(job)
+    db.flush()
+    return job
+
+
+def serialize_export_job(job: ExportJob) -> Dict[str, Any]:
+    """Client view of a job (what the polling endpoints return)."""
+    ready = job.status == "succeeded"
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "expires_at": job.expires_at.isoformat() if job.expires_at else None,
+        "file_name": job.artifact_name if ready else None,
+        "file_size": job.artifact_size if ready else None,
+        "download_url": f"/api/exports/{job.id}/download" if ready else None,
+        "error": job.last_error if job.status == "failed" else None,
+    }
+
+
+# ----------------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------------
+
+@dataclass
+class _ClaimedJob:
+    id: int
+    attempts: int
+
+
+def claim_next_job(db: Session, now: Optional[datetime] = None) -> Optional[_ClaimedJob]:
+    """Lease the oldest due job and commit, so the export runs outside the row lock."""
+    now = now or utc_now()
+    job = db.query(ExportJob).filter(
+        ExportJob.status.in_(("queued", "running")),
+        ExportJob.next_attempt_at <= now,
+    ).order_by(
+        ExportJob.next_attempt_at
+    ).limit(1).with_for_update(skip_locked=True).first()
+
+    if job is None:
+        db.commit()
+        return None
+
+    job.status = "running"
+    job.attempts = (job.attempts or 0) + 1
+    job.progress = 0
+    job.started_at = now
+    job.next_attempt_at = now + timedelta(seconds=LEASE_SECONDS)
+    claimed = _ClaimedJob(id=job.id, attempts=job.attempts)
+    db.commit()
+    return claimed
+
+
+class _ProgressReporter:
+    """Throttled progress writes on their own session; each write renews the lease."""
+
+    def __init__(self, job: _ClaimedJob, session_factory=SessionLocal, clock=time.monotonic):
+        self.job = job
+        self._session_factory = session_factory
+        self._clock = clock
+        self._last_percent = 0
+        self._last_write = clock()
+
+    def __call__(self, percent: int) -> None:
+        percent = max(0, min(int(percent), 99))
+        if percent <= self._last_percent or self._clock() - self._last_write < PROGRESS_MIN_INTERVAL_SECONDS:
+            return
+        self._last_percent = percent
+        self._last_write = self._clock()
+        db = self._session_factory()
+        try:
+            db.query(ExportJob).filter(
+                ExportJob.id == self.job.id,
+                ExportJob.attempts == self.job.attempts,
+            ).update({
+                "progress": percent,
+                "next_attempt_at": utc_now() + timedelta(seconds=LEASE_SECONDS),
+            }, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            api_logger.warning("No se pudo registrar el avance de la exportación", exc_info=True, extra={
+                "job_id": self.job.id
+            })
+        finally:
+            db.close()
+
+
+def _counted(chunks: Iterable[bytes], sizes: list) -> Iterator[bytes]:
+    for chunk in chunks:
+        sizes.append(len(chunk))
+        yield chunk
+
+
+def artifact_key(job: ExportJob, filename: str) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    return f"exports/{job.kind}/{job.id}-{uuid.uuid4().hex[:12]}{ext}"
+
+
+def run_job(db: Session, claimed: _ClaimedJob, storage=None, progress: Optional[ProgressFn] = None) -> bool:
+    """Produce and store the artifact of a claimed job; returns True on success."""
+    if storage is None:
+        from services.storage_service import get_storage_service
+        storage = get_storage_service()
+    progress = progress or _ProgressReporter(claimed)
+
+    job = db.get(ExportJob, claimed.id)
+    key = None
+    try:
+        handler = _HANDLERS.get(job.kind)
+        if handler is None:
+            raise ValueError(f"Unknown export kind: {job.kind}")
+        artifact = handler(db, job, progress)
+        key = artifact_key(job, artifact.filename)
+        sizes: list = []
+        storage.upload_stream(_counted(artifact.chunks, sizes), key, artifact.content_type)
+        db.rollback()  # end the export's read transaction
+
+        now = utc_now()
+        stored = db.query(ExportJob).filter(
+            ExportJob.id == claimed.id,
+            ExportJob.attempts == claimed.attempts,
+        ).update({
+            "status": "succeeded",
+            "progress": 100,
+            "artifact_key": key,
+            "artifact_name": artifact.filename,
+            "content_type": artifact.content_type,
+            "artifact_size": sum(sizes),
+            "last_error": None,
+            "finished_at": now,
+            "expires_at": now + timedelta(hours=ARTIFACT_TTL_HOURS),
+        }, synchronize_session=False)
+        db.commit()
+        if not stored:
+            # The lease expired and another worker took over; keep its result
+            storage.delete(key)
+            return False
+        api_logger.info("Exportación generada", extra={
+            "job_id": claimed.id, "kind": job.kind, "bytes": sum(sizes)
+        })
+        return True
+
+    except Exception as e:
+        db.rollback()
+        if key is not None:
+            storage.delete(key)
+        error = (str(e) or e.__class__.__name__)[:2000]
+        values = {"last_error": error}
+        if claimed.attempts >= MAX_ATTEMPTS:
+            values.update(status="failed", finished_at=utc_now())
+        else:
+            values.update(
+                status="queued",
+                next_attempt_at=utc_now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * claimed.attempts),
+            )
+        db.query(ExportJob).filter(
+            ExportJob.id == claimed.id,
+            ExportJob.attempts == claimed.attempts,
+        ).update(values, synchronize_session=False)
+        db.commit()
+        api_logger.error("Error generando exportación", exc_info=True, extra={
+            "job_id": claimed.id, "attempts": claimed.attempts, "error": error
+        })
+        return False
+
+
+def purge_expired_exports(db: Session, storage=None, now: Optional[datetime] = None, batch_size: int = 100) -> int:
+    """Delete artifacts past their retention and mark the jobs 'expired'."""
+    if storage is None:
+        from services.storage_service import get_storage_service
+        storage = get_storage_service()
+    now = now or utc_now()
+    jobs = db.query(ExportJob).filter(
+        ExportJob.status == "succeeded",
+        ExportJob.expires_at <= now,
+    ).limit(batch_size).with_for_update(skip_locked=True).all()
+    for job in jobs:
+        if job.artifact_key:
+            storage.delete(job.artifact_key)
+        job.status = "expired"
+        job.artifact_key = None
+    db.commit()
+    return len(jobs)
+
+
+def process_export_jobs(storage=None, max_jobs: int = 5) -> int:
+    """Run due jobs with a fresh session (entry point for the background loop)."""
+    db = SessionLocal()
+    processed = 0
+    try:
+        purge_expired_exports(db, storage=storage)
+        for _ in range(max_jobs):
+            claimed = claim_next_job(db)
+            if claimed is None:
+                break
+            run_job(db, claimed, storage=storage)
+            processed += 1
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return processed
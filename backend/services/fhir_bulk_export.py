@@ -0,0 +1,236 @@
+"""
+FHIR Bulk Data export (`$export`) — NDJSON, one file per resource type.
+
+The kick-off endpoints (routes/fhir.py) enqueue one export job per
+requested resource type (services/export_jobs.py); the worker calls
+`iter_resources` for its type and writes `ndjson_chunks` straight to the
+storage service, so neither the rows nor the file are held in memory:
+
+- rows are read with `yield_per`, which runs the query on a server-side
+  cursor, and related rows (identifier documents, offices, specialties,
+  medications, vital sign names) are loaded once per batch
+- resources go through the same serializers as the read endpoints
+  (`services/fhir_service`)
+- `_since` keeps only resources whose `updated_at` is at or after the
+  instant (incremental exports; the previous manifest's transactionTime)
+
+Scope follows the FHIR read rules: admins export everything; doctors export
+the patients they may read (created or consulted) and the Encounters —
+with their MedicationRequests and Observations — they authored.
+Practitioners are the authors of the exported Encounters (all doctors for
+an unrestricted admin export).
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Query, Session, joinedload
+
+from database import ConsultationPrescription, ConsultationVitalSign, MedicalRecord, Person
+from logger import get_logger
+from services.fhir_service import (
+    build_doctor_views,
+    build_patient_view,
+    load_documents_by_person,
+    serialize_encounter,
+    serialize_medication_request,
+    serialize_observation,
+    serialize_patient,
+    serialize_practitioner,
+)
+from services.patient_access import readable_patients_filter
+
+api_logger = get_logger("medical_records.api")
+
+NDJSON_CONTENT_TYPE = "application/fhir+ndjson"
+
+# System-level exports cover every type; Patient-level the patient compartment
+BULK_RESOURCE_TYPES = ("Patient", "Practitioner", "Encounter", "MedicationRequest", "Observation")
+PATIENT_COMPARTMENT_TYPES = ("Patient", "Encounter", "MedicationRequest", "Observation")
+
+BATCH_SIZE = 500
+CHUNK_BYTES = 64 * 1024
+
+
+@dataclass
+class BulkExportScope:
+    """Who is exporting and which slice of the data they asked for."""
+    requester: Person
+    patient_ids: Optional[List[int]] = None
+    since: Optional[datetime] = None
+
+    @property
+    def is_admin(self) -> bool:
+        return self.requester.person_type == "admin"
+
+
+# ----------------------------------------------------------------------------
+# Queries
+# ----------------------------------------------------------------------------
+
+def _encounter_criteria(scope: BulkExportScope) -> list:
+    criteria = []
+    if not scope.is_admin:
+        criteria.append(MedicalRecord.doctor_id == scope.requester.id)
+    if scope.patient_ids is not None:
+        criteria.append(MedicalRecord.patient_id.in_(scope.patient_ids))
+    return criteria
+
+
+def _patients(db: Session, scope: BulkExportScope) -> Query:
+    q = db.query(Person).filter(
+        Person.person_type == "patient",
+        readable_patients_filter(scope.requester),
+    )
+    if scope.patient_ids is not None:
+        q = q.filter(Person.id.in_(scope.patient_ids))
+    if scope.since is not None:
+        q = q.filter(Person.updated_at >= scope.since)
+    return q.order_by(Person.id)
+
+
+def _practitioners(db: Session, scope: BulkExportScope) -> Query:
+    q = db.query(Person).filter(Person.person_type == "doctor")
+    if not (scope.is_admin and scope.patient_ids is None):
+        authors = select(MedicalRecord.doctor_id).where(*_encounter_criteria(scope))
+        q = q.filter(Person.id.in_(authors))
+    if scope.since is not None:
+        q = q.filter(Person.updated_at >= scope.since)
+    return q.order_by(Person.id)
+
+
+def _encounters(db: Session, scope: BulkExportScope) -> Query:
+    q = db.query(MedicalRecord).filter(*_encounter_criteria(scope))
+    if scope.since is not None:
+        q = q.filter(MedicalRecord.updated_at >= scope.since)
+    return q.order_by(MedicalRecord.id)
+
+
+def _medication_requests(db: Session, scope: BulkExportScope) -> Query:
+    # subject / requester come from the parent encounter
+    q = (
+        db.query(ConsultationPrescription, MedicalRecord.patient_id, MedicalRecord.doctor_id)
+        .join(MedicalRecord, MedicalRecord.id == ConsultationPrescription.consultation_id)
+        .filter(*_encounter_criteria(scope))
+    )
+    if scope.since is not None:
+        q = q.filter(ConsultationPrescription.updated_at >= scope.since)
+    return q.order_by(ConsultationPrescription.id)
+
+
+def _observations(db: Session, scope: BulkExportScope) -> Query:
+    q = (
+        db.query(ConsultationVitalSign, MedicalRecord.patient_id)
+        .join(MedicalRecord, MedicalRecord.id == ConsultationVitalSign.consultation_id)
+        .filter(*_encounter_criteria(scope))
+    )
+    if scope.since is not None:
+        q = q.filter(ConsultationVitalSign.updated_at >= scope.since)
+    return q.order_by(ConsultationVitalSign.id)
+
+
+_QUERIES = {
+    "Patient": _patients,
+    "Practitioner": _practitioners,
+    "Encounter": _encounters,
+    "MedicationRequest": _medication_requests,
+    "Observation": _observations,
+}
+
+# Many-to-one eager loads for the streamed query (not for the count)
+_EAGER = {
+    "MedicationRequest": (joinedload(ConsultationPrescription.medication),),
+    "Observation": (joinedload(ConsultationVitalSign.vital_sign),),
+}
+
+
+def count_resources(db: Session, resource_type: str, scope: BulkExportScope) -> int:
+    """Number of resources `iter_resources` will consider (for progress)."""
+    return _QUERIES[resource_type](db, scope).order_by(None).count()
+
+
+# ----------------------------------------------------------------------------
+# Resources
+# ----------------------------------------------------------------------------
+
+def _batches(query: Query, batch_size: int) -> Iterator[list]:
+    rows = iter(query.yield_per(batch_size))
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _converted(resource_type: str, row_id: Any, convert) -> Optional[Dict[str, Any]]:
+    """Run a conversion; a row that cannot form a valid resource (e.g. a
+    doctor without a cédula) is logged and left out."""
+    try:
+        return convert()
+    except ValidationError as e:
+        api_logger.warning("Recurso FHIR omitido de la exportación", extra={
+            "resource_type": resource_type, "id": row_id, "error": str(e)[:500]
+        })
+        return None
+
+
+def _patient_resources(db: Session, batch: list) -> Iterator[Optional[Dict[str, Any]]]:
+    documents = load_documents_by_person(db, (p.id for p in batch))
+    for person in batch:
+        view = build_patient_view(db, person, documents=documents.get(person.id, {}))
+        yield _converted("Patient", person.id, lambda: serialize_patient(view))
+
+
+def _practitioner_resources(db: Session, batch: list) -> Iterator[Optional[Dict[str, Any]]]:
+    for person, view in zip(batch, build_doctor_views(db, batch)):
+        yield _converted("Practitioner", person.id, lambda: serialize_practitioner(view))
+
+
+def _serialize_batch(db: Session, resource_type: str, batch: list) -> Iterable[Optional[Dict[str, Any]]]:
+    if resource_type == "Patient":
+        return _patient_resources(db, batch)
+    if resource_type == "Practitioner":
+        return _practitioner_resources(db, batch)
+    if resource_type == "Encounter":
+        return (serialize_encounter(c) for c in batch)
+    if resource_type == "MedicationRequest":
+        return (serialize_medication_request(rx, patient_id, doctor_id) for rx, patient_id, doctor_id in batch)
+    return (serialize_observation(vs, patient_id) for vs, patient_id in batch)
+
+
+def iter_resources(
+    db: Session,
+    resource_type: str,
+    scope: BulkExportScope,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """FHIR resources of one type in `scope`, in id order, streamed in batches."""
+    if resource_type not in _QUERIES:
+        raise ValueError(f"Unsupported resource type: {resource_type}")
+    query = _QUERIES[resource_type](db, scope).options(*_EAGER.get(resource_type, ()))
+    for batch in _batches(query, batch_size):
+        for resource in _serialize_batch(db, resource_type, batch):
+            if resource is not None:
+                yield resource
+
+
+def ndjson_chunks(resources: Iterable[Dict[str, Any]], chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """One JSON resource per line, grouped into chunks of about `chunk_bytes`."""
+    buffer: List[bytes] = []
+    size = 0
+    for resource in resources:
+        line = json.dumps(resource, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
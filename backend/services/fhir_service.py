@@ -7,16 +7,29 @@ documents-normalization work — they read `doctor_profile.curp`,
 current schema those fields live in the join tables (`person_documents`,
 `offices`). This module builds a flattened view of the ORM entity that the
 existing conversion functions accept without modification.
+
+Patient, Practitioner and Encounter resources are emitted by the plain-dict
+`serialize_*` functions below, which produce exactly what
+`InteroperabilityService.*(...).model_dump(exclude_none=True)` returns
+without building and validating the nested pydantic models (most of the CPU
+of a large Bundle or bulk export). Set FHIR_STRICT_VALIDATION=true to route
+them through the pydantic models instead, e.g. to debug a resource that a
+consumer rejects.
 """
 
 from __future__ import annotations
 
+import os
 from types import SimpleNamespace
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from database import Document, Office, PersonDocument, Specialty
+from interoperability import InteroperabilityService
+
+STRICT_VALIDATION = os.getenv("FHIR_STRICT_VALIDATION", "false").lower() == "true"
 
 
 # ---------------------------------------------------------------------------
@@ -54,6 +67,56 @@ def _specialty_name(db: Session, specialty_id: Optional[int]) -> Optional[str]:
     return spec.name if spec else None
 
 
+# ---------------------------------------------------------------------------
+# Bulk loaders — one query per table for a whole Bundle instead of one per
+# resource. Same rules as the single-row helpers above.
+# ---------------------------------------------------------------------------
+
+def load_documents_by_person(db: Session, person_ids: Iterable[int]) -> Dict[int, Dict[str, str]]:
+    """`_load_documents_by_name` for many people: {person_id: {doc name: value}}."""
+    ids = sorted(set(person_ids))
+    if not ids:
+        return {}
+    rows = (
+        db.query(PersonDocument, Document)
+        .join(Document, PersonDocument.document_id == Document.id)
+        .filter(
+            PersonDocument.person_id.in_(ids),
+            PersonDocument.is_active.is_(True),
+        )
+        .all()
+    )
+    out: Dict[int, Dict[str, str]] = {}
+    for pd, doc in rows:
+        out.setdefault(pd.person_id, {})[doc.name] = pd.document_value
+    return out
+
+
+def load_primary_offices(db: Session, doctor_ids: Iterable[int]) -> Dict[int, Office]:
+    """`_primary_office` for many doctors: the lowest-id active office of each."""
+    ids = sorted(set(doctor_ids))
+    if not ids:
+        return {}
+    rows = (
+        db.query(Office)
+        .filter(Office.doctor_id.in_(ids), Office.is_active.is_(True))
+        .order_by(Office.doctor_id.asc(), Office.id.asc())
+        .all()
+    )
+    out: Dict[int, Office] = {}
+    for office in rows:
+        out.setdefault(office.doctor_id, office)
+    return out
+
+
+def load_specialty_names(db: Session, specialty_ids: Iterable[Optional[int]]) -> Dict[int, str]:
+    ids = sorted({sid for sid in specialty_ids if sid})
+    if not ids:
+        return {}
+    rows = db.query(Specialty.id, Specialty.name).filter(Specialty.id.in_(ids)).all()
+    return {sid: name for sid, name in rows}
+
+
 # ---------------------------------------------------------------------------
 # Flattened views that match interoperability.py's expectations.
 # ---------------------------------------------------------------------------
@@ -65,10 +128,46 @@ DOCTOR_LICENSE_DOCUMENT_NAMES = (
 
 def build_doctor_view(db: Session, person: Any) -> SimpleNamespace:
     """Build the view InteroperabilityService.doctor_to_fhir_practitioner expects."""
-    docs = _load_documents_by_name(db, person.id)
-    office = _primary_office(db, person.id)
-    specialty = _specialty_name(db, getattr(person, "specialty_id", None))
+    return _doctor_view(
+        person,
+        _load_documents_by_name(db, person.id),
+        _primary_office(db, person.id),
+        _specialty_name(db, getattr(person, "specialty_id", None)),
+    )
+
+
+def build_doctor_views(
+    db: Session,
+    people: List[Any],
+    documents: Optional[Dict[int, Dict[str, str]]] = None,
+) -> List[SimpleNamespace]:
+    """`build_doctor_view` for several doctors in three queries (documents,
+    offices, specialties) regardless of how many there are.
+
+    Pass `documents` when the caller already loaded them with
+    `load_documents_by_person` (e.g. together with the patient's).
+    """
+    ids = [p.id for p in people]
+    docs = documents if documents is not None else load_documents_by_person(db, ids)
+    offices = load_primary_offices(db, ids)
+    specialties = load_specialty_names(db, (getattr(p, "specialty_id", None) for p in people))
+    return [
+        _doctor_view(
+            p,
+            docs.get(p.id, {}),
+            offices.get(p.id),
+            specialties.get(getattr(p, "specialty_id", None)),
+        )
+        for p in people
+    ]
+
 
+def _doctor_view(
+    person: Any,
+    docs: Dict[str, str],
+    office: Optional[Office],
+    specialty: Optional[str],
+) -> SimpleNamespace:
     professional_license = next(
         (docs[name] for name in DOCTOR_LICENSE_DOCUMENT_NAMES if name in docs),
         None,
@@ -103,9 +202,16 @@ def build_doctor_view(db: Session, person: Any) -> SimpleNamespace:
     )
 
 
-def build_patient_view(db: Session, person: Any) -> SimpleNamespace:
-    """Build the view InteroperabilityService.patient_to_fhir_patient expects."""
-    docs = _load_documents_by_name(db, person.id)
+def build_patient_view(
+    db: Session,
+    person: Any,
+    documents: Optional[Dict[str, str]] = None,
+) -> SimpleNamespace:
+    """Build the view InteroperabilityService.patient_to_fhir_patient expects.
+
+    `documents` (from `load_documents_by_person`) skips the per-patient query.
+    """
+    docs = documents if documents is not None else _load_documents_by_name(db, person.id)
     return SimpleNamespace(
         id=str(person.id),
         name=person.name,
@@ -139,6 +245,160 @@ def _normalize_gender(raw: Optional[str]) -> str:
     return "desconocido"
 
 
+# ---------------------------------------------------------------------------
+# Patient / Practitioner (flattened view → FHIR), plain dicts.
+# ---------------------------------------------------------------------------
+
+_IDENTIFIER_TYPE_SYSTEM = "http://terminology.hl7.org/CodeSystem/v2-0203"
+_CURP_SYSTEM = "urn:oid:2.16.840.1.113883.4.629"
+_RFC_SYSTEM = "urn:oid:2.16.840.1.113883.4.628"
+_LICENSE_SYSTEM = "urn:oid:2.16.840.1.113883.4.630"
+_MRN_SYSTEM = "urn:oid:2.16.840.1.113883.4.631"
+_GENDER_CODES = {"masculino": "male", "femenino": "female", "otro": "other"}
+
+
+def _invalid(model: str, field: str, value: Any) -> ValidationError:
+    """The error the pydantic model raises for a missing required string,
+    so callers see the same failure on both paths."""
+    return ValidationError.from_exception_data(
+        model, [{"type": "string_type", "loc": (field,), "input": value}]
+    )
+
+
+def _identifier(code: str, display: str, text: str, system: str, value: Any) -> Dict[str, Any]:
+    if not isinstance(value, str):
+        raise _invalid("FHIRIdentifier", "value", value)
+    return {
+        "use": "official",
+        "type": {
+            "coding": [{"system": _IDENTIFIER_TYPE_SYSTEM, "code": code, "display": display}],
+            "text": text,
+        },
+        "system": system,
+        "value": value,
+    }
+
+
+def _human_name(full_name: Optional[str], text: Optional[str], prefix: Optional[str] = None) -> Dict[str, Any]:
+    parts = full_name.split() if full_name else []
+    name: Dict[str, Any] = {
+        "use": "official",
+        "family": " ".join(parts[1:]),
+        "given": parts[:1],
+    }
+    if prefix:
+        name["prefix"] = [prefix]
+    if text is not None:
+        name["text"] = text
+    return name
+
+
+def _address(use: str, text: Any, city: Any, state: Any, postal_code: Any) -> Dict[str, Any]:
+    address: Dict[str, Any] = {"use": use, "type": "physical"}
+    if text is not None:
+        address["text"] = text
+    address["line"] = [text]
+    address["city"] = city
+    address["state"] = state
+    if postal_code is not None:
+        address["postalCode"] = postal_code
+    address["country"] = "MX"
+    return address
+
+
+def serialize_practitioner(view: Any) -> Dict[str, Any]:
+    """FHIR Practitioner from `build_doctor_view(s)` output.
+
+    Same dict as `doctor_to_fhir_practitioner(view).model_dump(exclude_none=True)`;
+    a doctor without a professional license raises the same ValidationError.
+    """
+    if STRICT_VALIDATION:
+        return InteroperabilityService.doctor_to_fhir_practitioner(view).model_dump(exclude_none=True)
+
+    identifiers = []
+    if view.curp:
+        identifiers.append(_identifier("SB", "Social Beneficiary Identifier", "CURP", _CURP_SYSTEM, view.curp))
+    if view.rfc:
+        identifiers.append(_identifier("TAX", "Tax ID number", "RFC", _RFC_SYSTEM, view.rfc))
+    license_number = view.professional_license
+    identifiers.append(
+        _identifier("PRN", "Provider number", "Cédula Profesional", _LICENSE_SYSTEM, license_number)
+    )
+
+    telecom = []
+    if view.email:
+        telecom.append({"system": "email", "value": view.email, "use": "work"})
+    if view.phone:
+        telecom.append({"system": "phone", "value": view.phone, "use": "work"})
+
+    qualifications: List[Dict[str, Any]] = [{
+        "identifier": [{"value": license_number}],
+        "code": {
+            "coding": [{"system": "http://snomed.info/sct", "code": "309343006", "display": "Physician"}],
+            "text": "Médico",
+        },
+        "issuer": {"display": "SEP - Secretaría de Educación Pública"},
+    }]
+    if view.specialty:
+        qualifications.append({
+            "code": {
+                "coding": [{"system": "http://snomed.info/sct", "display": view.specialty}],
+                "text": view.specialty,
+            },
+            "issuer": {"display": "Consejo de Especialidad"},
+        })
+
+    return {
+        "resourceType": "Practitioner",
+        "id": view.id,
+        "identifier": identifiers,
+        "active": view.is_active,
+        "name": [_human_name(view.name, getattr(view, "full_name", view.name), prefix=view.title)],
+        "telecom": telecom,
+        "address": [_address(
+            "work", view.office_address, view.office_city, view.office_state, view.office_postal_code,
+        )],
+        "gender": "unknown",
+        "birthDate": view.birth_date.isoformat() if view.birth_date else "",
+        "qualification": qualifications,
+    }
+
+
+def serialize_patient(view: Any) -> Dict[str, Any]:
+    """FHIR Patient from `build_patient_view` output.
+
+    Same dict as `patient_to_fhir_patient(view).model_dump(exclude_none=True)`.
+    """
+    if STRICT_VALIDATION:
+        return InteroperabilityService.patient_to_fhir_patient(view).model_dump(exclude_none=True)
+
+    identifiers = []
+    if view.curp:
+        identifiers.append(_identifier("SB", "Social Beneficiary Identifier", "CURP", _CURP_SYSTEM, view.curp))
+    identifiers.append(_identifier("MR", "Medical record number", "Hospital ID", _MRN_SYSTEM, view.id))
+
+    telecom = []
+    if view.phone:
+        telecom.append({"system": "phone", "value": view.phone, "use": "home"})
+    if view.email:
+        telecom.append({"system": "email", "value": view.email, "use": "home"})
+
+    resource: Dict[str, Any] = {
+        "resourceType": "Patient",
+        "id": view.id,
+        "identifier": identifiers,
+        "active": True,
+        "name": [_human_name(view.name, view.name)],
+    }
+    if telecom:
+        resource["telecom"] = telecom
+    resource["gender"] = _GENDER_CODES.get(view.gender.lower(), "unknown")
+    resource["birthDate"] = view.birth_date.isoformat() if view.birth_date else ""
+    if view.address:
+        resource["address"] = [_address("home", view.address, view.city, view.state, view.postal_code)]
+    return resource
+
+
 # ---------------------------------------------------------------------------
 # Bundle helpers — minimal R4 Bundle envelope.
 # ---------------------------------------------------------------------------
@@ -187,18 +447,61 @@ def fix_encounter_keys(encounter: Dict[str, Any]) -> Dict[str, Any]:
     return out
 
 
+def serialize_encounter(consultation: Any) -> Dict[str, Any]:
+    """Convert a MedicalRecord row into a FHIR Encounter dict (with `class` key).
+
+    Same output as `consultation_to_fhir_encounter` + `fix_encounter_keys`
+    (including `class` coming last), built straight from the row.
+    """
+    if STRICT_VALIDATION:
+        fhir_model = InteroperabilityService.consultation_to_fhir_encounter(
+            build_encounter_view(consultation),
+            patient_id=str(consultation.patient_id),
+            doctor_id=str(consultation.doctor_id),
+        )
+        return fix_encounter_keys(fhir_model.model_dump(exclude_none=True))
+
+    date = getattr(consultation, "consultation_date", None)
+    when = date.isoformat() if date else ""
+    return {
+        "resourceType": "Encounter",
+        "id": str(consultation.id),
+        "status": "finished",
+        "subject": {"reference": f"Patient/{consultation.patient_id}"},
+        "participant": [{
+            "individual": {"reference": f"Practitioner/{consultation.doctor_id}"},
+            "type": [{
+                "coding": [{
+                    "system": "http://terminology.hl7.org/CodeSystem/v3-ParticipationType",
+                    "code": "PPRF",
+                    "display": "primary performer",
+                }]
+            }],
+        }],
+        "period": {"start": when, "end": when},
+        "reasonCode": [{"text": getattr(consultation, "chief_complaint", None)}],
+        "class": {
+            "system": "http://terminology.hl7.org/CodeSystem/v3-ActCode",
+            "code": "AMB",
+            "display": "ambulatory",
+        },
+    }
+
+
 def build_everything_bundle(
     patient_fhir: Dict[str, Any],
     encounter_fhirs: List[Dict[str, Any]],
     practitioner_fhirs: Optional[List[Dict[str, Any]]] = None,
     medication_request_fhirs: Optional[List[Dict[str, Any]]] = None,
     observation_fhirs: Optional[List[Dict[str, Any]]] = None,
+    links: Optional[List[Dict[str, str]]] = None,
 ) -> Dict[str, Any]:
     """Build a FHIR R4 `searchset` Bundle for the `Patient/$everything` op.
 
     Contains the Patient (mode=match) plus all their Encounters,
     MedicationRequests, Observations and any involved Practitioners (all
-    mode=include).
+    mode=include). When the operation is paged, `links` carries the
+    self/next/previous URLs (see `paging_links`).
     """
     entries: List[Dict[str, Any]] = [
         {"resource": patient_fhir, "search": {"mode": "match"}}
@@ -211,12 +514,15 @@ def build_everything_bundle(
         entries.append({"resource": obs, "search": {"mode": "include"}})
     for prac in practitioner_fhirs or []:
         entries.append({"resource": prac, "search": {"mode": "include"}})
-    return {
+    bundle: Dict[str, Any] = {
         "resourceType": "Bundle",
         "type": "searchset",
         "total": len(entries),
-        "entry": entries,
     }
+    if links:
+        bundle["link"] = links
+    bundle["entry"] = entries
+    return bundle
 
 
 # ---------------------------------------------------------------------------
@@ -373,18 +679,42 @@ def serialize_observation(
 
 def build_searchset_bundle(
     entries: List[Dict[str, Any]],
+    total: Optional[int] = None,
+    links: Optional[List[Dict[str, str]]] = None,
 ) -> Dict[str, Any]:
     """Wrap a list of FHIR resources in a searchset Bundle.
 
     Each entry is tagged with `search.mode = "match"` as required by the
-    R4 spec for search-type Bundles.
+    R4 spec for search-type Bundles. For a paged search `total` is the
+    number of matches across all pages and `links` the paging URLs;
+    otherwise `total` is the number of entries.
     """
-    return {
+    bundle: Dict[str, Any] = {
         "resourceType": "Bundle",
         "type": "searchset",
-        "total": len(entries),
-        "entry": [
-            {"resource": r, "search": {"mode": "match"}}
-            for r in entries
-        ],
+        "total": len(entries) if total is None else total,
     }
+    if links:
+        bundle["link"] = links
+    bundle["entry"] = [
+        {"resource": r, "search": {"mode": "match"}}
+        for r in entries
+    ]
+    return bundle
+
+
+def paging_links(url: Any, count: int, offset: int, total: int) -> List[Dict[str, str]]:
+    """Bundle.link entries (self / previous / next) for a `_count`/`_offset` page.
+
+    `url` is the request URL (a Starlette `URL`); the other query
+    parameters are kept so following a link repeats the same search.
+    """
+    def page(at: int) -> str:
+        return str(url.include_query_params(_count=count, _offset=at))
+
+    links = [{"relation": "self", "url": page(offset)}]
+    if count and offset > 0:
+        links.append({"relation": "previous", "url": page(max(offset - count, 0))})
+    if count and offset + count < total:
+        links.append({"relation": "next", "url": page(offset + count)})
+    return links
@@ -116,6 +116,34 @@ class GeminiBotService:
             }
         )
         
+        # Tool: Get days with openings
+        get_days_func = FunctionDeclaration(
+            name="get_available_days",
+            description="Get the next days that still have available times for a doctor (up to 14 days ahead by default). Use this when the user has no specific date in mind or the requested date has no availability.",
+            parameters={
+                "type": "object",
+                "properties": {
+                    "doctor_id": {
+                        "type": "integer",
+                        "description": "The ID of the doctor"
+                    },
+                    "office_id": {
+                        "type": "integer",
+                        "description": "The ID of the office"
+                    },
+                    "start_date_str": {
+                        "type": "string",
+                        "description": "First day in format YYYY-MM-DD (defaults to today)"
+                    },
+                    "days": {
+                        "type": "integer",
+                        "description": "Number of days to look at (default 14)"
+                    }
+                },
+                "required": ["doctor_id", "office_id"]
+            }
+        )
+        
         # Tool: Find patient by phone
         find_patient_func = FunctionDeclaration(
             name="find_patient_by_phone",
@@ -265,6 +293,7 @@ class GeminiBotService:
                 get_doctors_func,
                 get_offices_func,
                 get_slots_func,
+                get_days_func,
                 find_patient_func,
                 create_patient_func,
                 check_appointments_func,
@@ -330,7 +359,7 @@ Cuando el usuario escribe por primera vez:
 - **IMPORTANTE**: No permitas fechas en el pasado. Si el usuario intenta agendar en el pasado, informa amigablemente y pide otra fecha.
 - Una vez tengas la fecha, usa `get_available_slots(doctor_id, office_id, date_str)` para obtener horarios disponibles
 - Presenta los horarios de forma clara, agrupados si hay muchos
-- Si no hay horarios disponibles, sugiere otras fechas cercanas
+- Si no hay horarios disponibles, o el usuario no tiene una fecha en mente, usa `get_available_days(doctor_id, office_id)` para sugerir los próximos días con horarios libres
 
 ## 5. VALIDACIÓN DE PACIENTE
 - Usa `find_patient_by_phone(phone)` para buscar si el número ya está registrado
@@ -456,6 +485,15 @@ Cuando el usuario escribe por primera vez:
                     args.get("date_str")
                 )
             
+            elif function_name == "get_available_days":
+                return gemini_helpers.get_available_days(
+                    self.db,
+                    args.get("doctor_id"),
+                    args.get("office_id"),
+                    args.get("start_date_str"),
+                    args.get("days") or 14
+                )
+            
             elif function_name == "find_patient_by_phone":
                 return gemini_helpers.find_patient_by_phone(self.db, args.get("phone"))
             
@@ -7,9 +7,9 @@ from google_auth_oauthlib.flow import Flow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 import os
 
 from database import GoogleCalendarToken, Appointment, GoogleCalendarEventMapping
@@ -21,6 +21,15 @@ api_logger = get_logger("medical_records.google_calendar")
 # Scopes necesarios para Google Calendar API
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Máximo de peticiones por batch HTTP de la API de Google
+BATCH_MAX_REQUESTS = 50
+
+_SYNC_EVENT_TYPES = {
+    'insert': 'appointment_created_with_calendar_sync',
+    'update': 'appointment_updated_with_calendar_sync',
+    'delete': 'appointment_deleted_with_calendar_sync',
+}
+
 
 class GoogleCalendarService:
     """Service para gestionar integración con Google Calendar"""
@@ -161,6 +170,33 @@ class GoogleCalendarService:
         
         return credentials
     
+    @staticmethod
+    def build_event_body(appointment: Appointment) -> Dict[str, Any]:
+        """Convertir una cita en el cuerpo de un evento de Google Calendar"""
+        # Obtener información del paciente y doctor
+        patient_name = appointment.patient.full_name if appointment.patient else "Paciente"
+        doctor_name = appointment.doctor.full_name if appointment.doctor else "Doctor"
+        
+        # Calcular hora de fin (usar end_time si existe, sino calcular)
+        if appointment.end_time:
+            end_datetime = appointment.end_time
+        else:
+            duration_minutes = appointment.doctor.appointment_duration if appointment.doctor and appointment.doctor.appointment_duration else 30
+            end_datetime = appointment.appointment_date + timedelta(minutes=duration_minutes)
+        
+        return {
+            'summary': f'Cita médica - {patient_name}',
+            'description': f'Paciente: {patient_name}\nDoctor: {doctor_name}',
+            'start': {
+                'dateTime': appointment.appointment_date.isoformat(),
+                'timeZone': 'America/Mexico_City',
+            },
+            'end': {
+                'dateTime': end_datetime.isoformat(),
+                'timeZone': 'America/Mexico_City',
+            },
+        }
+    
     @staticmethod
     def create_calendar_event(db: Session, doctor_id: int, appointment: Appointment) -> Optional[str]:
         """Crear evento en Google Calendar desde una cita"""
@@ -195,30 +231,8 @@ class GoogleCalendarService:
         try:
             service = build('calendar', 'v3', credentials=credentials)
             
-            # Obtener información del paciente y doctor
-            patient_name = appointment.patient.full_name if appointment.patient else "Paciente"
-            doctor_name = appointment.doctor.full_name if appointment.doctor else "Doctor"
-            
-            # Calcular hora de fin (usar end_time si existe, sino calcular)
-            if appointment.end_time:
-                end_datetime = appointment.end_time
-            else:
-                duration_minutes = appointment.doctor.appointment_duration if appointment.doctor and appointment.doctor.appointment_duration else 30
-                end_datetime = appointment.appointment_date + timedelta(minutes=duration_minutes)
-            
             # Convertir appointment a evento de Google Calendar
-            event = {
-                'summary': f'Cita médica - {patient_name}',
-                'description': f'Paciente: {patient_name}\nDoctor: {doctor_name}',
-                'start': {
-                    'dateTime': appointment.appointment_date.isoformat(),
-                    'timeZone': 'America/Mexico_City',
-                },
-                'end': {
-                    'dateTime': end_datetime.isoformat(),
-                    'timeZone': 'America/Mexico_City',
-                },
-            }
+            event = GoogleCalendarService.build_event_body(appointment)
             
             calendar_id = token_data.calendar_id or 'primary'
             
@@ -329,29 +343,7 @@ class GoogleCalendarService:
         try:
             service = build('calendar', 'v3', credentials=credentials)
             
-            # Obtener información del paciente y doctor
-            patient_name = appointment.patient.full_name if appointment.patient else "Paciente"
-            doctor_name = appointment.doctor.full_name if appointment.doctor else "Doctor"
-            
-            # Calcular hora de fin
-            if appointment.end_time:
-                end_datetime = appointment.end_time
-            else:
-                duration_minutes = appointment.doctor.appointment_duration if appointment.doctor and appointment.doctor.appointment_duration else 30
-                end_datetime = appointment.appointment_date + timedelta(minutes=duration_minutes)
-            
-            event = {
-                'summary': f'Cita médica - {patient_name}',
-                'description': f'Paciente: {patient_name}\nDoctor: {doctor_name}',
-                'start': {
-                    'dateTime': appointment.appointment_date.isoformat(),
-                    'timeZone': 'America/Mexico_City',
-                },
-                'end': {
-                    'dateTime': end_datetime.isoformat(),
-                    'timeZone': 'America/Mexico_City',
-                },
-            }
+            event = GoogleCalendarService.build_event_body(appointment)
             
             calendar_id = token_data.calendar_id or 'primary'
             
@@ -534,5 +526,149 @@ class GoogleCalendarService:
                 "appointment_id": appointment_id
             })
             return False
-
-
+    
+    @staticmethod
+    def sync_events_batch(db: Session, doctor_id: int, changes: Dict[int, str]) -> Dict[int, Optional[str]]:
+        """
+        Aplicar varios cambios de citas de un doctor en Google Calendar
+        Usa un solo refresh de credenciales y peticiones batch (hasta 50 por llamada HTTP)
+        
+        Args:
+            changes: appointment_id -> 'upsert' | 'delete'
+        Returns:
+            appointment_id -> None si se aplicó (o no hay nada que hacer), o el error para reintentar
+        """
+        results: Dict[int, Optional[str]] = {appointment_id: None for appointment_id in changes}
+        if not changes:
+            return results
+        
+        mappings = {
+            mapping.appointment_id: mapping
+            for mapping in db.query(GoogleCalendarEventMapping).filter(
+                GoogleCalendarEventMapping.appointment_id.in_(list(changes))
+            ).all()
+        }
+        
+        # Verificar que el doctor tenga Google Calendar conectado
+        token_data = db.query(GoogleCalendarToken).filter(
+            GoogleCalendarToken.doctor_id == doctor_id,
+            GoogleCalendarToken.sync_enabled == True
+        ).first()
+        
+        if not token_data:
+            # Sin sincronización: solo limpiar mapeos de citas eliminadas
+            for appointment_id, operation in changes.items():
+                if operation == 'delete' and appointment_id in mappings:
+                    db.delete(mappings[appointment_id])
+            db.commit()
+            return results
+        
+        credentials = GoogleCalendarService.get_valid_credentials(db, doctor_id)
+        if not credentials:
+            error = "No se pudieron obtener credenciales válidas"
+            return {appointment_id: error for appointment_id in changes}
+        
+        upsert_ids = [appointment_id for appointment_id, operation in changes.items() if operation == 'upsert']
+        appointments = {}
+        if upsert_ids:
+            appointments = {
+                appointment.id: appointment
+                for appointment in db.query(Appointment).options(
+                    joinedload(Appointment.patient),
+                    joinedload(Appointment.doctor)
+                ).filter(Appointment.id.in_(upsert_ids)).all()
+            }
+        
+        service = build('calendar', 'v3', credentials=credentials, cache_discovery=False)
+        events = service.events()
+        calendar_id = token_data.calendar_id or 'primary'
+        
+        # (appointment_id, tipo, petición)
+        requests: List[Tuple[int, str, Any]] = []
+        for appointment_id, operation in changes.items():
+            mapping = mappings.get(appointment_id)
+            if operation == 'delete':
+                if mapping is not None:
+                    requests.append((appointment_id, 'delete', events.delete(
+                        calendarId=calendar_id, eventId=mapping.google_event_id
+                    )))
+                continue
+            
+            appointment = appointments.get(appointment_id)
+            if appointment is None:
+                # La cita ya no existe: nada que sincronizar
+                continue
+            body = GoogleCalendarService.build_event_body(appointment)
+            if mapping is not None:
+                requests.append((appointment_id, 'update', events.update(
+                    calendarId=calendar_id, eventId=mapping.google_event_id, body=body
+                )))
+            else:
+                requests.append((appointment_id, 'insert', events.insert(calendarId=calendar_id, body=body)))
+        
+        responses: Dict[str, Tuple[Any, Optional[Exception]]] = {}
+        
+        def _collect(request_id, response, exception):
+            responses[request_id] = (response, exception)
+        
+        for start in range(0, len(requests), BATCH_MAX_REQUESTS):
+            chunk = requests[start:start + BATCH_MAX_REQUESTS]
+            batch = service.new_batch_http_request(callback=_collect)
+            for appointment_id, _, request in chunk:
+                batch.add(request, request_id=str(appointment_id))
+            try:
+                batch.execute()
+            except Exception as e:
+                for appointment_id, _, _ in chunk:
+                    responses.setdefault(str(appointment_id), (None, e))
+        
+        synced = []
+        for appointment_id, kind, _ in requests:
+            response, exception = responses.get(str(appointment_id), (None, None))
+            status_code = exception.resp.status if isinstance(exception, HttpError) and hasattr(exception, 'resp') else None
+            mapping = mappings.get(appointment_id)
+            
+            if kind == 'delete' and (exception is None or status_code in (404, 410)):
+                # Si el evento ya no existe en Google Calendar, eliminar mapeo de todas formas
+                db.delete(mapping)
+                synced.append((appointment_id, kind))
+                continue
+            if exception is None:
+                if kind == 'insert':
+                    db.add(GoogleCalendarEventMapping(
+                        appointment_id=appointment_id,
+                        google_event_id=response.get('id'),
+                        doctor_id=doctor_id
+                    ))
+                synced.append((appointment_id, kind))
+                continue
+            if kind == 'update' and status_code in (404, 410):
+                # El evento se borró en Google: quitar mapeo para recrearlo en el reintento
+                db.delete(mapping)
+            results[appointment_id] = str(exception)
+        
+        token_data.last_sync_at = utc_now()
+        db.commit()
+        
+        api_logger.info("Lote sincronizado con Google Calendar", extra={
+            "doctor_id": doctor_id,
+            "requested": len(changes),
+            "synced": len(synced),
+            "failed": sum(1 for error in results.values() if error)
+        })
+        
+        # Track Google Calendar sync in Amplitude
+        try:
+            from services.amplitude_service import AmplitudeService
+            for appointment_id, kind in synced:
+                AmplitudeService.track_calendar_sync(
+                    event_type=_SYNC_EVENT_TYPES[kind],
+                    appointment_id=appointment_id,
+                    doctor_id=doctor_id,
+                    success=True
+                )
+        except Exception:
+            # Silently fail - Amplitude tracking is non-critical
+            pass
+        
+        return results
@@ -7,11 +7,21 @@ expediente PDF export.
 
 Rule: doctors see only patients they created or have consulted.
 Admins see everyone. Anyone else is denied.
+
+Three shapes of the same rule:
+- `doctor_can_read_patient`   one patient (detail endpoints)
+- `readable_patient_ids`      bulk: the readable subset of N ids, one query
+- `readable_patients_filter`  SQL predicate over `Person`, so searches and
+                              cohort lookups apply the ACL in the query itself
 """
 
 from __future__ import annotations
 
+from typing import Iterable, Set
+
+from sqlalchemy import exists, false, or_, true
 from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement
 
 from database import MedicalRecord, Person
 
@@ -40,3 +50,40 @@ def doctor_can_read_patient(db: Session, doctor: Person, patient: Person) -> boo
         is not None
     )
     return has_consultation
+
+
+def readable_patients_filter(doctor: Person) -> ColumnElement:
+    """Return a predicate on `Person` that is true for patients `doctor` may read.
+
+    Compose it into any `db.query(Person)` so the ACL runs inside the
+    search SQL instead of once per result row:
+
+        db.query(Person).filter(Person.person_type == "patient",
+                                readable_patients_filter(doctor))
+    """
+    if doctor.person_type == "admin":
+        return true()
+    if doctor.person_type != "doctor":
+        return false()
+    consulted = exists().where(
+        MedicalRecord.patient_id == Person.id,
+        MedicalRecord.doctor_id == doctor.id,
+    )
+    return or_(Person.created_by == doctor.id, consulted)
+
+
+def readable_patient_ids(db: Session, doctor: Person, patient_ids: Iterable[int]) -> Set[int]:
+    """Return the subset of `patient_ids` that `doctor` may read, in one query."""
+    ids = {int(pid) for pid in patient_ids if pid is not None}
+    if not ids:
+        return set()
+    if doctor.person_type == "admin":
+        return ids
+    if doctor.person_type != "doctor":
+        return set()
+    rows = (
+        db.query(Person.id)
+        .filter(Person.id.in_(ids), readable_patients_filter(doctor))
+        .all()
+    )
+    return {row[0] for row in rows}
@@ -11,6 +11,7 @@ import schemas
 from utils.audit_utils import serialize_instance
 from utils.datetime_utils import utc_now
 from utils.document_validators import validate_curp_conditional
+from utils.pagination import apply_keyset
 
 api_logger = get_logger("medical_records.api")
 security_logger = get_logger("medical_records.security")
@@ -97,13 +98,23 @@ class PatientService:
         return patient_data
 
     @classmethod
-    def get_patients(cls, db: Session, doctor_id: int, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get list of patients created by the current doctor with decrypted sensitive data."""
+    def get_patients(
+        cls, db: Session, doctor_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get list of patients created by the current doctor with decrypted sensitive data.
+
+        Ordered by id; when `cursor` is given the page is keyset-paginated on id
+        and `skip` is ignored.
+        """
         try:
-            patients = db.query(Person).filter(
+            query = db.query(Person).filter(
                 Person.person_type == 'patient',
                 Person.created_by == doctor_id
-            ).offset(skip).limit(limit).all()
+            )
+            query = apply_keyset(query, None, Person.id, cursor, descending=False)
+            if not cursor:
+                query = query.offset(skip)
+            patients = query.limit(limit).all()
             
             decrypted_patients = []
             for patient in patients:
@@ -20,26 +20,36 @@ is in use.
 
 All queries go through SQLAlchemy ORM — no raw SQL — so the tests can
 mock `Session.query` via the same chained-MagicMock pattern used in
-the rest of the codebase.
+the rest of the codebase. Bucketing (month, weekday × hour, age,
+averages) happens in PostgreSQL with `date_trunc` / `extract` / `age()`
+so only the aggregated cells travel back, never one row per consultation.
+
+Time series (consultations, new patients, studies, durations, heatmap)
+read the per-doctor daily rollups (models/analytics.py) instead of the
+base tables; top diagnoses and demographics still query them directly.
 """
 
 from __future__ import annotations
 
-from collections import Counter, defaultdict
+from collections import Counter
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import and_, func
+from sqlalchemy import and_, case, func
 from sqlalchemy.orm import Session
 
 from database import (
-    Appointment,
-    ClinicalStudy,
+    AppointmentDailyRollup,
+    AppointmentHourlyRollup,
     MedicalRecord,
     Person,
+    PracticeDailyRollup,
 )
 
+# Statuses whose appointment length counts towards the average duration
+DURATION_STATUSES = ["completed", "confirmada", "por_confirmar"]
+
 
 # ---------------------------------------------------------------------------
 # Helpers
@@ -74,24 +84,32 @@ def _month_starts(anchor: datetime, count: int) -> List[MonthRange]:
     return list(reversed(out))
 
 
-def _age_bucket(birth_date: Optional[date], today: date) -> str:
-    if birth_date is None:
-        return "unknown"
-    try:
-        age = today.year - birth_date.year - (
-            (today.month, today.day) < (birth_date.month, birth_date.day)
-        )
-    except Exception:
-        return "unknown"
-    if age < 18:
-        return "0-17"
-    if age < 30:
-        return "18-29"
-    if age < 45:
-        return "30-44"
-    if age < 60:
-        return "45-59"
-    return "60+"
+# (exclusive upper age, label); the last bucket is open-ended
+AGE_BUCKETS = [(18, "0-17"), (30, "18-29"), (45, "30-44"), (60, "45-59")]
+AGE_BUCKET_LABELS = [label for _, label in AGE_BUCKETS] + ["60+", "unknown"]
+
+
+def _age_bucket_expr(birth_date_col, today: date):
+    """Age bucket label in SQL: CASE over extract(year from age(today, birth_date));
+    NULL birth dates are "unknown"."""
+    age = func.extract("year", func.age(today, birth_date_col))
+    return case(
+        (birth_date_col.is_(None), "unknown"),
+        *[(age < upper, label) for upper, label in AGE_BUCKETS],
+        else_="60+",
+    )
+
+
+def _month_counts(rows, months: List[MonthRange]) -> List[Dict[str, Any]]:
+    """Map (date_trunc month, count) rows onto the full list of months."""
+    buckets: Dict[str, int] = {m.label: 0 for m in months}
+    for month, count in rows:
+        if month is None:
+            continue
+        key = f"{month.year:04d}-{month.month:02d}"
+        if key in buckets:
+            buckets[key] += int(count or 0)
+    return [{"month": m.label, "count": buckets[m.label]} for m in months]
 
 
 WEEKDAY_NAMES = ["lun", "mar", "mié", "jue", "vie", "sáb", "dom"]
@@ -127,10 +145,11 @@ class PracticeMetricsAggregator:
         months = _month_starts(self.now, 2)
         prev_month, current_month = months[0], months[1]
 
-        current = self._consultation_count(doctor, current_month)
-        previous = self._consultation_count(doctor, prev_month)
-
-        new_patients = self._new_patients_count(doctor, current_month)
+        current, previous, new_patients = self._monthly_totals(doctor, current_month, prev_month)
+        if self.is_admin(doctor):
+            # Rollups attribute new patients to persons.created_by; the
+            # practice-wide count also includes patients without a creator.
+            new_patients = self._new_patients_count(doctor, current_month)
 
         avg_duration = self._avg_consultation_duration(doctor, current_month)
 
@@ -143,14 +162,33 @@ class PracticeMetricsAggregator:
             "avg_consultation_duration_minutes": avg_duration,
         }
 
-    def _consultation_count(self, doctor: Person, month: MonthRange) -> int:
-        q = self.db.query(func.count(MedicalRecord.id)).filter(
-            MedicalRecord.consultation_date >= month.start,
-            MedicalRecord.consultation_date <= month.end,
+    def _rollup_query(self, doctor: Person, model, first: datetime, last: datetime, *columns):
+        """Query over a rollup table for the days [first, last], scoped to the doctor."""
+        q = self.db.query(*columns).filter(
+            model.day >= first.date(),
+            model.day <= last.date(),
         )
         if not self.is_admin(doctor):
-            q = q.filter(MedicalRecord.doctor_id == doctor.id)
-        return int(q.scalar() or 0)
+            q = q.filter(model.doctor_id == doctor.id)
+        return q
+
+    def _monthly_totals(
+        self, doctor: Person, current: MonthRange, previous: MonthRange
+    ) -> Tuple[int, int, int]:
+        """(consultations this month, consultations last month, new patients this month)."""
+        def in_month(month: MonthRange):
+            return and_(
+                PracticeDailyRollup.day >= month.start.date(),
+                PracticeDailyRollup.day <= month.end.date(),
+            )
+
+        current_count, previous_count, new_patients = self._rollup_query(
+            doctor, PracticeDailyRollup, previous.start, current.end,
+            func.sum(PracticeDailyRollup.consultations).filter(in_month(current)),
+            func.sum(PracticeDailyRollup.consultations).filter(in_month(previous)),
+            func.sum(PracticeDailyRollup.new_patients).filter(in_month(current)),
+        ).one()
+        return int(current_count or 0), int(previous_count or 0), int(new_patients or 0)
 
     def _new_patients_count(self, doctor: Person, month: MonthRange) -> int:
         q = self.db.query(func.count(Person.id)).filter(
@@ -166,23 +204,17 @@ class PracticeMetricsAggregator:
         self, doctor: Person, month: MonthRange
     ) -> Optional[int]:
         """Approximate from appointments (end_time - appointment_date)."""
-        q = self.db.query(Appointment).filter(
-            Appointment.appointment_date >= month.start,
-            Appointment.appointment_date <= month.end,
-            Appointment.status.in_(["completed", "confirmada", "por_confirmar"]),
-        )
-        if not self.is_admin(doctor):
-            q = q.filter(Appointment.doctor_id == doctor.id)
-        rows = q.all()
-        durations: List[int] = []
-        for a in rows:
-            if a.appointment_date and a.end_time:
-                delta = (a.end_time - a.appointment_date).total_seconds() / 60.0
-                if 5 <= delta <= 240:  # drop obviously bad rows
-                    durations.append(int(delta))
-        if not durations:
+        # The rollup keeps whole minutes of rows within 5-240 min (bad rows dropped)
+        total_minutes, samples = self._rollup_query(
+            doctor, AppointmentDailyRollup, month.start, month.end,
+            func.sum(AppointmentDailyRollup.duration_minutes),
+            func.sum(AppointmentDailyRollup.duration_samples),
+        ).filter(
+            AppointmentDailyRollup.status.in_(DURATION_STATUSES),
+        ).one()
+        if not samples:
             return None
-        return int(sum(durations) / len(durations))
+        return int(total_minutes / samples)
 
     # ------------------------------------------------------------------
     # Consultations by month (12-month trend)
@@ -190,22 +222,12 @@ class PracticeMetricsAggregator:
 
     def consultations_by_month(self, doctor: Person) -> List[Dict[str, Any]]:
         months = _month_starts(self.now, 12)
-        q = self.db.query(MedicalRecord.consultation_date).filter(
-            MedicalRecord.consultation_date >= months[0].start,
-            MedicalRecord.consultation_date <= months[-1].end,
+        month_expr = func.date_trunc("month", PracticeDailyRollup.day)
+        q = self._rollup_query(
+            doctor, PracticeDailyRollup, months[0].start, months[-1].end,
+            month_expr, func.sum(PracticeDailyRollup.consultations),
         )
-        if not self.is_admin(doctor):
-            q = q.filter(MedicalRecord.doctor_id == doctor.id)
-        rows = q.all()
-
-        buckets: Dict[str, int] = {m.label: 0 for m in months}
-        for (dt,) in rows:
-            if dt is None:
-                continue
-            key = f"{dt.year:04d}-{dt.month:02d}"
-            if key in buckets:
-                buckets[key] += 1
-        return [{"month": m.label, "count": buckets[m.label]} for m in months]
+        return _month_counts(q.group_by(month_expr).all(), months)
 
     # ------------------------------------------------------------------
     # Top diagnoses
@@ -213,22 +235,28 @@ class PracticeMetricsAggregator:
 
     def top_diagnoses(self, doctor: Person, limit: int = 10) -> List[Dict[str, Any]]:
         months = _month_starts(self.now, 12)
-        q = self.db.query(MedicalRecord.primary_diagnosis).filter(
+        # Group on the normalised text server-side so only distinct
+        # diagnoses come back; Python re-applies the exact normalisation.
+        normalised = func.lower(
+            func.regexp_replace(func.btrim(MedicalRecord.primary_diagnosis), r"\s+", " ", "g")
+        )
+        q = self.db.query(normalised, func.count()).filter(
             MedicalRecord.consultation_date >= months[0].start,
             MedicalRecord.consultation_date <= months[-1].end,
+            MedicalRecord.primary_diagnosis.isnot(None),
         )
         if not self.is_admin(doctor):
             q = q.filter(MedicalRecord.doctor_id == doctor.id)
-        rows = q.all()
+        rows = q.group_by(normalised).all()
 
         counter: Counter = Counter()
-        for (dx,) in rows:
+        for dx, count in rows:
             if not dx:
                 continue
             # Normalise casing / whitespace to avoid split counts.
             key = " ".join(dx.strip().split()).capitalize()
             if key:
-                counter[key] += 1
+                counter[key] += int(count or 0)
         top = counter.most_common(limit)
         return [{"diagnosis": k, "count": v} for k, v in top]
 
@@ -238,20 +266,20 @@ class PracticeMetricsAggregator:
 
     def busy_heatmap(self, doctor: Person) -> List[Dict[str, Any]]:
         months = _month_starts(self.now, 3)
-        q = self.db.query(Appointment.appointment_date).filter(
-            Appointment.appointment_date >= months[0].start,
-            Appointment.appointment_date <= months[-1].end,
-            Appointment.status != "cancelled",
+        # isodow is 1 (Monday) .. 7 (Sunday); minus one matches date.weekday()
+        weekday = func.extract("isodow", AppointmentHourlyRollup.day) - 1
+        hour = AppointmentHourlyRollup.hour
+        q = self._rollup_query(
+            doctor, AppointmentHourlyRollup, months[0].start, months[-1].end,
+            weekday, hour, func.sum(AppointmentHourlyRollup.appointments),
         )
-        if not self.is_admin(doctor):
-            q = q.filter(Appointment.doctor_id == doctor.id)
-        rows = q.all()
+        rows = q.group_by(weekday, hour).all()
 
-        grid: Dict[tuple, int] = defaultdict(int)
-        for (dt,) in rows:
-            if dt is None:
-                continue
-            grid[(dt.weekday(), dt.hour)] += 1
+        grid = {
+            (int(wd), int(hr)): int(cnt)
+            for wd, hr, cnt in rows
+            if wd is not None and hr is not None
+        }
         return [
             {"weekday": WEEKDAY_NAMES[wd], "hour": hr, "count": cnt}
             for (wd, hr), cnt in sorted(grid.items())
@@ -262,27 +290,28 @@ class PracticeMetricsAggregator:
     # ------------------------------------------------------------------
 
     def demographics(self, doctor: Person) -> Dict[str, Any]:
-        q = self.db.query(Person.gender, Person.birth_date).filter(
+        gender = func.lower(func.coalesce(Person.gender, "unknown"))
+        bucket = _age_bucket_expr(Person.birth_date, self.now.date())
+        q = self.db.query(gender, bucket, func.count()).filter(
             Person.person_type == "patient",
             Person.is_active.is_(True),
         )
         if not self.is_admin(doctor):
             q = q.filter(Person.created_by == doctor.id)
-        rows = q.all()
+        rows = q.group_by(gender, bucket).all()
 
         gender_counter: Counter = Counter()
         age_counter: Counter = Counter()
-        today = self.now.date()
-        for (gender, birth_date) in rows:
-            gender_counter[(gender or "unknown").lower()] += 1
-            age_counter[_age_bucket(birth_date, today)] += 1
+        for g, b, count in rows:
+            gender_counter[g or "unknown"] += int(count or 0)
+            age_counter[b or "unknown"] += int(count or 0)
 
         return {
             "total_patients": sum(gender_counter.values()),
             "by_gender": [{"gender": g, "count": c} for g, c in gender_counter.most_common()],
             "by_age_bucket": [
                 {"bucket": b, "count": age_counter[b]}
-                for b in ["0-17", "18-29", "30-44", "45-59", "60+", "unknown"]
+                for b in AGE_BUCKET_LABELS
                 if age_counter[b] > 0
             ],
         }
@@ -293,22 +322,12 @@ class PracticeMetricsAggregator:
 
     def studies_by_month(self, doctor: Person) -> List[Dict[str, Any]]:
         months = _month_starts(self.now, 12)
-        q = self.db.query(ClinicalStudy.ordered_date).filter(
-            ClinicalStudy.ordered_date >= months[0].start,
-            ClinicalStudy.ordered_date <= months[-1].end,
+        month_expr = func.date_trunc("month", PracticeDailyRollup.day)
+        q = self._rollup_query(
+            doctor, PracticeDailyRollup, months[0].start, months[-1].end,
+            month_expr, func.sum(PracticeDailyRollup.studies_ordered),
         )
-        if not self.is_admin(doctor):
-            q = q.filter(ClinicalStudy.doctor_id == doctor.id)
-        rows = q.all()
-
-        buckets: Dict[str, int] = {m.label: 0 for m in months}
-        for (dt,) in rows:
-            if dt is None:
-                continue
-            key = f"{dt.year:04d}-{dt.month:02d}"
-            if key in buckets:
-                buckets[key] += 1
-        return [{"month": m.label, "count": buckets[m.label]} for m in months]
+        return _month_counts(q.group_by(month_expr).all(), months)
 
 
 # ---------------------------------------------------------------------------
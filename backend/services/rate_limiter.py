@@ -0,0 +1,307 @@
+"""
+Rate limiter
+Sliding-window request limits per client and route policy
+
+Each (policy, client) key keeps two fixed-size counters - the current and
+the previous window - and the request count is estimated as
+
+    current + previous * (fraction of the previous window still in range)
+
+which tracks a true sliding window closely with O(1) memory per key,
+instead of one timestamp per request.
+
+Backends:
+- LocalRateLimitBackend: in-process, keys spread over sharded locks so
+  concurrent requests rarely contend; idle keys are evicted on a
+  per-shard sweep
+- RedisRateLimitBackend: shared counters (atomic Lua check-and-increment)
+  so limits hold across Cloud Run instances; falls back to the local
+  backend while Redis is unreachable
+
+Policies are matched by method + path prefix; the first match wins and
+unmatched requests use the default policy. Each policy counts separately.
+"""
+
+import math
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import settings
+from logger import get_logger
+
+logger = get_logger("medical_records.rate_limit")
+
+DEFAULT_SHARDS = 64
+SWEEP_INTERVAL_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """Limit of `max_requests` per `window_seconds` for requests matching the prefixes/methods."""
+    name: str
+    max_requests: int
+    window_seconds: int
+    path_prefixes: Tuple[str, ...] = ()
+    methods: Optional[Tuple[str, ...]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_requests > 0 and self.window_seconds > 0
+
+    def matches(self, method: str, path: str) -> bool:
+        if self.methods is not None and method not in self.methods:
+            return False
+        return any(path.startswith(prefix) for prefix in self.path_prefixes)
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    window_seconds: int
+    retry_after: int = 0
+    policy: str = "default"
+
+
+def evaluate_window(
+    policy: RateLimitPolicy,
+    now: float,
+    current: int,
+    previous: int,
+) -> Tuple[bool, int, int]:
+    """Decide one request against the window counters (current excludes this request).
+
+    Returns (allowed, remaining, retry_after_seconds).
+    """
+    window = policy.window_seconds
+    elapsed = now % window
+    weight = 1.0 - elapsed / window
+    estimate = current + previous * weight
+
+    if estimate < policy.max_requests:
+        remaining = int(policy.max_requests - (estimate + 1))
+        return True, max(remaining, 0), 0
+
+    if current >= policy.max_requests or previous <= 0:
+        # Only the next window resets the count
+        retry_after = window - elapsed
+    else:
+        # Wait until the previous window's share decays below the limit
+        needed_weight = (policy.max_requests - current) / previous
+        retry_after = (1.0 - needed_weight) * window - elapsed
+    return False, 0, max(1, math.ceil(retry_after))
+
+
+class _Window:
+    __slots__ = ("index", "window_seconds", "current", "previous")
+
+    def __init__(self, index: int, window_seconds: int):
+        self.index = index
+        self.window_seconds = window_seconds
+        self.current = 0
+        self.previous = 0
+
+    def roll(self, index: int) -> None:
+        if index == self.index:
+            return
+        self.previous = self.current if index == self.index + 1 else 0
+        self.current = 0
+        self.index = index
+
+
+@dataclass
+class _Shard:
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    windows: Dict[str, _Window] = field(default_factory=dict)
+    next_sweep: float = 0.0
+
+
+class LocalRateLimitBackend:
+    """In-process counters over sharded locks with idle-key eviction."""
+
+    def __init__(self, shards: int = DEFAULT_SHARDS, clock: Callable[[], float] = time.time):
+        self._shards: List[_Shard] = [_Shard() for _ in range(max(1, shards))]
+        self._clock = clock
+
+    def hit(self, key: str, policy: RateLimitPolicy) -> RateLimitResult:
+        now = self._clock()
+        index = int(now // policy.window_seconds)
+        shard = self._shards[zlib.crc32(key.encode("utf-8")) % len(self._shards)]
+
+        with shard.lock:
+            if now >= shard.next_sweep:
+                self._sweep(shard, now)
+            window = shard.windows.get(key)
+            if window is None:
+                window = shard.windows[key] = _Window(index, policy.window_seconds)
+            window.roll(index)
+            allowed, remaining, retry_after = evaluate_window(policy, now, window.current, window.previous)
+            if allowed:
+                window.current += 1
+
+        return RateLimitResult(
+            allowed=allowed,
+            limit=policy.max_requests,
+            remaining=remaining,
+            window_seconds=policy.window_seconds,
+            retry_after=retry_after,
+            policy=policy.name,
+        )
+
+    @staticmethod
+    def _sweep(shard: _Shard, now: float) -> None:
+        # A key whose current and previous windows have both passed counts
+        # as zero, so dropping it cannot change any decision.
+        stale = [
+            key for key, w in shard.windows.items()
+            if int(now // w.window_seconds) > w.index + 1
+        ]
+        for key in stale:
+            del shard.windows[key]
+        shard.next_sweep = now + SWEEP_INTERVAL_SECONDS
+
+    def __len__(self) -> int:
+        return sum(len(shard.windows) for shard in self._shards)
+
+
+# KEYS[1] = current window counter, KEYS[2] = previous window counter
+# ARGV[1] = weight of the previous window, ARGV[2] = limit, ARGV[3] = TTL
+_REDIS_HIT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if current + previous * tonumber(ARGV[1]) >= tonumber(ARGV[2]) then
+    return {0, current, previous}
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return {1, current, previous}
+"""
+
+
+class RedisRateLimitBackend:
+    """Shared counters in Redis; uses `fallback` while Redis is failing."""
+
+    KEY_PREFIX = "ratelimit"
+
+    def __init__(
+        self,
+        client,
+        fallback: Optional[LocalRateLimitBackend] = None,
+        retry_seconds: float = 30.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._client = client
+        self._script = client.register_script(_REDIS_HIT_SCRIPT)
+        self._fallback = fallback or LocalRateLimitBackend(clock=clock)
+        self._retry_seconds = retry_seconds
+        self._clock = clock
+        self._down_until = 0.0
+
+    async def hit(self, key: str, policy: RateLimitPolicy) -> RateLimitResult:
+        now = self._clock()
+        if now < self._down_until:
+            return self._fallback.hit(key, policy)
+
+        window = policy.window_seconds
+        index = int(now // window)
+        weight = 1.0 - (now % window) / window
+        try:
+            _, current, previous = await self._script(
+                keys=[
+                    f"{self.KEY_PREFIX}:{key}:{index}",
+                    f"{self.KEY_PREFIX}:{key}:{index - 1}",
+                ],
+                args=[repr(weight), policy.max_requests, window * 2],
+            )
+        except Exception as e:
+            logger.warning(
+                f"Rate limit backend unavailable, using in-process counters for {self._retry_seconds:.0f}s: {e}"
+            )
+            self._down_until = now + self._retry_seconds
+            return self._fallback.hit(key, policy)
+
+        allowed, remaining, retry_after = evaluate_window(policy, now, int(current), int(previous))
+        return RateLimitResult(
+            allowed=allowed,
+            limit=policy.max_requests,
+            remaining=remaining,
+            window_seconds=window,
+            retry_after=retry_after,
+            policy=policy.name,
+        )
+
+
+class RateLimiter:
+    """Resolves the policy for a request and counts it against the backend."""
+
+    def __init__(self, backend, default_policy: RateLimitPolicy, policies: Sequence[RateLimitPolicy] = ()):
+        self.backend = backend
+        self.default_policy = default_policy
+        self.policies = list(policies)
+
+    def policy_for(self, method: str, path: str) -> RateLimitPolicy:
+        for policy in self.policies:
+            if policy.matches(method, path):
+                return policy
+        return self.default_policy
+
+    async def hit(self, method: str, path: str, client_id: str) -> Optional[RateLimitResult]:
+        """Count a request; None when its policy is disabled."""
+        policy = self.policy_for(method, path)
+        if not policy.enabled:
+            return None
+        key = f"{policy.name}:{client_id}"
+        if isinstance(self.backend, LocalRateLimitBackend):
+            return self.backend.hit(key, policy)
+        return await self.backend.hit(key, policy)
+
+
+def default_policies() -> Tuple[RateLimitPolicy, List[RateLimitPolicy]]:
+    """Default + per-route policies from settings."""
+    default = RateLimitPolicy(
+        name="default",
+        max_requests=settings.RATE_LIMIT_MAX_REQUESTS,
+        window_seconds=settings.RATE_LIMIT_WINDOW_SECONDS,
+    )
+    policies = [
+        RateLimitPolicy(
+            name="auth",
+            max_requests=settings.RATE_LIMIT_AUTH_MAX_REQUESTS,
+            window_seconds=settings.RATE_LIMIT_AUTH_WINDOW_SECONDS,
+            path_prefixes=(
+                "/api/auth/login",
+                "/api/auth/register",
+                "/api/auth/password-reset",
+            ),
+            methods=("POST",),
+        ),
+        RateLimitPolicy(
+            name="webhook",
+            max_requests=settings.RATE_LIMIT_WEBHOOK_MAX_REQUESTS,
+            window_seconds=settings.RATE_LIMIT_WEBHOOK_WINDOW_SECONDS,
+            path_prefixes=("/api/whatsapp/webhook",),
+        ),
+    ]
+    return default, policies
+
+
+def build_rate_limiter() -> RateLimiter:
+    """Rate limiter for the configured backend (RATE_LIMIT_BACKEND: memory | redis)."""
+    default, policies = default_policies()
+    backend = LocalRateLimitBackend()
+
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        try:
+            import redis.asyncio as redis_asyncio
+
+            client = redis_asyncio.from_url(settings.REDIS_URL)
+            backend = RedisRateLimitBackend(client, fallback=backend)
+            logger.info("Rate limiting using Redis backend", extra={"redis_url": settings.REDIS_URL})
+        except ImportError:
+            logger.warning("redis package not installed; rate limiting falls back to in-process counters")
+
+    return RateLimiter(backend, default, policies)
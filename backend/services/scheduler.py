@@ -1,19 +1,123 @@
 """
 Scheduler service for automatic WhatsApp appointment reminders.
 Designed to be triggered by Google Cloud Scheduler or similar cron jobs.
+
+Reminders are a due-time queue: `AppointmentReminder.send_at` is indexed on
+(sent, enabled, send_at), and each tick claims only rows that are due with
+FOR UPDATE SKIP LOCKED in bounded batches, marking them sent in the same
+statement. Several instances can run the tick concurrently without
+double-sending, and a tick costs O(due reminders) instead of O(all
+future reminders).
 """
-from typing import Dict, Any
-from sqlalchemy.orm import joinedload
-from datetime import datetime, timedelta, timezone
+import os
+from typing import Collection, Dict, Any, List
+from sqlalchemy import and_, literal_column, select, update
+from sqlalchemy.orm import Session, joinedload
+from datetime import timedelta
 
 from database import SessionLocal, Appointment, AppointmentReminder
+from models.appointment import ACTIVE_APPOINTMENT_STATUSES
 from services.appointment_service import AppointmentService
+from services.appointments import reminders as legacy_reminders
 from services.consultation_service import now_cdmx
+from utils.datetime_utils import utc_now
 from logger import get_logger
 
 
 api_logger = get_logger("medical_records.api")
 
+# "Latch" window: a reminder is still sent if the tick runs up to 6 hours
+# after its send time (cron delays, restarts); older ones are skipped.
+SEND_WINDOW = timedelta(hours=6)
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "50"))
+REMINDER_MAX_BATCHES = int(os.getenv("REMINDER_MAX_BATCHES", "20"))
+
+
+def _due_reminders_filter(now):
+    return and_(
+        AppointmentReminder.sent == False,
+        AppointmentReminder.enabled == True,
+        AppointmentReminder.send_at <= now,
+        AppointmentReminder.send_at >= now - SEND_WINDOW,
+        Appointment.status.in_(ACTIVE_APPOINTMENT_STATUSES),  # Only allow reminders for pending and confirmed
+        Appointment.appointment_date > now,  # Only include appointments that haven't passed yet
+    )
+
+
+def claim_due_reminders(
+    db: Session,
+    now,
+    batch_size: int = REMINDER_BATCH_SIZE,
+    exclude_ids: Collection[int] = (),
+) -> List[int]:
+    """
+    Atomically mark up to `batch_size` due reminders as sent and return their ids.
+    Rows locked by another instance are skipped, so each reminder is claimed once.
+    `exclude_ids` are reminders that already failed in this tick (they are
+    un-claimed and due again, and would otherwise fill every later batch).
+    """
+    due_ids = select(AppointmentReminder.id).join(
+        Appointment, Appointment.id == AppointmentReminder.appointment_id
+    ).where(
+        _due_reminders_filter(now)
+    )
+    if exclude_ids:
+        due_ids = due_ids.where(AppointmentReminder.id.notin_(sorted(exclude_ids)))
+    due_ids = due_ids.order_by(
+        AppointmentReminder.send_at
+    ).limit(batch_size).with_for_update(skip_locked=True, of=AppointmentReminder)
+
+    result = db.execute(
+        update(AppointmentReminder)
+        .where(AppointmentReminder.id.in_(due_ids.scalar_subquery()))
+        .values(sent=True, sent_at=utc_now())
+        .returning(AppointmentReminder.id)
+        .execution_options(synchronize_session=False)
+    )
+    claimed = [row[0] for row in result]
+    db.commit()
+    return claimed
+
+
+def _send_claimed_reminders(db: Session, reminder_ids: List[int]) -> Dict[str, Any]:
+    reminders = db.query(AppointmentReminder).options(
+        # Load appointment and related data needed for sending reminders
+        joinedload(AppointmentReminder.appointment).joinedload(Appointment.patient),
+        joinedload(AppointmentReminder.appointment).joinedload(Appointment.doctor),
+        joinedload(AppointmentReminder.appointment).joinedload(Appointment.office),
+        joinedload(AppointmentReminder.appointment).joinedload(Appointment.appointment_type_rel)
+    ).filter(AppointmentReminder.id.in_(reminder_ids)).all()
+
+    api_logger.info("📤 Sending reminders", extra={"reminder_ids": [r.id for r in reminders]})
+    # One concurrent bulk send per batch (pooled HTTP client, bounded parallelism)
+    outcome = AppointmentService.deliver_reminders(db, reminders)
+
+    sent_count = 0
+    failed_ids = []
+    for reminder_id, delivered in outcome.items():
+        if delivered:
+            sent_count += 1
+            api_logger.info("✅ Auto reminder sent", extra={"reminder_id": reminder_id})
+        else:
+            failed_ids.append(reminder_id)
+            api_logger.warning("⚠️ Auto reminder failed", extra={"reminder_id": reminder_id})
+    return {"sent": sent_count, "failed": len(failed_ids), "failed_ids": failed_ids}
+
+
+def _legacy_due_appointment_ids(db: Session, now) -> List[int]:
+    """Appointments on the old single-reminder flags (no AppointmentReminder rows) that are due."""
+    offset = literal_column("interval '1 minute'") * Appointment.auto_reminder_offset_minutes
+    rows = db.query(Appointment.id).filter(
+        Appointment.auto_reminder_enabled == True,
+        Appointment.reminder_sent == False,
+        Appointment.status == 'por_confirmar',
+        Appointment.appointment_date > now,
+        Appointment.appointment_date - offset <= now,
+        Appointment.appointment_date - offset >= now - SEND_WINDOW,
+        ~Appointment.reminders.any()
+    ).limit(REMINDER_BATCH_SIZE).all()
+    return [row[0] for row in rows]
+
 
 def check_and_send_reminders(db: SessionLocal = None) -> Dict[str, Any]:
     """
@@ -27,102 +131,46 @@ def check_and_send_reminders(db: SessionLocal = None) -> Dict[str, Any]:
 
     try:
         api_logger.info("🔄 Reminder check started", extra={"scheduler": "CloudScheduler"})
-        
+
         # Get current time in CDMX (naive datetime for comparison)
+        # NOTE: appointment_date / send_at are stored as CDMX local time (naive datetime)
         now = now_cdmx().replace(tzinfo=None)
-        
-        
-        # 1. NEW SYSTEM: Check AppointmentReminder table
-        reminders = db.query(AppointmentReminder).join(Appointment).filter(
-            AppointmentReminder.enabled == True,
-            AppointmentReminder.sent == False,
-            Appointment.status.in_(['por_confirmar', 'confirmada']),  # Only allow reminders for pending and confirmed
-            Appointment.appointment_date > now  # Only include appointments that haven't passed yet
-        ).options(
-            # Load appointment and related data needed for sending reminders
-            joinedload(AppointmentReminder.appointment).joinedload(Appointment.patient),
-            joinedload(AppointmentReminder.appointment).joinedload(Appointment.doctor),
-            joinedload(AppointmentReminder.appointment).joinedload(Appointment.office)
-        ).all()
-        
-        
+
+        # 1. NEW SYSTEM: claim due AppointmentReminder rows in bounded batches
+        # Failed reminders go back to unsent; each is retried once per tick
+        found = 0
         sent_count = 0
-        failed_count = 0
-        
-        for reminder in reminders:
-            appointment = reminder.appointment
-            if not appointment:
-                continue
-            
-            # Calculate when this reminder should be sent
-            # NOTE: appointment_date is stored as CDMX local time (naive datetime)
-            # We compare using CDMX local time throughout
-            
-            # 1. Get current time in CDMX (naive for comparison)
-            now_cdmx_naive = now_cdmx().replace(tzinfo=None)
-            
-            # 2. appointment_date is already in CDMX local time
-            appt_date = appointment.appointment_date
-            if appt_date.tzinfo:
-                # If it has timezone info, convert to CDMX
-                import pytz
-                cdmx_tz = pytz.timezone('America/Mexico_City')
-                appt_date = appt_date.astimezone(cdmx_tz).replace(tzinfo=None)
-            
-            # 3. Calculate send time in CDMX local time
-            send_time = appt_date - timedelta(minutes=reminder.offset_minutes)
-            
-            # 4. Check if we're in the send window (Send time passed, but not more than 6 hours ago)
-            # This "Latch" logic ensures we don't miss it if the cron is slightly delayed
-            window_end = send_time + timedelta(hours=6)
-            
-            should_send = send_time <= now_cdmx_naive <= window_end
-            
-            
-            if should_send:
-                api_logger.info(
-                    "📤 Sending reminder",
-                    extra={
-                        "reminder_id": reminder.id,
-                        "appointment_id": appointment.id
-                    }
-                )
-                success = AppointmentService.send_reminder_by_id(db, reminder.id)
-                if success:
-                    sent_count += 1
-                    api_logger.info("✅ Auto reminder sent", extra={"reminder_id": reminder.id})
-                else:
-                    failed_count += 1
-                    api_logger.warning("⚠️ Auto reminder failed", extra={"reminder_id": reminder.id})
+        failed_ids: set = set()
+        for _ in range(REMINDER_MAX_BATCHES):
+            claimed = claim_due_reminders(db, now, exclude_ids=failed_ids)
+            if not claimed:
+                break
+            found += len(claimed)
+            outcome = _send_claimed_reminders(db, claimed)
+            sent_count += outcome["sent"]
+            failed_ids.update(outcome["failed_ids"])
+            if len(claimed) < REMINDER_BATCH_SIZE:
+                break
+        failed_count = len(failed_ids)
 
         # 2. LEGACY SYSTEM: Check Appointment table directly
         # This can be removed after full migration
-        legacy_candidates = db.query(Appointment).filter(
-            Appointment.auto_reminder_enabled == True,
-            Appointment.status.in_(['por_confirmar', 'confirmada']),
-            Appointment.appointment_date > now
-        ).all()
-        
         legacy_sent = 0
-        
-        for apt in legacy_candidates:
-            # Only process if no reminders exist (old system)
-            if not apt.reminders or len(apt.reminders) == 0:
-                if AppointmentService.should_send_reminder(apt):
-                    success = AppointmentService.send_appointment_reminder(db, apt.id)
-                    if success:
-                        legacy_sent += 1
-                        api_logger.info("✅ Legacy auto reminder sent", extra={"appointment_id": apt.id})
+        for appointment_id in _legacy_due_appointment_ids(db, now):
+            success = legacy_reminders.send_appointment_reminder(db, appointment_id)
+            if success:
+                legacy_sent += 1
+                api_logger.info("✅ Legacy auto reminder sent", extra={"appointment_id": appointment_id})
 
         result = {
             "status": "success",
             "timestamp": now.isoformat(),
-            "reminders_found": len(reminders),
+            "reminders_found": found,
             "reminders_sent": sent_count,
             "reminders_failed": failed_count,
             "legacy_sent": legacy_sent
         }
-        
+
         api_logger.info("🏁 Reminder check finished", extra=result)
         return result
 
@@ -136,5 +184,3 @@ def check_and_send_reminders(db: SessionLocal = None) -> Dict[str, Any]:
     finally:
         if local_db:
             db.close()
-
-
@@ -6,7 +6,7 @@ import os
 import uuid
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Optional, BinaryIO, Union
+from typing import Iterable, Optional, BinaryIO, Union
 from logger import get_logger
 
 logger = get_logger("medical_records.storage")
@@ -30,6 +30,23 @@ class StorageService(ABC):
         """
         pass
     
+    def upload_stream(self, chunks: Iterable[bytes], key: str, content_type: Optional[str] = None) -> str:
+        """
+        Upload a file produced incrementally (e.g. a generated export).
+        
+        The default buffers the chunks and calls `upload`; backends override
+        it to write chunk by chunk.
+        
+        Args:
+            chunks: The file content as an iterable of byte strings
+            key: The storage key/path for the file
+            content_type: MIME type of the file
+            
+        Returns:
+            The storage key/path where the file was stored
+        """
+        return self.upload(b"".join(chunks), key, content_type)
+    
     @abstractmethod
     def download(self, key: str) -> Optional[bytes]:
         """
@@ -57,13 +74,14 @@ class StorageService(ABC):
         pass
     
     @abstractmethod
-    def get_url(self, key: str, expires_in: int = 3600) -> Optional[str]:
+    def get_url(self, key: str, expires_in: int = 3600, download_name: Optional[str] = None) -> Optional[str]:
         """
         Get a URL to access the file.
         
         Args:
             key: The storage key/path of the file
             expires_in: URL expiration time in seconds (for presigned URLs)
+            download_name: If given, the URL serves the file as an attachment with this name
             
         Returns:
             URL to access the file, or None if not available
@@ -106,6 +124,24 @@ class LocalStorageService(StorageService):
         logger.info(f"Local storage: uploaded file to {key}")
         return key
     
+    def upload_stream(self, chunks: Iterable[bytes], key: str, content_type: Optional[str] = None) -> str:
+        """Write chunks to a temporary file and move it into place once complete"""
+        full_path = self._get_full_path(key)
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = full_path.with_name(full_path.name + ".part")
+        
+        try:
+            with open(partial_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(partial_path, full_path)
+        finally:
+            if partial_path.exists():
+                partial_path.unlink()
+        
+        logger.info(f"Local storage: uploaded stream to {key}")
+        return key
+    
     def download(self, key: str) -> Optional[bytes]:
         """Download a file from local filesystem"""
         full_path = self._get_full_path(key)
@@ -131,7 +167,7 @@ class LocalStorageService(StorageService):
                 return False
         return False
     
-    def get_url(self, key: str, expires_in: int = 3600) -> Optional[str]:
+    def get_url(self, key: str, expires_in: int = 3600, download_name: Optional[str] = None) -> Optional[str]:
         """
         Get URL for local file.
         For local storage, returns None as files should be served via the API endpoint.
@@ -178,6 +214,19 @@ class GCSStorageService(StorageService):
             logger.error(f"GCS storage: error uploading {key}: {e}")
             raise
 
+    def upload_stream(self, chunks: Iterable[bytes], key: str, content_type: Optional[str] = None) -> str:
+        """Upload chunks to GCS as a resumable upload (the object appears once closed)"""
+        try:
+            blob = self.bucket.blob(key)
+            with blob.open("wb", content_type=content_type) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            logger.info(f"GCS storage: uploaded stream to gs://{self.bucket.name}/{key}")
+            return key
+        except Exception as e:
+            logger.error(f"GCS storage: error uploading stream {key}: {e}")
+            raise
+
     def download(self, key: str) -> Optional[bytes]:
         """Download a file from GCS"""
         try:
@@ -200,8 +249,8 @@ class GCSStorageService(StorageService):
             logger.error(f"GCS storage: failed to delete {key}: {e}")
             return False
 
-    def get_url(self, key: str, expires_in: int = 3600) -> Optional[str]:
-        """Get a signed URL for GCS file"""
+    def get_url(self, key: str, expires_in: int = 3600, download_name: Optional[str] = None) -> Optional[str]:
+        """Get a signed URL for GCS file (GCS serves Range requests on it)"""
         from datetime import timedelta
         try:
             blob = self.bucket.blob(key)
@@ -209,6 +258,7 @@ class GCSStorageService(StorageService):
                 version="v4",
                 expiration=timedelta(seconds=expires_in),
                 method="GET",
+                response_disposition=f'attachment; filename="{download_name}"' if download_name else None,
             )
             return url
         except Exception as e:
@@ -1,10 +1,13 @@
+import asyncio
 import os
 import requests
 import logging
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 
+from .sender import AsyncMessageSender
+
 # Import Sentry for error tracking (optional, fails gracefully if not configured)
 try:
     import sentry_sdk
@@ -83,24 +86,17 @@ class WhatsAppService:
         
         return phone
     
-    def send_template_message(
-        self, 
-        to_phone: str, 
-        template_name: str, 
+    def build_template_payload(
+        self,
+        to_phone: str,
+        template_name: str,
         template_params: List[str],
         language_code: str = 'es',
         country_code: str = None
     ) -> Dict[str, Any]:
         """
-        Enviar mensaje usando plantilla aprobada
+        Construir el payload de /messages para una plantilla aprobada
         """
-        if not self.phone_id or not self.access_token:
-            return {
-                'success': False,
-                'error': 'WhatsApp not configured. Please set META_WHATSAPP_PHONE_ID and META_WHATSAPP_TOKEN'
-            }
-        
-        url = f'{self.base_url}/{self.phone_id}/messages'
         formatted_phone = self._format_phone_number(to_phone, country_code)
         logger.info(f"📞 Original phone: {to_phone}, Country code: {country_code}, Formatted phone: {formatted_phone}")
         
@@ -129,7 +125,28 @@ class WhatsAppService:
                 'components': components
             }
         }
+        return payload
+    
+    def send_template_message(
+        self, 
+        to_phone: str, 
+        template_name: str, 
+        template_params: List[str],
+        language_code: str = 'es',
+        country_code: str = None
+    ) -> Dict[str, Any]:
+        """
+        Enviar mensaje usando plantilla aprobada
+        """
+        if not self.phone_id or not self.access_token:
+            return {
+                'success': False,
+                'error': 'WhatsApp not configured. Please set META_WHATSAPP_PHONE_ID and META_WHATSAPP_TOKEN'
+            }
         
+        url = f'{self.base_url}/{self.phone_id}/messages'
+        payload = self.build_template_payload(to_phone, template_name, template_params, language_code, country_code)
+        formatted_phone = payload['to'].lstrip('+')
         
         try:
             logger.info(f"📤 Sending WhatsApp to {formatted_phone} using template {template_name}")
@@ -362,24 +379,21 @@ class WhatsAppService:
                 'error': str(e)
             }
     
-    def send_appointment_reminder(
+    def _appointment_reminder_template(
         self,
-        patient_phone: str,
         patient_full_name: str,
         appointment_date: str,
         appointment_time: str,
         doctor_title: str,
         doctor_full_name: str,
         office_address: str,
-        country_code: str = None,
         appointment_type: str = "presencial",
         online_consultation_url: str = None,
         maps_url: Optional[str] = None,
-        appointment_status: str = "por_confirmar",
-        appointment_id: Optional[int] = None
-    ) -> Dict[str, Any]:
+        appointment_status: str = "por_confirmar"
+    ) -> Tuple[str, List[str], str]:
         """
-        Enviar recordatorio de cita médica usando plantilla aprobada
+        Plantilla, parámetros e idioma del recordatorio de cita
         """
         # Preparar parámetros para la plantilla según el formato exacto:
         # ¡Hola *{{1}}*, 🗓️
@@ -437,20 +451,11 @@ class WhatsAppService:
         
         template_language = os.getenv('WHATSAPP_TEMPLATE_LANGUAGE', 'es')  # Default to 'es' (Spanish)
         
-        # Log what we're trying to send
-        logger.info(f"📤 Attempting to send '{template_name}' template with language: '{template_language}' for appointment status: '{appointment_status}'")
-        
-        
-        result = self.send_template_message(
-            to_phone=patient_phone,
-            template_name=template_name,
-            template_params=template_params,
-            language_code=template_language,
-            country_code=country_code
-        )
-        
-        
-        # If it fails with template translation error, try other Spanish variants
+        return template_name, template_params, template_language
+    
+    @staticmethod
+    def _is_template_language_error(result: Dict[str, Any]) -> bool:
+        """True si Meta rechazó la plantilla por idioma/traducción inexistente (132001)"""
         # Check both error message and details for the template translation error
         error_text = str(result.get('error', '')).lower()
         details = result.get('details', {})
@@ -468,7 +473,7 @@ class WhatsAppService:
             details_text = details.lower()
         
         # Check for template translation error (code 132001 or message contains "template name does not exist")
-        is_template_error = (
+        return (
             not result.get('success') and 
             ('template name does not exist' in error_text or 
              'template name does not exist' in details_text or
@@ -478,35 +483,133 @@ class WhatsAppService:
               isinstance(details.get('error'), dict) and
               details.get('error', {}).get('code') == 132001))
         )
+    
+    def _send_template_language_variants(
+        self,
+        patient_phone: str,
+        template_name: str,
+        template_params: List[str],
+        template_language: str,
+        country_code: str = None
+    ) -> Dict[str, Any]:
+        """Reintentar la plantilla con otras variantes de español"""
+        result = {'success': False, 'error': 'No language variant available'}
+        # Try common Spanish language codes (prioritize es_MX, then es, then others)
+        # Remove the one we already tried from the list
+        spanish_variants = ['es_MX', 'es_ES', 'es_AR', 'es_CO', 'es_CL', 'es_PE', 'es_VE']
+        if template_language in spanish_variants:
+            spanish_variants.remove(template_language)
+
+        for variant in spanish_variants:
+            logger.info(f"📤 Trying language code: '{variant}'")
+            result = self.send_template_message(
+                to_phone=patient_phone,
+                template_name=template_name,
+                template_params=template_params,
+                language_code=variant,
+                country_code=country_code
+            )
+            if result.get('success'):
+                logger.info(f"✅ Success with language code: '{variant}'")
+                break
+            else:
+                logger.debug(f"❌ Failed with language code '{variant}': {result.get('error')}")
+        
+        return result
+    
+    def build_appointment_reminder_payload(
+        self,
+        patient_phone: str,
+        patient_full_name: str,
+        appointment_date: str,
+        appointment_time: str,
+        doctor_title: str,
+        doctor_full_name: str,
+        office_address: str,
+        country_code: str = None,
+        appointment_type: str = "presencial",
+        online_consultation_url: str = None,
+        maps_url: Optional[str] = None,
+        appointment_status: str = "por_confirmar",
+        appointment_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Payload de /messages del recordatorio de cita (para send_many)
+        """
+        template_name, template_params, template_language = self._appointment_reminder_template(
+            patient_full_name, appointment_date, appointment_time, doctor_title, doctor_full_name,
+            office_address, appointment_type, online_consultation_url, maps_url, appointment_status
+        )
+        return self.build_template_payload(
+            patient_phone, template_name, template_params, template_language, country_code
+        )
+    
+    def send_appointment_reminder(
+        self,
+        patient_phone: str,
+        patient_full_name: str,
+        appointment_date: str,
+        appointment_time: str,
+        doctor_title: str,
+        doctor_full_name: str,
+        office_address: str,
+        country_code: str = None,
+        appointment_type: str = "presencial",
+        online_consultation_url: str = None,
+        maps_url: Optional[str] = None,
+        appointment_status: str = "por_confirmar",
+        appointment_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Enviar recordatorio de cita médica usando plantilla aprobada
+        """
+        template_name, template_params, template_language = self._appointment_reminder_template(
+            patient_full_name, appointment_date, appointment_time, doctor_title, doctor_full_name,
+            office_address, appointment_type, online_consultation_url, maps_url, appointment_status
+        )
+        
+        # Log what we're trying to send
+        logger.info(f"📤 Attempting to send '{template_name}' template with language: '{template_language}' for appointment status: '{appointment_status}'")
+        
+        result = self.send_template_message(
+            to_phone=patient_phone,
+            template_name=template_name,
+            template_params=template_params,
+            language_code=template_language,
+            country_code=country_code
+        )
         
-        if is_template_error:
+        # If it fails with template translation error, try other Spanish variants
+        if self._is_template_language_error(result):
             logger.warning(f"⚠️ Template '{template_name}' failed with language '{template_language}', trying other Spanish variants...")
             logger.debug(f"🔍 Error details: {result.get('error')}, Details: {result.get('details')}")
-            
-            # Try common Spanish language codes (prioritize es_MX, then es, then others)
-            # Remove the one we already tried from the list
-            spanish_variants = ['es_MX', 'es_ES', 'es_AR', 'es_CO', 'es_CL', 'es_PE', 'es_VE']
-            if template_language in spanish_variants:
-                spanish_variants.remove(template_language)
-            
-            for variant in spanish_variants:
-                logger.info(f"📤 Trying language code: '{variant}'")
-                result = self.send_template_message(
-                    to_phone=patient_phone,
-                    template_name=template_name,
-                    template_params=template_params,
-                    language_code=variant,
-                    country_code=country_code
-                )
-                if result.get('success'):
-                    logger.info(f"✅ Success with language code: '{variant}'")
-                    break
-                else:
-                    logger.debug(f"❌ Failed with language code '{variant}': {result.get('error')}")
-        
+            result = self._send_template_language_variants(
+                patient_phone, template_name, template_params, template_language, country_code
+            )
         
         return result
     
+    def send_many(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Enviar varios payloads de /messages en paralelo sobre un cliente HTTP
+        con keep-alive (ver services/whatsapp/sender.py). Bloquea hasta que
+        terminan todos; no llamar desde un event loop en ejecución.
+        Los resultados conservan el orden de `payloads`.
+        """
+        if not payloads:
+            return []
+        if not self.phone_id or not self.access_token:
+            return [{
+                'success': False,
+                'error': 'WhatsApp not configured. Please set META_WHATSAPP_PHONE_ID and META_WHATSAPP_TOKEN'
+            } for _ in payloads]
+        return asyncio.run(self.send_many_async(payloads))
+    
+    async def send_many_async(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Versión async de send_many"""
+        async with AsyncMessageSender(self.base_url, self.phone_id, self.access_token) as sender:
+            return await sender.send_many(payloads)
+    
     def send_lab_results_notification(
         self,
         patient_phone: str,
@@ -0,0 +1,166 @@
+"""
+Pooled async sender for the Meta WhatsApp Cloud API.
+
+`WhatsAppService` methods issue one blocking `requests.post` per message,
+opening a new TLS connection each time. Bulk sends (scheduler reminders) go
+through `AsyncMessageSender` instead:
+
+- one `httpx.AsyncClient` per sender, keep-alive connections reused for
+  every message in the batch
+- at most `concurrency` requests in flight, so a batch stays under the
+  per-number throughput Meta allows for the sending phone id
+- 429 / 5xx / Meta throughput errors and connection failures are retried
+  with full-jitter exponential backoff (Retry-After is honored when
+  present). Read/write timeouts and protocol errors are not: Meta may
+  already have accepted the message, and a retry would send it twice.
+
+Results have the same shape as `WhatsAppService.send_template_message`.
+"""
+import asyncio
+import os
+import random
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from logger import get_logger
+
+logger = get_logger("medical_records.whatsapp")
+
+SEND_CONCURRENCY = int(os.getenv("WHATSAPP_SEND_CONCURRENCY", "8"))
+SEND_MAX_RETRIES = int(os.getenv("WHATSAPP_SEND_MAX_RETRIES", "3"))
+SEND_TIMEOUT_SECONDS = float(os.getenv("WHATSAPP_SEND_TIMEOUT_SECONDS", "10"))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+# Graph error codes for throughput / transient failures returned with a 4xx body
+RETRY_ERROR_CODES = frozenset({4, 80007, 130429})
+# Transport errors raised before the request was sent; safe to retry
+UNSENT_TRANSPORT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before retry number `attempt` (1-based)."""
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    cap = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)))
+    return random.uniform(0, cap)
+
+
+def _error_body(response: httpx.Response) -> Any:
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+def _graph_error_code(body: Any) -> Optional[int]:
+    if isinstance(body, dict) and isinstance(body.get("error"), dict):
+        return body["error"].get("code")
+    return None
+
+
+def _is_retryable(response: httpx.Response, body: Any) -> bool:
+    return response.status_code in RETRY_STATUS_CODES or _graph_error_code(body) in RETRY_ERROR_CODES
+
+
+def _success_result(body: Dict[str, Any]) -> Dict[str, Any]:
+    messages = body.get("messages") or [{}]
+    message_status = messages[0].get("message_status")
+    return {
+        "success": True,
+        "message_id": messages[0].get("id"),
+        "message_status": message_status,
+        "response": body,
+        "delivery_confirmed": message_status not in (None, "accepted"),
+    }
+
+
+class AsyncMessageSender:
+    """
+    Sends Graph `/messages` payloads over a shared pooled client.
+
+    Use as `async with AsyncMessageSender(...) as sender:`; the client (and its
+    connection pool) lives for the duration of the block.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        phone_id: str,
+        access_token: str,
+        concurrency: int = SEND_CONCURRENCY,
+        max_retries: int = SEND_MAX_RETRIES,
+        timeout: float = SEND_TIMEOUT_SECONDS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = f"{base_url}/{phone_id}/messages"
+        self.access_token = access_token
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self.timeout = timeout
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncMessageSender":
+        self._client = httpx.AsyncClient(
+            headers={
+                "Authorization": f"Bearer {self.access_token}",
+                "Content-Type": "application/json",
+            },
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+            transport=self.transport,
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._client.aclose()
+        self._client = None
+
+    async def send(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST one payload, retrying transient failures."""
+        attempt = 0
+        while True:
+            retry_after = None
+            async with self._semaphore:
+                try:
+                    response = await self._client.post(self.url, json=payload)
+                except httpx.TransportError as e:
+                    result = {"success": False, "error": f"{type(e).__name__}: {e}"}
+                    retryable = isinstance(e, UNSENT_TRANSPORT_ERRORS)
+                else:
+                    body = _error_body(response)
+                    if response.is_success and isinstance(body, dict) and "error" not in body:
+                        return _success_result(body)
+                    result = {
+                        "success": False,
+                        "error": f"HTTP Error {response.status_code}",
+                        "status_code": response.status_code,
+                        "details": body,
+                    }
+                    retryable = _is_retryable(response, body)
+                    retry_after = response.headers.get("Retry-After")
+
+            attempt += 1
+            if not retryable or attempt > self.max_retries:
+                logger.warning(
+                    "⚠️ WhatsApp send failed",
+                    extra={"to": payload.get("to"), "attempts": attempt, "error": result["error"]}
+                )
+                return result
+            # Sleep outside the semaphore so other messages keep flowing
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+    async def send_many(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Send all payloads with bounded parallelism; results keep input order."""
+        return list(await asyncio.gather(*(self.send(payload) for payload in payloads)))
@@ -7,11 +7,13 @@ from sqlalchemy import func, and_
 from datetime import datetime, date, timedelta
 from typing import List, Dict, Optional, Any
 from database import Person, Office, Appointment, AppointmentType
-from services.appointments.query import get_available_time_slots
+from services.appointments.availability import MAX_RANGE_DAYS, free_slots, free_slots_by_day
 from services.appointments.creation import create_appointment
 from services.appointments.validation import get_doctor_duration
 from crud.person import generate_person_code
 from logger import get_logger
+from utils.datetime_utils import now_cdmx
+from utils.phone_utils import normalize_phone_e164
 
 api_logger = get_logger("medical_records.gemini_bot")
 
@@ -109,7 +111,7 @@ def get_available_slots(
     Args:
         db: Database session
         doctor_id: Doctor ID
-        office_id: Office ID (for future use, currently not used in query)
+        office_id: Office ID whose schedule template defines the slots
         date_str: Date in format "YYYY-MM-DD"
     Returns:
         List of available time slots with time and display format
@@ -127,18 +129,20 @@ def get_available_slots(
         # Get doctor's appointment duration (defaults to 30 if not set)
         slot_duration = get_doctor_duration(db, doctor_id)
         
-        # Get available slots using existing service with doctor's duration
-        slots = get_available_time_slots(db, target_date, str(doctor_id), slot_duration)
+        # Same conflict rule as validate_appointment_slot: any active
+        # appointment of the doctor blocks the slot, whatever the office
+        slots = free_slots(
+            db, doctor_id, office_id, target_date, slot_duration, bookings_office_only=False
+        )
         
         # Format for Gemini
         result = []
         for slot in slots:
-            if slot.get("available", False):
-                time_str = slot.get("time", "")
-                result.append({
-                    "time": time_str,
-                    "display": time_str  # Can be formatted as "10:00 AM" if needed
-                })
+            time_str = slot.start.strftime("%H:%M")
+            result.append({
+                "time": time_str,
+                "display": time_str  # Can be formatted as "10:00 AM" if needed
+            })
         
         api_logger.debug(f"Found {len(result)} available slots for doctor {doctor_id} on {date_str}")
         return result
@@ -147,21 +151,67 @@ def get_available_slots(
         return []
 
 
+def get_available_days(
+    db: Session,
+    doctor_id: int,
+    office_id: int,
+    start_date_str: Optional[str] = None,
+    days: int = 14
+) -> List[Dict[str, Any]]:
+    """
+    Get the days with openings in a date range, with their available times.
+    Args:
+        db: Database session
+        doctor_id: Doctor ID
+        office_id: Office ID whose schedule template defines the slots
+        start_date_str: First day in format "YYYY-MM-DD" (defaults to today)
+        days: Number of days to look at (capped at MAX_RANGE_DAYS)
+    Returns:
+        List of {"date", "times"} for the days that still have free slots
+    """
+    try:
+        # Slots are in CDMX time; the server clock is UTC on Cloud Run
+        today = now_cdmx().date()
+        first_day = datetime.strptime(start_date_str, "%Y-%m-%d").date() if start_date_str else today
+        first_day = max(first_day, today)
+        days = max(1, min(days or 14, MAX_RANGE_DAYS))
+        last_day = first_day + timedelta(days=days - 1)
+
+        slot_duration = get_doctor_duration(db, doctor_id)
+        by_day = free_slots_by_day(
+            db, doctor_id, office_id, first_day, last_day, slot_duration, bookings_office_only=False
+        )
+
+        result = [
+            {
+                "date": day.isoformat(),
+                "times": [slot.start.strftime("%H:%M") for slot in slots]
+            }
+            for day, slots in by_day.items()
+            if slots
+        ]
+        api_logger.debug(f"Found {len(result)} days with openings for doctor {doctor_id} from {first_day}")
+        return result
+    except Exception as e:
+        api_logger.error(f"Error getting available days: {e}", exc_info=True)
+        return []
+
+
 def find_patient_by_phone(db: Session, phone: str) -> List[Dict[str, Any]]:
     """
     Find patient by phone number.
     Returns list of patients (may share the same phone).
     """
     try:
-        # Normalize phone (remove spaces, dashes, etc.)
-        normalized_phone = phone.replace(" ", "").replace("-", "").replace("+", "")
+        # Canonical E.164 (521/52 folded) matches the indexed phone_e164 column
+        phone_key = normalize_phone_e164(phone)
+        if not phone_key:
+            return []
         
-        # Try finding all matching patients
         patients = db.query(Person).filter(
             Person.person_type == 'patient',
-            (Person.primary_phone == phone) | 
-            (func.replace(func.replace(func.replace(Person.primary_phone, " ", ""), "-", ""), "+", "") == normalized_phone)
-        ).all()
+            Person.phone_e164 == phone_key
+        ).order_by(Person.id).all()
         
         result = []
         for patient in patients:
@@ -17,6 +17,10 @@ BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if BACKEND_DIR not in sys.path:
     sys.path.insert(0, BACKEND_DIR)
 
+# Audit entries go through the mocked session synchronously instead of the
+# background writer (which would try to reach a real database).
+os.environ.setdefault("AUDIT_ASYNC_ENABLED", "false")
+
 # The local vertexai package may be missing symbols used by the doctor assistant
 # agent (Content, Part, etc.). Stub them out before importing the app so that
 # import errors don't prevent the rest of the application from loading.
@@ -72,3 +76,25 @@ def unauth_client():
     with TestClient(app, raise_server_exceptions=False) as c:
         yield c
     app.dependency_overrides.clear()
+
+
+@pytest.fixture()
+def pg_session():
+    """Session on the migrated PostgreSQL database of the query-plan tests
+    (QUERY_PLAN_DATABASE_URL); everything, commits included, is rolled back."""
+    url = os.getenv("QUERY_PLAN_DATABASE_URL")
+    if not url:
+        pytest.skip("QUERY_PLAN_DATABASE_URL not set")
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        trans = conn.begin()
+        session = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            yield session
+        finally:
+            session.close()
+            trans.rollback()
+    engine.dispose()
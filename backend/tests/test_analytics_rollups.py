@@ -0,0 +1,183 @@
+"""
+Tests for the daily analytics rollups.
+
+- collect_rollup_keys: which (doctor, day) buckets a flush touches
+  (old and new values, the ±1 h "completed" window, untracked edits skipped)
+- refresh_rollups: advisory lock, then delete + INSERT ... SELECT per table,
+  scoped to the doctor and the touched days
+- the after_flush hook refreshes each doctor once, in a fixed order
+- reconcile_rollups: one transaction per doctor, failures do not stop the run
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database import Appointment, ClinicalStudy, MedicalRecord, Person
+from models import analytics as rollups
+from models.analytics import collect_rollup_keys, refresh_rollups
+from services import analytics_rollups as reconcile_module
+
+
+def _sql(statement):
+    return str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _persisted(model, **values):
+    """Object whose values look loaded from the database (no pending changes)."""
+    obj = model()
+    for key, value in values.items():
+        set_committed_value(obj, key, value)
+    return obj
+
+
+# ----------------------------------------------------------------------------
+# collect_rollup_keys
+# ----------------------------------------------------------------------------
+
+def test_new_appointment_touches_its_day():
+    appointment = Appointment(doctor_id=1, patient_id=5, appointment_date=datetime(2026, 4, 10, 9, 0))
+    assert collect_rollup_keys([appointment]) == {1: {date(2026, 4, 10)}}
+
+
+def test_rescheduled_appointment_touches_old_and_new_day_and_doctor():
+    appointment = _persisted(Appointment, doctor_id=1, patient_id=5, appointment_date=datetime(2026, 4, 10, 9, 0))
+    appointment.appointment_date = datetime(2026, 4, 12, 9, 0)
+    appointment.doctor_id = 2
+
+    keys = collect_rollup_keys([appointment])
+
+    assert keys == {1: {date(2026, 4, 10), date(2026, 4, 12)}, 2: {date(2026, 4, 10), date(2026, 4, 12)}}
+
+
+def test_status_change_touches_the_day():
+    appointment = _persisted(Appointment, doctor_id=1, status="por_confirmar",
+                             appointment_date=datetime(2026, 4, 10, 9, 0))
+    appointment.status = "cancelled"
+    assert collect_rollup_keys([appointment]) == {1: {date(2026, 4, 10)}}
+
+
+def test_untracked_change_is_skipped():
+    appointment = _persisted(Appointment, doctor_id=1, status="confirmada",
+                             appointment_date=datetime(2026, 4, 10, 9, 0))
+    appointment.reminder_sent = True
+    record = _persisted(MedicalRecord, doctor_id=1, consultation_date=datetime(2026, 4, 10, 9, 0))
+    record.treatment_plan = "Reposo"
+    assert collect_rollup_keys([appointment, record]) == {}
+
+
+def test_deleted_object_touches_its_day():
+    study = _persisted(ClinicalStudy, doctor_id=3, ordered_date=datetime(2026, 4, 1, 18, 0))
+    assert collect_rollup_keys([study], deleted={study}) == {3: {date(2026, 4, 1)}}
+
+
+def test_consultation_near_midnight_touches_adjacent_day():
+    # An appointment at 23:30 the previous day can be completed by this consultation
+    record = MedicalRecord(doctor_id=1, patient_id=5, consultation_date=datetime(2026, 4, 11, 0, 20))
+    assert collect_rollup_keys([record]) == {1: {date(2026, 4, 10), date(2026, 4, 11)}}
+
+
+def test_only_patients_count_as_new_patients():
+    patient = Person(person_type="patient", created_by=7, created_at=datetime(2026, 4, 3, 12, 0))
+    doctor = Person(person_type="doctor", created_by=7, created_at=datetime(2026, 4, 3, 12, 0))
+    orphan = Person(person_type="patient", created_at=datetime(2026, 4, 3, 12, 0))
+    assert collect_rollup_keys([patient, doctor, orphan]) == {7: {date(2026, 4, 3)}}
+
+
+# ----------------------------------------------------------------------------
+# refresh_rollups
+# ----------------------------------------------------------------------------
+
+def test_refresh_locks_then_rebuilds_each_table_for_the_days():
+    connection = MagicMock()
+    days = {date(2026, 4, 10), date(2026, 4, 12)}
+
+    refresh_rollups(connection, 4, min(days), max(days), days)
+
+    statements = [_sql(call.args[0]) for call in connection.execute.call_args_list]
+    assert len(statements) == 7
+    assert statements[0] == f"SELECT pg_advisory_xact_lock({rollups.ROLLUP_LOCK_NAMESPACE}, 4) AS pg_advisory_xact_lock_1"
+    assert [s.split()[2] for s in statements[1:4]] == [
+        "practice_daily_rollups", "appointment_daily_rollups", "appointment_hourly_rollups",
+    ]
+    assert all("day IN ('2026-04-10', '2026-04-12')" in s for s in statements[1:4])
+
+    practice, appointments, hourly = statements[4:]
+    assert practice.startswith("INSERT INTO practice_daily_rollups")
+    assert "UNION ALL" in practice and "persons.created_by = 4" in practice
+    assert appointments.startswith("INSERT INTO appointment_daily_rollups")
+    assert "EXISTS (SELECT *" in appointments
+    assert "CAST(appointments.appointment_date AS DATE) IN ('2026-04-10', '2026-04-12')" in appointments
+    assert "appointments.appointment_date < '2026-04-13'" in appointments
+    assert hourly.startswith("INSERT INTO appointment_hourly_rollups")
+    assert "appointments.status != 'cancelled'" in hourly
+
+
+def test_refresh_without_days_rebuilds_the_whole_range():
+    connection = MagicMock()
+    refresh_rollups(connection, 4, date(2026, 1, 1), date(2026, 12, 31))
+    statements = [_sql(call.args[0]) for call in connection.execute.call_args_list]
+    assert not any(" IN (" in s for s in statements[1:4])
+    assert "appointment_daily_rollups.day <= '2026-12-31'" in statements[2]
+
+
+def test_after_flush_refreshes_each_doctor_once_in_order():
+    session = MagicMock()
+    session.new = [
+        Appointment(doctor_id=9, appointment_date=datetime(2026, 4, 10, 9, 0)),
+        Appointment(doctor_id=2, appointment_date=datetime(2026, 4, 10, 11, 0)),
+        Appointment(doctor_id=9, appointment_date=datetime(2026, 4, 14, 9, 0)),
+    ]
+    session.dirty = []
+    session.deleted = []
+
+    with patch.object(rollups, "refresh_rollups") as refresh:
+        rollups._refresh_rollups_after_flush(session, None)
+
+    assert [call.args[1:] for call in refresh.call_args_list] == [
+        (2, date(2026, 4, 10), date(2026, 4, 10), {date(2026, 4, 10)}),
+        (9, date(2026, 4, 10), date(2026, 4, 14), {date(2026, 4, 10), date(2026, 4, 14)}),
+    ]
+
+
+def test_after_flush_without_tracked_objects_does_nothing():
+    session = MagicMock(new=[], dirty=[], deleted=[])
+    with patch.object(rollups, "refresh_rollups") as refresh:
+        rollups._refresh_rollups_after_flush(session, None)
+    refresh.assert_not_called()
+    session.connection.assert_not_called()
+
+
+# ----------------------------------------------------------------------------
+# reconcile_rollups
+# ----------------------------------------------------------------------------
+
+def test_reconcile_rebuilds_window_per_doctor():
+    db = MagicMock()
+    db.execute.return_value = [(5,), (2,)]
+
+    with patch.object(reconcile_module, "refresh_rollups") as refresh:
+        result = reconcile_module.reconcile_rollups(db, days=30, today=date(2026, 4, 15))
+
+    first_day = date(2026, 3, 16)
+    last_day = date(2026, 4, 15) + reconcile_module.timedelta(days=reconcile_module.RECONCILE_AHEAD_DAYS)
+    assert [call.args[1:] for call in refresh.call_args_list] == [(2, first_day, last_day), (5, first_day, last_day)]
+    assert db.commit.call_count == 2
+    assert result["doctors"] == 2 and result["failed"] == []
+    assert _sql(db.execute.call_args.args[0]).count("UNION") == 6
+
+
+def test_reconcile_continues_after_a_failed_doctor():
+    db = MagicMock()
+    db.execute.return_value = [(1,), (2,)]
+
+    with patch.object(reconcile_module, "refresh_rollups", side_effect=[RuntimeError("boom"), None]):
+        result = reconcile_module.reconcile_rollups(db, days=30, today=date(2026, 4, 15))
+
+    db.rollback.assert_called_once()
+    db.commit.assert_called_once()
+    assert result["failed"] == [1]
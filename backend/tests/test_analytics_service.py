@@ -0,0 +1,232 @@
+"""
+Tests for the single-pass analytics dashboard.
+
+- get_dashboard_metrics issues three statements (patients, consultations,
+  appointments) instead of one per metric
+- the consultation / appointment passes read the daily rollup tables with
+  SUM(...) FILTER, never the base tables
+- every dashboard section is derived correctly from the grouped rows
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.dialects import postgresql
+
+from services import analytics_service as analytics_module
+from services.analytics_service import AnalyticsService
+
+NOW = analytics_module.CDMX_TZ.localize(datetime(2026, 5, 20, 12, 0))
+DATE_FROM = date(2026, 3, 1)
+DATE_TO = date(2026, 5, 20)
+
+APPOINTMENT_COLUMNS = (
+    "in_period", "completed", "today", "this_week", "this_month", "completed_this_month",
+    "cancelled_by_doctor", "cancelled_by_patient", "new_patient", "follow_up",
+)
+
+
+def _appt_row(month, status, **counts):
+    values = {column: 0 for column in APPOINTMENT_COLUMNS}
+    values.update(counts)
+    return SimpleNamespace(month=datetime(2026, month, 1), status=status, **values)
+
+
+def _consult_row(month, in_period=0, this_month=0, last_month=0):
+    return SimpleNamespace(
+        month=datetime(2026, month, 1), in_period=in_period, this_month=this_month, last_month=last_month
+    )
+
+
+APPOINTMENT_ROWS = [
+    _appt_row(3, "confirmada", in_period=10, completed=8, new_patient=4, follow_up=5),
+    _appt_row(3, "cancelled", in_period=4, cancelled_by_doctor=1, cancelled_by_patient=3),
+    _appt_row(4, "completada", in_period=6, completed=6, follow_up=6),
+    _appt_row(5, "confirmada", in_period=5, completed=2, today=2, this_week=4, this_month=5,
+              completed_this_month=2, new_patient=1),
+    _appt_row(5, "por_confirmar", in_period=3, this_week=1, this_month=3),
+    # Future month: outside the period, still counted in this week / this month
+    _appt_row(6, "por_confirmar", this_week=1),
+]
+
+CONSULTATION_ROWS = [
+    _consult_row(3, in_period=8),
+    _consult_row(4, in_period=6, last_month=6),
+    _consult_row(5, in_period=2, this_month=2),
+]
+
+
+def _compile(query):
+    return str(query.statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _capture_query(rows):
+    """db whose query(...) records the built Query and returns rows from .all()"""
+    from sqlalchemy.orm import Query
+
+    captured = {}
+
+    def query(*entities):
+        q = Query(entities)
+        captured["query"] = q
+        chained = MagicMock()
+        chained.filter.return_value = chained
+        chained.group_by.return_value = chained
+        chained.order_by.return_value = chained
+        chained.all.return_value = rows
+
+        def filter_(*criteria):
+            captured["query"] = captured["query"].filter(*criteria)
+            return chained
+
+        chained.filter.side_effect = filter_
+        return chained
+
+    db = MagicMock()
+    db.query.side_effect = query
+    return db, captured
+
+
+# ----------------------------------------------------------------------------
+# Query count / SQL shape
+# ----------------------------------------------------------------------------
+
+def test_dashboard_runs_three_statements():
+    db = MagicMock()
+    with patch.object(analytics_module, "now_cdmx", return_value=NOW), \
+            patch.object(AnalyticsService, "_consultation_pass", return_value=CONSULTATION_ROWS) as consult, \
+            patch.object(AnalyticsService, "_appointment_pass", return_value=APPOINTMENT_ROWS) as appts:
+        db.query.return_value.one.return_value = SimpleNamespace(total=40, new=3, active=25)
+        metrics = AnalyticsService.get_dashboard_metrics(db, 1, DATE_FROM, DATE_TO)
+
+    consult.assert_called_once()
+    appts.assert_called_once()
+    db.query.assert_called_once()
+    assert metrics["patients"] == {"total": 40, "newThisMonth": 3, "active": 25}
+    assert set(metrics) == {
+        "patients", "consultations", "appointments", "occupation",
+        "appointmentFlow", "appointmentTrends", "appointmentTypeTrends",
+    }
+
+
+def test_appointment_pass_reads_appointment_rollup():
+    db, captured = _capture_query([])
+    with patch.object(analytics_module, "now_cdmx", return_value=NOW):
+        AnalyticsService._appointment_pass(db, 1, DATE_FROM, DATE_TO)
+
+    sql = _compile(captured["query"])
+    assert db.query.call_count == 1
+    assert sql.count(") FILTER (WHERE") == 10
+    assert "FROM appointment_daily_rollups" in sql
+    assert "FROM appointments" not in sql and "medical_records" not in sql
+    assert "appointment_daily_rollups.day >= '2026-03-01'" in sql
+    assert "appointment_daily_rollups.day <= '2026-05-20'" in sql
+    assert "appointment_daily_rollups.type_bucket = 'new'" in sql
+    assert "appointment_daily_rollups.day = '2026-05-20'" in sql  # today
+    assert "appointment_daily_rollups.day >= '2026-05-18'" in sql  # week (Monday)
+
+
+def test_consultation_pass_reads_practice_rollup():
+    db, captured = _capture_query([])
+    with patch.object(analytics_module, "now_cdmx", return_value=NOW):
+        AnalyticsService._consultation_pass(db, 1, DATE_FROM, DATE_TO)
+
+    sql = _compile(captured["query"])
+    assert db.query.call_count == 1
+    assert sql.count("sum(practice_daily_rollups.consultations) FILTER (WHERE") == 3
+    assert "practice_daily_rollups.doctor_id = 1" in sql
+    assert "medical_records" not in sql
+
+
+def test_patient_metrics_single_round_trip():
+    db = MagicMock()
+    db.query.return_value.one.return_value = SimpleNamespace(total=None, new=2, active=1)
+    with patch.object(analytics_module, "now_cdmx", return_value=NOW):
+        result = AnalyticsService.get_patient_metrics(db, 1)
+
+    assert result == {"total": 0, "newThisMonth": 2, "active": 1}
+    sql = str(db.query.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert "UNION" in sql
+
+
+# ----------------------------------------------------------------------------
+# Derived sections
+# ----------------------------------------------------------------------------
+
+def _metrics(method, **rows):
+    with patch.object(analytics_module, "now_cdmx", return_value=NOW):
+        return method(MagicMock(), 1, DATE_FROM, DATE_TO, **rows)
+
+
+def test_consultation_metrics():
+    result = _metrics(AnalyticsService.get_consultation_metrics, consultation_rows=CONSULTATION_ROWS)
+    assert result == {
+        "total": 16,
+        "thisMonth": 2,
+        "averagePerDay": 0.1,
+        "trend": -66.67,
+        "byMonth": [
+            {"month": "2026-03", "count": 8},
+            {"month": "2026-04", "count": 6},
+            {"month": "2026-05", "count": 2},
+        ],
+    }
+
+
+def test_appointment_metrics():
+    result = _metrics(AnalyticsService.get_appointment_metrics, appointment_rows=APPOINTMENT_ROWS)
+    assert result["today"] == 2
+    assert result["thisWeek"] == 6
+    assert result["completed"] == 16
+    assert result["cancelled"] == 4
+    assert result["pending"] == 3
+    assert result["attendanceRate"] == round(16 / 28 * 100, 2)
+    assert sorted((s["status"], s["count"]) for s in result["byStatus"]) == [
+        ("cancelled", 4), ("completada", 6), ("confirmada", 15), ("por_confirmar", 3),
+    ]
+
+
+def test_occupation_metrics():
+    result = _metrics(AnalyticsService.get_occupation_metrics, appointment_rows=APPOINTMENT_ROWS)
+    assert result == {"hoursWorkedThisMonth": 1.0, "appointmentsCompleted": 2, "occupancyRate": 25.0}
+
+
+def test_sankey():
+    result = _metrics(AnalyticsService.get_appointment_flow_sankey, appointment_rows=APPOINTMENT_ROWS)
+    assert result["totalScheduled"] == 28
+    assert result["confirmedAppointments"] == 15
+    assert result["completedConsultations"] == 16
+    assert (result["cancelledByDoctor"], result["cancelledByPatient"]) == (1, 3)
+    links = {(l["source"], l["target"]): l["value"] for l in result["sankeyData"]["links"]}
+    assert links[("Citas Agendadas", "Citas Canceladas")] == 4
+
+
+def test_sankey_empty_period():
+    result = _metrics(AnalyticsService.get_appointment_flow_sankey, appointment_rows=[])
+    assert result["totalScheduled"] == 0
+    assert result["sankeyData"] == {"nodes": [], "links": []}
+
+
+def test_trends_fill_every_month():
+    result = _metrics(
+        AnalyticsService.get_appointment_trends,
+        appointment_rows=APPOINTMENT_ROWS,
+        consultation_rows=CONSULTATION_ROWS,
+    )
+    assert result["data"] == [
+        {"month": "2026-03", "scheduled": 14, "cancelledByPatient": 3, "consultations": 8},
+        {"month": "2026-04", "scheduled": 6, "cancelledByPatient": 0, "consultations": 6},
+        {"month": "2026-05", "scheduled": 8, "cancelledByPatient": 0, "consultations": 2},
+    ]
+
+
+def test_type_trends():
+    result = _metrics(AnalyticsService.get_appointment_type_trends, appointment_rows=APPOINTMENT_ROWS)
+    assert result["data"] == [
+        {"month": "2026-03", "newPatient": 4, "followUp": 5, "other": 5},
+        {"month": "2026-04", "newPatient": 0, "followUp": 6, "other": 0},
+        {"month": "2026-05", "newPatient": 1, "followUp": 0, "other": 7},
+    ]
@@ -30,8 +30,8 @@ VALID_CONSULTATION = {
 
 def test_get_consultations_returns_list(client):
     with patch(
-        "services.consultation_service.ConsultationService.get_consultations_for_doctor",
-        return_value=[],
+        "services.consultation_service.ConsultationService.get_consultations_page",
+        return_value=([], None),
     ):
         response = client.get("/api/consultations")
     assert response.status_code == 200
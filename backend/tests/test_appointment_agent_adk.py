@@ -130,15 +130,16 @@ async def test_function_calling_fallback(agent_with_fallback):
 
 
 def test_get_all_tools():
-    """Test that get_all_tools returns all 9 tools"""
+    """Test that get_all_tools returns all 10 tools"""
     tools = get_all_tools()
     
-    assert len(tools) == 9
+    assert len(tools) == 10
     tool_names = [tool.name for tool in tools]
     
     assert "get_active_doctors" in tool_names
     assert "get_doctor_offices" in tool_names
     assert "get_available_slots" in tool_names
+    assert "get_available_days" in tool_names
     assert "find_patient_by_phone" in tool_names
     assert "create_patient_from_chat" in tool_names
     assert "check_patient_has_previous_appointments" in tool_names
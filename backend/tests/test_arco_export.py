@@ -25,14 +25,18 @@ if BACKEND_DIR not in sys.path:
     sys.path.insert(0, BACKEND_DIR)
 
 from services.arco_export_service import (  # noqa: E402
+    STREAM_CHUNK_BYTES,
     ARCOExportBundle,
     build_zip,
+    count_patient_records,
     serialize_clinical_study,
     serialize_consultation,
+    serialize_consultations,
     serialize_patient,
     serialize_prescription,
     serialize_privacy_consent,
     serialize_vital_sign,
+    stream_zip,
     _maybe_decrypt,
 )
 from audit_service import AuditService  # noqa: E402
@@ -127,6 +131,21 @@ def test_serialize_consultation_without_decrypt_keeps_ciphertext():
     assert out["chief_complaint"] == "enc::CIPHER"
 
 
+def test_serialize_consultations_batch_decrypts_and_marks_failures():
+    from encryption import EncryptionService
+
+    svc = EncryptionService("unit-test-arco-key-do-not-use-in-prod")
+    good = _fake_consultation()
+    good.chief_complaint = svc.encrypt_sensitive_data("Fiebre")
+    bad = _fake_consultation()
+    bad.chief_complaint = EncryptionService("other-key").encrypt_sensitive_data("Fiebre")
+
+    out = serialize_consultations([good, bad], svc)
+    assert out[0]["chief_complaint"] == "Fiebre"
+    assert out[0]["family_history"] == "fh-plain"
+    assert out[1]["chief_complaint"] == {"_decrypt_failed": True, "ciphertext": bad.chief_complaint}
+
+
 def test_maybe_decrypt_none_is_none():
     assert _maybe_decrypt(None, lambda v: v) is None
 
@@ -246,6 +265,103 @@ def test_build_zip_summary_references_lfpdppp():
     assert "7" in summary
 
 
+# ---------------------------------------------------------------------------
+# Streaming.
+# ---------------------------------------------------------------------------
+
+def _lazy_records(n, consumed):
+    for i in range(n):
+        consumed.append(i)
+        # Incompressible text so the archive grows with the record count
+        yield {"id": i, "notes": os.urandom(96).hex()}
+
+
+def test_stream_zip_consumes_records_lazily_in_bounded_chunks():
+    consumed = []
+    sections = [("consultations", _lazy_records(5000, consumed)), ("privacy_consents", [])]
+
+    chunks = []
+    consumed_at_chunk = []
+    for chunk in stream_zip({"id": 42, "name": "Juan Pérez"}, sections, generated_by_doctor_id=7):
+        chunks.append(chunk)
+        consumed_at_chunk.append(len(consumed))
+
+    # Chunks go out while records are still being read, never much above the threshold
+    assert consumed_at_chunk[0] < 5000
+    assert len(chunks) > 5
+    assert max(len(chunk) for chunk in chunks) < 2 * STREAM_CHUNK_BYTES
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zf:
+        consultations = json.loads(zf.read("consultations.json"))
+        assert json.loads(zf.read("privacy_consents.json")) == []
+        summary = zf.read("summary.md").decode("utf-8")
+    assert [c["id"] for c in consultations] == list(range(5000))
+    assert "| `consultations.json` | 5000 |" in summary
+    assert "| `prescriptions.json` | 0 |" in summary
+
+
+def test_count_patient_records_is_one_query():
+    from sqlalchemy.dialects import postgresql
+
+    db = MagicMock()
+    db.execute.return_value.one.return_value._mapping = {
+        "consultations": 3, "prescriptions": 4, "clinical_studies": 1, "vital_signs": 9, "privacy_consents": 1,
+    }
+
+    counts = count_patient_records(db, 42)
+
+    assert counts["vital_signs"] == 9
+    assert db.execute.call_count == 1
+    sql = str(db.execute.call_args.args[0].compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True},
+    ))
+    assert sql.count("count(*)") == 5
+    assert "clinical_studies.consultation_id IS NULL" in sql
+
+
+def test_export_route_audits_then_streams(monkeypatch):
+    from fastapi.testclient import TestClient
+    from database import get_db
+    from dependencies import get_current_user
+    from main_clean_english import app
+    from routes import privacy
+
+    patient = _fake_patient()
+    patient.created_by = 7
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = patient
+    db.query.return_value.filter.return_value.all.return_value = []
+    export_db = MagicMock()
+    events = []
+
+    monkeypatch.setattr(privacy, "SessionLocal", lambda: export_db)
+    monkeypatch.setattr(privacy, "count_patient_records", lambda _db, _pid: {"consultations": 1})
+    monkeypatch.setattr(
+        privacy.audit_service, "log_arco_export", lambda **kwargs: events.append(("audit", kwargs["counts"])),
+    )
+
+    def sections(session, patient_id, encryption_service):
+        events.append(("stream", session is export_db))
+        yield "consultations", [{"id": 1}]
+
+    monkeypatch.setattr(privacy, "iter_patient_sections", sections)
+    monkeypatch.setattr("encryption.get_encryption_service", lambda: None)
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=7, person_type="doctor")
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        response = TestClient(app).post("/api/privacy/arco/export/42")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert events == [("audit", {"consultations": 1}), ("stream", True)]
+    export_db.close.assert_called_once()
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        assert json.loads(zf.read("consultations.json")) == [{"id": 1}]
+        assert json.loads(zf.read("profile.json"))["name"] == "Juan Pérez"
+
+
 # ---------------------------------------------------------------------------
 # Audit.
 # ---------------------------------------------------------------------------
@@ -0,0 +1,295 @@
+"""
+Tests for the batched audit log writer.
+
+- log_action: routine entries are queued (no commit on the request session),
+  security events are written synchronously
+- AuditWriter.flush: one multi-row INSERT per batch, actor identities
+  resolved with one persons query
+- back-pressure: a full queue spools to disk instead of dropping
+- database outage: batches are spooled and replayed later; undecodable
+  spool lines and orphaned claims do not block the replay
+- the flusher thread batches by size / interval, drains on stop and
+  survives a failing iteration
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+import audit_service as audit_module
+from audit_service import AuditService
+from services import audit_writer as writer_module
+from services.audit_writer import AuditWriter
+
+
+def _fake_request():
+    req = MagicMock()
+    req.client = SimpleNamespace(host="10.0.0.1")
+    req.headers = {"user-agent": "pytest/1.0"}
+    req.url.path = "/api/patients/5"
+    req.method = "GET"
+    return req
+
+
+def _user(**kwargs):
+    values = dict(id=7, email="doc@example.com", name="Dra. Test", person_type="doctor")
+    values.update(kwargs)
+    return SimpleNamespace(**values)
+
+
+def _entry(**kwargs):
+    return AuditService._build_entry(action="READ", user=_user(), request=_fake_request(), **kwargs)
+
+
+class _RecordingSession:
+    def __init__(self, people=(), fail=False):
+        self.people = list(people)
+        self.fail = fail
+        self.inserts = []
+        self.commits = 0
+        self.closed = False
+        self.rolled_back = False
+
+    def query(self, *columns):
+        q = MagicMock()
+        q.filter.return_value = q
+        q.all.return_value = self.people
+        return q
+
+    def execute(self, stmt, rows):
+        if self.fail:
+            raise ConnectionError("database is down")
+        self.inserts.append((stmt, [dict(r) for r in rows]))
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+
+def _writer(tmp_path, sessions, **kwargs):
+    factory = MagicMock(side_effect=sessions)
+    kwargs.setdefault("flush_interval_ms", 20)
+    return AuditWriter(session_factory=factory, spool_dir=str(tmp_path), **kwargs)
+
+
+# ----------------------------------------------------------------------------
+# log_action routing
+# ----------------------------------------------------------------------------
+
+def test_routine_entry_is_queued_without_touching_request_session():
+    db = MagicMock()
+    writer = MagicMock(running=True)
+    with patch.object(audit_module, "audit_writer", writer):
+        AuditService.log_patient_access(db=db, user=_user(), patient_id=5, patient_name="Ana", request=_fake_request())
+
+    db.add.assert_not_called()
+    db.commit.assert_not_called()
+    db.rollback.assert_not_called()
+    entry = writer.submit.call_args.args[0]
+    assert entry["action"] == "READ"
+    assert entry["operation_type"] == "patient_access"
+    assert entry["user_email"] == "doc@example.com"
+    assert entry["metadata_json"]["change_folio"].startswith("AL-")
+
+
+@pytest.mark.parametrize("action,level", [("LOGIN", "INFO"), ("ACCESS_DENIED", "WARNING"), ("UPDATE", "CRITICAL")])
+def test_security_events_are_written_synchronously(action, level):
+    db = MagicMock()
+    writer = MagicMock(running=True)
+    with patch.object(audit_module, "audit_writer", writer):
+        AuditService.log_action(db=db, action=action, user=_user(), request=_fake_request(), security_level=level)
+
+    writer.submit.assert_not_called()
+    added = db.add.call_args.args[0]
+    assert (added.action, added.security_level) == (action, level)
+    db.commit.assert_called_once()
+
+
+def test_sync_path_when_writer_is_not_running():
+    db = MagicMock()
+    with patch.object(audit_module, "audit_writer", MagicMock(running=False)):
+        AuditService.log_action(db=db, action="READ", user=None, request=_fake_request())
+    added = db.add.call_args.args[0]
+    assert (added.user_email, added.user_name, added.user_type) == ("SYSTEM", "SYSTEM", "system")
+
+
+def test_sync_path_spools_when_commit_fails():
+    db = MagicMock()
+    db.commit.side_effect = ConnectionError("down")
+    writer = MagicMock(running=True)
+    with patch.object(audit_module, "audit_writer", writer):
+        AuditService.log_login(db=db, user=_user(), request=_fake_request())
+    db.rollback.assert_called()
+    assert writer.spool.call_args.args[0][0]["action"] == "LOGIN"
+
+
+def test_metadata_is_copied_not_shared():
+    metadata = {"result_count": 3}
+    entry = _entry(metadata=metadata)
+    assert "change_folio" not in metadata
+    assert entry["metadata_json"]["result_count"] == 3
+
+
+# ----------------------------------------------------------------------------
+# flush
+# ----------------------------------------------------------------------------
+
+def test_flush_is_one_multirow_insert_with_bulk_identity_lookup(tmp_path):
+    session = _RecordingSession(people=[(8, "b@example.com", "Dr. B", "doctor")])
+    writer = _writer(tmp_path, [session])
+    rows = [_entry(), AuditService._build_entry(action="READ", user=_user(id=8, email=None, name=None), request=_fake_request())]
+
+    assert writer.flush(rows) is True
+
+    [(stmt, inserted)] = session.inserts
+    assert str(stmt.compile(dialect=postgresql.dialect())).startswith("INSERT INTO audit_log")
+    assert [r["user_email"] for r in inserted] == ["doc@example.com", "b@example.com"]
+    assert session.commits == 1 and session.closed
+
+
+def test_identity_fallback_without_person_row(tmp_path):
+    session = _RecordingSession(people=[])
+    writer = _writer(tmp_path, [session])
+    row = AuditService._build_entry(action="READ", user=_user(email="", name=None, person_type=None), request=_fake_request())
+    writer.flush([row])
+    inserted = session.inserts[0][1][0]
+    assert (inserted["user_email"], inserted["user_name"], inserted["user_type"]) == ("SYSTEM", "SYSTEM", "system")
+
+
+# ----------------------------------------------------------------------------
+# spool / back-pressure
+# ----------------------------------------------------------------------------
+
+def test_failed_batch_is_spooled_and_replayed(tmp_path):
+    down = _RecordingSession(fail=True)
+    up = _RecordingSession()
+    writer = _writer(tmp_path, [down, up])
+    rows = [_entry(record_id=1), _entry(record_id=2)]
+
+    assert writer.flush(rows) is False
+    assert down.rolled_back
+    spooled = os.listdir(tmp_path)
+    assert len(spooled) == 1
+
+    writer._db_down_until = 0
+    assert writer.replay_spool() == 2
+    assert [r["record_id"] for r in up.inserts[0][1]] == [1, 2]
+    assert up.inserts[0][1][0]["timestamp"] == rows[0]["timestamp"]
+    assert os.listdir(tmp_path) == []
+
+
+def test_truncated_spool_line_is_set_aside(tmp_path):
+    up = _RecordingSession()
+    writer = _writer(tmp_path, [up])
+    writer.spool([_entry(record_id=1), _entry(record_id=2)])
+    with open(writer._spool_path(), "ab") as fh:
+        fh.write('{"action": "READ", "record_id": 3, "user_name": "Dra. Ló'.encode("utf-8")[:-1])
+
+    assert writer.replay_spool() == 2
+    assert [r["record_id"] for r in up.inserts[0][1]] == [1, 2]
+    [bad] = os.listdir(tmp_path)
+    assert bad.endswith(writer_module.BAD_SUFFIX)
+    assert b'"record_id": 3' in (tmp_path / bad).read_bytes()
+
+
+def test_orphaned_replay_file_is_claimed_again(tmp_path):
+    up = _RecordingSession()
+    writer = _writer(tmp_path, [up, _RecordingSession()])
+    writer.spool([_entry(record_id=1)])
+    [claimed] = writer._claim_spool_files()
+    # Fresh claims belong to a live replay and are left alone
+    assert writer._claim_spool_files() == []
+
+    stale = time.time() - writer_module.ORPHAN_REPLAY_SECONDS - 1
+    os.utime(claimed, (stale, stale))
+    assert writer.replay_spool() == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_batches_skip_database_while_it_is_down(tmp_path):
+    factory_sessions = [_RecordingSession(fail=True)]
+    writer = _writer(tmp_path, factory_sessions)
+    writer.flush([_entry()])
+    # Second batch goes straight to disk without opening a session
+    writer.flush([_entry()])
+    assert writer._session_factory.call_count == 1
+    with open(os.path.join(tmp_path, os.listdir(tmp_path)[0])) as fh:
+        assert len(fh.readlines()) == 2
+
+
+def test_full_queue_spools_instead_of_dropping(tmp_path, monkeypatch):
+    monkeypatch.setattr(writer_module, "ENQUEUE_TIMEOUT_SECONDS", 0.001)
+    writer = _writer(tmp_path, [], max_queue_size=1)
+    writer.submit(_entry(record_id=1))
+    writer.submit(_entry(record_id=2))
+
+    assert writer._queue.qsize() == 1
+    with open(os.path.join(tmp_path, os.listdir(tmp_path)[0])) as fh:
+        assert '"record_id": 2' in fh.read()
+
+
+# ----------------------------------------------------------------------------
+# flusher thread
+# ----------------------------------------------------------------------------
+
+def test_thread_batches_by_size_and_drains_on_stop(tmp_path):
+    sessions = [_RecordingSession() for _ in range(10)]
+    writer = _writer(tmp_path, sessions, batch_size=3, flush_interval_ms=200)
+    for i in range(7):
+        writer.submit(_entry(record_id=i))
+
+    writer.start()
+    assert writer.running
+    writer.stop()
+
+    inserted = [r["record_id"] for s in sessions for _, rows in s.inserts for r in rows]
+    assert inserted == list(range(7))
+    assert max(len(rows) for s in sessions for _, rows in s.inserts) == 3
+    assert not writer.running
+
+
+def test_thread_flushes_partial_batch_after_interval(tmp_path):
+    session = _RecordingSession()
+    writer = _writer(tmp_path, [session, _RecordingSession()], batch_size=100, flush_interval_ms=20)
+    writer.start()
+    try:
+        writer.submit(_entry())
+        deadline = time.monotonic() + 2
+        while not session.inserts and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(session.inserts) == 1
+    finally:
+        writer.stop()
+
+
+def test_thread_survives_a_failing_iteration(tmp_path, monkeypatch):
+    session = _RecordingSession()
+    writer = _writer(tmp_path, [session], flush_interval_ms=20)
+    failures = iter([RuntimeError("boom")])
+
+    def replay_once():
+        for error in failures:
+            raise error
+
+    monkeypatch.setattr(writer, "_maybe_replay_spool", replay_once)
+    writer.start()
+    try:
+        writer.submit(_entry())
+        deadline = time.monotonic() + 2
+        while not session.inserts and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.running
+        assert len(session.inserts) == 1
+    finally:
+        writer.stop()
@@ -0,0 +1,219 @@
+"""
+Tests for the per-token authenticated user cache.
+
+- AuthUserCache: hit/miss, TTL expiry, LRU bound, per-user invalidation
+- get_user_from_token: DB is queried only on the first request per token,
+  hits are merged into the request session without SQL
+- require_valid_license_for_doctor: a successful license check is reused
+- Person/License mapper events and logout drop the user's entries
+"""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import auth
+import dependencies
+from database import License, Person
+from services import auth_user_cache as cache_module
+from services.auth_user_cache import AuthUserCache, auth_user_cache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def _clear_singleton():
+    auth_user_cache.clear()
+    yield
+    auth_user_cache.clear()
+
+
+def _doctor(id: int = 5) -> Person:
+    return Person(
+        id=id,
+        name="Dra. Ruiz",
+        person_type="doctor",
+        person_code=f"D{id}",
+        email=f"dr{id}@example.com",
+        primary_phone="5512345678",
+        is_active=True,
+    )
+
+
+def test_hit_returns_session_merged_copy():
+    cache = AuthUserCache()
+    cache.put_user("5:abc", _doctor())
+
+    session = Session()
+    user = cache.get_user(session, "5:abc")
+
+    assert isinstance(user, Person)
+    assert user.id == 5 and user.email == "dr5@example.com"
+    assert user.phone_e164 == "+525512345678"
+    assert user in session
+    assert not session.dirty and not session.new
+
+
+def test_miss_and_non_person_are_ignored():
+    cache = AuthUserCache()
+    cache.put_user("k", MagicMock(id=1))
+    assert len(cache) == 0
+    assert cache.get_user(MagicMock(), "k") is None
+
+
+def test_entries_expire_after_ttl():
+    clock = _Clock()
+    cache = AuthUserCache(ttl_seconds=30, clock=clock)
+    cache.put_user("k", _doctor())
+    cache.mark_license_valid(5)
+
+    clock.now += 29
+    assert cache.get_user(Session(), "k") is not None
+    assert cache.is_license_valid(5)
+
+    clock.now += 2
+    assert cache.get_user(Session(), "k") is None
+    assert not cache.is_license_valid(5)
+    assert len(cache) == 0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = AuthUserCache(max_entries=2)
+    cache.put_user("a", _doctor(1))
+    cache.put_user("b", _doctor(2))
+    cache.get_user(Session(), "a")
+    cache.put_user("c", _doctor(3))
+
+    assert len(cache) == 2
+    assert cache.get_user(Session(), "b") is None
+    assert cache.get_user(Session(), "a") is not None
+
+
+def test_invalidate_user_drops_all_tokens_and_license_mark():
+    cache = AuthUserCache()
+    cache.put_user("5:one", _doctor(5))
+    cache.put_user("5:two", _doctor(5))
+    cache.put_user("6:one", _doctor(6))
+    cache.mark_license_valid(5)
+
+    cache.invalidate_user(5)
+
+    assert cache.get_user(Session(), "5:one") is None
+    assert cache.get_user(Session(), "5:two") is None
+    assert cache.get_user(Session(), "6:one") is not None
+    assert not cache.is_license_valid(5)
+
+
+def test_disabled_cache_is_a_no_op():
+    cache = AuthUserCache(ttl_seconds=0)
+    cache.put_user("k", _doctor())
+    cache.mark_license_valid(5)
+    assert cache.get_user(Session(), "k") is None
+    assert not cache.is_license_valid(5)
+
+
+def test_key_uses_jti_or_token_digest():
+    assert AuthUserCache.key_for("tok", {"sub": "5", "jti": "xyz"}) == "5:xyz"
+    legacy = AuthUserCache.key_for("tok", {"sub": "5"})
+    assert legacy.startswith("sha256:") and "tok" not in legacy
+
+
+def test_access_tokens_carry_unique_jti():
+    a = auth.verify_token(auth.create_access_token({"sub": "5", "user_id": 5}))
+    b = auth.verify_token(auth.create_access_token({"sub": "5", "user_id": 5}))
+    assert a["jti"] and a["jti"] != b["jti"]
+
+
+def test_get_user_from_token_queries_db_once_per_token():
+    token = auth.create_access_token({"sub": "5", "user_id": 5})
+    first_db = MagicMock()
+    first_db.query.return_value.filter.return_value.first.return_value = _doctor()
+
+    assert auth.get_user_from_token(first_db, token).id == 5
+    assert first_db.query.call_count == 1
+
+    second_db = Session()
+    with patch.object(second_db, "query") as query:
+        user = auth.get_user_from_token(second_db, token)
+    query.assert_not_called()
+    assert user.id == 5 and user in second_db
+
+
+def test_get_user_from_token_invalid_token_skips_cache():
+    db = MagicMock()
+    assert auth.get_user_from_token(db, "not-a-jwt") is None
+    db.query.assert_not_called()
+    assert len(auth_user_cache) == 0
+
+
+def test_license_check_is_reused_until_invalidated():
+    doctor = SimpleNamespace(id=5, person_type="doctor")
+    db = MagicMock()
+    with patch(
+        "services.license_service.LicenseService.require_valid_license",
+        return_value=MagicMock(),
+    ) as check:
+        dependencies.require_valid_license_for_doctor(current_user=doctor, db=db)
+        dependencies.require_valid_license_for_doctor(current_user=doctor, db=db)
+        assert check.call_count == 1
+
+        auth_user_cache.invalidate_user(5)
+        dependencies.require_valid_license_for_doctor(current_user=doctor, db=db)
+        assert check.call_count == 2
+
+
+def test_skipped_license_check_is_not_cached():
+    doctor = SimpleNamespace(id=5, person_type="doctor")
+    with patch(
+        "services.license_service.LicenseService.require_valid_license",
+        return_value=None,
+    ):
+        dependencies.require_valid_license_for_doctor(current_user=doctor, db=MagicMock())
+    assert not auth_user_cache.is_license_valid(5)
+
+
+@pytest.mark.parametrize("target,identifier", [
+    (Person, "after_update"),
+    (Person, "after_delete"),
+    (License, "after_insert"),
+    (License, "after_update"),
+    (License, "after_delete"),
+])
+def test_mapper_events_are_registered(target, identifier):
+    listener = (
+        cache_module._invalidate_person if target is Person else cache_module._invalidate_license
+    )
+    assert event.contains(target, identifier, listener)
+
+
+def test_mapper_listeners_invalidate_user():
+    auth_user_cache.put_user("5:a", _doctor(5))
+    cache_module._invalidate_person(None, None, SimpleNamespace(id=5))
+    assert len(auth_user_cache) == 0
+
+    auth_user_cache.mark_license_valid(5)
+    cache_module._invalidate_license(None, None, SimpleNamespace(doctor_id=5))
+    assert not auth_user_cache.is_license_valid(5)
+
+
+def test_logout_invalidates_current_user(client):
+    # conftest's fake doctor has id=1
+    auth_user_cache.put_user("1:a", _doctor(1))
+    auth_user_cache.mark_license_valid(1)
+
+    response = client.post("/api/auth/logout")
+
+    assert response.status_code == 200
+    assert len(auth_user_cache) == 0
+    assert not auth_user_cache.is_license_valid(1)
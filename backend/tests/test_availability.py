@@ -0,0 +1,259 @@
+"""
+Tests for the shared availability engine (services/appointments/availability).
+
+- parse_time_blocks: JSONB list / legacy JSON string / start-end fallback,
+  overlapping blocks merged
+- day_slots: interval subtraction with a single forward sweep (nested and
+  back-to-back bookings, slots that do not fit the block are dropped)
+- get_availability: one template query + one appointment query for a
+  whole date range, days without template omitted
+- entry points (query.get_available_time_slots, gemini_helpers) delegate
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time
+from unittest.mock import MagicMock, patch
+
+import pytz
+from sqlalchemy.dialects import postgresql
+
+from services.appointments import availability, query
+from services.appointments.availability import Booking, Slot, day_slots, get_availability, parse_time_blocks
+
+MONDAY = date(2026, 5, 18)
+CDMX = pytz.timezone("America/Mexico_City")
+
+
+def _at(day, hh, mm=0):
+    return datetime.combine(day, time(hh, mm))
+
+
+def _free(slots):
+    return [slot.start.strftime("%H:%M") for slot in slots if slot.available]
+
+
+# ----------------------------------------------------------------------------
+# parse_time_blocks
+# ----------------------------------------------------------------------------
+
+def test_blocks_from_jsonb_list_sorted_and_merged():
+    raw = [
+        {"start_time": "16:00", "end_time": "19:00"},
+        {"start_time": "09:00", "end_time": "12:00"},
+        {"start_time": "11:00", "end_time": "13:00"},
+        {"start_time": "", "end_time": "14:00"},
+    ]
+    assert parse_time_blocks(raw, None, None) == [(time(9), time(13)), (time(16), time(19))]
+
+
+def test_blocks_from_legacy_json_string():
+    raw = '[{"start_time": "08:30", "end_time": "10:00"}]'
+    assert parse_time_blocks(raw, time(9), time(17)) == [(time(8, 30), time(10))]
+
+
+def test_blocks_fall_back_to_start_and_end_time():
+    assert parse_time_blocks([], time(9), time(17)) == [(time(9), time(17))]
+    assert parse_time_blocks(None, None, None) == []
+
+
+# ----------------------------------------------------------------------------
+# day_slots
+# ----------------------------------------------------------------------------
+
+def test_bookings_are_subtracted_from_blocks():
+    blocks = [(time(9), time(12)), (time(16), time(17, 45))]
+    bookings = [
+        Booking(_at(MONDAY, 9, 30), _at(MONDAY, 10, 30), 1),   # spans two slots
+        Booking(_at(MONDAY, 11), _at(MONDAY, 11, 30), 2),
+        Booking(_at(MONDAY, 16, 30), _at(MONDAY, 17), 3),
+    ]
+
+    slots = day_slots(MONDAY, blocks, bookings, 30)
+
+    # 17:30 does not fit a 30 min slot before 17:45
+    assert [slot.start.strftime("%H:%M") for slot in slots] == [
+        "09:00", "09:30", "10:00", "10:30", "11:00", "11:30", "16:00", "16:30", "17:00",
+    ]
+    assert _free(slots) == ["09:00", "10:30", "11:30", "16:00", "17:00"]
+    assert [slot.appointment_id for slot in slots if not slot.available] == [1, 1, 2, 3]
+
+
+def test_nested_booking_does_not_hide_the_longer_one():
+    bookings = [
+        Booking(_at(MONDAY, 9), _at(MONDAY, 11), 1),
+        Booking(_at(MONDAY, 9, 15), _at(MONDAY, 9, 30), 2),
+    ]
+    slots = day_slots(MONDAY, [(time(9), time(12))], bookings, 30)
+    assert _free(slots) == ["11:00", "11:30"]
+
+
+def test_booking_with_unaligned_times_blocks_every_overlapped_slot():
+    bookings = [Booking(_at(MONDAY, 9, 50), _at(MONDAY, 10, 5), 7)]
+    slots = day_slots(MONDAY, [(time(9), time(11))], bookings, 20)
+    # 09:40-10:00 and 10:00-10:20 overlap; 10:20 onwards is free
+    assert _free(slots) == ["09:00", "09:20", "10:20", "10:40"]
+
+
+# ----------------------------------------------------------------------------
+# get_availability
+# ----------------------------------------------------------------------------
+
+def test_range_uses_two_queries_and_skips_days_without_template():
+    db = MagicMock()
+    db.execute.return_value.fetchall.return_value = [
+        (0, time(9), time(11), [{"start_time": "09:00", "end_time": "10:00"}]),  # Monday
+        (2, time(9), time(10), None),                                              # Wednesday
+    ]
+    db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [
+        (5, _at(MONDAY, 9, 30), _at(MONDAY, 10)),
+    ]
+
+    result = get_availability(db, 1, 3, MONDAY, date(2026, 5, 24), 30, bookings_office_only=False)
+
+    assert db.execute.call_count == 1 and db.query.call_count == 1
+    assert list(result) == [MONDAY, date(2026, 5, 20)]
+    assert result[MONDAY] == [
+        Slot(_at(MONDAY, 9), _at(MONDAY, 9, 30), True),
+        Slot(_at(MONDAY, 9, 30), _at(MONDAY, 10), False, 5),
+    ]
+    assert _free(result[date(2026, 5, 20)]) == ["09:00", "09:30"]
+
+    criteria = db.query.return_value.filter.call_args.args
+    sql = " AND ".join(
+        str(c.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})) for c in criteria
+    )
+    assert "appointments.appointment_date >= '2026-05-18 00:00:00'" in sql
+    assert "appointments.appointment_date < '2026-05-25 00:00:00'" in sql
+    assert "appointments.status IN ('confirmada', 'por_confirmar')" in sql
+
+
+def test_office_scoped_bookings_filter_by_office():
+    db = MagicMock()
+    db.execute.return_value.fetchall.return_value = [(0, time(9), time(10), None)]
+    chain = db.query.return_value.filter.return_value
+    chain.filter.return_value.order_by.return_value.all.return_value = []
+
+    get_availability(db, 1, 3, MONDAY, MONDAY, 30)
+
+    office_filter = chain.filter.call_args.args[0]
+    assert str(office_filter.compile(compile_kwargs={"literal_binds": True})) == "appointments.office_id = 3"
+
+
+def test_no_office_or_template_means_no_slots():
+    db = MagicMock()
+    assert get_availability(db, 1, None, MONDAY, MONDAY) == {}
+    db.execute.return_value.fetchall.return_value = []
+    assert get_availability(db, 1, 3, MONDAY, MONDAY) == {}
+    db.query.assert_not_called()
+
+
+# ----------------------------------------------------------------------------
+# Entry points
+# ----------------------------------------------------------------------------
+
+def test_query_slots_use_the_doctor_and_default_office():
+    slots = [Slot(_at(MONDAY, 9), _at(MONDAY, 9, 30), True)]
+    with patch.object(availability, "default_office_id", return_value=4) as office, \
+            patch.object(availability, "get_availability", return_value={MONDAY: slots}) as engine:
+        result = query.get_available_time_slots(MagicMock(), MONDAY, "12", 30)
+
+    office.assert_called_once()
+    assert engine.call_args.args[1:6] == (12, 4, MONDAY, MONDAY, 30)
+    assert result == [{
+        "time": "09:00", "datetime": _at(MONDAY, 9), "available": True,
+        "appointment_id": None, "patient_name": None,
+    }]
+
+
+def test_query_slots_without_doctor_are_empty():
+    assert query.get_available_time_slots(MagicMock(), MONDAY) == []
+
+
+def test_bot_slots_come_from_the_engine():
+    from services.whatsapp_handlers import gemini_helpers
+
+    slots = [Slot(_at(MONDAY, 9), _at(MONDAY, 9, 30), True), Slot(_at(MONDAY, 10), _at(MONDAY, 10, 30), True)]
+    with patch.object(gemini_helpers, "free_slots", return_value=slots) as engine, \
+            patch.object(gemini_helpers, "get_doctor_duration", return_value=30), \
+            patch.object(gemini_helpers, "date") as fake_date:
+        fake_date.today.return_value = date(2026, 5, 1)
+        result = gemini_helpers.get_available_slots(MagicMock(), 1, 3, "2026-05-18")
+
+    assert engine.call_args.args[1:5] == (1, 3, MONDAY, 30)
+    assert result == [{"time": "09:00", "display": "09:00"}, {"time": "10:00", "display": "10:00"}]
+
+
+# ----------------------------------------------------------------------------
+# Multi-day range
+# ----------------------------------------------------------------------------
+
+def test_free_slots_by_day_keeps_fully_booked_days_empty():
+    db = MagicMock()
+    db.execute.return_value.fetchall.return_value = [
+        (0, time(9), time(10), None),
+        (1, time(9), time(9, 30), None),
+    ]
+    tuesday = date(2026, 5, 19)
+    chain = db.query.return_value.filter.return_value.filter.return_value
+    chain.order_by.return_value.all.return_value = [(8, _at(tuesday, 9), _at(tuesday, 9, 30))]
+
+    result = availability.free_slots_by_day(db, 1, 3, MONDAY, tuesday, 30)
+
+    assert {day: _free(slots) for day, slots in result.items()} == {
+        MONDAY: ["09:00", "09:30"],
+        tuesday: [],
+    }
+
+
+def test_bot_days_skip_full_days_and_clamp_the_range():
+    from services.whatsapp_handlers import gemini_helpers
+
+    tuesday = date(2026, 5, 19)
+    by_day = {MONDAY: [], tuesday: [Slot(_at(tuesday, 9), _at(tuesday, 9, 30), True)]}
+    with patch.object(gemini_helpers, "free_slots_by_day", return_value=by_day) as engine, \
+            patch.object(gemini_helpers, "get_doctor_duration", return_value=30), \
+            patch.object(gemini_helpers, "now_cdmx", return_value=CDMX.localize(datetime(2026, 5, 18, 21, 0))):
+        # 21:00 in CDMX is already Tuesday in UTC; today is still Monday
+        result = gemini_helpers.get_available_days(MagicMock(), 1, 3, "2026-05-01", days=90)
+
+    # Past start moves to today; the range is capped at MAX_RANGE_DAYS
+    assert engine.call_args.args[3:5] == (MONDAY, date(2026, 6, 17))
+    assert result == [{"date": "2026-05-19", "times": ["09:00"]}]
+
+
+def test_range_endpoint_returns_every_working_day():
+    from fastapi.testclient import TestClient
+    from types import SimpleNamespace
+
+    from database import get_db
+    from dependencies import get_current_user
+    from main_clean_english import app
+    from routes import schedule
+
+    tuesday = date(2026, 5, 19)
+    by_day = {MONDAY: [Slot(_at(MONDAY, 9), _at(MONDAY, 9, 20), True)], tuesday: []}
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=1, appointment_duration=20)
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    try:
+        with patch.object(schedule, "_resolve_target_office_id", return_value=3), \
+                patch.object(schedule, "free_slots_by_day", return_value=by_day) as engine:
+            client = TestClient(app)
+            response = client.get("/api/schedule/availability", params={"start_date": "2026-05-18", "days": 14})
+            too_long = client.get("/api/schedule/availability", params={"days": 60})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert engine.call_count == 1
+    assert engine.call_args.args[1:6] == (1, 3, MONDAY, date(2026, 5, 31), 20)
+    body = response.json()
+    assert (body["start_date"], body["end_date"], body["slot_duration_minutes"]) == ("2026-05-18", "2026-05-31", 20)
+    assert body["days"] == [
+        {"date": "2026-05-18", "available_times": [{
+            "time": "09:00", "display": "09:00", "datetime": "2026-05-18T09:00:00",
+            "duration_minutes": 20, "available": True,
+        }]},
+        {"date": "2026-05-19", "available_times": []},
+    ]
+    assert too_long.status_code == 422
@@ -0,0 +1,307 @@
+"""
+Tests for the Google Calendar sync outbox.
+
+- enqueue_calendar_sync: one INSERT ... ON CONFLICT in the caller's transaction;
+  a change to a leased entry keeps the lease (needs QUERY_PLAN_DATABASE_URL)
+- drain_calendar_outbox against a fake calendar client: per-doctor batches,
+  success deletes, failures back off, exhausted entries are parked,
+  version-guarded settlement
+- GoogleCalendarService.sync_events_batch: one batch HTTP request per doctor,
+  mappings created/removed from the batch responses
+- appointment writes enqueue instead of calling Google inline
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from googleapiclient.errors import HttpError
+from sqlalchemy.dialects import postgresql
+
+from database import CalendarSyncOutbox, GoogleCalendarEventMapping
+from services import calendar_sync_outbox as outbox
+from services.google_calendar_service import GoogleCalendarService
+
+NOW = datetime(2026, 10, 17, 12, 0, tzinfo=timezone.utc)
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def _chain(*, first=None, all_=()):
+    q = MagicMock()
+    for method in ("filter", "options", "order_by", "limit", "with_for_update"):
+        getattr(q, method).return_value = q
+    q.first.return_value = first
+    q.all.return_value = list(all_)
+    return q
+
+
+def _entry(id, appointment_id, doctor_id, operation="upsert", attempts=0, version=1):
+    return CalendarSyncOutbox(
+        id=id, appointment_id=appointment_id, doctor_id=doctor_id,
+        operation=operation, status="pending", version=version, attempts=attempts,
+        next_attempt_at=NOW,
+    )
+
+
+class _FakeCalendar:
+    def __init__(self, errors=None, raises=None):
+        self.errors = errors or {}
+        self.raises = raises
+        self.calls = []
+
+    def sync_events_batch(self, db, doctor_id, changes):
+        self.calls.append((doctor_id, dict(changes)))
+        if self.raises:
+            raise self.raises
+        return {appointment_id: self.errors.get(appointment_id) for appointment_id in changes}
+
+
+# ----------------------------------------------------------------------------
+# enqueue
+# ----------------------------------------------------------------------------
+
+def test_enqueue_is_single_upsert_without_commit():
+    db = MagicMock()
+    outbox.enqueue_calendar_sync(db, 42, 7, outbox.OPERATION_UPSERT)
+
+    db.commit.assert_not_called()
+    sql = _sql(db.execute.call_args.args[0])
+    assert sql.startswith("INSERT INTO calendar_sync_outbox")
+    assert "ON CONFLICT (appointment_id) WHERE status = %(status_1)s DO UPDATE" in sql
+
+
+def test_enqueue_keeps_the_lease_of_a_claimed_entry(pg_session):
+    from database import Person
+
+    db = pg_session
+    doctor = Person(person_code="OUTBOX-T1", person_type="doctor", name="Dra. Outbox")
+    db.add(doctor)
+    db.flush()
+
+    outbox.enqueue_calendar_sync(db, 987654, doctor.id, outbox.OPERATION_UPSERT)
+    now = outbox.utc_now() + timedelta(seconds=1)
+    [held] = [e for e in outbox.claim_due_entries(db, now=now) if e.appointment_id == 987654]
+
+    # A new change while the worker calls Google
+    outbox.enqueue_calendar_sync(db, 987654, doctor.id, outbox.OPERATION_DELETE)
+    db.commit()
+
+    mine = lambda entries: [e for e in entries if e.appointment_id == 987654]
+    assert mine(outbox.claim_due_entries(db, now=now + timedelta(seconds=1))) == []
+    [again] = mine(outbox.claim_due_entries(db, now=now + timedelta(seconds=outbox.LEASE_SECONDS + 1)))
+    assert (again.version, again.operation) == (held.version + 1, outbox.OPERATION_DELETE)
+
+
+def test_enqueue_rejects_unknown_operation_and_skips_missing_ids():
+    db = MagicMock()
+    with pytest.raises(ValueError):
+        outbox.enqueue_calendar_sync(db, 1, 1, "patch")
+    outbox.enqueue_calendar_sync(db, None, 1, outbox.OPERATION_DELETE)
+    db.execute.assert_not_called()
+
+
+@pytest.mark.parametrize("attempts,expected", [(1, 30), (2, 60), (5, 480), (20, 3600)])
+def test_backoff(attempts, expected):
+    assert outbox.backoff_seconds(attempts) == expected
+
+
+# ----------------------------------------------------------------------------
+# worker
+# ----------------------------------------------------------------------------
+
+def test_drain_batches_per_doctor_and_settles_each_entry():
+    entries = [_entry(1, 100, 7), _entry(2, 101, 7, "delete"), _entry(3, 200, 8)]
+    claim = _chain(all_=entries)
+    settles = [_chain() for _ in entries]
+    db = MagicMock()
+    db.query.side_effect = [claim, *settles]
+    calendar = _FakeCalendar(errors={101: "HttpError 500"})
+
+    assert outbox.drain_calendar_outbox(db, calendar=calendar, now=NOW) == 3
+
+    assert calendar.calls == [(7, {100: "upsert", 101: "delete"}), (8, {200: "upsert"})]
+    claim.with_for_update.assert_called_once_with(skip_locked=True)
+    # Claimed rows are leased and counted before the API calls
+    assert all(e.attempts == 1 for e in entries)
+    assert entries[0].next_attempt_at > NOW
+
+    settles[0].delete.assert_called_once_with(synchronize_session=False)
+    settles[2].delete.assert_called_once_with(synchronize_session=False)
+    settles[1].delete.assert_not_called()
+    values = settles[1].update.call_args.args[0]
+    assert values["last_error"] == "HttpError 500"
+    assert "status" not in values and values["next_attempt_at"] > values["updated_at"]
+
+
+def test_drain_parks_entry_after_max_attempts():
+    entry = _entry(1, 100, 7, attempts=outbox.MAX_ATTEMPTS - 1)
+    settle = _chain()
+    db = MagicMock()
+    db.query.side_effect = [_chain(all_=[entry]), settle]
+
+    outbox.drain_calendar_outbox(db, calendar=_FakeCalendar(errors={100: "boom"}), now=NOW)
+
+    values = settle.update.call_args.args[0]
+    assert values["status"] == "failed"
+    assert "next_attempt_at" not in values
+
+
+def test_drain_client_exception_retries_whole_batch():
+    entries = [_entry(1, 100, 7), _entry(2, 101, 7)]
+    settles = [_chain(), _chain()]
+    db = MagicMock()
+    db.query.side_effect = [_chain(all_=entries), *settles]
+
+    outbox.drain_calendar_outbox(db, calendar=_FakeCalendar(raises=RuntimeError("token")), now=NOW)
+
+    db.rollback.assert_called_once()
+    for settle in settles:
+        assert settle.update.call_args.args[0]["last_error"] == "token"
+
+
+def test_settle_is_guarded_by_claimed_version():
+    entry = _entry(1, 100, 7, version=3)
+    settle = _chain()
+    db = MagicMock()
+    db.query.side_effect = [_chain(all_=[entry]), settle]
+
+    outbox.drain_calendar_outbox(db, calendar=_FakeCalendar(), now=NOW)
+
+    criteria = " AND ".join(
+        str(c.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        for c in settle.filter.call_args.args
+    )
+    assert "calendar_sync_outbox.id = 1" in criteria
+    assert "calendar_sync_outbox.version = 3" in criteria
+
+
+def test_drain_without_due_entries_does_nothing():
+    db = MagicMock()
+    db.query.side_effect = [_chain(all_=[])]
+    calendar = _FakeCalendar()
+    assert outbox.drain_calendar_outbox(db, calendar=calendar, now=NOW) == 0
+    assert calendar.calls == []
+
+
+# ----------------------------------------------------------------------------
+# GoogleCalendarService.sync_events_batch
+# ----------------------------------------------------------------------------
+
+class _FakeBatch:
+    def __init__(self, callback, outcomes, log):
+        self.callback = callback
+        self.outcomes = outcomes
+        self.log = log
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.log.append([request_id for request_id, _ in self.requests])
+        for request_id, request in self.requests:
+            response, exception = self.outcomes.get(request_id, ({"id": f"evt-{request_id}"}, None))
+            self.callback(request_id, response, exception)
+
+
+class _FakeService:
+    def __init__(self, outcomes=None):
+        self.outcomes = outcomes or {}
+        self.batches = []
+        self._events = MagicMock()
+
+    def events(self):
+        return self._events
+
+    def new_batch_http_request(self, callback):
+        return _FakeBatch(callback, self.outcomes, self.batches)
+
+
+def _http_error(status):
+    return HttpError(SimpleNamespace(status=status, reason="x"), b"{}")
+
+
+def _appointment(id):
+    return SimpleNamespace(
+        id=id, patient=None, doctor=None,
+        appointment_date=datetime(2026, 10, 20, 9, 0), end_time=datetime(2026, 10, 20, 9, 30),
+    )
+
+
+def test_sync_events_batch_single_batch_per_doctor():
+    stale = GoogleCalendarEventMapping(appointment_id=2, google_event_id="evt-old", doctor_id=7)
+    gone = GoogleCalendarEventMapping(appointment_id=3, google_event_id="evt-gone", doctor_id=7)
+    token = SimpleNamespace(calendar_id=None, last_sync_at=None)
+    db = MagicMock()
+    db.query.side_effect = [
+        _chain(all_=[stale, gone]),          # mappings
+        _chain(first=token),                 # token
+        _chain(all_=[_appointment(1), _appointment(2)]),  # appointments
+    ]
+    service = _FakeService(outcomes={"2": (None, _http_error(500)), "3": (None, _http_error(404))})
+
+    with patch.object(GoogleCalendarService, "get_valid_credentials", return_value=object()) as creds, \
+            patch("services.google_calendar_service.build", return_value=service):
+        results = GoogleCalendarService.sync_events_batch(
+            db, 7, {1: "upsert", 2: "upsert", 3: "delete", 4: "delete"}
+        )
+
+    creds.assert_called_once()
+    assert service.batches == [["1", "2", "3"]]
+    assert results[1] is None and results[3] is None and results[4] is None
+    assert "500" in results[2]
+
+    added = db.add.call_args.args[0]
+    assert (added.appointment_id, added.google_event_id) == (1, "evt-1")
+    db.delete.assert_called_once_with(gone)
+    assert token.last_sync_at is not None
+    db.commit.assert_called_once()
+
+
+def test_sync_events_batch_without_token_only_cleans_mappings():
+    mapping = GoogleCalendarEventMapping(appointment_id=5, google_event_id="evt-5", doctor_id=7)
+    db = MagicMock()
+    db.query.side_effect = [_chain(all_=[mapping]), _chain(first=None)]
+
+    with patch("services.google_calendar_service.build") as build:
+        results = GoogleCalendarService.sync_events_batch(db, 7, {5: "delete", 6: "upsert"})
+
+    build.assert_not_called()
+    assert results == {5: None, 6: None}
+    db.delete.assert_called_once_with(mapping)
+
+
+def test_sync_events_batch_missing_credentials_retries_all():
+    db = MagicMock()
+    db.query.side_effect = [_chain(all_=[]), _chain(first=SimpleNamespace(calendar_id="primary"))]
+    with patch.object(GoogleCalendarService, "get_valid_credentials", return_value=None):
+        results = GoogleCalendarService.sync_events_batch(db, 7, {1: "upsert"})
+    assert results[1]
+
+
+# ----------------------------------------------------------------------------
+# Appointment writes enqueue instead of calling Google
+# ----------------------------------------------------------------------------
+
+def test_cancel_appointment_enqueues_delete_before_commit():
+    import crud.appointment as mod
+
+    appointment = SimpleNamespace(id=9, doctor_id=7)
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = appointment
+    order = []
+    db.execute.side_effect = lambda *a, **k: order.append("enqueue")
+    db.commit.side_effect = lambda: order.append("commit")
+
+    with patch.object(GoogleCalendarService, "delete_calendar_event") as inline:
+        mod.cancel_appointment(db, 9, "motivo", cancelled_by=7)
+
+    inline.assert_not_called()
+    assert order == ["enqueue", "commit"]
+    assert "INSERT INTO calendar_sync_outbox" in _sql(db.execute.call_args.args[0])
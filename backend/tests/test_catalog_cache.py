@@ -0,0 +1,237 @@
+"""
+Tests for the in-process catalog cache (services/catalog_cache.py).
+
+- CatalogCache: one load per (catalog, scope), TTL expiry, invalidation of
+  every scope, a load racing an invalidation is not kept
+- catalog_response: strong ETag, If-None-Match -> 304 (also W/ and lists),
+  per-variant ETags for filtered / paged views
+- commit hook: a flushed write to a catalog model invalidates on commit,
+  not on rollback
+- routes: medications and the CIE-10 catalog are served from the cache
+"""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from services import catalog_cache as cache_module
+from services.catalog_cache import CatalogCache, catalog_cache, catalog_response, contains, page
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    catalog_cache.clear()
+    yield
+    catalog_cache.clear()
+
+
+# ----------------------------------------------------------------------------
+# CatalogCache
+# ----------------------------------------------------------------------------
+
+def test_catalog_is_loaded_once_per_scope():
+    cache = CatalogCache()
+    loader = MagicMock(return_value=[{"id": 1, "name": "Paracetamol"}])
+
+    first = cache.get("medications", loader, scope=7)
+    second = cache.get("medications", loader, scope=7)
+    cache.get("medications", loader, scope=8)
+
+    assert first is second
+    assert loader.call_count == 2
+    assert first.body == b'[{"id":1,"name":"Paracetamol"}]'
+    assert first.etag.startswith('"medications-MEDS-MX-2024-')
+
+
+def test_entries_expire_after_ttl():
+    clock = _Clock()
+    cache = CatalogCache(ttl_seconds=60, clock=clock)
+    loader = MagicMock(return_value=[])
+
+    cache.get("countries", loader)
+    clock.now += 61
+    cache.get("countries", loader)
+
+    assert loader.call_count == 2
+
+
+def test_invalidate_drops_every_scope_of_the_catalog():
+    cache = CatalogCache()
+    cache.get("diagnoses", lambda: [], scope=1)
+    cache.get("diagnoses", lambda: [], scope="all")
+    cache.get("countries", lambda: [])
+
+    cache.invalidate("diagnoses")
+
+    assert len(cache) == 1
+
+
+def test_load_racing_an_invalidation_is_not_kept():
+    cache = CatalogCache()
+
+    def loader():
+        cache.invalidate("medications")  # a write commits while we read
+        return [{"id": 1}]
+
+    entry = cache.get("medications", loader, scope=1)
+
+    assert entry.rows == [{"id": 1}]
+    assert len(cache) == 0
+
+
+def test_disabled_cache_always_loads():
+    cache = CatalogCache(ttl_seconds=0)
+    loader = MagicMock(return_value=[])
+    cache.get("states", loader)
+    cache.get("states", loader)
+    assert loader.call_count == 2
+
+
+# ----------------------------------------------------------------------------
+# catalog_response
+# ----------------------------------------------------------------------------
+
+def test_response_carries_etag_and_cache_control():
+    entry = CatalogCache().get("countries", lambda: [{"id": 1, "name": "México"}])
+    response = catalog_response(_request(), entry)
+
+    assert response.status_code == 200
+    assert response.body == '[{"id":1,"name":"México"}]'.encode()
+    assert response.headers["etag"] == entry.etag
+    assert response.headers["cache-control"] == "public, max-age=3600"
+
+
+@pytest.mark.parametrize("header", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_matching_if_none_match_returns_304(header):
+    entry = CatalogCache().get("countries", lambda: [{"id": 1}])
+    response = catalog_response(_request(header.format(etag=entry.etag)), entry)
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == entry.etag
+
+
+def test_filtered_views_get_their_own_etag():
+    entry = CatalogCache().get("study_catalog", lambda: [{"id": i, "name": f"Estudio {i}"} for i in range(5)])
+
+    first_page = catalog_response(_request(), entry, lambda rows: page(rows, 0, 2), {"skip": 0, "limit": 2})
+    second_page = catalog_response(_request(), entry, lambda rows: page(rows, 2, 2), {"skip": 2, "limit": 2})
+
+    assert first_page.headers["etag"] != second_page.headers["etag"] != entry.etag
+    assert second_page.body == b'[{"id":2,"name":"Estudio 2"},{"id":3,"name":"Estudio 3"}]'
+    # The whole-catalog ETag does not validate a partial view
+    assert catalog_response(_request(entry.etag), entry, lambda rows: rows[:1], {"skip": 0}).status_code == 200
+
+
+def test_contains_is_case_insensitive():
+    rows = [{"name": "Ibuprofeno"}, {"name": "Paracetamol"}, {"name": None}]
+    assert contains(rows, "name", "PROF") == [{"name": "Ibuprofeno"}]
+    assert contains(rows, "name", None) == rows
+
+
+# ----------------------------------------------------------------------------
+# Invalidation on commit
+# ----------------------------------------------------------------------------
+
+def _flush_write(monkeypatch, session, model):
+    monkeypatch.setattr(cache_module, "object_session", lambda _: session)
+    cache_module._mark_catalog_written(SimpleNamespace(class_=model), None, MagicMock())
+
+
+def test_write_invalidates_on_commit_only(monkeypatch):
+    from database import Medication
+
+    catalog_cache.get("medications", lambda: [], scope=1)
+    session = SimpleNamespace(info={})
+
+    _flush_write(monkeypatch, session, Medication)
+    assert len(catalog_cache) == 1  # not yet committed
+
+    cache_module._invalidate_committed_catalogs(session)
+    assert len(catalog_cache) == 0
+    assert session.info == {}
+
+
+def test_rolled_back_write_keeps_the_cache(monkeypatch):
+    from database import StudyCategory
+
+    catalog_cache.get("study_catalog", lambda: [])
+    session = SimpleNamespace(info={})
+
+    _flush_write(monkeypatch, session, StudyCategory)
+    assert session.info[cache_module._PENDING_KEY] == {"study_categories", "study_catalog"}
+    cache_module._forget_rolled_back_catalogs(session)
+    cache_module._invalidate_committed_catalogs(session)
+
+    assert len(catalog_cache) == 1
+
+
+# ----------------------------------------------------------------------------
+# Routes
+# ----------------------------------------------------------------------------
+
+@pytest.fixture
+def client():
+    from main_clean_english import app
+    from database import get_db
+    from dependencies import get_current_user
+
+    db = MagicMock()
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=5, person_type="doctor")
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        yield TestClient(app), db
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_medications_are_served_from_cache_with_304(client, monkeypatch):
+    from routes import medications
+
+    http, _ = client
+    rows = [{"id": 1, "name": "Ibuprofeno", "created_by": 5}, {"id": 2, "name": "Paracetamol", "created_by": 0}]
+    loader = MagicMock(return_value=rows)
+    monkeypatch.setattr(medications, "_medication_rows", loader)
+
+    first = http.get("/api/medications")
+    again = http.get("/api/medications", headers={"If-None-Match": first.headers["etag"]})
+    searched = http.get("/api/medications", params={"search": "para"})
+
+    assert loader.call_count == 1
+    assert first.json() == rows
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert again.status_code == 304
+    assert searched.json() == [rows[1]]
+    assert searched.headers["etag"] != first.headers["etag"]
+
+
+def test_diagnosis_catalog_pages_the_cached_rows(client, monkeypatch):
+    from routes import diagnosis
+
+    http, _ = client
+    rows = [{"id": i, "code": f"A0{i}", "name": f"Dx {i}"} for i in range(5)]
+    loader = MagicMock(return_value=rows)
+    monkeypatch.setattr(diagnosis, "_diagnosis_rows", loader)
+
+    response = http.get("/api/diagnosis/catalog", params={"offset": 1, "limit": 2})
+    http.get("/api/diagnosis/catalog")
+
+    assert loader.call_count == 1
+    assert response.json() == rows[1:3]
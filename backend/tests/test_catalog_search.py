@@ -0,0 +1,148 @@
+"""
+Tests for the catalog typeahead index (services/catalog_search.py).
+
+- normalize: accents, case and punctuation are ignored
+- ranking: exact code > code prefix > name prefix > word prefix > substring > fuzzy
+- scoping predicate and paging
+- the index lives on the cached entry and is rebuilt with it
+- routes: CIE-10 search and study search use the index
+"""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.catalog_cache import CatalogCache, catalog_cache
+from services.catalog_search import TypeaheadIndex, normalize, search_index
+
+DIAGNOSES = [
+    {"id": 1, "code": "J18.9", "name": "Neumonía, no especificada", "created_by": 0},
+    {"id": 2, "code": "J18.0", "name": "Bronconeumonía, no especificada", "created_by": 0},
+    {"id": 3, "code": "R51", "name": "Cefalea", "created_by": 0},
+    {"id": 4, "code": "E11.9", "name": "Diabetes mellitus tipo 2, sin complicaciones", "created_by": 0},
+    {"id": 5, "code": "I10", "name": "Hipertensión esencial (primaria)", "created_by": 0},
+    {"id": 6, "code": "", "name": "Cefalea tensional crónica", "created_by": 7},
+    {"id": 7, "code": "", "name": "Cefalea postpunción", "created_by": 8},
+]
+
+
+@pytest.fixture
+def index():
+    return TypeaheadIndex(DIAGNOSES, code_field="code")
+
+
+def _ids(matches):
+    return [row["id"] for row, _ in matches]
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    catalog_cache.clear()
+    yield
+    catalog_cache.clear()
+
+
+def test_normalize_drops_accents_case_and_punctuation():
+    assert normalize("Hipertensión  esencial (primaria)") == "hipertension esencial primaria"
+    assert normalize(None) == ""
+
+
+def test_code_matches_rank_first(index):
+    matches = index.search("j18")
+    assert _ids(matches) == [2, 1]
+    assert {rank for _, rank in matches} == {0.9}
+
+    exact = index.search("J18.9")
+    assert exact[0] == (DIAGNOSES[0], 1.0)
+
+
+def test_name_prefix_beats_word_prefix_beats_substring(index):
+    matches = index.search("neumo")
+    assert [(row["id"], rank) for row, rank in matches] == [(1, 0.8), (2, 0.5)]
+
+    assert _ids(index.search("mellitus tip")) == [4]
+    assert index.search("esencial")[0][1] == 0.7
+
+
+def test_accent_insensitive(index):
+    assert _ids(index.search("hipertensión")) == _ids(index.search("HIPERTENSION")) == [5]
+
+
+def test_typos_fall_back_to_fuzzy(index):
+    matches = index.search("hipertencion")
+    assert _ids(matches) == [5]
+    assert 0 < matches[0][1] < 0.4
+    assert index.search("xyzw") == []
+
+
+def test_predicate_scopes_and_paging(index):
+    own = index.search("cefalea", predicate=lambda row: row["created_by"] in (0, 7))
+    assert _ids(own) == [3, 6]
+
+    assert _ids(index.search("cefalea", limit=1, offset=1)) == [7]
+
+
+def test_empty_query_lists_alphabetically(index):
+    assert _ids(index.search("", limit=3)) == [2, 3, 7]
+    assert index.search("", limit=1)[0][1] is None
+
+
+def test_index_is_built_once_per_cache_entry():
+    cache = CatalogCache()
+    entry = cache.get("diagnoses", lambda: DIAGNOSES, scope="all")
+
+    assert search_index(entry, code_field="code") is search_index(entry, code_field="code")
+
+    cache.invalidate("diagnoses")
+    reloaded = cache.get("diagnoses", lambda: DIAGNOSES[:1], scope="all")
+    assert len(search_index(reloaded, code_field="code")) == 1
+
+
+# ----------------------------------------------------------------------------
+# Routes
+# ----------------------------------------------------------------------------
+
+@pytest.fixture
+def client():
+    from main_clean_english import app
+    from database import get_db
+    from dependencies import get_current_user
+
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=7, person_type="doctor")
+    app.dependency_overrides[get_db] = lambda: MagicMock()
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_diagnosis_search_is_ranked_and_scoped(client, monkeypatch):
+    from routes import diagnosis
+
+    loader = MagicMock(return_value=DIAGNOSES)
+    monkeypatch.setattr(diagnosis, "_diagnosis_rows", loader)
+
+    response = client.post("/api/diagnosis/search", json={"query": "cefalea", "limit": 10})
+    client.post("/api/diagnosis/search", json={"query": "r51"})
+
+    assert response.status_code == 200
+    assert [(item["id"], item["rank"]) for item in response.json()] == [(3, 0.8), (6, 0.8)]
+    assert loader.call_count == 1
+
+
+def test_study_search_filters_by_category(client, monkeypatch):
+    from routes import clinical_studies
+
+    rows = [
+        {"id": 1, "name": "Biometría hemática", "category_id": 1},
+        {"id": 2, "name": "Química sanguínea", "category_id": 1},
+        {"id": 3, "name": "Radiografía de tórax", "category_id": 2},
+    ]
+    monkeypatch.setattr(clinical_studies, "_study_catalog_rows", lambda db: rows)
+
+    assert [item["id"] for item in client.get("/api/study-search", params={"q": "hematica"}).json()] == [1]
+    assert client.get("/api/study-search", params={"q": "torax", "category_id": 1}).json() == []
@@ -0,0 +1,187 @@
+"""
+Query-count tests for the consultation list (N+1 regression guard).
+
+- statement count: the list runs against an in-memory SQLite engine and
+  every SQL statement is counted with a `before_cursor_execute` listener,
+  so lazy loads show up too; the count must not grow with the page size
+- grouping: with a mocked DB (every `db.query(Model)` returns a chain whose
+  `.all()` yields the canned rows for that model) related rows are grouped
+  back onto the right consultation
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from database import (
+    Base,
+    ClinicalStudy,
+    ConsultationPrescription,
+    ConsultationVitalSign,
+    MedicalRecord,
+    Medication,
+    Person,
+    VitalSign,
+)
+from services.consultation_service import ConsultationService
+
+
+def _chain(rows):
+    q = MagicMock()
+    for method in ("options", "filter", "join", "order_by", "offset", "limit"):
+        getattr(q, method).return_value = q
+    q.all.return_value = list(rows)
+    return q
+
+
+def _consultation(id: int):
+    return SimpleNamespace(
+        id=id,
+        patient_id=10,
+        doctor_id=1,
+        consultation_date=datetime(2026, 4, 1, 10, 0),
+        patient_document_id=None,
+        patient_document_value=None,
+        patient_document=None,
+        patient=SimpleNamespace(name="Juan Pérez"),
+        doctor=SimpleNamespace(name="Dra. Prueba", title="Dra.", offices=[]),
+        chief_complaint="Cefalea",
+        history_present_illness="",
+        family_history="",
+        perinatal_history="",
+        personal_pathological_history="",
+        gynecological_and_obstetric_history="",
+        personal_non_pathological_history="",
+        physical_examination="",
+        primary_diagnosis="Migraña",
+        secondary_diagnoses="",
+        treatment_plan="",
+        follow_up_instructions="",
+        laboratory_results="",
+        notes="",
+        prescribed_medications="",
+        consultation_type="Seguimiento",
+        created_by=1,
+        created_at=datetime(2026, 4, 1, 10, 0),
+    )
+
+
+def _mock_db(consultations, vitals=(), prescriptions=(), studies=()):
+    rows = {
+        MedicalRecord: consultations,
+        ConsultationVitalSign: vitals,
+        ConsultationPrescription: prescriptions,
+        ClinicalStudy: studies,
+    }
+    db = MagicMock()
+    db.query.side_effect = lambda model, *a: _chain(rows[model])
+    return db
+
+
+# The models use JSONB; SQLite stores it as JSON so create_all works here
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture
+def sqlite_db():
+    """Real session on an in-memory database, seeded with one doctor's consultations."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    text_fields = dict.fromkeys((
+        "history_present_illness", "family_history", "perinatal_history",
+        "gynecological_and_obstetric_history", "personal_pathological_history",
+        "personal_non_pathological_history", "physical_examination", "treatment_plan",
+    ), "")
+    ids = range(1, 31)
+    # Core inserts: seeding should not fire the ORM write hooks (analytics rollups)
+    with engine.begin() as conn:
+        conn.execute(Person.__table__.insert(), [
+            dict(id=1, person_code="D1", person_type="doctor", name="Dra. Prueba"),
+            dict(id=10, person_code="P10", person_type="patient", name="Juan Pérez"),
+        ])
+        conn.execute(VitalSign.__table__.insert(), [dict(id=5, name="Frecuencia cardíaca")])
+        conn.execute(Medication.__table__.insert(), [dict(id=3, name="Paracetamol", created_by=1)])
+        conn.execute(MedicalRecord.__table__.insert(), [
+            dict(id=i, patient_id=10, doctor_id=1, consultation_date=datetime(2026, 4, 1, 10, i),
+                 chief_complaint="Cefalea", primary_diagnosis="Migraña", created_by=1, **text_fields)
+            for i in ids
+        ])
+        conn.execute(ConsultationVitalSign.__table__.insert(), [
+            dict(consultation_id=i, vital_sign_id=5, value="72", unit="bpm") for i in ids
+        ])
+        conn.execute(ConsultationPrescription.__table__.insert(), [
+            dict(consultation_id=i, medication_id=3, dosage="500mg", frequency="c/8h", duration="5d")
+            for i in ids
+        ])
+        conn.execute(ClinicalStudy.__table__.insert(), [
+            dict(consultation_id=i, patient_id=10, doctor_id=1, study_type="lab", study_name="BH",
+                 ordered_date=datetime(2026, 4, 1))
+            for i in ids
+        ])
+    db = sessionmaker(bind=engine)()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *a: statements.append(sql))
+    try:
+        yield db, statements
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_list_statement_count_does_not_grow_with_page_size(sqlite_db):
+    db, statements = sqlite_db
+    counts = {}
+    for page_size in (2, 30):
+        statements.clear()
+        db.expunge_all()  # no identity-map hits from the previous page
+        result = ConsultationService.get_consultations_for_doctor(db, doctor_id=1, limit=page_size)
+        assert len(result) == page_size
+        assert all(c["prescribed_medications"][0]["medication_name"] == "Paracetamol" for c in result)
+        counts[page_size] = len(statements)
+
+    assert counts[2] == counts[30]
+
+
+def test_empty_page_skips_related_queries(sqlite_db):
+    db, statements = sqlite_db
+    assert ConsultationService.get_consultations_for_doctor(db, doctor_id=2) == []
+    assert len(statements) == 1
+
+
+def test_related_rows_grouped_by_consultation():
+    vitals = [
+        SimpleNamespace(id=1, consultation_id=2, vital_sign_id=5, value="72", unit="bpm", created_at=None),
+    ]
+    prescriptions = [
+        SimpleNamespace(
+            id=7, consultation_id=1, medication_id=3, medication=SimpleNamespace(name="Paracetamol"),
+            dosage="500mg", frequency="c/8h", duration="5d", instructions=None,
+            quantity="10", via_administracion="oral", created_at=None,
+        ),
+    ]
+    studies = [
+        SimpleNamespace(
+            id=9, consultation_id=2, study_name="BH", study_type="lab",
+            clinical_indication=None, file_path=None, created_at=None,
+        ),
+    ]
+    db = _mock_db([_consultation(1), _consultation(2)], vitals, prescriptions, studies)
+
+    result = {c["id"]: c for c in ConsultationService.get_consultations_for_doctor(db, doctor_id=1)}
+
+    assert result[1]["vital_signs"] == []
+    assert [v["value"] for v in result[2]["vital_signs"]] == ["72"]
+    assert [p["medication_name"] for p in result[1]["prescribed_medications"]] == ["Paracetamol"]
+    assert result[2]["prescribed_medications"] == []
+    assert [s["study_name"] for s in result[2]["clinical_studies"]] == ["BH"]
@@ -115,20 +115,27 @@ def test_search_patients_returns_matches_visible_to_doctor():
 
 
 def test_search_patients_filters_out_patients_doctor_cannot_read():
+    from sqlalchemy.dialects import postgresql
+
     doctor = _doctor(id=1)
     mine = _patient(10, "Juan Pérez", created_by=1)
-    theirs = _patient(11, "Pedro Pérez", created_by=999)
-    db = _mock_db(
-        _chain(all_=[mine, theirs]),
-        # `_doctor_can_read_patient` fires for `theirs` (not creator) — no prior consultation:
-        _chain(first=None),
-    )
+    # The ACL is part of the search SQL, so the DB only returns `mine`.
+    search = _chain(all_=[mine])
+    db = _mock_db(search)
 
     result = tools_module.search_patients(db, doctor, query="Pérez", limit=10)
 
     # Only `mine` survives; `theirs` is silently filtered (no 403 leak).
     assert result["count"] == 1
     assert result["patients"][0]["name"] == "Juan Pérez"
+    # One query total — no per-patient ACL round trips.
+    assert db.query.call_count == 1
+    sql = " AND ".join(
+        str(c.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        for c in search.filter.call_args.args
+    )
+    assert "persons.created_by = 1" in sql
+    assert "EXISTS (SELECT *" in sql and "medical_records.doctor_id = 1" in sql
 
 
 def test_search_patients_empty_query_returns_error():
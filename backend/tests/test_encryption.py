@@ -0,0 +1,247 @@
+"""
+Unit tests del formato de cifrado versionado (v2) y caché de claves.
+
+Valida:
+- roundtrip v2 y marcador de formato
+- blobs legados (sal por campo) siguen descifrando
+- la derivación PBKDF2 se hace una vez por key_id, no por campo
+- re-cifrado de blobs legados a v2 y detección de rotación de key_id
+- decrypt_sensitive_data (consultas) reconoce blobs v2 cortos
+- decrypt_many: filas ORM/dict/tupla, una derivación por lote, pool de hilos
+- job de re-cifrado: ignora texto plano y se reanuda desde el último id
+"""
+from __future__ import annotations
+
+import os
+import sys
+from unittest.mock import patch
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ["MEDICAL_ENCRYPTION_KEY"] = "unit-test-encryption-key-do-not-use-in-prod"
+
+import pytest  # noqa: E402
+
+import encryption  # noqa: E402
+from encryption import CIPHERTEXT_V2_PREFIX, EncryptionService  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _clear_key_cache():
+    encryption._derived_key_cache.clear()
+    yield
+    encryption._derived_key_cache.clear()
+
+
+def _svc(key_id: str = "k1") -> EncryptionService:
+    return EncryptionService("unit-test-encryption-key-do-not-use-in-prod", key_id=key_id)
+
+
+def test_v2_roundtrip_and_marker():
+    svc = _svc()
+    ct = svc.encrypt_sensitive_data("Dolor abdominal de 3 días")
+    assert ct.startswith(f"{CIPHERTEXT_V2_PREFIX}k1:")
+    assert svc.is_versioned_ciphertext(ct)
+    assert svc.decrypt_sensitive_data(ct) == "Dolor abdominal de 3 días"
+
+
+def test_v2_short_value_roundtrip():
+    svc = _svc()
+    ct = svc.encrypt_sensitive_data("a")
+    assert svc.decrypt_sensitive_data(ct) == "a"
+
+
+def test_legacy_blob_still_decrypts():
+    svc = _svc()
+    legacy = svc.encrypt_legacy_data("Antecedente de hipertensión")
+    assert not svc.is_versioned_ciphertext(legacy)
+    assert svc.decrypt_sensitive_data(legacy) == "Antecedente de hipertensión"
+
+
+def test_key_derived_once_per_key_id():
+    svc = _svc()
+    with patch.object(EncryptionService, "_pbkdf2", wraps=svc._pbkdf2) as kdf:
+        blobs = [svc.encrypt_sensitive_data(f"campo {i}") for i in range(20)]
+        assert [svc.decrypt_sensitive_data(b) for b in blobs] == [f"campo {i}" for i in range(20)]
+    assert kdf.call_count == 1
+
+
+def test_cache_is_shared_across_instances():
+    ct = _svc().encrypt_sensitive_data("nota")
+    with patch.object(EncryptionService, "_pbkdf2") as kdf:
+        assert _svc().decrypt_sensitive_data(ct) == "nota"
+    kdf.assert_not_called()
+
+
+def test_cache_is_bounded():
+    cache = encryption._DerivedKeyCache(maxsize=2)
+    cache.put((b"m", "salt", b"1"), b"a")
+    cache.put((b"m", "salt", b"2"), b"b")
+    cache.get((b"m", "salt", b"1"))
+    cache.put((b"m", "salt", b"3"), b"c")
+    assert len(cache) == 2
+    assert cache.get((b"m", "salt", b"2")) is None
+    assert cache.get((b"m", "salt", b"1")) == b"a"
+
+
+def test_wrong_key_id_label_fails_closed():
+    svc = _svc()
+    ct = svc.encrypt_sensitive_data("secreto")
+    tampered = ct.replace(f"{CIPHERTEXT_V2_PREFIX}k1:", f"{CIPHERTEXT_V2_PREFIX}k2:")
+    assert svc.decrypt_sensitive_data(tampered) == tampered
+
+
+def test_key_id_cannot_contain_separator():
+    with pytest.raises(ValueError):
+        _svc("bad:id")
+
+
+def test_reencrypt_upgrades_legacy_and_skips_plaintext():
+    svc = _svc()
+    legacy = svc.encrypt_legacy_data("Exploración física normal")
+    assert svc.needs_reencryption(legacy)
+    upgraded = svc.reencrypt(legacy)
+    assert svc.is_versioned_ciphertext(upgraded)
+    assert svc.decrypt_sensitive_data(upgraded) == "Exploración física normal"
+    assert not svc.needs_reencryption(upgraded)
+
+    assert svc.reencrypt("texto plano") is None
+    assert svc.reencrypt(None) is None
+
+
+def test_key_rotation_marks_old_key_id_for_reencryption():
+    old = _svc("k1").encrypt_sensitive_data("dato")
+    rotated = _svc("k2")
+    assert rotated.needs_reencryption(old)
+    new = rotated.reencrypt(old)
+    assert new.startswith(f"{CIPHERTEXT_V2_PREFIX}k2:")
+    assert rotated.decrypt_sensitive_data(new) == "dato"
+
+
+def test_consultation_decrypt_handles_short_v2_values():
+    from services.consultations import security
+
+    short = security.encryption_service.encrypt_sensitive_data("Tos")
+    out = security.decrypt_sensitive_data({"chief_complaint": short, "notes": "plano"}, "consultation")
+    assert out == {"chief_complaint": "Tos", "notes": "plano"}
+
+
+# ---- decrypt_many -------------------------------------------------------------
+
+def test_decrypt_many_handles_orm_rows_dicts_and_tuples():
+    from types import SimpleNamespace
+
+    svc = _svc()
+    v2 = svc.encrypt_sensitive_data("Cefalea")
+    legacy = svc.encrypt_legacy_data("Migraña crónica")
+    rows = [
+        SimpleNamespace(chief_complaint=v2, notes=legacy),
+        {"chief_complaint": legacy, "notes": "texto plano"},
+        (v2, None),
+    ]
+    out = svc.decrypt_many(rows, ["chief_complaint", "notes"])
+    assert out == [
+        {"chief_complaint": "Cefalea", "notes": "Migraña crónica"},
+        {"chief_complaint": "Migraña crónica", "notes": "texto plano"},
+        {"chief_complaint": "Cefalea", "notes": None},
+    ]
+
+
+def test_decrypt_many_derives_key_once_for_whole_result_set():
+    svc = _svc()
+    rows = [{"notes": svc.encrypt_sensitive_data(f"nota {i}")} for i in range(50)]
+    encryption._derived_key_cache.clear()
+    with patch.object(EncryptionService, "_pbkdf2", wraps=svc._pbkdf2) as kdf:
+        out = svc.decrypt_many(rows, ["notes"])
+    assert kdf.call_count == 1
+    assert out[49] == {"notes": "nota 49"}
+
+
+def test_decrypt_many_on_error_callback():
+    svc = _svc()
+    ct = svc.encrypt_sensitive_data("x")
+    broken = ct.replace(f"{CIPHERTEXT_V2_PREFIX}k1:", f"{CIPHERTEXT_V2_PREFIX}k9:")
+    out = svc.decrypt_many([{"notes": broken}], ["notes"], on_error=lambda f, v: {"failed": f})
+    assert out == [{"notes": {"failed": "notes"}}]
+    # Default keeps the ciphertext, same as decrypt_sensitive_data.
+    assert svc.decrypt_many([{"notes": broken}], ["notes"]) == [{"notes": broken}]
+
+
+def test_decrypt_many_parallel_preserves_order():
+    svc = _svc()
+    n = encryption.DECRYPT_PARALLEL_MIN_ROWS + 7
+    rows = [(svc.encrypt_sensitive_data(str(i)),) for i in range(n)]
+    out = svc.decrypt_many(rows, ["value"], max_workers=4)
+    assert [r["value"] for r in out] == [str(i) for i in range(n)]
+
+
+# ---- reencrypt_legacy_values ---------------------------------------------------
+
+def _notes_table(values):
+    from sqlalchemy import Column, Integer, Text, create_engine
+    from sqlalchemy.orm import declarative_base, sessionmaker
+
+    Base = declarative_base()
+
+    class Note(Base):
+        __tablename__ = "notes"
+        id = Column(Integer, primary_key=True)
+        notes = Column(Text)
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Note(id=i, notes=v) for i, v in enumerate(values, start=1)])
+    session.commit()
+    return session, Note
+
+
+def test_reencrypt_job_skips_plaintext_and_resumes_from_last_id():
+    from encryption import EncryptionMigration
+
+    svc = _svc()
+    values = ["texto plano", svc.encrypt_legacy_data("a"), None, svc.encrypt_legacy_data("b"),
+              _svc("k0").encrypt_sensitive_data("c"), svc.encrypt_sensitive_data("d")]
+    session, Note = _notes_table(values)
+
+    first = EncryptionMigration.reencrypt_legacy_values(session, Note, ["notes"], svc, batch_size=1, max_rows=2)
+    # plaintext and NULL are not pending: the two v1 blobs are the first rows scanned
+    assert (first["scanned"], first["updated_rows"], first["last_id"], first["done"]) == (2, 2, 4, False)
+
+    rest = EncryptionMigration.reencrypt_legacy_values(
+        session, Note, ["notes"], svc, max_rows=10, start_after_id=first["last_id"])
+    assert (rest["scanned"], rest["updated_rows"], rest["last_id"], rest["done"]) == (1, 1, 5, True)
+
+    stored = {n.id: n.notes for n in session.query(Note)}
+    assert stored[1] == "texto plano"
+    assert all(stored[i].startswith(f"{CIPHERTEXT_V2_PREFIX}k1:") for i in (2, 4, 5, 6))
+    assert [svc.decrypt_sensitive_data(stored[i]) for i in (2, 4, 5)] == ["a", "b", "c"]
+    assert EncryptionMigration.reencrypt_legacy_values(session, Note, ["notes"], svc)["scanned"] == 0
+
+
+def test_reencrypt_endpoint_returns_a_resume_cursor(monkeypatch):
+    import asyncio
+    from routes import internal
+
+    calls = []
+
+    def fake(db, model_class, fields, service, batch_size, max_rows, start_after_id):
+        calls.append((model_class.__tablename__, max_rows, start_after_id))
+        if model_class.__tablename__ == "medical_records":
+            return {"scanned": 3, "last_id": 40, "done": True}
+        return {"scanned": max_rows, "last_id": 9, "done": False}
+
+    monkeypatch.setattr(internal.EncryptionMigration, "reencrypt_legacy_values", staticmethod(fake))
+    run = lambda **kw: asyncio.run(internal.reencrypt_legacy_ciphertext(
+        batch_size=200, x_internal_key=internal.INTERNAL_API_KEY, db=None, **kw))
+
+    out = run(max_rows=5, table="medical_records", start_after_id=37)
+    # the remaining budget carries over to the next table
+    assert calls == [("medical_records", 5, 37), ("cfdi_issuers", 2, 0)]
+    assert out["next"] == {"table": "cfdi_issuers", "start_after_id": 9}
+
+    calls.clear()
+    run(max_rows=5, table="cfdi_issuers", start_after_id=9)
+    assert calls == [("cfdi_issuers", 5, 9)]
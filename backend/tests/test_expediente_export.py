@@ -268,3 +268,23 @@ def test_admin_sees_consultations_from_all_doctors():
     out = agg.build(patient_id=10, doctor=admin)
 
     assert len(out["consultations"]) == 2
+
+
+def test_build_decrypts_consultation_fields():
+    from encryption import get_encryption_service
+
+    doctor = _doctor(id=1)
+    patient = _patient(id=10, created_by=1)
+    c1 = _consultation(100, 10, 1, datetime(2026, 4, 15))
+    c1.chief_complaint = get_encryption_service().encrypt_sensitive_data("Dolor torácico")
+    db = _mock_db(
+        _chain(first=patient),
+        _chain(all_=[c1]),
+        _chain(all_=[]),
+        _chain(all_=[]),
+        _chain(all_=[]),
+        _chain(all_=[]),
+    )
+    out = ExpedienteAggregator(db=db).build(patient_id=10, doctor=doctor)
+    assert out["consultations"][0]["chief_complaint"] == "Dolor torácico"
+    assert out["consultations"][0]["primary_diagnosis"] == "Migraña"
@@ -0,0 +1,273 @@
+"""
+Tests for the background export queue (services/export_jobs.py) and its
+endpoints (routes/export_jobs.py).
+
+- enqueue / claim: queued + expired-lease jobs claimed with SKIP LOCKED
+- run_job: artifact streamed to storage, job settled with size and expiry;
+  failures retry with backoff then park as 'failed'; a lost lease discards
+  the artifact
+- progress writes are throttled
+- LocalStorageService.upload_stream is atomic
+- download: 409 until ready, 410 once expired, 206 for Range requests
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from services import export_jobs
+from services.export_jobs import (
+    ExportArtifact,
+    _ClaimedJob,
+    _ProgressReporter,
+    claim_next_job,
+    enqueue_export,
+    export_handler,
+    run_job,
+)
+from services.storage_service import LocalStorageService
+
+NOW = datetime(2026, 10, 17, 12, 0)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorageService(base_dir=str(tmp_path))
+
+
+@pytest.fixture
+def fake_kind():
+    calls = []
+
+    @export_handler("test_export")
+    def handler(db, job, progress):
+        calls.append(job.params)
+        if job.params.get("fail"):
+            raise RuntimeError("boom")
+        progress(50)
+        return ExportArtifact("report.json", "application/json", iter([b'{"a":', b" 1}"]))
+
+    yield calls
+    export_jobs._HANDLERS.pop("test_export", None)
+
+
+def _job(**values):
+    defaults = dict(id=9, kind="test_export", params={}, requested_by=7, attempts=1)
+    defaults.update(values)
+    return SimpleNamespace(**defaults)
+
+
+def _db_for(job, updated=1):
+    db = MagicMock()
+    db.get.return_value = job
+    db.query.return_value.filter.return_value.update.return_value = updated
+    return db
+
+
+def _settled(db):
+    return db.query.return_value.filter.return_value.update.call_args.args[0]
+
+
+# ----------------------------------------------------------------------------
+# Enqueue / claim
+# ----------------------------------------------------------------------------
+
+def test_enqueue_flushes_a_queued_job(fake_kind):
+    db = MagicMock()
+    job = enqueue_export(db, "test_export", 7, {"patient_id": 3})
+
+    db.add.assert_called_once_with(job)
+    db.flush.assert_called_once()
+    db.commit.assert_not_called()
+    assert (job.status, job.requested_by, job.params, job.attempts) == ("queued", 7, {"patient_id": 3}, 0)
+
+    with pytest.raises(ValueError):
+        enqueue_export(db, "unknown", 7)
+
+
+def test_claim_leases_the_oldest_due_job():
+    db = MagicMock()
+    chain = db.query.return_value.filter.return_value.order_by.return_value.limit.return_value.with_for_update
+    row = SimpleNamespace(id=4, attempts=1, status="running", progress=30, started_at=None, next_attempt_at=None)
+    chain.return_value.first.return_value = row
+
+    claimed = claim_next_job(db, now=NOW)
+
+    assert claimed == _ClaimedJob(id=4, attempts=2)
+    assert (row.status, row.progress, row.started_at) == ("running", 0, NOW)
+    assert (row.next_attempt_at - NOW).total_seconds() == export_jobs.LEASE_SECONDS
+    chain.assert_called_once_with(skip_locked=True)
+    criteria = db.query.return_value.filter.call_args.args
+    sql = " AND ".join(
+        str(c.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})) for c in criteria
+    )
+    assert "export_jobs.status IN ('queued', 'running')" in sql
+    assert "export_jobs.next_attempt_at <= '2026-10-17 12:00:00'" in sql
+    db.commit.assert_called_once()
+
+
+def test_claim_returns_none_when_idle():
+    db = MagicMock()
+    db.query.return_value.filter.return_value.order_by.return_value.limit.return_value \
+        .with_for_update.return_value.first.return_value = None
+    assert claim_next_job(db) is None
+
+
+# ----------------------------------------------------------------------------
+# run_job
+# ----------------------------------------------------------------------------
+
+def test_run_job_streams_the_artifact_to_storage(fake_kind, storage):
+    db = _db_for(_job())
+    progress = MagicMock()
+
+    assert run_job(db, _ClaimedJob(9, 1), storage=storage, progress=progress) is True
+
+    progress.assert_called_once_with(50)
+    values = _settled(db)
+    assert values["status"] == "succeeded"
+    assert values["artifact_size"] == 8
+    assert values["artifact_key"].startswith("exports/test_export/9-") and values["artifact_key"].endswith(".json")
+    assert (values["expires_at"] - values["finished_at"]).total_seconds() == export_jobs.ARTIFACT_TTL_HOURS * 3600
+    assert storage.download(values["artifact_key"]) == b'{"a": 1}'
+
+
+def test_failed_attempt_is_requeued_with_backoff(fake_kind, storage):
+    db = _db_for(_job(params={"fail": True}))
+
+    assert run_job(db, _ClaimedJob(9, 1), storage=storage, progress=MagicMock()) is False
+
+    values = _settled(db)
+    assert values["status"] == "queued"
+    assert values["last_error"] == "boom"
+    assert "next_attempt_at" in values
+    db.rollback.assert_called()
+
+
+def test_last_attempt_parks_the_job_as_failed(fake_kind, storage):
+    db = _db_for(_job(params={"fail": True}, attempts=export_jobs.MAX_ATTEMPTS))
+    run_job(db, _ClaimedJob(9, export_jobs.MAX_ATTEMPTS), storage=storage, progress=MagicMock())
+    assert _settled(db)["status"] == "failed"
+
+
+def test_lost_lease_discards_the_artifact(fake_kind):
+    db = _db_for(_job(), updated=0)
+    storage = MagicMock()
+
+    assert run_job(db, _ClaimedJob(9, 1), storage=storage, progress=MagicMock()) is False
+
+    key = storage.upload_stream.call_args.args[1]
+    storage.delete.assert_called_once_with(key)
+
+
+def test_progress_writes_are_throttled():
+    clock = SimpleNamespace(now=0.0)
+    session = MagicMock()
+    reporter = _ProgressReporter(_ClaimedJob(9, 1), session_factory=lambda: session, clock=lambda: clock.now)
+
+    reporter(10)          # too soon after start
+    clock.now += 5
+    reporter(20)
+    reporter(30)          # too soon after the previous write
+    clock.now += 5
+    reporter(10)          # never goes backwards
+    reporter(100)         # 100 is only set when the artifact is stored
+
+    updates = [c.args[0]["progress"] for c in session.query.return_value.filter.return_value.update.call_args_list]
+    assert updates == [20, 99]
+    assert session.close.call_count == 2
+
+
+def test_local_upload_stream_is_atomic(storage, tmp_path):
+    def chunks():
+        yield b"partial"
+        raise RuntimeError("export failed")
+
+    with pytest.raises(RuntimeError):
+        storage.upload_stream(chunks(), "exports/a/1.zip")
+
+    assert not storage.exists("exports/a/1.zip")
+    assert list((tmp_path / "exports" / "a").iterdir()) == []
+
+
+# ----------------------------------------------------------------------------
+# Routes
+# ----------------------------------------------------------------------------
+
+@pytest.fixture
+def client():
+    from main_clean_english import app
+    from database import get_db
+    from dependencies import get_current_user
+
+    db = MagicMock()
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=7, person_type="doctor", name="Dra. X")
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        yield TestClient(app), db
+    finally:
+        app.dependency_overrides.clear()
+
+
+def _stored_job(status="succeeded", key="exports/arco_export/9-abc.zip"):
+    return SimpleNamespace(
+        id=9, kind="arco_export", status=status, progress=100 if status == "succeeded" else 40,
+        created_at=NOW, started_at=NOW, finished_at=None, expires_at=None,
+        artifact_key=key, artifact_name="arco.zip", artifact_size=10,
+        content_type="application/zip", last_error=None,
+    )
+
+
+def test_download_supports_range_requests(client, storage, monkeypatch):
+    from routes import export_jobs as export_routes
+
+    http, db = client
+    storage.upload(b"0123456789", "exports/arco_export/9-abc.zip")
+    db.query.return_value.filter.return_value.first.return_value = _stored_job()
+    monkeypatch.setattr(export_routes, "get_storage_service", lambda: storage)
+
+    full = http.get("/api/exports/9/download")
+    partial = http.get("/api/exports/9/download", headers={"Range": "bytes=4-"})
+
+    assert full.status_code == 200 and full.content == b"0123456789"
+    assert full.headers["accept-ranges"] == "bytes"
+    assert partial.status_code == 206
+    assert partial.content == b"456789"
+    assert partial.headers["content-range"] == "bytes 4-9/10"
+
+
+@pytest.mark.parametrize("status,code", [("running", 409), ("expired", 410)])
+def test_download_requires_a_ready_artifact(client, status, code):
+    http, db = client
+    db.query.return_value.filter.return_value.first.return_value = _stored_job(status=status)
+    assert http.get("/api/exports/9/download").status_code == code
+
+
+def test_status_hides_the_download_until_ready(client):
+    http, db = client
+    db.query.return_value.filter.return_value.first.return_value = _stored_job(status="running")
+
+    body = http.get("/api/exports/9").json()
+
+    assert (body["status"], body["progress"], body["download_url"]) == ("running", 40, None)
+
+
+def test_compliance_report_is_enqueued(client):
+    http, db = client
+
+    def flush():
+        db.add.call_args.args[0].id = 12
+
+    db.flush.side_effect = flush
+    response = http.post("/api/compliance/report/jobs", params={"doctor_id": 7})
+
+    assert response.status_code == 202
+    assert (response.json()["id"], response.json()["kind"], response.json()["status"]) == (12, "compliance_report", "queued")
+    assert db.add.call_args.args[0].params == {"doctor_id": 7}
+    db.commit.assert_called_once()
@@ -31,15 +31,24 @@ from services.fhir_service import (  # noqa: E402
     _load_documents_by_name,
     _normalize_gender,
     build_doctor_view,
+    build_doctor_views,
     build_encounter_view,
     build_everything_bundle,
     build_patient_view,
+    build_searchset_bundle,
     fix_encounter_keys,
+    load_documents_by_person,
+    load_primary_offices,
+    paging_links,
+    serialize_encounter,
+    serialize_patient,
+    serialize_practitioner,
     serialize_medication_request,
     serialize_observation,
     wrap_as_bundle,
 )
 from interoperability import InteroperabilityService  # noqa: E402
+from services import fhir_service  # noqa: E402
 
 
 # ---------------------------------------------------------------------------
@@ -171,6 +180,64 @@ def test_build_doctor_view_handles_missing_office_and_specialty():
     assert view.professional_license == "1234567"
 
 
+# ---------------------------------------------------------------------------
+# Bulk loaders / build_doctor_views
+# ---------------------------------------------------------------------------
+
+def test_load_documents_by_person_groups_rows_per_person():
+    db = _mock_db(documents_rows=[
+        (SimpleNamespace(person_id=1, document_value="A"), SimpleNamespace(name="CURP")),
+        (SimpleNamespace(person_id=2, document_value="B"), SimpleNamespace(name="CURP")),
+        (SimpleNamespace(person_id=2, document_value="C"), SimpleNamespace(name="RFC")),
+    ])
+    assert load_documents_by_person(db, [2, 1, 2]) == {
+        1: {"CURP": "A"},
+        2: {"CURP": "B", "RFC": "C"},
+    }
+    assert load_documents_by_person(MagicMock(), []) == {}
+
+
+def test_load_primary_offices_keeps_first_office_per_doctor():
+    offices = [
+        SimpleNamespace(id=3, doctor_id=1),
+        SimpleNamespace(id=8, doctor_id=1),
+        SimpleNamespace(id=5, doctor_id=2),
+    ]
+    db = _mock_db(documents_rows=offices)  # rows come back ordered by (doctor_id, id)
+    assert {k: o.id for k, o in load_primary_offices(db, [1, 2]).items()} == {1: 3, 2: 5}
+
+
+def test_build_doctor_views_queries_once_per_table():
+    people = [
+        SimpleNamespace(id=i, name=f"Dr {i}", email=f"d{i}@x.mx", specialty_id=None)
+        for i in range(1, 21)
+    ]
+    db = _mock_db(documents_rows=[])
+    views = build_doctor_views(db, people)
+    assert [v.id for v in views] == [str(i) for i in range(1, 21)]
+    assert db.query.call_count == 2  # documents + offices; no specialty ids to resolve
+
+
+# ---------------------------------------------------------------------------
+# Paging
+# ---------------------------------------------------------------------------
+
+def test_paging_links_and_total():
+    from starlette.datastructures import URL
+
+    url = URL("http://x/api/fhir/Encounter?patient=4&_count=10&_offset=10")
+    links = {l["relation"]: l["url"] for l in paging_links(url, 10, 10, 25)}
+    assert links["next"] == "http://x/api/fhir/Encounter?patient=4&_count=10&_offset=20"
+    assert links["previous"] == "http://x/api/fhir/Encounter?patient=4&_count=10&_offset=0"
+
+    last = {l["relation"] for l in paging_links(url, 10, 20, 25)}
+    assert last == {"self", "previous"}
+
+    bundle = build_searchset_bundle([{"id": "1"}], total=25, links=paging_links(url, 10, 0, 25))
+    assert bundle["total"] == 25
+    assert [l["relation"] for l in bundle["link"]] == ["self", "next"]
+
+
 # ---------------------------------------------------------------------------
 # build_patient_view
 # ---------------------------------------------------------------------------
@@ -467,3 +534,102 @@ def test_observation_handles_missing_vital_sign_name():
     vs = _fake_vital_sign(vital_sign=None)
     out = serialize_observation(vs, 42)
     assert out["code"]["text"] == "Vital sign"
+
+
+# ---------------------------------------------------------------------------
+# Plain-dict serializers vs. the pydantic models
+# ---------------------------------------------------------------------------
+
+def _patient_view(**overrides):
+    base = dict(
+        id="42", name="María López García", curp="LOGM900101MDFPRR01",
+        email="maria@example.com", phone="5512345678", address="Av. Reforma 1",
+        city="CDMX", state="", postal_code="06600", gender="femenino",
+        birth_date=date(1990, 1, 1),
+    )
+    base.update(overrides)
+    return SimpleNamespace(**base)
+
+
+def _practitioner_view(**overrides):
+    base = dict(
+        id="7", is_active=True, curp="GARC850315HDFXYZ01", rfc="GARC850315XYZ",
+        professional_license="1234567", name="Carlos García", full_name="Dr. Carlos García",
+        title="Dr.", birth_date=date(1985, 3, 15), email="c@example.com", phone="5511111111",
+        office_address="Insurgentes 100", office_city="CDMX", office_state="CDMX",
+        office_postal_code="03100", specialty="Cardiología",
+    )
+    base.update(overrides)
+    return SimpleNamespace(**base)
+
+
+def _same_json(fast, slow):
+    """Equal values and key order, so NDJSON / response bytes are identical."""
+    import json
+    assert json.dumps(fast, ensure_ascii=False) == json.dumps(slow, ensure_ascii=False)
+
+
+@pytest.mark.parametrize("overrides", [
+    {},
+    {"curp": None, "phone": None, "email": None},
+    {"address": None, "gender": "desconocido", "birth_date": None},
+    {"name": "", "postal_code": None},
+    {"name": "Ana", "gender": "masculino"},
+])
+def test_serialize_patient_matches_pydantic_model(overrides):
+    view = _patient_view(**overrides)
+    _same_json(
+        serialize_patient(view),
+        InteroperabilityService.patient_to_fhir_patient(view).model_dump(exclude_none=True),
+    )
+
+
+@pytest.mark.parametrize("overrides", [
+    {},
+    {"curp": None, "rfc": None, "phone": None, "title": None, "specialty": None},
+    {"office_address": "", "office_city": "", "office_state": "", "office_postal_code": "", "birth_date": None},
+    {"name": None, "is_active": False, "email": None},
+])
+def test_serialize_practitioner_matches_pydantic_model(overrides):
+    view = _practitioner_view(**overrides)
+    _same_json(
+        serialize_practitioner(view),
+        InteroperabilityService.doctor_to_fhir_practitioner(view).model_dump(exclude_none=True),
+    )
+
+
+def test_serialize_practitioner_without_license_fails_like_pydantic():
+    from pydantic import ValidationError
+
+    view = _practitioner_view(professional_license=None)
+    with pytest.raises(ValidationError) as fast:
+        serialize_practitioner(view)
+    with pytest.raises(ValidationError) as slow:
+        InteroperabilityService.doctor_to_fhir_practitioner(view)
+    assert fast.value.errors()[0]["type"] == slow.value.errors()[0]["type"] == "string_type"
+
+
+@pytest.mark.parametrize("date_value,complaint", [
+    (date(2026, 3, 1), "Cefalea"),
+    (None, None),
+])
+def test_serialize_encounter_matches_pydantic_model(date_value, complaint):
+    consultation = SimpleNamespace(
+        id=100, patient_id=42, doctor_id=7, consultation_date=date_value, chief_complaint=complaint,
+    )
+    slow = InteroperabilityService.consultation_to_fhir_encounter(
+        build_encounter_view(consultation), patient_id="42", doctor_id="7",
+    )
+    _same_json(serialize_encounter(consultation), fix_encounter_keys(slow.model_dump(exclude_none=True)))
+
+
+def test_strict_mode_goes_through_the_pydantic_models(monkeypatch):
+    from pydantic import ValidationError
+
+    monkeypatch.setattr(fhir_service, "STRICT_VALIDATION", True)
+    assert serialize_patient(_patient_view())["resourceType"] == "Patient"
+    # A null address city is only caught by the models
+    with pytest.raises(ValidationError):
+        serialize_patient(_patient_view(city=None))
+    monkeypatch.setattr(fhir_service, "STRICT_VALIDATION", False)
+    assert serialize_patient(_patient_view(city=None))["address"][0]["city"] is None
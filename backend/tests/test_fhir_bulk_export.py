@@ -0,0 +1,266 @@
+"""
+Tests for FHIR Bulk Data `$export` (services/fhir_bulk_export.py and the
+kick-off / status endpoints in routes/fhir.py).
+
+- scope: doctors only export what they authored / may read; `_since`
+  filters on updated_at
+- streaming: rows read with yield_per, related rows loaded per batch,
+  invalid resources skipped, NDJSON chunked
+- kick-off: one job per resource type, 202 + Content-Location
+- status: 202 with X-Progress while running, manifest when done
+"""
+
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from database import get_db
+from dependencies import get_current_user
+from main_clean_english import app
+from routes import fhir as fhir_module
+from services import fhir_bulk_export
+from services.fhir_bulk_export import BulkExportScope, iter_resources, ndjson_chunks
+
+SINCE = datetime(2026, 9, 1, tzinfo=timezone.utc)
+
+
+def _sql(query) -> str:
+    return str(query.statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _doctor(id=1, person_type="doctor"):
+    return SimpleNamespace(id=id, person_type=person_type, name="Dr Test", email=f"d{id}@test.mx")
+
+
+# ----------------------------------------------------------------------------
+# Scope
+# ----------------------------------------------------------------------------
+
+def test_doctor_scope_limits_encounters_to_their_own():
+    scope = BulkExportScope(requester=_doctor(7), patient_ids=[3, 4], since=SINCE)
+    sql = _sql(fhir_bulk_export._encounters(Session(), scope))
+
+    assert "medical_records.doctor_id = 7" in sql
+    assert "medical_records.patient_id IN (3, 4)" in sql
+    assert "medical_records.updated_at >= '2026-09-01 00:00:00+00:00'" in sql
+
+
+def test_admin_system_export_has_no_ownership_filter():
+    scope = BulkExportScope(requester=_doctor(1, "admin"))
+    assert "doctor_id" not in _sql(fhir_bulk_export._practitioners(Session(), scope))
+    assert "WHERE" not in _sql(fhir_bulk_export._encounters(Session(), scope))
+
+
+def test_incremental_prescriptions_use_their_own_updated_at():
+    scope = BulkExportScope(requester=_doctor(7), since=SINCE)
+    sql = _sql(fhir_bulk_export._medication_requests(Session(), scope))
+    assert "consultation_prescriptions.updated_at >=" in sql
+    assert "JOIN medical_records" in sql
+
+
+# ----------------------------------------------------------------------------
+# Streaming
+# ----------------------------------------------------------------------------
+
+def _streaming_db(rows_by_model):
+    """db.query(Model, ...) → chain whose yield_per()/all() return the model's rows."""
+    db = MagicMock()
+
+    def query(*entities):
+        name = getattr(entities[0], "__name__", "")
+        rows = rows_by_model.get(name, [])
+        q = MagicMock()
+        for method in ("filter", "join", "options", "order_by"):
+            getattr(q, method).return_value = q
+        q.yield_per.side_effect = lambda size: iter(rows)
+        q.all.return_value = rows
+        return q
+
+    db.query.side_effect = query
+    return db
+
+
+def test_encounters_stream_in_batches():
+    consultations = [
+        SimpleNamespace(id=i, patient_id=10, doctor_id=1,
+                        consultation_date=datetime(2026, 4, 1), chief_complaint="Control")
+        for i in range(1, 8)
+    ]
+    db = _streaming_db({"MedicalRecord": consultations})
+
+    resources = list(iter_resources(db, "Encounter", BulkExportScope(requester=_doctor()), batch_size=3))
+
+    assert [r["id"] for r in resources] == [str(i) for i in range(1, 8)]
+    assert {r["resourceType"] for r in resources} == {"Encounter"}
+    assert resources[0]["class"]["code"] == "AMB"
+
+
+def test_practitioners_without_a_license_are_skipped():
+    doctors = [
+        SimpleNamespace(id=1, name="Ana Ruiz", email="a@x.mx", specialty_id=None),
+        SimpleNamespace(id=2, name="Sin Cedula", email="b@x.mx", specialty_id=None),
+    ]
+    documents = [(SimpleNamespace(person_id=1, document_value="1234567"), SimpleNamespace(name="Cédula Profesional"))]
+    db = _streaming_db({"Person": doctors, "PersonDocument": documents})
+
+    resources = list(iter_resources(db, "Practitioner", BulkExportScope(requester=_doctor(1, "admin"))))
+
+    assert [r["id"] for r in resources] == ["1"]
+    # documents + offices loaded once for the batch, plus the streamed query
+    assert db.query.call_count == 3
+
+
+def test_ndjson_chunks_one_resource_per_line():
+    resources = [{"resourceType": "Observation", "id": str(i), "code": {"text": "Frecuencia cardíaca"}} for i in range(50)]
+
+    chunks = list(ndjson_chunks(resources, chunk_bytes=1024))
+
+    assert len(chunks) > 1
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [str(i) for i in range(50)]
+    assert "cardíaca" in lines[0]
+    assert list(ndjson_chunks([])) == []
+
+
+def test_handler_reports_progress_and_names_the_file(monkeypatch):
+    job = SimpleNamespace(requested_by=1, params={"type": "Observation", "since": SINCE.isoformat()})
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = _doctor()
+    seen = {}
+
+    def fake_iter(_db, resource_type, scope):
+        seen.update(type=resource_type, since=scope.since)
+        return iter([{"resourceType": "Observation", "id": "1"}, {"resourceType": "Observation", "id": "2"}])
+
+    monkeypatch.setattr(fhir_module, "count_resources", lambda *a: 2)
+    monkeypatch.setattr(fhir_module, "iter_resources", fake_iter)
+    progress = MagicMock()
+
+    artifact = fhir_module._build_fhir_bulk_export(db, job, progress)
+    body = b"".join(artifact.chunks)
+
+    assert (artifact.filename, artifact.content_type) == ("Observation.ndjson", "application/fhir+ndjson")
+    assert body.count(b"\n") == 2
+    assert [c.args[0] for c in progress.call_args_list] == [50, 100]
+    assert seen == {"type": "Observation", "since": SINCE}
+
+
+# ----------------------------------------------------------------------------
+# Kick-off / status
+# ----------------------------------------------------------------------------
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(fhir_module.audit_service, "log_action", lambda *a, **kw: None)
+    db = MagicMock()
+    app.dependency_overrides[get_current_user] = lambda: _doctor(1)
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        yield TestClient(app), db
+    finally:
+        app.dependency_overrides.clear()
+
+
+def _enqueued(db):
+    return [c.args[0] for c in db.add.call_args_list]
+
+
+def test_system_export_enqueues_one_job_per_type(client):
+    http, db = client
+
+    r = http.get("/api/fhir/$export", params={"_since": "2026-09-01T00:00:00Z"},
+                 headers={"Prefer": "respond-async"})
+
+    assert r.status_code == 202
+    jobs = _enqueued(db)
+    assert [j.params["type"] for j in jobs] == list(fhir_bulk_export.BULK_RESOURCE_TYPES)
+    export_id = jobs[0].params["export_id"]
+    assert {j.params["export_id"] for j in jobs} == {export_id}
+    assert {j.kind for j in jobs} == {"fhir_bulk_export"}
+    assert jobs[0].params["since"] == "2026-09-01T00:00:00+00:00"
+    assert r.headers["content-location"].endswith(f"/api/fhir/$export-status/{export_id}")
+    db.commit.assert_called_once()
+
+
+@pytest.mark.parametrize("params", [
+    {"_type": "Patient,Claim"},
+    {"_outputFormat": "text/csv"},
+    {"_since": "yesterday"},
+])
+def test_export_rejects_bad_parameters(client, params):
+    http, db = client
+    r = http.get("/api/fhir/$export", params=params)
+    assert r.status_code == 400
+    assert r.json()["resourceType"] == "OperationOutcome"
+    db.add.assert_not_called()
+
+
+def test_patient_export_checks_every_listed_patient(client, monkeypatch):
+    http, db = client
+    monkeypatch.setattr(fhir_module, "readable_patient_ids", lambda _db, _u, ids: {10})
+
+    denied = http.get("/api/fhir/Patient/$export", params={"patient": "Patient/10,Patient/11"})
+    assert denied.status_code == 403
+
+    monkeypatch.setattr(fhir_module, "readable_patient_ids", lambda _db, _u, ids: set(ids))
+    allowed = http.get("/api/fhir/Patient/$export", params={"patient": "Patient/10,11", "_type": "Observation"})
+    assert allowed.status_code == 202
+    jobs = _enqueued(db)
+    assert [(j.params["type"], j.params["patient_ids"]) for j in jobs] == [("Observation", [10, 11])]
+
+
+def _bulk_job(id, type_, status="succeeded", size=100):
+    return SimpleNamespace(
+        id=id, status=status, artifact_size=size, last_error=None,
+        params={"type": type_, "transaction_time": "2026-10-17T12:00:00+00:00",
+                "request": "http://testserver/api/fhir/$export"},
+    )
+
+
+def _status_db(db, jobs):
+    db.query.return_value.filter.return_value.order_by.return_value.all.return_value = jobs
+
+
+def test_status_reports_progress_while_running(client):
+    http, db = client
+    _status_db(db, [_bulk_job(1, "Patient"), _bulk_job(2, "Encounter", status="running")])
+
+    r = http.get("/api/fhir/$export-status/abc")
+
+    assert r.status_code == 202
+    assert r.headers["x-progress"] == "1/2 resource types complete"
+    assert "retry-after" in r.headers
+
+
+def test_status_returns_the_manifest_when_done(client):
+    http, db = client
+    _status_db(db, [_bulk_job(1, "Patient"), _bulk_job(2, "Encounter", size=0)])
+
+    r = http.get("/api/fhir/$export-status/abc")
+
+    assert r.status_code == 200
+    manifest = r.json()
+    assert manifest["transactionTime"] == "2026-10-17T12:00:00+00:00"
+    assert manifest["requiresAccessToken"] is True
+    assert manifest["output"] == [{"type": "Patient", "url": "http://testserver/api/exports/1/download"}]
+
+
+def test_status_of_failed_or_unknown_export(client):
+    http, db = client
+    failed = _bulk_job(2, "Encounter", status="failed")
+    failed.last_error = "boom"
+    _status_db(db, [_bulk_job(1, "Patient"), failed])
+    r = http.get("/api/fhir/$export-status/abc")
+    assert r.status_code == 500
+    assert "Encounter: boom" in r.json()["issue"][0]["diagnostics"]
+
+    _status_db(db, [])
+    assert http.get("/api/fhir/$export-status/abc").status_code == 404
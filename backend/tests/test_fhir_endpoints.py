@@ -93,15 +93,15 @@ def _vital_sign(id: int, consultation_id: int, name: str = "Heart rate"):
     )
 
 
-def _chain(*, first=None, all_=()):
-    """A MagicMock that self-returns for filter/join/order_by and yields
-    the configured result on .first() / .all()."""
+def _chain(*, first=None, all_=(), total=None):
+    """A MagicMock that self-returns for filter/join/order_by/paging and
+    yields the configured result on .first() / .all() / .count()."""
     q = MagicMock()
-    q.filter.return_value = q
-    q.join.return_value = q
-    q.order_by.return_value = q
+    for method in ("filter", "join", "outerjoin", "options", "order_by", "offset", "limit"):
+        getattr(q, method).return_value = q
     q.first.return_value = first
     q.all.return_value = list(all_)
+    q.count.return_value = len(all_) if total is None else total
     return q
 
 
@@ -198,6 +198,81 @@ def test_search_encounters_forbidden_when_not_owner_or_consultant(client):
     assert r.json()["resourceType"] == "OperationOutcome"
 
 
+def test_search_encounters_pages_with_count_and_offset(client):
+    doctor = _doctor(id=1)
+    pt = _patient(id=10, created_by=1)
+    page = [
+        _consultation(id=102, patient_id=10, doctor_id=1),
+        _consultation(id=103, patient_id=10, doctor_id=1),
+    ]
+    encounters_q = _chain(all_=page, total=5)
+    db = _mock_db([_chain(first=pt), encounters_q])
+    _override_user(doctor)
+    _override_db(db)
+    try:
+        r = client.get("/api/fhir/Encounter?patient=10&_count=2&_offset=2")
+    finally:
+        _reset_overrides()
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["total"] == 5          # all matches, not just this page
+    assert len(body["entry"]) == 2
+    links = {link["relation"]: link["url"] for link in body["link"]}
+    assert set(links) == {"self", "previous", "next"}
+    assert "patient=10" in links["next"] and "_offset=4" in links["next"]
+    assert "_offset=0" in links["previous"]
+    encounters_q.offset.assert_called_once_with(2)
+    encounters_q.limit.assert_called_once_with(2)
+
+
+def test_patient_everything_uses_a_fixed_number_of_queries(client):
+    admin = _doctor(id=99, person_type="admin")
+    pt = _patient(id=10)
+    consultations = [
+        _consultation(id=100 + i, patient_id=10, doctor_id=1 + i % 3)
+        for i in range(30)
+    ]
+    doctors = [
+        SimpleNamespace(
+            id=d, person_type="doctor", name=f"Dr {d}", email=f"d{d}@test.mx",
+            specialty_id=5, is_active=True,
+        )
+        for d in (1, 2, 3)
+    ]
+    documents = [
+        (SimpleNamespace(person_id=10, document_value="PERJ900101HDFRRN01"), SimpleNamespace(name="CURP")),
+    ] + [
+        (SimpleNamespace(person_id=d.id, document_value=f"12345{d.id}"), SimpleNamespace(name="Cédula Profesional"))
+        for d in doctors
+    ]
+    db = _mock_db([
+        _chain(first=pt),                       # Patient
+        _chain(all_=consultations, total=45),   # Encounters (page)
+        _chain(all_=[_prescription(id=501, consultation_id=100)]),
+        _chain(all_=[_vital_sign(id=801, consultation_id=101)]),
+        _chain(all_=doctors),                   # Practitioners
+        _chain(all_=documents),                 # identifier documents
+        _chain(all_=[]),                        # offices
+        _chain(all_=[(5, "Cardiología")]),      # specialties
+    ])
+    _override_user(admin)
+    _override_db(db)
+    try:
+        r = client.get("/api/fhir/Patient/10/$everything?_count=30")
+    finally:
+        _reset_overrides()
+    assert r.status_code == 200, r.text
+    assert db.query.call_count == 8
+    body = r.json()
+    kinds = [e["resource"]["resourceType"] for e in body["entry"]]
+    assert kinds.count("Encounter") == 30
+    assert kinds.count("Practitioner") == 3
+    patient = body["entry"][0]["resource"]
+    assert patient["identifier"][0]["value"] == "PERJ900101HDFRRN01"
+    links = {link["relation"]: link["url"] for link in body["link"]}
+    assert "_offset=30" in links["next"]
+
+
 # ---------------------------------------------------------------------------
 # MedicationRequest — search + read
 # ---------------------------------------------------------------------------
@@ -212,8 +287,7 @@ def test_search_medication_requests_happy_path(client):
     ]
     db = _mock_db([
         _chain(first=pt),
-        _chain(all_=consultations),
-        _chain(all_=rx),
+        _chain(all_=[(r, consultations[0].doctor_id) for r in rx]),  # rx ⋈ encounter
     ])
     _override_user(doctor)
     _override_db(db)
@@ -253,8 +327,7 @@ def test_get_medication_request_forbidden_for_other_doctor(client):
     # consultation belongs to a different doctor
     consultation = _consultation(id=100, patient_id=10, doctor_id=42)
     db = _mock_db([
-        _chain(first=rx),
-        _chain(first=consultation),
+        _chain(first=(rx, consultation)),  # rx ⟕ encounter
     ])
     _override_user(doctor)
     _override_db(db)
@@ -272,15 +345,13 @@ def test_get_medication_request_forbidden_for_other_doctor(client):
 def test_search_observations_happy_path(client):
     doctor = _doctor(id=1)
     pt = _patient(id=10, created_by=1)
-    consultations = [_consultation(id=100, patient_id=10, doctor_id=1)]
     vs = [
         _vital_sign(id=801, consultation_id=100, name="Heart rate"),
         _vital_sign(id=802, consultation_id=100, name="Systolic BP"),
     ]
     db = _mock_db([
         _chain(first=pt),
-        _chain(all_=consultations),
-        _chain(all_=vs),
+        _chain(all_=vs),  # vital signs ⋈ encounter
     ])
     _override_user(doctor)
     _override_db(db)
@@ -317,8 +388,7 @@ def test_get_observation_forbidden_for_other_doctor(client):
     vs = _vital_sign(id=801, consultation_id=100)
     consultation = _consultation(id=100, patient_id=10, doctor_id=42)
     db = _mock_db([
-        _chain(first=vs),
-        _chain(first=consultation),
+        _chain(first=(vs, consultation)),  # vital sign ⟕ encounter
     ])
     _override_user(doctor)
     _override_db(db)
@@ -339,6 +409,7 @@ def test_search_patients_by_curp_returns_only_visible(monkeypatch, client):
 
     db = _mock_db([
         _chain(all_=[pt]),  # Person ⋈ PersonDocument ⋈ Document join
+        _chain(all_=[]),    # identifier documents, bulk-loaded
     ])
     # Skip the DB-backed view builder; we only care that the endpoint wires
     # through the right patient and produces a valid searchset Bundle.
@@ -349,7 +420,7 @@ def test_search_patients_by_curp_returns_only_visible(monkeypatch, client):
         phone=None, address=None, city="", state="", postal_code="",
         gender="male", birth_date=None,
     )
-    monkeypatch.setattr(fhir_module, "build_patient_view", lambda _db, _p: stub_view)
+    monkeypatch.setattr(fhir_module, "build_patient_view", lambda _db, _p, **_kw: stub_view)
 
     _override_user(doctor)
     _override_db(db)
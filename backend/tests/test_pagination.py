@@ -0,0 +1,115 @@
+"""
+Keyset (cursor) pagination tests.
+
+- cursor encode/decode roundtrip (datetime / int / NULL sort values)
+- malformed cursors → InvalidCursorError / HTTP 400 on list endpoints
+- apply_keyset emits a row-value comparison on (sort_column, id)
+- next_cursor only when the page is full
+- list endpoints expose the next cursor (X-Next-Cursor header / next_cursor key)
+"""
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from database import AuditLog, MedicalRecord, Person
+from utils.pagination import (
+    NEXT_CURSOR_HEADER,
+    InvalidCursorError,
+    apply_keyset,
+    decode_cursor,
+    encode_cursor,
+    next_cursor,
+)
+
+
+def _sql(query) -> str:
+    return str(query.statement.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.parametrize("value", [datetime(2026, 3, 1, 9, 30, 15, 120), 42, "abc", None])
+def test_cursor_roundtrip(value):
+    assert decode_cursor(encode_cursor(value, 7)) == (value, 7)
+
+
+@pytest.mark.parametrize("bad", ["", "not-base64!!", "eyJ2IjoxfQ", "WzEsMl0"])
+def test_decode_rejects_malformed_cursor(bad):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(bad)
+
+
+def test_apply_keyset_filters_on_row_value():
+    from sqlalchemy.orm import Query
+
+    cursor = encode_cursor(datetime(2026, 1, 1), 10)
+    sql = _sql(apply_keyset(Query(MedicalRecord), MedicalRecord.consultation_date, MedicalRecord.id, cursor))
+    assert "(medical_records.consultation_date, medical_records.id) < (" in sql
+    assert "ORDER BY medical_records.consultation_date DESC, medical_records.id DESC" in sql
+
+
+def test_apply_keyset_without_cursor_only_orders():
+    from sqlalchemy.orm import Query
+
+    sql = _sql(apply_keyset(Query(AuditLog), AuditLog.timestamp, AuditLog.id, None))
+    assert "WHERE" not in sql
+    assert "ORDER BY audit_log.timestamp DESC, audit_log.id DESC" in sql
+
+
+def test_apply_keyset_on_id_only():
+    from sqlalchemy.orm import Query
+
+    sql = _sql(apply_keyset(Query(Person), None, Person.id, encode_cursor(None, 5), descending=False))
+    assert "persons.id > " in sql
+    assert "ORDER BY persons.id ASC" in sql
+
+
+def test_next_cursor_only_for_full_pages():
+    rows = [SimpleNamespace(d=datetime(2026, 1, i), id=i) for i in range(1, 4)]
+    key = lambda r: (r.d, r.id)  # noqa: E731
+    assert next_cursor(rows, 5, key) is None
+    assert next_cursor([], 5, key) is None
+    assert decode_cursor(next_cursor(rows, 3, key)) == (datetime(2026, 1, 3), 3)
+
+
+@pytest.mark.parametrize("path", [
+    "/api/consultations",
+    "/api/patients",
+    "/api/appointments",
+    "/api/audit/logs",
+])
+def test_list_endpoints_reject_invalid_cursor(client, path):
+    response = client.get(path, params={"cursor": "%%%"})
+    assert response.status_code == 400
+
+
+def test_consultations_expose_next_cursor_header(client):
+    cursor = encode_cursor(datetime(2026, 2, 1), 3)
+    with patch(
+        "services.consultation_service.ConsultationService.get_consultations_page",
+        return_value=([{"id": 3}], cursor),
+    ) as page:
+        response = client.get("/api/consultations", params={"limit": 1, "cursor": cursor})
+    assert response.status_code == 200
+    assert response.headers[NEXT_CURSOR_HEADER] == cursor
+    assert page.call_args.kwargs["cursor"] == cursor
+
+
+def test_appointments_next_cursor_from_last_row(client):
+    rows = [SimpleNamespace(id=i, appointment_date=datetime(2026, 5, i, 10)) for i in (9, 8)]
+    with patch("crud.get_appointments", return_value=rows) as get_appointments, patch(
+        "services.appointment_service.AppointmentService.serialize_appointment",
+        side_effect=lambda apt: {"id": apt.id},
+    ):
+        response = client.get("/api/appointments", params={"limit": 2})
+    assert response.status_code == 200
+    assert get_appointments.call_args.kwargs["cursor"] is None
+    assert decode_cursor(response.headers[NEXT_CURSOR_HEADER]) == (datetime(2026, 5, 8, 10), 8)
+
+
+def test_last_page_has_no_next_cursor(client):
+    with patch("crud.get_appointments", return_value=[]):
+        response = client.get("/api/appointments", params={"limit": 2})
+    assert response.status_code == 200
+    assert NEXT_CURSOR_HEADER not in response.headers
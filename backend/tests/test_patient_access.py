@@ -0,0 +1,64 @@
+"""
+Unit tests for the set-based patient ACL helpers.
+
+- readable_patients_filter: SQL predicate per person_type
+- readable_patient_ids: one query for N ids, short-circuits for admins,
+  non-doctors and empty input
+"""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from services.patient_access import readable_patient_ids, readable_patients_filter
+
+
+def _person(id: int = 1, person_type: str = "doctor"):
+    return SimpleNamespace(id=id, person_type=person_type)
+
+
+def _sql(clause) -> str:
+    return str(clause.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_filter_for_doctor_is_creator_or_consulted():
+    sql = _sql(readable_patients_filter(_person(id=7)))
+    assert "persons.created_by = 7" in sql
+    assert "EXISTS (SELECT *" in sql
+    assert "medical_records.patient_id = persons.id" in sql
+    assert "medical_records.doctor_id = 7" in sql
+
+
+@pytest.mark.parametrize("person_type,expected", [("admin", "true"), ("patient", "false")])
+def test_filter_for_admin_and_others(person_type, expected):
+    assert _sql(readable_patients_filter(_person(person_type=person_type))) == expected
+
+
+def test_readable_ids_single_query_for_doctor():
+    db = MagicMock()
+    db.query.return_value.filter.return_value.all.return_value = [(10,), (12,)]
+
+    out = readable_patient_ids(db, _person(id=1), range(10, 110))
+
+    assert out == {10, 12}
+    assert db.query.call_count == 1
+    sql = " AND ".join(_sql(c) for c in db.query.return_value.filter.call_args.args)
+    assert "persons.id IN (10, 11," in sql
+    assert "persons.created_by = 1" in sql
+
+
+def test_readable_ids_admin_skips_query():
+    db = MagicMock()
+    assert readable_patient_ids(db, _person(person_type="admin"), [3, 4, None]) == {3, 4}
+    db.query.assert_not_called()
+
+
+@pytest.mark.parametrize("person_type,ids", [("patient", [1, 2]), ("doctor", [])])
+def test_readable_ids_empty_without_query(person_type, ids):
+    db = MagicMock()
+    assert readable_patient_ids(db, _person(person_type=person_type), ids) == set()
+    db.query.assert_not_called()
@@ -0,0 +1,101 @@
+"""
+Tests for the indexed WhatsApp phone lookup.
+
+- normalize_phone_e164 folds 521/52 Mexican mobile variants and formatting
+- Person.phone_e164 follows primary_phone on construction and update
+- both find_patient_by_phone helpers issue ONE query on phone_e164
+  instead of scanning every patient
+"""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from database import Person
+from routes.whatsapp_handlers.phone_utils import find_patient_by_phone
+from services.whatsapp_handlers import gemini_helpers
+from utils.phone_utils import normalize_phone_e164
+
+
+@pytest.mark.parametrize("raw", [
+    "5512345678",
+    "55 1234 5678",
+    "(55) 1234-5678",
+    "525512345678",
+    "+52 55 1234 5678",
+    "5215512345678",
+    "+521 55 1234 5678",
+])
+def test_mexican_variants_share_one_key(raw):
+    assert normalize_phone_e164(raw) == "+525512345678"
+
+
+@pytest.mark.parametrize("raw,expected", [
+    ("+1 (415) 555-0100", "+14155550100"),
+    ("+34 612 345 678", "+34612345678"),
+    ("", None),
+    (None, None),
+    ("sin teléfono", None),
+])
+def test_other_numbers(raw, expected):
+    assert normalize_phone_e164(raw) == expected
+
+
+def test_person_keeps_phone_e164_in_sync():
+    person = Person(name="Ana", person_type="patient", primary_phone="55-1234-5678")
+    assert person.phone_e164 == "+525512345678"
+    person.primary_phone = "+5215587654321"
+    assert person.phone_e164 == "+525587654321"
+    person.primary_phone = None
+    assert person.phone_e164 is None
+
+
+def _filter_sql(db: MagicMock) -> str:
+    criteria = db.query.return_value.filter.call_args.args
+    return " AND ".join(
+        str(c.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        for c in criteria
+    )
+
+
+def test_webhook_lookup_is_single_indexed_query():
+    patient = SimpleNamespace(id=7)
+    db = MagicMock()
+    db.query.return_value.filter.return_value.order_by.return_value.first.return_value = patient
+
+    assert find_patient_by_phone("5215512345678", db) is patient
+    assert db.query.call_count == 1
+    assert "persons.phone_e164 = '+525512345678'" in _filter_sql(db)
+
+
+def test_webhook_lookup_over_given_list():
+    a = SimpleNamespace(id=1, primary_phone="+52 55 0000 0000")
+    b = SimpleNamespace(id=2, primary_phone="55 1234 5678")
+    db = MagicMock()
+    assert find_patient_by_phone("5215512345678", db, patients=[a, b]) is b
+    db.query.assert_not_called()
+
+
+def test_bot_lookup_returns_all_patients_sharing_the_number():
+    rows = [
+        SimpleNamespace(id=3, full_name="Luis", name="Luis", primary_phone="5512345678", birth_date=None),
+        SimpleNamespace(id=4, full_name="Eva", name="Eva", primary_phone="+525512345678", birth_date=None),
+    ]
+    db = MagicMock()
+    db.query.return_value.filter.return_value.order_by.return_value.all.return_value = rows
+
+    out = gemini_helpers.find_patient_by_phone(db, "+521 55 1234 5678")
+
+    assert [p["id"] for p in out] == [3, 4]
+    assert db.query.call_count == 1
+    assert "persons.phone_e164 = '+525512345678'" in _filter_sql(db)
+
+
+def test_bot_lookup_without_digits_skips_query():
+    db = MagicMock()
+    assert gemini_helpers.find_patient_by_phone(db, "---") == []
+    db.query.assert_not_called()
@@ -2,6 +2,9 @@
 Unit tests for PracticeMetricsAggregator.
 
 Uses the same chained-MagicMock pattern as the other aggregator tests.
+Queries return the already-aggregated cells (time series come from the
+daily rollup tables), and a few tests compile the SQL to check it. The
+age-bucket CASE also runs on PostgreSQL when QUERY_PLAN_DATABASE_URL is set.
 """
 
 from __future__ import annotations
@@ -11,10 +14,15 @@ from types import SimpleNamespace
 from unittest.mock import MagicMock
 
 import pytest
+from sqlalchemy import Date, literal, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query
 
+from database import Person
 from services.practice_metrics import (
+    AGE_BUCKETS,
     PracticeMetricsAggregator,
-    _age_bucket,
+    _age_bucket_expr,
     _month_starts,
     _pct_change,
 )
@@ -29,17 +37,47 @@ def _doctor(id: int = 1, person_type: str = "doctor"):
     return SimpleNamespace(id=id, person_type=person_type, name="Dr Test")
 
 
-def _chain(*, first=None, all_=(), scalar=None):
+def _chain(*, first=None, all_=(), scalar=None, one=None):
     q = MagicMock()
     q.filter.return_value = q
     q.join.return_value = q
     q.order_by.return_value = q
+    q.group_by.return_value = q
     q.first.return_value = first
     q.all.return_value = list(all_)
     q.scalar.return_value = scalar
+    q.one.return_value = one
     return q
 
 
+def _compiled_sql(method, doctor, now=datetime(2026, 4, 15)):
+    """Run one aggregator method against a recording db and compile its SQL."""
+    built = {}
+
+    def query(*entities):
+        built["q"] = Query(entities)
+        chain = _chain(one=(0,) * len(entities))
+
+        def filter_(*criteria):
+            built["q"] = built["q"].filter(*criteria)
+            return chain
+
+        def group_by(*clauses):
+            built["q"] = built["q"].group_by(*clauses)
+            return chain
+
+        chain.filter.side_effect = filter_
+        chain.group_by.side_effect = group_by
+        return chain
+
+    db = MagicMock()
+    db.query.side_effect = query
+    getattr(PracticeMetricsAggregator(db=db, now=now), method)(doctor)
+    return str(
+        built["q"].statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    )
+
+
 # ---------------------------------------------------------------------------
 # Pure helpers
 # ---------------------------------------------------------------------------
@@ -69,17 +107,33 @@ def test_pct_change_computes_percentage():
     assert _pct_change(current=8, previous=10) == -20.0
 
 
-def test_age_bucket_none_is_unknown():
-    assert _age_bucket(None, date(2026, 4, 15)) == "unknown"
+AGE_TODAY = date(2026, 4, 15)
+AGE_BOUNDARIES = [
+    (None, "unknown"),
+    (date(2008, 4, 16), "0-17"),    # 18 tomorrow
+    (date(2008, 4, 15), "18-29"),   # 18 today
+    (date(1996, 4, 15), "30-44"),   # 30
+    (date(1981, 4, 16), "30-44"),   # 45 tomorrow
+    (date(1981, 4, 15), "45-59"),   # 45
+    (date(1966, 4, 15), "60+"),     # 60
+]
+
 
+def test_age_bucket_expr_is_case_over_pg_age():
+    sql = str(_age_bucket_expr(Person.birth_date, AGE_TODAY).compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    ))
+    age = "EXTRACT(year FROM age('2026-04-15', persons.birth_date))"
+    assert sql.startswith("CASE WHEN (persons.birth_date IS NULL) THEN 'unknown'")
+    for upper, label in AGE_BUCKETS:
+        assert f"WHEN ({age} < {upper}) THEN '{label}'" in sql
+    assert sql.endswith("ELSE '60+' END")
 
-def test_age_bucket_boundaries():
-    today = date(2026, 4, 15)
-    assert _age_bucket(date(2026, 4, 14), today) == "0-17"
-    assert _age_bucket(date(2008, 4, 14), today) == "18-29"   # 18
-    assert _age_bucket(date(1996, 4, 14), today) == "30-44"   # 30
-    assert _age_bucket(date(1981, 4, 14), today) == "45-59"   # 45
-    assert _age_bucket(date(1966, 4, 14), today) == "60+"     # 60
+
+@pytest.mark.parametrize("birth_date,bucket", AGE_BOUNDARIES)
+def test_age_bucket_expr_boundaries(pg_session, birth_date, bucket):
+    expr = _age_bucket_expr(literal(birth_date, type_=Date), AGE_TODAY)
+    assert pg_session.execute(select(expr)).scalar() == bucket
 
 
 # ---------------------------------------------------------------------------
@@ -92,12 +146,10 @@ def test_kpis_computes_delta_and_counts():
     # Anchor: 2026-04-15 → months = [2026-03, 2026-04]
     now = datetime(2026, 4, 15)
     db = MagicMock()
-    # Call order in kpis(): current_month first, then previous, then new_patients, then appointments.
+    # Call order in kpis(): monthly totals rollup, then avg duration rollup.
     db.query.side_effect = [
-        _chain(scalar=8),     # current month consultations (2026-04)
-        _chain(scalar=5),     # previous month consultations (2026-03)
-        _chain(scalar=3),     # new patients this month
-        _chain(all_=[]),      # appointments for avg duration (empty)
+        _chain(one=(8, 5, 3)),     # consultations 2026-04, 2026-03, new patients 2026-04
+        _chain(one=(None, None)),  # duration minutes / samples (no appointments)
     ]
     agg = PracticeMetricsAggregator(db=db, now=now)
 
@@ -114,39 +166,46 @@ def test_kpis_computes_delta_and_counts():
 def test_kpis_computes_avg_duration_from_appointments():
     doctor = _doctor(id=1)
     now = datetime(2026, 4, 15)
-    appointments = [
-        SimpleNamespace(
-            appointment_date=datetime(2026, 4, 10, 10, 0),
-            end_time=datetime(2026, 4, 10, 10, 30),
-            status="completed",
-        ),
-        SimpleNamespace(
-            appointment_date=datetime(2026, 4, 11, 10, 0),
-            end_time=datetime(2026, 4, 11, 10, 45),
-            status="completed",
-        ),
-        # Outlier (10h long) — should be filtered
-        SimpleNamespace(
-            appointment_date=datetime(2026, 4, 12, 10, 0),
-            end_time=datetime(2026, 4, 12, 20, 0),
-            status="completed",
-        ),
-    ]
     db = MagicMock()
     db.query.side_effect = [
-        _chain(scalar=0),
-        _chain(scalar=0),
-        _chain(scalar=0),
-        _chain(all_=appointments),
+        _chain(one=(0, 0, 0)),
+        _chain(one=(75, 2)),  # 30 + 45 minutes over two appointments
     ]
     agg = PracticeMetricsAggregator(db=db, now=now)
 
     out = agg.kpis(doctor)
 
-    # Avg of 30 and 45 = 37 (outlier filtered)
     assert out["avg_consultation_duration_minutes"] == 37
 
 
+def test_avg_duration_reads_duration_rollup():
+    sql = _compiled_sql("kpis", _doctor(id=1))
+    # The last query kpis() builds is the avg duration one
+    assert "sum(appointment_daily_rollups.duration_minutes)" in sql
+    assert "appointment_daily_rollups.status IN ('completed', 'confirmada', 'por_confirmar')" in sql
+    assert "appointment_daily_rollups.day >= '2026-04-01'" in sql
+    assert "appointment_daily_rollups.day <= '2026-04-30'" in sql
+    assert "appointments" not in sql.replace("appointment_daily_rollups", "")
+
+
+def test_monthly_totals_use_filter_per_month():
+    db = MagicMock()
+    db.query.return_value = _chain(one=(4, 2, 1))
+    agg = PracticeMetricsAggregator(db=db, now=datetime(2026, 4, 15))
+    months = _month_starts(agg.now, 2)
+
+    assert agg._monthly_totals(_doctor(), months[1], months[0]) == (4, 2, 1)
+    sql = str(db.query.call_args.args[0].compile(dialect=postgresql.dialect()))
+    assert sql.startswith("sum(practice_daily_rollups.consultations) FILTER (WHERE")
+
+
+def test_admin_new_patients_are_counted_live():
+    db = MagicMock()
+    db.query.side_effect = [_chain(one=(0, 0, 2)), _chain(scalar=7), _chain(one=(None, None))]
+    out = PracticeMetricsAggregator(db=db, now=datetime(2026, 4, 15)).kpis(_doctor(person_type="admin"))
+    assert out["new_patients_this_month"] == 7
+
+
 # ---------------------------------------------------------------------------
 # Aggregator — trends
 # ---------------------------------------------------------------------------
@@ -156,10 +215,9 @@ def test_consultations_by_month_buckets_into_12_months():
     doctor = _doctor(id=1)
     now = datetime(2026, 4, 15)
     rows = [
-        (datetime(2026, 4, 1),),
-        (datetime(2026, 4, 10),),
-        (datetime(2026, 3, 5),),
-        (datetime(2025, 12, 20),),
+        (datetime(2026, 4, 1), 2),
+        (datetime(2026, 3, 1), 1),
+        (datetime(2025, 12, 1), 1),
     ]
     db = MagicMock()
     db.query.side_effect = [_chain(all_=rows)]
@@ -177,16 +235,43 @@ def test_consultations_by_month_buckets_into_12_months():
     assert by_label["2025-10"] == 0
 
 
+def test_monthly_trends_read_daily_rollup():
+    for method, column in (
+        ("consultations_by_month", "consultations"),
+        ("studies_by_month", "studies_ordered"),
+    ):
+        sql = _compiled_sql(method, _doctor(id=1))
+        assert f"sum(practice_daily_rollups.{column})" in sql
+        assert "GROUP BY date_trunc('month', practice_daily_rollups.day)" in sql
+        assert "practice_daily_rollups.day >= '2025-05-01'" in sql
+        assert "practice_daily_rollups.doctor_id = 1" in sql
+
+
+def test_admin_scope_reads_all_doctors():
+    sql = _compiled_sql("consultations_by_month", _doctor(id=9, person_type="admin"))
+    assert "doctor_id" not in sql
+
+
+def test_studies_by_month_maps_grouped_rows():
+    db = MagicMock()
+    db.query.side_effect = [_chain(all_=[(datetime(2026, 2, 1), 4), (None, 9)])]
+    out = PracticeMetricsAggregator(db=db, now=datetime(2026, 4, 15)).studies_by_month(_doctor())
+    by_label = {r["month"]: r["count"] for r in out}
+    assert by_label["2026-02"] == 4
+    assert sum(by_label.values()) == 4
+
+
 def test_top_diagnoses_normalises_and_ranks():
     doctor = _doctor(id=1)
     now = datetime(2026, 4, 15)
+    # Already grouped by lower(collapsed whitespace) in SQL; Python merges
+    # anything the database normalised differently.
     rows = [
-        ("Hipertensión arterial",),
-        ("hipertensión arterial",),  # case diff
-        ("Hipertensión arterial ",),  # trailing space
-        ("Diabetes mellitus tipo 2",),
-        ("Diabetes mellitus tipo 2",),
-        ("Migraña",),
+        ("hipertensión arterial", 2),
+        ("hipertensión  arterial ", 1),
+        ("diabetes mellitus tipo 2", 2),
+        ("migraña", 1),
+        (None, 4),
     ]
     db = MagicMock()
     db.query.side_effect = [_chain(all_=rows)]
@@ -203,10 +288,10 @@ def test_top_diagnoses_normalises_and_ranks():
 def test_busy_heatmap_groups_by_weekday_hour():
     doctor = _doctor(id=1)
     now = datetime(2026, 4, 15)
+    # (isodow - 1, hour, count) cells
     rows = [
-        (datetime(2026, 4, 13, 10, 0),),   # Monday 10:00 (weekday=0)
-        (datetime(2026, 4, 13, 10, 30),),  # Monday 10:30 → also hour=10
-        (datetime(2026, 4, 14, 15, 0),),   # Tuesday 15:00
+        (0, 10, 2),   # Monday 10:00
+        (1, 15, 1),   # Tuesday 15:00
     ]
     db = MagicMock()
     db.query.side_effect = [_chain(all_=rows)]
@@ -222,15 +307,24 @@ def test_busy_heatmap_groups_by_weekday_hour():
     assert tue["count"] == 1
 
 
+def test_busy_heatmap_reads_hourly_rollup():
+    sql = _compiled_sql("busy_heatmap", _doctor(id=1))
+    assert "sum(appointment_hourly_rollups.appointments)" in sql
+    assert (
+        "GROUP BY EXTRACT(isodow FROM appointment_hourly_rollups.day) - 1, appointment_hourly_rollups.hour"
+        in sql
+    )
+
+
 def test_demographics_groups_by_gender_and_age():
     doctor = _doctor(id=1)
     now = datetime(2026, 4, 15)
+    # (gender, age bucket, count) cells
     rows = [
-        ("Masculino", date(1990, 1, 1)),
-        ("Masculino", date(1985, 1, 1)),
-        ("Femenino", date(2010, 1, 1)),
-        ("Femenino", date(1960, 1, 1)),
-        (None, None),
+        ("masculino", "30-44", 2),
+        ("femenino", "0-17", 1),
+        ("femenino", "60+", 1),
+        ("unknown", "unknown", 1),
     ]
     db = MagicMock()
     db.query.side_effect = [_chain(all_=rows)]
@@ -244,10 +338,18 @@ def test_demographics_groups_by_gender_and_age():
     assert gender_by["femenino"] == 2
     assert gender_by["unknown"] == 1
     age_by = {r["bucket"]: r["count"] for r in out["by_age_bucket"]}
-    # 1990 → 36 and 1985 → 41, both in 30-44; 2010 → 16 in 0-17; 1960 → 66 in 60+
     assert age_by["30-44"] == 2
     assert age_by["0-17"] == 1
     assert age_by["60+"] == 1
+    assert [r["bucket"] for r in out["by_age_bucket"]] == ["0-17", "30-44", "60+", "unknown"]
+
+
+def test_demographics_buckets_age_in_sql():
+    sql = _compiled_sql("demographics", _doctor(id=1))
+    assert "age('2026-04-15', persons.birth_date)" in sql
+    assert "WHEN (EXTRACT(year FROM age('2026-04-15', persons.birth_date)) < 18) THEN '0-17'" in sql
+    assert "ELSE '60+'" in sql
+    assert "GROUP BY lower(coalesce(persons.gender, 'unknown'))" in sql
 
 
 # ---------------------------------------------------------------------------
@@ -261,8 +363,7 @@ def test_build_tags_scope_as_admin_for_admin_user():
     db = MagicMock()
     # Many query calls — just return empty chains for all of them
     db.query.side_effect = [
-        _chain(scalar=0), _chain(scalar=0), _chain(scalar=0),
-        _chain(all_=[]),
+        _chain(one=(0, 0, 0)), _chain(scalar=0), _chain(one=(None, None)),
         _chain(all_=[]),
         _chain(all_=[]),
         _chain(all_=[]),
@@ -0,0 +1,189 @@
+"""
+Tests for the sliding-window rate limiter.
+
+- evaluate_window: weighted previous window, remaining and Retry-After
+- LocalRateLimitBackend: limits per key, window roll-over, idle eviction
+- RedisRateLimitBackend: script keys/args, fallback while Redis fails
+- RateLimiter policies and RateLimitMiddleware headers / 429s
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from main_clean_english import RateLimitMiddleware
+from services import rate_limiter as rl
+from services.rate_limiter import (
+    LocalRateLimitBackend,
+    RateLimiter,
+    RateLimitPolicy,
+    RedisRateLimitBackend,
+    evaluate_window,
+)
+
+POLICY = RateLimitPolicy(name="default", max_requests=10, window_seconds=60)
+
+
+class _Clock:
+    def __init__(self, now: float = 6000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_evaluate_window_weights_previous_window():
+    # 15s into the window: 75% of the previous window still counts
+    assert evaluate_window(POLICY, 6015.0, current=5, previous=8) == (False, 0, 8)
+    # 30s in: 5 + 8 * 0.5 = 9 < 10, and this request takes the last slot
+    assert evaluate_window(POLICY, 6030.0, current=5, previous=8) == (True, 0, 0)
+    assert evaluate_window(POLICY, 6030.0, current=2, previous=8) == (True, 3, 0)
+
+
+def test_evaluate_window_full_current_waits_for_next_window():
+    assert evaluate_window(POLICY, 6045.0, current=10, previous=0) == (False, 0, 15)
+
+
+def test_local_backend_limits_and_rolls_over():
+    clock = _Clock()
+    backend = LocalRateLimitBackend(shards=4, clock=clock)
+
+    results = [backend.hit("default:1.2.3.4", POLICY) for _ in range(11)]
+    assert [r.allowed for r in results] == [True] * 10 + [False]
+    assert results[0].remaining == 9 and results[9].remaining == 0
+    assert results[10].retry_after == 60
+
+    # Other clients are unaffected
+    assert backend.hit("default:5.6.7.8", POLICY).allowed
+
+    # Half-way through the next window half of the old count remains
+    clock.now += 90
+    allowed = sum(backend.hit("default:1.2.3.4", POLICY).allowed for _ in range(10))
+    assert allowed == 5
+
+
+def test_local_backend_evicts_idle_keys():
+    clock = _Clock()
+    backend = LocalRateLimitBackend(shards=1, clock=clock)
+    for i in range(50):
+        backend.hit(f"default:10.0.0.{i}", POLICY)
+    assert len(backend) == 50
+
+    clock.now += 2 * POLICY.window_seconds + rl.SWEEP_INTERVAL_SECONDS
+    backend.hit("default:10.0.1.1", POLICY)
+    assert len(backend) == 1
+
+
+class _FakeScript:
+    def __init__(self, result=(1, 0, 0), error: Exception = None):
+        self.result = list(result)
+        self.error = error
+        self.calls = []
+
+    async def __call__(self, keys, args):
+        self.calls.append((keys, args))
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class _FakeRedis:
+    def __init__(self, script: _FakeScript):
+        self.script = script
+
+    def register_script(self, source):
+        assert "INCR" in source
+        return self.script
+
+
+def test_redis_backend_passes_window_keys_and_weight():
+    script = _FakeScript(result=(1, 3, 4))
+    backend = RedisRateLimitBackend(_FakeRedis(script), clock=_Clock(6030.0))
+
+    result = asyncio.run(backend.hit("auth:1.2.3.4", POLICY))
+
+    keys, args = script.calls[0]
+    assert keys == ["ratelimit:auth:1.2.3.4:100", "ratelimit:auth:1.2.3.4:99"]
+    assert args == ["0.5", 10, 120]
+    assert result.allowed and result.remaining == 4
+
+
+def test_redis_backend_falls_back_while_unavailable():
+    clock = _Clock()
+    script = _FakeScript(error=ConnectionError("down"))
+    backend = RedisRateLimitBackend(_FakeRedis(script), retry_seconds=30, clock=clock)
+
+    assert asyncio.run(backend.hit("default:a", POLICY)).allowed
+    assert asyncio.run(backend.hit("default:a", POLICY)).allowed
+    assert len(script.calls) == 1
+
+    clock.now += 31
+    script.error = None
+    asyncio.run(backend.hit("default:a", POLICY))
+    assert len(script.calls) == 2
+
+
+def test_policy_resolution():
+    login = RateLimitPolicy("auth", 2, 60, path_prefixes=("/api/auth/login",), methods=("POST",))
+    limiter = RateLimiter(LocalRateLimitBackend(), POLICY, [login])
+
+    assert limiter.policy_for("POST", "/api/auth/login") is login
+    assert limiter.policy_for("GET", "/api/auth/login") is POLICY
+    assert limiter.policy_for("GET", "/api/patients") is POLICY
+
+
+def test_default_policies_are_stricter_for_auth():
+    default, policies = rl.default_policies()
+    by_name = {p.name: p for p in policies}
+    assert set(by_name) == {"auth", "webhook"}
+    assert by_name["auth"].max_requests <= default.max_requests
+    assert by_name["webhook"].matches("POST", "/api/whatsapp/webhook")
+
+
+def _app(limiter: RateLimiter) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+
+    @app.get("/api/patients")
+    def patients():
+        return {"ok": True}
+
+    @app.post("/api/auth/login")
+    def login():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_middleware_applies_route_policy_separately():
+    login = RateLimitPolicy("auth", 2, 60, path_prefixes=("/api/auth/login",), methods=("POST",))
+    client = _app(RateLimiter(LocalRateLimitBackend(), POLICY, [login]))
+
+    assert [client.post("/api/auth/login").status_code for _ in range(3)] == [200, 200, 429]
+
+    blocked = client.post("/api/auth/login")
+    assert blocked.headers["X-RateLimit-Limit"] == "2"
+    assert int(blocked.headers["Retry-After"]) >= 1
+
+    ok = client.get("/api/patients")
+    assert ok.status_code == 200
+    assert ok.headers["X-RateLimit-Limit"] == "10"
+    assert ok.headers["X-RateLimit-Remaining"] == "9"
+
+
+def test_middleware_skips_disabled_policy():
+    disabled = RateLimitPolicy("default", 0, 60)
+    client = _app(RateLimiter(LocalRateLimitBackend(), disabled))
+    response = client.get("/api/patients")
+    assert response.status_code == 200
+    assert "X-RateLimit-Limit" not in response.headers
+
+
+@pytest.mark.parametrize("backend_name,expected", [("memory", LocalRateLimitBackend), ("redis", RedisRateLimitBackend)])
+def test_build_rate_limiter_backend(monkeypatch, backend_name, expected):
+    monkeypatch.setattr(rl.settings, "RATE_LIMIT_BACKEND", backend_name)
+    assert isinstance(rl.build_rate_limiter().backend, expected)
@@ -0,0 +1,225 @@
+"""
+Tests for the due-time reminder queue.
+
+- AppointmentReminder.send_at follows appointment_date - offset_minutes
+  (insert, offset change, appointment reschedule)
+- claim_due_reminders: one UPDATE ... WHERE id IN (SELECT ... FOR UPDATE
+  SKIP LOCKED LIMIT n) RETURNING id, bounded by the send window
+- check_and_send_reminders: sends only claimed rows (one bulk send per
+  batch), batches until drained, tries a failing reminder once per tick
+- legacy single-reminder appointments are filtered in SQL (no N+1)
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy.dialects import postgresql
+
+from database import Appointment, AppointmentReminder
+from models import appointment as appointment_models
+from services import scheduler
+
+NOW = datetime(2026, 10, 17, 9, 0)
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def _chain(all_=()):
+    q = MagicMock()
+    for method in ("filter", "options", "limit"):
+        getattr(q, method).return_value = q
+    q.all.return_value = list(all_)
+    return q
+
+
+# ----------------------------------------------------------------------------
+# send_at maintenance
+# ----------------------------------------------------------------------------
+
+def test_send_at_from_loaded_appointment():
+    appointment = Appointment(id=1, appointment_date=datetime(2026, 10, 20, 10, 0))
+    reminder = AppointmentReminder(appointment=appointment, reminder_number=1, offset_minutes=90)
+
+    connection = MagicMock()
+    appointment_models._set_reminder_send_at(None, connection, reminder)
+
+    assert reminder.send_at == datetime(2026, 10, 20, 8, 30)
+    connection.scalar.assert_not_called()
+
+
+def test_send_at_looks_up_appointment_date_by_id():
+    reminder = AppointmentReminder(appointment_id=5, reminder_number=2, offset_minutes=60)
+    connection = MagicMock()
+    connection.scalar.return_value = datetime(2026, 10, 20, 10, 0)
+
+    appointment_models._set_reminder_send_at(None, connection, reminder)
+
+    assert reminder.send_at == datetime(2026, 10, 20, 9, 0)
+    assert "appointments.id = 5" in _sql(connection.scalar.call_args.args[0])
+
+
+def test_reschedule_moves_reminders_in_one_statement():
+    appointment = Appointment(id=7, appointment_date=datetime(2026, 10, 21, 12, 0))
+    connection = MagicMock()
+
+    appointment_models._reschedule_reminders(None, connection, appointment)
+
+    sql = _sql(connection.execute.call_args.args[0])
+    assert sql.startswith("UPDATE appointment_reminders SET send_at=")
+    assert "- appointment_reminders.offset_minutes * interval '1 minute'" in sql
+    assert "WHERE appointment_reminders.appointment_id = 7" in sql
+
+
+def test_due_index_declared_on_model():
+    indexes = {idx.name: [c.name for c in idx.columns] for idx in AppointmentReminder.__table__.indexes}
+    assert indexes["ix_appointment_reminders_due"] == ["sent", "enabled", "send_at"]
+
+
+# ----------------------------------------------------------------------------
+# claiming
+# ----------------------------------------------------------------------------
+
+def test_claim_is_single_skip_locked_update():
+    db = MagicMock()
+    db.execute.return_value = [(11,), (12,)]
+
+    assert scheduler.claim_due_reminders(db, NOW, batch_size=25) == [11, 12]
+
+    sql = _sql(db.execute.call_args.args[0])
+    assert sql.startswith("UPDATE appointment_reminders SET sent=true")
+    assert "FOR UPDATE OF appointment_reminders SKIP LOCKED" in sql
+    assert "LIMIT 25" in sql
+    assert "appointment_reminders.send_at <= '2026-10-17 09:00:00'" in sql
+    assert "appointment_reminders.send_at >= '2026-10-17 03:00:00'" in sql
+    assert "RETURNING appointment_reminders.id" in sql
+    db.commit.assert_called_once()
+
+
+def _reminder(id):
+    return SimpleNamespace(id=id, appointment_id=100 + id)
+
+
+def test_tick_sends_only_claimed_reminders():
+    db = MagicMock()
+    db.query.side_effect = [_chain([_reminder(1), _reminder(2)]), _chain([])]
+
+    with patch.object(scheduler, "now_cdmx", return_value=NOW), \
+            patch.object(scheduler, "claim_due_reminders", return_value=[1, 2]) as claim, \
+            patch.object(scheduler.AppointmentService, "deliver_reminders", return_value={1: True, 2: False}) as deliver:
+        result = scheduler.check_and_send_reminders(db)
+
+    claim.assert_called_once()
+    # The whole batch goes out in one bulk call
+    assert [r.id for r in deliver.call_args.args[1]] == [1, 2]
+    assert result["reminders_found"] == 2
+    assert result["reminders_sent"] == 1
+    assert result["reminders_failed"] == 1
+    assert result["legacy_sent"] == 0
+
+
+def test_tick_keeps_claiming_full_batches(monkeypatch):
+    monkeypatch.setattr(scheduler, "REMINDER_BATCH_SIZE", 2)
+    db = MagicMock()
+    db.query.side_effect = [_chain([_reminder(1), _reminder(2)]), _chain([_reminder(3)]), _chain([])]
+
+    with patch.object(scheduler, "now_cdmx", return_value=NOW), \
+            patch.object(scheduler, "claim_due_reminders", side_effect=[[1, 2], [3]]) as claim, \
+            patch.object(scheduler.AppointmentService, "deliver_reminders",
+                         side_effect=lambda db, rs: {r.id: True for r in rs}):
+        result = scheduler.check_and_send_reminders(db)
+
+    assert claim.call_count == 2
+    assert result["reminders_sent"] == 3
+
+
+def test_permanent_failures_do_not_starve_newer_reminders(monkeypatch):
+    monkeypatch.setattr(scheduler, "REMINDER_BATCH_SIZE", 2)
+    # ids in send_at order; 1 and 2 always fail (e.g. a bad number)
+    unsent = [1, 2, 3, 4, 5]
+
+    def claim(db, now, batch_size=2, exclude_ids=()):
+        batch = [i for i in unsent if i not in exclude_ids][:batch_size]
+        for i in batch:
+            unsent.remove(i)
+        return batch
+
+    def deliver(db, reminders):
+        outcome = {r.id: r.id > 2 for r in reminders}
+        unsent.extend(i for i, ok in outcome.items() if not ok)  # un-claimed again
+        unsent.sort()
+        return outcome
+
+    claimed_ids = []
+
+    def recording_claim(*args, **kwargs):
+        claimed_ids.append(claim(*args, **kwargs))
+        return claimed_ids[-1]
+
+    def query(model, *columns):
+        # Loading the claimed batch, then the (empty) legacy query
+        return _chain([_reminder(i) for i in claimed_ids[-1]] if model is AppointmentReminder else [])
+
+    db = MagicMock()
+    db.query.side_effect = query
+
+    with patch.object(scheduler, "now_cdmx", return_value=NOW), \
+            patch.object(scheduler, "claim_due_reminders", side_effect=recording_claim), \
+            patch.object(scheduler.AppointmentService, "deliver_reminders", side_effect=deliver):
+        result = scheduler.check_and_send_reminders(db)
+
+    assert claimed_ids == [[1, 2], [3, 4], [5]]
+    assert (result["reminders_sent"], result["reminders_failed"]) == (3, 2)
+    assert unsent == [1, 2]  # retried on the next tick
+
+
+def test_claim_skips_reminders_that_failed_this_tick():
+    db = MagicMock()
+    db.execute.return_value = []
+    scheduler.claim_due_reminders(db, NOW, exclude_ids={7, 3})
+    assert "appointment_reminders.id NOT IN (3, 7)" in _sql(db.execute.call_args.args[0])
+
+
+def test_tick_with_nothing_due_skips_loading():
+    db = MagicMock()
+    db.query.side_effect = [_chain([])]
+    with patch.object(scheduler, "now_cdmx", return_value=NOW), \
+            patch.object(scheduler, "claim_due_reminders", return_value=[]), \
+            patch.object(scheduler.AppointmentService, "deliver_reminders") as deliver:
+        result = scheduler.check_and_send_reminders(db)
+    deliver.assert_not_called()
+    assert result["reminders_found"] == 0
+    # Only the legacy query ran
+    assert db.query.call_count == 1
+
+
+# ----------------------------------------------------------------------------
+# legacy path
+# ----------------------------------------------------------------------------
+
+def test_legacy_candidates_filtered_in_sql():
+    q = _chain([(4,), (9,)])
+    db = MagicMock()
+    db.query.return_value = q
+
+    assert scheduler._legacy_due_appointment_ids(db, NOW) == [4, 9]
+
+    sql = " AND ".join(_sql(c) for c in q.filter.call_args.args)
+    assert "NOT (EXISTS (SELECT 1" in sql
+    assert "appointments.reminder_sent = false" in sql
+    assert "interval '1 minute' * appointments.auto_reminder_offset_minutes" in sql
+
+
+def test_legacy_due_appointments_use_atomic_sender():
+    db = MagicMock()
+    with patch.object(scheduler, "now_cdmx", return_value=NOW), \
+            patch.object(scheduler, "claim_due_reminders", return_value=[]), \
+            patch.object(scheduler, "_legacy_due_appointment_ids", return_value=[4, 9]), \
+            patch.object(scheduler.legacy_reminders, "send_appointment_reminder", side_effect=[True, False]) as send:
+        result = scheduler.check_and_send_reminders(db)
+    assert [c.args[1] for c in send.call_args_list] == [4, 9]
+    assert result["legacy_sent"] == 1
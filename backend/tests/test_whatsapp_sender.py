@@ -0,0 +1,264 @@
+"""
+Tests for the pooled async WhatsApp sender and the bulk reminder path.
+
+- AsyncMessageSender against httpx.MockTransport: retries on 429/5xx,
+  Meta throughput errors and connection failures, no retry on other 4xx
+  or on errors after the request was sent, bounded parallelism,
+  results in input order
+- WhatsAppService.send_many builds on the same payloads as the single send
+- AppointmentService.deliver_reminders: one send_many per batch, failed
+  reminders un-claimed in one UPDATE, template-language fallback
+"""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from services.appointment_service import AppointmentService
+from services.whatsapp import sender as sender_mod
+from services.whatsapp.meta import WhatsAppService
+from services.whatsapp.sender import AsyncMessageSender, backoff_delay
+
+
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch):
+    monkeypatch.setattr(sender_mod, "backoff_delay", lambda attempt, retry_after=None: 0)
+
+
+def _ok(message_id="wamid.1"):
+    return httpx.Response(200, json={"messages": [{"id": message_id, "message_status": "accepted"}]})
+
+
+def _sender(handler, **kwargs):
+    return AsyncMessageSender(
+        "https://graph.test/v24.0", "PHONE", "TOKEN", transport=httpx.MockTransport(handler), **kwargs
+    )
+
+
+async def _send_many(sender, payloads):
+    async with sender:
+        return await sender.send_many(payloads)
+
+
+# ----------------------------------------------------------------------------
+# AsyncMessageSender
+# ----------------------------------------------------------------------------
+
+async def test_retries_429_then_succeeds():
+    responses = [httpx.Response(429, headers={"Retry-After": "1"}), httpx.Response(503), _ok()]
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return responses.pop(0)
+
+    [result] = await _send_many(_sender(handler), [{"to": "+5215555555555"}])
+
+    assert result["success"] is True and result["message_id"] == "wamid.1"
+    assert len(seen) == 3
+    assert seen[0].url == "https://graph.test/v24.0/PHONE/messages"
+    assert seen[0].headers["Authorization"] == "Bearer TOKEN"
+
+
+async def test_meta_throughput_error_is_retried():
+    responses = [httpx.Response(400, json={"error": {"code": 130429, "message": "Rate limit hit"}}), _ok()]
+    [result] = await _send_many(_sender(lambda request: responses.pop(0)), [{}])
+    assert result["success"] is True
+
+
+async def test_client_error_is_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={"error": {"code": 132001, "message": "template name does not exist"}})
+
+    [result] = await _send_many(_sender(handler), [{}])
+
+    assert len(calls) == 1
+    assert result["success"] is False
+    assert result["error"] == "HTTP Error 400"
+    assert result["details"]["error"]["code"] == 132001
+
+
+async def test_gives_up_after_max_retries():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    [result] = await _send_many(_sender(handler, max_retries=2), [{}])
+    assert len(calls) == 3
+    assert result == {"success": False, "error": "HTTP Error 500", "status_code": 500, "details": ""}
+
+
+@pytest.mark.parametrize("error,retried", [
+    (httpx.ConnectError("refused"), True),
+    (httpx.ConnectTimeout("connect"), True),
+    (httpx.PoolTimeout("pool"), True),
+    (httpx.ReadTimeout("read"), False),
+    (httpx.RemoteProtocolError("reset"), False),
+])
+async def test_only_unsent_transport_errors_are_retried(error, retried):
+    # A read timeout or dropped response may follow an accepted send
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise error
+        return _ok()
+
+    [result] = await _send_many(_sender(handler), [{}])
+    assert result["success"] is retried
+    assert len(calls) == (2 if retried else 1)
+
+
+async def test_parallelism_is_bounded_and_order_kept():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        to = request.read().decode()
+        return _ok(message_id=to)
+
+    payloads = [{"to": str(i)} for i in range(12)]
+    results = await _send_many(_sender(handler, concurrency=3), payloads)
+
+    assert peak == 3
+    assert [r["message_id"] for r in results] == [f'{{"to":"{i}"}}' for i in range(12)]
+
+
+@pytest.mark.parametrize("attempt,cap", [(1, 0.5), (3, 2.0), (10, sender_mod.BACKOFF_MAX_SECONDS)])
+def test_backoff_is_jittered_and_capped(attempt, cap):
+    # The autouse fixture only replaces the module attribute
+    assert all(0 <= backoff_delay(attempt) <= cap for _ in range(50))
+    assert backoff_delay(attempt, retry_after="2") == 2.0
+
+
+# ----------------------------------------------------------------------------
+# WhatsAppService.send_many
+# ----------------------------------------------------------------------------
+
+def _meta_service():
+    with patch.dict("os.environ", {"META_WHATSAPP_PHONE_ID": "PHONE123456", "META_WHATSAPP_TOKEN": "TOKEN123456789"}):
+        return WhatsAppService()
+
+
+REMINDER_KWARGS = dict(
+    patient_phone="5512345678",
+    patient_full_name="Ana López",
+    appointment_date="20 de October de 2026",
+    appointment_time="10:00 AM",
+    doctor_title="Dra.",
+    doctor_full_name="Dra. Sofía Ruiz",
+    office_address="Av. Reforma 1, CDMX",
+    country_code="52",
+    appointment_type="presencial",
+    maps_url=None,
+)
+
+
+def test_reminder_payload_matches_single_send():
+    service = _meta_service()
+    payload = service.build_appointment_reminder_payload(**REMINDER_KWARGS)
+
+    with patch("services.whatsapp.meta.requests.post") as post:
+        post.return_value.json.return_value = {"messages": [{"id": "wamid.x"}]}
+        service.send_appointment_reminder(**REMINDER_KWARGS)
+
+    assert post.call_args.kwargs["json"] == payload
+    assert payload["to"] == "+5215512345678"
+    assert payload["template"]["components"][0]["parameters"][4] == {"type": "text", "text": "Sofía Ruiz"}
+
+
+def test_send_many_uses_pooled_sender():
+    service = _meta_service()
+
+    async def fake_send_many(self, payloads):
+        return [{"success": True, "message_id": p["to"]} for p in payloads]
+
+    with patch.object(AsyncMessageSender, "send_many", fake_send_many):
+        results = service.send_many([{"to": "a"}, {"to": "b"}])
+    assert [r["message_id"] for r in results] == ["a", "b"]
+
+
+def test_send_many_without_credentials():
+    with patch.dict("os.environ", {"META_WHATSAPP_PHONE_ID": "", "META_WHATSAPP_TOKEN": ""}):
+        service = WhatsAppService()
+    results = service.send_many([{}, {}])
+    assert [r["success"] for r in results] == [False, False]
+    assert service.send_many([]) == []
+
+
+# ----------------------------------------------------------------------------
+# AppointmentService.deliver_reminders
+# ----------------------------------------------------------------------------
+
+def _reminder(id):
+    return SimpleNamespace(id=id, appointment_id=100 + id)
+
+
+def _bulk_service(results):
+    service = MagicMock(spec=["send_many", "build_appointment_reminder_payload",
+                              "send_appointment_reminder", "_is_template_language_error"])
+    service.build_appointment_reminder_payload.side_effect = lambda **kw: {"to": kw["patient_phone"]}
+    service.send_many.return_value = results
+    service._is_template_language_error.side_effect = WhatsAppService._is_template_language_error
+    return service
+
+
+def _kwargs(reminder):
+    return {"patient_phone": str(reminder.id)}
+
+
+def test_deliver_reminders_sends_batch_and_unclaims_failures():
+    service = _bulk_service([{"success": True}, {"success": False, "error": "HTTP Error 500"}, {"success": True}])
+    db = MagicMock()
+
+    with patch("whatsapp_service.get_whatsapp_service", return_value=service), \
+            patch.object(AppointmentService, "reminder_message_kwargs", side_effect=_kwargs):
+        outcome = AppointmentService.deliver_reminders(db, [_reminder(1), _reminder(2), _reminder(3)])
+
+    assert outcome == {1: True, 2: False, 3: True}
+    service.send_many.assert_called_once_with([{"to": "1"}, {"to": "2"}, {"to": "3"}])
+    update = db.query.return_value.filter.return_value.update
+    update.assert_called_once_with({"sent": False, "sent_at": None}, synchronize_session=False)
+    db.commit.assert_called_once()
+
+
+def test_deliver_reminders_template_error_uses_language_fallback():
+    template_error = {"success": False, "error": "HTTP Error 404",
+                      "details": {"error": {"code": 132001, "message": "template name does not exist"}}}
+    service = _bulk_service([template_error])
+    service.send_appointment_reminder.return_value = {"success": True}
+    db = MagicMock()
+
+    with patch("whatsapp_service.get_whatsapp_service", return_value=service), \
+            patch.object(AppointmentService, "reminder_message_kwargs", side_effect=_kwargs):
+        outcome = AppointmentService.deliver_reminders(db, [_reminder(1)])
+
+    assert outcome == {1: True}
+    service.send_appointment_reminder.assert_called_once_with(patient_phone="1")
+    db.commit.assert_not_called()
+
+
+def test_deliver_reminders_without_bulk_support_sends_one_by_one():
+    service = SimpleNamespace(send_appointment_reminder=MagicMock())
+    db = MagicMock()
+    with patch("whatsapp_service.get_whatsapp_service", return_value=service), \
+            patch.object(AppointmentService, "deliver_reminder", side_effect=[True, False]) as single:
+        outcome = AppointmentService.deliver_reminders(db, [_reminder(1), _reminder(2)])
+    assert single.call_count == 2
+    assert outcome == {1: True, 2: False}
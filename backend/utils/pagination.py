@@ -0,0 +1,126 @@
+"""
+Keyset (cursor) pagination helpers for list endpoints.
+
+Offset pagination makes the database walk and discard every row before
+the requested page, so deep pages on multi-year archives get linearly
+slower. Keyset pagination instead remembers the sort key of the last row
+served and asks for rows strictly "after" it, which an index on
+(sort_column, id) answers in O(page).
+
+Cursors are opaque to clients: base64url-encoded JSON carrying the sort
+value of the last row and its id (the tie-breaker). Endpoints accept the
+cursor alongside the existing `skip`/`limit` params; when a cursor is
+given, `skip` is ignored.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, tuple_
+
+# Response header carrying the next cursor for endpoints that return a bare list.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client-supplied cursor cannot be decoded."""
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    """Build an opaque cursor from the last row's sort value and id."""
+    payload: dict = {"id": int(row_id)}
+    if isinstance(sort_value, datetime):
+        payload.update(v=sort_value.isoformat(), t="dt")
+    elif isinstance(sort_value, date):
+        payload.update(v=sort_value.isoformat(), t="d")
+    else:
+        payload["v"] = sort_value
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Return ``(sort_value, id)`` from a cursor produced by `encode_cursor`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        row_id = int(payload["id"])
+        value = payload.get("v")
+        kind = payload.get("t")
+        if value is not None and kind == "dt":
+            value = datetime.fromisoformat(value)
+        elif value is not None and kind == "d":
+            value = date.fromisoformat(value)
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError, AttributeError) as exc:
+        raise InvalidCursorError("Invalid pagination cursor") from exc
+    return value, row_id
+
+
+def validate_cursor(cursor: Optional[str]) -> None:
+    """Route guard: reject malformed cursors with 400 before any query runs."""
+    if not cursor:
+        return
+    try:
+        decode_cursor(cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Cursor de paginación inválido")
+
+
+def apply_keyset(query, sort_column, id_column, cursor: Optional[str], descending: bool = True):
+    """
+    Order `query` by (sort_column, id_column) and, if `cursor` is given,
+    restrict it to rows after the cursor position.
+
+    `sort_column` may be None to paginate on the id alone. Rows with a NULL
+    sort value follow PostgreSQL's default placement (first for DESC, last
+    for ASC) so pages never skip or repeat them.
+    """
+    if sort_column is None:
+        query = query.order_by(id_column.desc() if descending else id_column.asc())
+        if cursor:
+            _, last_id = decode_cursor(cursor)
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        return query
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+    if not cursor:
+        return query
+
+    last_value, last_id = decode_cursor(cursor)
+    if descending:
+        if last_value is None:
+            return query.filter(or_(
+                and_(sort_column.is_(None), id_column < last_id),
+                sort_column.isnot(None),
+            ))
+        return query.filter(tuple_(sort_column, id_column) < tuple_(last_value, last_id))
+    if last_value is None:
+        return query.filter(sort_column.is_(None), id_column > last_id)
+    return query.filter(or_(
+        tuple_(sort_column, id_column) > tuple_(last_value, last_id),
+        sort_column.is_(None),
+    ))
+
+
+def next_cursor(
+    items: Sequence[Any],
+    limit: int,
+    key: Callable[[Any], Tuple[Any, int]],
+) -> Optional[str]:
+    """
+    Cursor for the page after `items`, or None when this was the last page.
+
+    `key` maps the last item to its ``(sort_value, id)``.
+    """
+    if not items or limit <= 0 or len(items) < limit:
+        return None
+    sort_value, row_id = key(items[-1])
+    return encode_cursor(sort_value, row_id)
@@ -0,0 +1,38 @@
+"""
+Phone number normalization for indexed lookups.
+
+`Person.phone_e164` stores the canonical form produced here so that
+WhatsApp webhooks can resolve the sender with a single indexed equality
+query instead of normalizing every patient's phone in Python.
+
+Mexican mobile numbers arrive in two shapes: WhatsApp sends the legacy
+mobile prefix (521 + 10 digits) while patients usually register the
+current one (52 + 10 digits). Both collapse to +52 + 10 digits, so either
+variant matches the other.
+"""
+import re
+from typing import Optional
+
+DEFAULT_COUNTRY_CODE = "52"
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone_e164(phone: Optional[str], country_code: str = DEFAULT_COUNTRY_CODE) -> Optional[str]:
+    """Return the canonical +E.164 form of `phone`, or None if it has no digits.
+
+    - 10 national digits get `country_code` prepended
+    - Mexican 521 + 10 digits is folded to 52 + 10 digits
+    - anything else keeps its digits as-is
+
+    Keep in sync with the SQL backfill in migration f4a5b6c7d8e9.
+    """
+    if not phone:
+        return None
+    digits = _NON_DIGITS.sub("", phone)
+    if not digits:
+        return None
+    if len(digits) == 10:
+        digits = f"{country_code}{digits}"
+    elif len(digits) == 13 and digits.startswith("521"):
+        digits = f"52{digits[3:]}"
+    return f"+{digits}"